@@ -7,6 +7,7 @@ from datetime import datetime
 
 from models.business_config import BusinessConfig
 from integrations.customer_data_manager import CustomerDataManager
+from integrations.customer_cache import customer_cache
 
 
 class ConfigManager:
@@ -44,8 +45,9 @@ class ConfigManager:
             
             self.business_config = business_config
             
-            # Reinitialize data manager
+            # Reinitialize data manager; providers may now point elsewhere
             self.data_manager = CustomerDataManager(business_config)
+            customer_cache.clear()
             
         except Exception as e:
             raise Exception(f"Error saving config: {e}")
@@ -159,6 +161,7 @@ class ConfigManager:
         
         self.business_config = None
         self.data_manager = None
+        customer_cache.clear()
     
     def validate_config(self) -> Dict[str, Any]:
         """Validate current configuration."""
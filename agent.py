@@ -40,7 +40,7 @@ logger = logging.getLogger(__name__)
 
 # Create an instance. That's it.
 # session_service = InMemorySessionService()
-db_url = "sqlite:///./my_agent_data.db"
+db_url = "sqlite+aiosqlite:///./my_agent_data.db"
 session_service = DatabaseSessionService(db_url=db_url)
 
 # Create function tools for each capability
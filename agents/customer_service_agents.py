@@ -8,10 +8,12 @@ from google.adk.runners import Runner
 from google.adk.cli.utils import create_empty_state
 from google.adk.agents import LlmAgent, SequentialAgent, ParallelAgent
 from google.adk.tools import FunctionTool
-from google.adk.sessions import InMemorySessionService
-from google.adk.sessions import DatabaseSessionService
 
 from config import Config
+from .session_store import create_session_service
+from .session_sweeper import SessionSweeper
+from shared_libraries.callbacks import after_agent, after_tool, before_agent, before_tool, on_tool_error
+from shared_libraries.conversation_history import compact_conversation, record_prompt_usage
 from prompts import (
     GLOBAL_INSTRUCTION,
     COORDINATOR_INSTRUCTION,
@@ -43,10 +45,10 @@ warnings.filterwarnings("ignore", category=UserWarning, module=".*pydantic.*")
 configs = Config()
 logger = logging.getLogger(__name__)
 
-# Create an instance. That's it.
-# session_service = InMemorySessionService()
-db_url = "sqlite:///./my_agent_data.db"
-session_service = DatabaseSessionService(db_url=db_url)
+# Shared by every runner; backend and pooling come from the session_db_* settings
+session_service = create_session_service()
+# Deletes expired sessions; started with the web app
+session_sweeper = SessionSweeper(session_service)
 
 # Create function tools for each capability
 search_kb_tool = FunctionTool(func=search_knowledge_base)
@@ -63,6 +65,17 @@ suggestions_tool = FunctionTool(func=generate_improvement_suggestions)
 save_state_tool = FunctionTool(func=save_to_session_state)
 get_state_tool = FunctionTool(func=get_from_session_state)
 
+# Callbacks shared by every agent: prompt compaction and session history tracking
+AGENT_CALLBACKS = {
+    "before_model_callback": compact_conversation,
+    "after_model_callback": record_prompt_usage,
+    "before_agent_callback": before_agent,
+    "after_agent_callback": after_agent,
+    "before_tool_callback": before_tool,
+    "after_tool_callback": after_tool,
+    "on_tool_error_callback": on_tool_error,
+}
+
 # Reception Agent - Initial categorization and routing
 reception_agent = LlmAgent(
     model=configs.reception_agent.model,
@@ -75,7 +88,8 @@ reception_agent = LlmAgent(
         priority_tool,
         save_state_tool
     ],
-    output_key="reception_assessment"
+    output_key="reception_assessment",
+    **AGENT_CALLBACKS
 )
 
 # Knowledge Agent - Search knowledge base and provide solutions
@@ -90,7 +104,8 @@ knowledge_agent = LlmAgent(
         get_state_tool,
         save_state_tool
     ],
-    output_key="knowledge_response"
+    output_key="knowledge_response",
+    **AGENT_CALLBACKS
 )
 
 # Technical Agent - Complex troubleshooting and technical support
@@ -106,7 +121,8 @@ technical_agent = LlmAgent(
         get_state_tool,
         save_state_tool
     ],
-    output_key="technical_response"
+    output_key="technical_response",
+    **AGENT_CALLBACKS
 )
 
 # Escalation Agent - Route to human specialists
@@ -122,7 +138,8 @@ escalation_agent = LlmAgent(
         get_state_tool,
         save_state_tool
     ],
-    output_key="escalation_response"
+    output_key="escalation_response",
+    **AGENT_CALLBACKS
 )
 
 # Follow-up Agent - Check satisfaction and ensure resolution
@@ -138,7 +155,8 @@ followup_agent = LlmAgent(
         get_state_tool,
         save_state_tool
     ],
-    output_key="followup_response"
+    output_key="followup_response",
+    **AGENT_CALLBACKS
 )
 
 # Learning Agent - Analyze interactions for continuous improvement
@@ -154,7 +172,8 @@ learning_agent = LlmAgent(
         get_state_tool,
         save_state_tool
     ],
-    output_key="learning_insights"
+    output_key="learning_insights",
+    **AGENT_CALLBACKS
 )
 
 # Main Coordinator Agent - Routes to appropriate workflows
@@ -178,8 +197,7 @@ coordinator_agent = LlmAgent(
         get_state_tool,
         save_state_tool
     ],
-    # after_model_callback=simple_after_model_modifier # Assign the function here
-    
+    **AGENT_CALLBACKS
 )
 
 # Export the main agent for use in applications
@@ -189,6 +207,18 @@ runner = Runner(
     agent=root_agent,
     session_service=session_service
 )
+
+# Runners rooted at each specialist, used by the fast-path router to skip the
+# coordinator model. They share the app name and session service, so a
+# conversation can move between them and the coordinator runner freely.
+agent_runners = {
+    agent.name: Runner(
+        app_name="customer-service",
+        agent=agent,
+        session_service=session_service
+    )
+    for agent in (knowledge_agent, technical_agent, escalation_agent)
+}
 logger.info("ADK Customer Service Agents initialized successfully")
 
 def create_new_state():
@@ -0,0 +1,120 @@
+"""Deterministic routing of chat messages ahead of the coordinator model.
+
+The coordinator's first step for most messages is to call the keyword
+classifiers and transfer to a specialist. When those classifiers are
+confident, the router dispatches straight to the specialist's runner and
+saves that model round-trip; ambiguous messages still go to the coordinator.
+Routing mirrors the reception agent's rules: critical priority goes to
+escalation, technical requests to the technical agent and everything else
+to the knowledge agent.
+"""
+
+import logging
+from typing import Dict, Any, Optional, Tuple
+
+from config import config
+from tools.keyword_matcher import scan_message
+import tools.customer_service_tools  # noqa: F401 - registers the request_* keyword tables
+from .customer_service_agents import runner, agent_runners
+
+logger = logging.getLogger(__name__)
+
+# Request category -> specialist agent, per the reception agent's routing rules
+CATEGORY_ROUTES = {
+    "technical": config.technical_agent.name,
+    "billing": config.knowledge_agent.name,
+    "account": config.knowledge_agent.name,
+    "general": config.knowledge_agent.name,
+}
+
+# Keyword hits at which a category is considered fully established
+SATURATION_HITS = 2
+
+
+def _confidence(best: int, total: int) -> float:
+    """Share of hits held by the winning specialist, scaled down for thin evidence."""
+    if not total:
+        return 0.0
+    return (best / total) * min(1.0, best / SATURATION_HITS)
+
+
+def classify_route(message: str) -> Dict[str, Any]:
+    """
+    Decide locally which specialist should handle a message.
+
+    Args:
+        message: The customer message
+
+    Returns:
+        Dict with the target ``agent`` (None to defer to the coordinator),
+        ``category``, ``priority``, ``confidence`` and ``reason``
+    """
+    scan = scan_message(message)
+    threshold = config.fast_path_confidence_threshold
+
+    # Critical messages must not be fast-pathed anywhere but escalation
+    critical_hits = scan.count("request_priority", "critical")
+    if critical_hits:
+        confidence = min(1.0, critical_hits / SATURATION_HITS)
+        return {
+            "agent": config.escalation_agent.name if confidence >= threshold else None,
+            "category": None,
+            "priority": "critical",
+            "confidence": confidence,
+            "reason": "critical priority keywords"
+        }
+
+    scores = {
+        category: scan.count("request_category", category)
+        for category in scan.categories("request_category")
+    }
+    if not scores:
+        return {
+            "agent": None,
+            "category": None,
+            "priority": None,
+            "confidence": 0.0,
+            "reason": "no category keywords"
+        }
+
+    # Categories sharing a specialist pool their evidence
+    agent_scores: Dict[str, int] = {}
+    for category, hits in scores.items():
+        agent_scores[CATEGORY_ROUTES[category]] = agent_scores.get(CATEGORY_ROUTES[category], 0) + hits
+    best_agent = max(agent_scores, key=agent_scores.get)
+    confidence = _confidence(agent_scores[best_agent], sum(agent_scores.values()))
+
+    best_category = max(
+        (category for category in scores if CATEGORY_ROUTES[category] == best_agent), key=scores.get
+    )
+    priorities = scan.categories("request_priority")
+    return {
+        "agent": best_agent if confidence >= threshold else None,
+        "category": best_category,
+        "priority": priorities[0] if priorities else "medium",
+        "confidence": confidence,
+        "reason": f"{best_category} keywords"
+    }
+
+
+def select_runner(message: str) -> Tuple[Any, Optional[Dict[str, Any]]]:
+    """
+    Pick the runner for a message.
+
+    Args:
+        message: The customer message
+
+    Returns:
+        Tuple of (runner, route decision); the decision is None when the
+        coordinator runner is used
+    """
+    if not config.fast_path_enabled:
+        return runner, None
+
+    route = classify_route(message)
+    if route["agent"] is None or route["agent"] not in agent_runners:
+        logger.debug(f"Fast path deferred to coordinator: {route['reason']} ({route['confidence']:.2f})")
+        return runner, None
+
+    logger.info(f"Fast path routed to {route['agent']}: {route['reason']} ({route['confidence']:.2f})")
+    return agent_runners[route["agent"]], route
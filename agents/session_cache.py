@@ -0,0 +1,355 @@
+"""In-process cache of agent sessions with write-behind persistence.
+
+``CachedSessionService`` sits in front of the database session service.
+Sessions read once stay in memory, so the next turn of a conversation
+handled by the same worker reads no rows. Appended events update the
+cached session at once and are written to the database according to
+``session_cache_durability``:
+
+- ``sync``: before ``append_event`` returns (read cache only)
+- ``interval``: by a background task every ``session_cache_flush_interval_seconds``
+- ``on_close``: when the session is evicted, on ``flush`` and on shutdown
+
+Buffered events of one session are written in order, sessions in
+parallel. A worker that crashes loses only its buffered events; the
+database never holds a partial session. Conversations should be routed
+to one worker (e.g. a load balancer hashing the conversation ID). If
+another worker has written the session anyway, the buffered events are
+replayed onto the stored session and the cached copy is dropped, so the
+next read picks up both workers' events.
+
+Sessions are evicted after ``session_cache_idle_seconds`` without use, and
+least recently used first once ``session_cache_max_sessions`` or
+``session_cache_max_bytes`` is exceeded.
+"""
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from contextlib import nullcontext
+from typing import Dict, Any, List, Optional, Tuple
+
+from google.adk.errors import StaleSessionError
+from google.adk.events import Event
+from google.adk.sessions import BaseSessionService, Session
+from google.adk.sessions.base_session_service import GetSessionConfig, ListSessionsResponse
+
+from config import config
+
+logger = logging.getLogger(__name__)
+
+SYNC = "sync"
+INTERVAL = "interval"
+ON_CLOSE = "on_close"
+
+
+def _event_size(event: Event) -> int:
+    return len(event.model_dump_json(exclude_none=True))
+
+
+class _CachedSession:
+    """A cached session, its write handle and events not yet stored."""
+
+    def __init__(self, view: Session, complete: bool):
+        self.view = view
+        # Separate copy passed to the database service, which tracks the
+        # stored revision on it; its events are not kept
+        self.shadow = view.model_copy(update={"events": [], "state": {}})
+        self.complete = complete
+        self.pending: List[Event] = []
+        self.size = sum(_event_size(event) for event in view.events)
+        self.last_access = time.monotonic()
+        self.stale = False
+        self.lock = asyncio.Lock()
+
+
+class CachedSessionService(BaseSessionService):
+    """LRU session cache with write-behind in front of another session service."""
+
+    def __init__(self, backend: BaseSessionService, durability: Optional[str] = None):
+        self.backend = backend
+        self.durability = durability or config.session_cache_durability
+        if self.durability not in (SYNC, INTERVAL, ON_CLOSE):
+            raise ValueError(f"Unknown session cache durability: {self.durability}")
+        self._sessions: "OrderedDict[Tuple[str, str, str], _CachedSession]" = OrderedDict()
+        self._bytes = 0
+        self._flusher: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.misses = 0
+        self.flushed = 0
+        self.conflicts = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _key(app_name: str, user_id: str, session_id: str) -> Tuple[str, str, str]:
+        return (app_name, user_id, session_id)
+
+    def _start(self):
+        if self.durability != SYNC and (self._flusher is None or self._flusher.done()):
+            self._flusher = asyncio.create_task(self._run())
+
+    def _store(self, session: Session, complete: bool) -> _CachedSession:
+        key = self._key(session.app_name, session.user_id, session.id)
+        self._drop(key)
+        entry = self._sessions[key] = _CachedSession(session, complete)
+        self._bytes += entry.size
+        self._start()
+        return entry
+
+    def _drop(self, key: Tuple[str, str, str]) -> Optional[_CachedSession]:
+        entry = self._sessions.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.size
+        return entry
+
+    def _serve(self, entry: _CachedSession, config: Optional[GetSessionConfig]) -> Optional[Session]:
+        """The cached session as requested by ``config``, or None if the cache lacks its events."""
+        num_recent = config.num_recent_events if config else None
+        after = config.after_timestamp if config else None
+        events = entry.view.events
+        if not entry.complete and (after is not None or num_recent is None or num_recent > len(events)):
+            return None
+        if after is None and num_recent is None:
+            return entry.view
+        if after is not None:
+            events = [event for event in events if event.timestamp >= after]
+        if num_recent is not None:
+            events = events[len(events) - num_recent:] if num_recent else []
+        return entry.view.model_copy(update={"events": events, "state": dict(entry.view.state)})
+
+    async def create_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        state: Optional[Dict[str, Any]] = None,
+        session_id: Optional[str] = None,
+    ) -> Session:
+        session = await self.backend.create_session(
+            app_name=app_name, user_id=user_id, state=state, session_id=session_id
+        )
+        return self._store(session, complete=True).view
+
+    async def get_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        session_id: str,
+        config: Optional[GetSessionConfig] = None,
+    ) -> Optional[Session]:
+        key = self._key(app_name, user_id, session_id)
+        entry = self._sessions.get(key)
+        if entry is not None and not entry.stale:
+            session = self._serve(entry, config)
+            if session is not None:
+                self.hits += 1
+                entry.last_access = time.monotonic()
+                self._sessions.move_to_end(key)
+                return session
+            # More history requested than cached: store what is buffered, then reload
+            await self._flush_session(key, entry)
+
+        self.misses += 1
+        old = self._sessions.get(key)
+        # No flush of the old copy may run while the session is reloaded
+        async with (old.lock if old is not None else nullcontext()):
+            session = await self.backend.get_session(
+                app_name=app_name, user_id=user_id, session_id=session_id, config=config
+            )
+            if session is None:
+                self._drop(key)
+                return None
+            num_recent = config.num_recent_events if config else None
+            after = config.after_timestamp if config else None
+            # A window that came back short holds the whole history
+            complete = after is None and (num_recent is None or len(session.events) < num_recent)
+            entry = self._store(session, complete)
+            if old is not None and old.pending:
+                # Appended meanwhile and not stored yet: carry them over
+                entry.pending, old.pending = old.pending, []
+                for event in entry.pending:
+                    self._update_session_state(entry.view, event)
+                    entry.view.events.append(event)
+        return entry.view
+
+    def holds(self, app_name: str, user_id: str, session_id: str) -> bool:
+        """Whether a session is cached, i.e. in use by this worker."""
+        return self._key(app_name, user_id, session_id) in self._sessions
+
+    async def list_sessions(self, *, app_name: str, user_id: Optional[str] = None) -> ListSessionsResponse:
+        return await self.backend.list_sessions(app_name=app_name, user_id=user_id)
+
+    async def delete_session(self, *, app_name: str, user_id: str, session_id: str) -> None:
+        self._drop(self._key(app_name, user_id, session_id))
+        await self.backend.delete_session(app_name=app_name, user_id=user_id, session_id=session_id)
+
+    async def get_user_state(self, *, app_name: str, user_id: str) -> Dict[str, Any]:
+        return await self.backend.get_user_state(app_name=app_name, user_id=user_id)
+
+    async def append_event(self, session: Session, event: Event) -> Event:
+        if event.partial:
+            return event
+        key = self._key(session.app_name, session.user_id, session.id)
+        entry = self._sessions.get(key)
+        if entry is None:
+            return await self._write_through(session, event)
+
+        self._apply_temp_state(session, event)
+        event = self._trim_temp_delta_state(event)
+        self._commit_event_to_session(session, event)
+        if session is not entry.view:
+            self._update_session_state(entry.view, event)
+            entry.view.events.append(event)
+        entry.view.last_update_time = event.timestamp
+        entry.last_access = time.monotonic()
+        self._sessions.move_to_end(key)
+
+        size = _event_size(event)
+        entry.size += size
+        self._bytes += size
+        entry.pending.append(event)
+        self._trim(entry)
+
+        if self.durability == SYNC:
+            await self._flush_session(key, entry)
+        elif self._bytes > config.session_cache_max_bytes or len(self._sessions) > config.session_cache_max_sessions:
+            self._start()
+        return event
+
+    async def _write_through(self, session: Session, event: Event) -> Event:
+        """Store an event of a session that is no longer cached."""
+        self._apply_temp_state(session, event)
+        event = self._trim_temp_delta_state(event)
+        # The caller's copy may predate events written from the cache; write via a fresh one
+        stored = await self.backend.get_session(
+            app_name=session.app_name,
+            user_id=session.user_id,
+            session_id=session.id,
+            config=GetSessionConfig(num_recent_events=0)
+        )
+        if stored is None:
+            return await self.backend.append_event(session, event)
+        await self.backend.append_event(stored, event)
+        return self._commit_event_to_session(session, event)
+
+    def _trim(self, entry: _CachedSession):
+        """Keep at most ``session_cache_max_events`` events of a cached session."""
+        excess = len(entry.view.events) - config.session_cache_max_events
+        if excess > 0:
+            dropped = sum(_event_size(event) for event in entry.view.events[:excess])
+            del entry.view.events[:excess]
+            entry.size -= dropped
+            self._bytes -= dropped
+            entry.complete = False
+
+    async def _flush_session(self, key: Tuple[str, str, str], entry: _CachedSession):
+        """Write a session's buffered events to the backend, oldest first."""
+        async with entry.lock:
+            while entry.pending:
+                event = entry.pending[0]
+                try:
+                    await self.backend.append_event(entry.shadow, event)
+                except StaleSessionError:
+                    # Another worker wrote this session: replay ours onto the stored revision
+                    self.conflicts += 1
+                    entry.stale = True
+                    stored = await self.backend.get_session(
+                        app_name=key[0],
+                        user_id=key[1],
+                        session_id=key[2],
+                        config=GetSessionConfig(num_recent_events=0)
+                    )
+                    if stored is None:
+                        logger.warning(f"Session {key[2]} was deleted; dropping {len(entry.pending)} buffered events")
+                        entry.pending.clear()
+                        break
+                    entry.shadow = stored
+                    continue
+                entry.pending.pop(0)
+                entry.shadow.events.clear()
+                self.flushed += 1
+        if entry.stale and self._sessions.get(key) is entry:
+            self._drop(key)
+
+    async def flush(self) -> None:
+        """Write every buffered event."""
+        await self._flush_all([key for key, entry in self._sessions.items() if entry.pending])
+
+    async def _flush_all(self, keys: List[Tuple[str, str, str]]):
+        async def flush_one(key):
+            entry = self._sessions.get(key)
+            if entry is None:
+                return
+            try:
+                await self._flush_session(key, entry)
+            except Exception as e:
+                logger.error(f"Error writing session {key[2]}: {str(e)}")
+
+        await asyncio.gather(*(flush_one(key) for key in keys))
+
+    async def _evict(self):
+        """Drop idle sessions and, beyond the size limits, least recently used ones."""
+        now = time.monotonic()
+        victims = [
+            key for key, entry in self._sessions.items()
+            if now - entry.last_access > config.session_cache_idle_seconds
+        ]
+        remaining = len(self._sessions) - len(victims)
+        remaining_bytes = self._bytes - sum(self._sessions[key].size for key in victims)
+        for key, entry in self._sessions.items():
+            if remaining <= config.session_cache_max_sessions and remaining_bytes <= config.session_cache_max_bytes:
+                break
+            if key not in victims:
+                victims.append(key)
+                remaining -= 1
+                remaining_bytes -= entry.size
+
+        await self._flush_all([key for key in victims if self._sessions.get(key) and self._sessions[key].pending])
+        for key in victims:
+            entry = self._sessions.get(key)
+            if entry is not None and not entry.pending:
+                self._drop(key)
+                self.evictions += 1
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(config.session_cache_flush_interval_seconds)
+            try:
+                if self.durability == INTERVAL:
+                    await self.flush()
+                await self._evict()
+            except Exception as e:
+                logger.error(f"Session cache maintenance failed: {str(e)}")
+
+    async def close(self) -> None:
+        """Stop background writes, store everything buffered and close the backend."""
+        if self._flusher is not None:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+            self._flusher = None
+        await self.flush()
+        self._sessions.clear()
+        self._bytes = 0
+        if hasattr(self.backend, "close"):
+            await self.backend.close()
+
+    def stats(self) -> Dict[str, Any]:
+        """Cache size, hit rate and write-behind counters."""
+        total = self.hits + self.misses
+        return {
+            "sessions": len(self._sessions),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "pending_events": sum(len(entry.pending) for entry in self._sessions.values()),
+            "flushed": self.flushed,
+            "conflicts": self.conflicts,
+            "evictions": self.evictions,
+            "durability": self.durability
+        }
@@ -0,0 +1,118 @@
+"""Agent session storage.
+
+Builds the ``DatabaseSessionService`` shared by every runner from the
+``session_db_*`` settings. The store is either SQLite, in WAL mode so chat
+turns read while others write, or PostgreSQL through asyncpg, with a
+connection pool sized for concurrent chats.
+
+Every event append is a transaction of its own inside ADK, so appends are
+batched at the database instead: SQLite uses ``synchronous=NORMAL`` and
+syncs the WAL at checkpoints rather than on every commit. With
+``session_db_synchronous_commit`` off, Postgres acknowledges commits
+before their WAL is flushed and flushes them in groups. A crash can lose
+the last fraction of a second of chat events, never corrupt a session.
+
+Sessions are read with at most ``session_recent_events`` events, so
+loading a long conversation does not re-hydrate its whole history. The
+bound is also all the agents see of the conversation: it is raised to
+cover ``max_conversation_turns`` turns of ``session_events_per_turn``
+events, and older turns reach the model through the conversation summary
+(see ``shared_libraries.conversation_history``). With
+``session_cache_enabled`` the store is fronted by ``CachedSessionService``
+(see ``session_cache``).
+"""
+
+import logging
+from typing import Dict, Any, Optional
+
+from google.adk.agents.run_config import RunConfig
+from google.adk.sessions import BaseSessionService, DatabaseSessionService
+from google.adk.sessions.base_session_service import GetSessionConfig
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+from config import config
+from .session_cache import CachedSessionService
+
+logger = logging.getLogger(__name__)
+
+# Async drivers for URLs given with a synchronous or no driver
+_ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgres": "postgresql+asyncpg",
+}
+
+
+def _async_url(db_url: str) -> str:
+    """Rewrite ``sqlite://`` and ``postgresql://`` URLs to their async drivers."""
+    url = make_url(db_url)
+    driver = _ASYNC_DRIVERS.get(url.drivername)
+    return url.set(drivername=driver).render_as_string(hide_password=False) if driver else db_url
+
+
+def _sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={int(config.session_db_busy_timeout_seconds * 1000)}")
+    cursor.close()
+
+
+def _engine_options(db_url: str) -> Dict[str, Any]:
+    """SQLAlchemy engine options for a session database."""
+    url = make_url(db_url)
+    if url.get_backend_name() == "sqlite":
+        # In-memory databases use one shared connection; ADK sets that up
+        if url.database in (None, "", ":memory:"):
+            return {}
+        return {
+            "pool_size": config.session_db_pool_size,
+            "max_overflow": config.session_db_max_overflow,
+        }
+
+    options = {
+        "pool_size": config.session_db_pool_size,
+        "max_overflow": config.session_db_max_overflow,
+        "pool_recycle": config.session_db_pool_recycle_seconds,
+        "pool_pre_ping": True,
+    }
+    if url.get_backend_name() == "postgresql" and not config.session_db_synchronous_commit:
+        options["connect_args"] = {"server_settings": {"synchronous_commit": "off"}}
+    return options
+
+
+def create_session_service(db_url: Optional[str] = None) -> BaseSessionService:
+    """
+    Create the agent session service.
+
+    Args:
+        db_url: Database URL (defaults to ``session_db_url``); synchronous
+            sqlite and postgresql URLs are switched to their async drivers
+
+    Returns:
+        Session service with a pooled, tuned engine, behind the session
+        cache if enabled
+    """
+    db_url = _async_url(db_url or config.session_db_url)
+    service = DatabaseSessionService(db_url=db_url, **_engine_options(db_url))
+    if service.db_engine.dialect.name == "sqlite":
+        event.listen(service.db_engine.sync_engine, "connect", _sqlite_pragmas)
+    logger.info(f"Session store: {make_url(db_url).render_as_string(hide_password=True)}")
+    if config.session_cache_enabled:
+        return CachedSessionService(service)
+    return service
+
+
+def session_read_config() -> Optional[GetSessionConfig]:
+    """Bound on the events loaded with a session; None loads the full history."""
+    if config.session_recent_events <= 0:
+        return None
+    # Never fewer events than the turns the agents keep verbatim, plus the current one
+    verbatim_events = (max(1, config.max_conversation_turns) + 1) * config.session_events_per_turn
+    return GetSessionConfig(num_recent_events=max(config.session_recent_events, verbatim_events))
+
+
+def agent_run_config(**kwargs) -> RunConfig:
+    """RunConfig for chat turns, loading sessions with ``session_read_config``."""
+    return RunConfig(get_session_config=session_read_config(), **kwargs)
@@ -0,0 +1,278 @@
+"""Expiry of stored agent sessions.
+
+``SessionSweeper`` deletes sessions from the session database once they
+have been idle longer than the TTL of their kind:
+
+- ``resolved``: a resolution was recorded (``session_ttl_resolved_seconds``)
+- ``abandoned``: the customer never got a reply, i.e. fewer than two
+  events were stored (``session_ttl_abandoned_seconds``)
+- ``active``: any other conversation (``session_ttl_active_seconds``)
+
+A sweep walks the sessions idle longer than the shortest TTL, oldest first,
+in batches of ``session_sweep_batch_size``. Each batch is read and deleted
+in short transactions of its own, with a pause in between, so chat turns
+are never blocked behind a sweep. Events go with their session (the
+schema cascades deletes). A session changed since it was read is not
+deleted. With ``session_sweep_archive`` a summary of each expired session
+(rollups, conversation summary, resolutions and escalations) is written to
+the session history archive first, on the archive's thread and before the
+delete transaction opens, so the session database is never locked while
+the archive is written. If that fails nothing is deleted. A session
+changed between the two keeps its archive record; it gets another one when
+it expires again.
+
+Sessions held by the session cache are skipped; they are in use.
+"""
+
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional, Tuple
+
+from sqlalchemy import and_, delete, func, or_, select, text, tuple_
+
+from config import config
+from shared_libraries.session_history import ROLLUP_KEY, compact_value, history_archive, history_total
+
+logger = logging.getLogger(__name__)
+
+ACTIVE = "active"
+RESOLVED = "resolved"
+ABANDONED = "abandoned"
+
+# State kept in the archive record of a deleted session
+_ARCHIVED_STATE_KEYS = (ROLLUP_KEY, "conversation_summary", "resolutions", "escalations")
+
+
+def _ttls() -> Dict[str, int]:
+    return {
+        ACTIVE: config.session_ttl_active_seconds,
+        RESOLVED: config.session_ttl_resolved_seconds,
+        ABANDONED: config.session_ttl_abandoned_seconds,
+    }
+
+
+def classify_session(state: Dict[str, Any], event_count: int) -> str:
+    """Kind of a stored session, which decides its TTL."""
+    if history_total(state, "resolutions") or state.get("followup_response"):
+        return RESOLVED
+    if event_count < 2:
+        return ABANDONED
+    return ACTIVE
+
+
+class SessionSweeper:
+    """Background deletion of expired sessions in bounded batches."""
+
+    def __init__(self, session_service):
+        self.session_service = session_service
+        # The database service, behind the session cache if there is one
+        self.store = getattr(session_service, "backend", session_service)
+        self._task: Optional[asyncio.Task] = None
+        self.sweeps = 0
+        self.scanned = 0
+        self.deleted = {ACTIVE: 0, RESOLVED: 0, ABANDONED: 0}
+        self.archived = 0
+        self.errors = 0
+        self.last_sweep_at: Optional[float] = None
+        self.last_sweep_seconds = 0.0
+        self.last_sweep_deleted = 0
+        self.table_sizes: Dict[str, Any] = {}
+
+    def _cutoff(self, seconds_ago: float) -> datetime:
+        cutoff = datetime.fromtimestamp(time.time() - seconds_ago, timezone.utc)
+        return cutoff.replace(tzinfo=None) if self.store._uses_naive_datetime() else cutoff
+
+    def _in_use(self, app_name: str, user_id: str, session_id: str) -> bool:
+        holds = getattr(self.session_service, "holds", None)
+        return bool(holds and holds(app_name, user_id, session_id))
+
+    async def _read_batch(self, cursor: Optional[Tuple[datetime, str, str, str]]) -> List[Any]:
+        """Next batch of sessions idle longer than the shortest TTL, after ``cursor``."""
+        schema = self.store._get_schema_classes()
+        sessions = schema.StorageSession
+        query = select(
+            sessions.app_name, sessions.user_id, sessions.id, sessions.state, sessions.update_time
+        ).where(sessions.update_time < self._cutoff(min(_ttls().values())))
+        if cursor is not None:
+            query = query.where(or_(
+                sessions.update_time > cursor[0],
+                and_(
+                    sessions.update_time == cursor[0],
+                    tuple_(sessions.app_name, sessions.user_id, sessions.id) > tuple_(*cursor[1:])
+                )
+            ))
+        query = query.order_by(
+            sessions.update_time, sessions.app_name, sessions.user_id, sessions.id
+        ).limit(config.session_sweep_batch_size)
+
+        async with self.store.database_session_factory() as sql_session:
+            rows = (await sql_session.execute(query)).all()
+            if not rows:
+                return []
+            events = schema.StorageEvent
+            keys = [(row.app_name, row.user_id, row.id) for row in rows]
+            counts = dict(
+                ((app_name, user_id, session_id), count)
+                for app_name, user_id, session_id, count in (await sql_session.execute(
+                    select(events.app_name, events.user_id, events.session_id, func.count())
+                    .where(tuple_(events.app_name, events.user_id, events.session_id).in_(keys))
+                    .group_by(events.app_name, events.user_id, events.session_id)
+                )).all()
+            )
+        return [(row, counts.get((row.app_name, row.user_id, row.id), 0)) for row in rows]
+
+    async def _delete(self, expired: List[Tuple[Any, str]]) -> Optional[List[Tuple[Any, str]]]:
+        """
+        Archive expired sessions, then delete them.
+
+        Returns:
+            The sessions deleted, or None if archiving failed and nothing was deleted
+        """
+        if config.session_sweep_archive:
+            try:
+                await history_archive.run(self._archive, expired)
+            except Exception as e:
+                # Keep the sessions rather than lose their history
+                logger.warning(f"Could not archive expired sessions: {str(e)}")
+                return None
+
+        sessions = self.store._get_schema_classes().StorageSession
+        async with self.store.database_session_factory() as sql_session:
+            deleted = []
+            for row, kind in expired:
+                # Unchanged since it was read, or it is no longer expired
+                result = await sql_session.execute(delete(sessions).where(
+                    sessions.app_name == row.app_name,
+                    sessions.user_id == row.user_id,
+                    sessions.id == row.id,
+                    sessions.update_time == row.update_time
+                ))
+                if result.rowcount:
+                    deleted.append((row, kind))
+            await sql_session.commit()
+        return deleted
+
+    def _archive(self, expired: List[Tuple[Any, str]]):
+        """Write the archive records of sessions; runs on the archive's thread."""
+        for row, kind in expired:
+            state = row.state or {}
+            record = {
+                "user_id": row.user_id,
+                "kind": kind,
+                "timestamp": row.update_time.replace(tzinfo=row.update_time.tzinfo or timezone.utc).timestamp(),
+                "state": compact_value({key: state[key] for key in _ARCHIVED_STATE_KEYS if key in state})
+            }
+            history_archive.append(row.id, "session", [record])
+            self.archived += 1
+
+    async def sweep(self) -> int:
+        """
+        Delete the sessions expired now.
+
+        Returns:
+            Number of sessions deleted
+        """
+        await self.store.prepare_tables()
+        started = time.monotonic()
+        ttls = _ttls()
+        now = time.time()
+        deleted = 0
+        cursor = None
+        for _ in range(config.session_sweep_max_batches):
+            batch = await self._read_batch(cursor)
+            if not batch:
+                break
+            last = batch[-1][0]
+            cursor = (last.update_time, last.app_name, last.user_id, last.id)
+            self.scanned += len(batch)
+
+            expired = []
+            for row, event_count in batch:
+                kind = classify_session(row.state or {}, event_count)
+                idle = now - row.update_time.replace(tzinfo=row.update_time.tzinfo or timezone.utc).timestamp()
+                if idle > ttls[kind] and not self._in_use(row.app_name, row.user_id, row.id):
+                    expired.append((row, kind))
+            if expired:
+                removed = await self._delete(expired)
+                if removed is None:
+                    break
+                for _, kind in removed:
+                    self.deleted[kind] += 1
+                deleted += len(removed)
+            if len(batch) < config.session_sweep_batch_size:
+                break
+            await asyncio.sleep(config.session_sweep_pause_seconds)
+
+        self.sweeps += 1
+        self.last_sweep_at = time.time()
+        self.last_sweep_seconds = time.monotonic() - started
+        self.last_sweep_deleted = deleted
+        if deleted:
+            logger.info(f"Session sweep deleted {deleted} expired sessions in {self.last_sweep_seconds:.2f}s")
+        self.table_sizes = await self._table_sizes()
+        return deleted
+
+    async def _table_sizes(self) -> Dict[str, Any]:
+        """Row counts and on-disk size of the session tables."""
+        schema = self.store._get_schema_classes()
+        async with self.store.db_engine.connect() as conn:
+            dialect = conn.dialect.name
+            if dialect == "postgresql":
+                # Planner estimates; exact counts would scan the tables
+                rows = (await conn.execute(text(
+                    "SELECT relname, reltuples::bigint, pg_total_relation_size(oid) FROM pg_class "
+                    "WHERE relname IN ('sessions', 'events') AND relkind = 'r'"
+                ))).all()
+                sizes = {f"{name}_rows": count for name, count, _ in rows}
+                sizes["bytes"] = sum(size for _, _, size in rows)
+                return sizes
+
+            sizes = {
+                "sessions_rows": (await conn.execute(select(func.count()).select_from(schema.StorageSession))).scalar(),
+                "events_rows": (await conn.execute(select(func.count()).select_from(schema.StorageEvent))).scalar()
+            }
+            if dialect == "sqlite":
+                page_size = (await conn.execute(text("PRAGMA page_size"))).scalar()
+                sizes["bytes"] = (await conn.execute(text("PRAGMA page_count"))).scalar() * page_size
+                sizes["free_bytes"] = (await conn.execute(text("PRAGMA freelist_count"))).scalar() * page_size
+            return sizes
+
+    def start(self):
+        if config.session_sweep_enabled and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.sweep()
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Session sweep failed: {str(e)}")
+            await asyncio.sleep(config.session_sweep_interval_seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        """Sweep throughput and the size of the session tables at the last sweep."""
+        return {
+            "sweeps": self.sweeps,
+            "scanned": self.scanned,
+            "deleted": dict(self.deleted),
+            "archived": self.archived,
+            "errors": self.errors,
+            "last_sweep_at": self.last_sweep_at,
+            "last_sweep_seconds": round(self.last_sweep_seconds, 3),
+            "last_sweep_deleted_per_second": (
+                round(self.last_sweep_deleted / self.last_sweep_seconds, 1) if self.last_sweep_seconds else 0.0
+            ),
+            "tables": self.table_sizes
+        }
@@ -14,42 +14,49 @@ class AgentModel(BaseModel):
     name: str = Field(default="customer_service_agent")
     team: str = Field(default="Customer Support")
     model: str = Field(default="gemini-2.0-flash-001")
+    history_token_budget: Optional[int] = Field(default=None)  # defaults to Config.history_token_budget
 
 class ReceptionAgentModel(BaseModel):
     """Reception agent settings."""
     name: str = Field(default="reception_agent")
     team: str = Field(default="General Support")
     model: str = Field(default="gemini-2.0-flash-001")
+    history_token_budget: Optional[int] = Field(default=None)  # defaults to Config.history_token_budget
 
 class KnowledgeAgentModel(BaseModel):
     """Knowledge agent settings."""
     name: str = Field(default="knowledge_agent")
     team: str = Field(default="Knowledge Base Support")
     model: str = Field(default="gemini-2.0-flash-001")
+    history_token_budget: Optional[int] = Field(default=None)  # defaults to Config.history_token_budget
 
 class TechnicalAgentModel(BaseModel):
     """Technical agent settings."""
     name: str = Field(default="technical_agent")
     team: str = Field(default="Technical Support")
     model: str = Field(default="gemini-2.0-flash-001")
+    history_token_budget: Optional[int] = Field(default=None)  # defaults to Config.history_token_budget
 
 class EscalationAgentModel(BaseModel):
     """Escalation agent settings."""
     name: str = Field(default="escalation_agent")
     team: str = Field(default="Escalation Team")
     model: str = Field(default="gemini-2.0-flash-001")
+    history_token_budget: Optional[int] = Field(default=None)  # defaults to Config.history_token_budget
 
 class FollowupAgentModel(BaseModel):
     """Follow-up agent settings."""
     name: str = Field(default="followup_agent")
     team: str = Field(default="Followup Team")
     model: str = Field(default="gemini-2.0-flash-001")
+    history_token_budget: Optional[int] = Field(default=None)  # defaults to Config.history_token_budget
 
 class LearningAgentModel(BaseModel):
     """Learning agent settings."""
     name: str = Field(default="learning_agent")
     team: str = Field(default="R & D Team")
     model: str = Field(default="gemini-2.0-flash-001")
+    history_token_budget: Optional[int] = Field(default=None)  # defaults to Config.history_token_budget
 
 class Config(BaseSettings):
     """Configuration settings for the customer service ecosystem."""
@@ -87,8 +94,102 @@ class Config(BaseSettings):
     
     # Knowledge base settings
     knowledge_base_path: str = "data/knowledge_base"
+    knowledge_index_path: str = "data/knowledge_index.bin"
+    knowledge_retrieval_mode: str = "keyword"  # keyword, vector or hybrid
+    knowledge_embeddings_path: str = "data/knowledge_embeddings.npy"
+    knowledge_embedding_dim: int = 256
+    knowledge_embedder: str = ""  # module:function; empty uses the hashing embedder
+    knowledge_hybrid_alpha: float = 0.5
+    knowledge_ivf_min_documents: int = 50000
+    knowledge_ivf_lists: int = 0
+    knowledge_ivf_nprobe: int = 8
+    knowledge_reload_check_seconds: float = 5.0  # 0 disables reloading changed knowledge files
     max_conversation_turns: int = 10
+    history_token_budget: int = 8000
+    history_summary_max_chars: int = 4000
+    fast_path_enabled: bool = True
+    fast_path_confidence_threshold: float = 0.7
+    response_cache_enabled: bool = True
+    response_cache_ttl_seconds: int = 3600
+    response_cache_max_entries: int = 1000
+    response_cache_similarity_threshold: float = 0.9
     escalation_threshold: int = 3
+    customer_cache_enabled: bool = True
+    customer_cache_ttl_seconds: int = 300
+    customer_cache_negative_ttl_seconds: int = 60
+    customer_cache_max_entries: int = 10000
+    oauth_refresh_margin_seconds: int = 300
+    circuit_breaker_enabled: bool = True
+    circuit_breaker_window: int = 20
+    circuit_breaker_min_calls: int = 10
+    circuit_breaker_failure_rate: float = 0.5
+    circuit_breaker_slow_call_seconds: float = 3.0
+    circuit_breaker_slow_call_rate: float = 0.5
+    circuit_breaker_open_seconds: int = 30
+    rate_limit_enabled: bool = True
+    rate_limit_requests_per_second: float = 10.0
+    rate_limit_burst: int = 20
+    rate_limit_bulk_reserve: float = 0.25  # share of the bucket kept for interactive requests
+    rate_limit_daily_reserve: float = 0.1  # share of a daily quota kept for interactive requests
+    rate_limit_max_retries: int = 3
+    rate_limit_backoff_base_seconds: float = 0.5
+    rate_limit_backoff_max_seconds: float = 30.0
+    identity_index_enabled: bool = True
+    identity_index_path: str = "data/identity_index.db"
+    default_phone_country_code: str = "1"
+    customer_replica_path: str = "data/customer_replica.db"
+    customer_sync_enabled: bool = False
+    customer_sync_interval_seconds: int = 300
+    customer_sync_overlap_seconds: int = 60
+    customer_sync_page_size: int = 100
+    postgres_pool_min_size: int = 1
+    postgres_pool_max_size: int = 10
+    postgres_pool_max_inactive_lifetime: float = 300.0
+    postgres_command_timeout: float = 10.0
+    postgres_statement_cache_size: int = 100
+    postgres_health_check_interval: float = 30.0
+    postgres_notify_keepalive_seconds: float = 30.0
+    postgres_notify_reconnect_max_seconds: float = 60.0
+    postgres_notify_queue_size: int = 10000
+    webhook_workers: int = 4
+    webhook_queue_size: int = 10000
+    webhook_dedup_ttl_seconds: int = 86400
+    webhook_dedup_max_entries: int = 100000
+    webhook_signature_tolerance_seconds: int = 300
+    session_db_url: str = "sqlite+aiosqlite:///./my_agent_data.db"
+    session_db_pool_size: int = 10
+    session_db_max_overflow: int = 10
+    session_db_pool_recycle_seconds: int = 1800
+    session_db_busy_timeout_seconds: float = 5.0
+    session_db_synchronous_commit: bool = False
+    session_recent_events: int = 50  # events loaded with a session; 0 loads all
+    session_events_per_turn: int = 8  # so the loaded events cover max_conversation_turns
+    session_cache_enabled: bool = True
+    session_cache_durability: str = "interval"  # sync, interval or on_close
+    session_cache_flush_interval_seconds: float = 1.0
+    session_cache_idle_seconds: int = 900
+    session_cache_max_sessions: int = 1000
+    session_cache_max_bytes: int = 64 * 1024 * 1024
+    session_cache_max_events: int = 200
+    session_history_max_entries: int = 20  # per history list in session state
+    session_history_max_value_chars: int = 200
+    session_history_archive_enabled: bool = True
+    session_history_archive_path: str = "data/session_history.db"
+    session_ttl_active_seconds: int = 30 * 86400
+    session_ttl_resolved_seconds: int = 7 * 86400
+    session_ttl_abandoned_seconds: int = 86400
+    session_sweep_enabled: bool = True
+    session_sweep_interval_seconds: int = 3600
+    session_sweep_batch_size: int = 200
+    session_sweep_max_batches: int = 500  # per sweep
+    session_sweep_pause_seconds: float = 0.05
+    session_sweep_archive: bool = True
+    http_pool_limit: int = 100
+    http_pool_limit_per_host: int = 20
+    http_keepalive_timeout: float = 60.0
+    http_dns_cache_ttl: int = 300
+    http_connect_timeout: float = 5.0
+    http_request_timeout: float = 30.0
     api_host: str = Field(default="0.0.0.0")
     api_port: int = Field(default=8008)
     log_level: str = Field(default="DEBUG")
@@ -1,11 +1,17 @@
 """Base classes for customer data providers."""
 
+import asyncio
 from abc import ABC, abstractmethod
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, AsyncIterator, List, Optional
 from pydantic import BaseModel
+import aiohttp
 from datetime import datetime
 
 from entities.customer import Customer
+from .http_client import get_http_session, close_http_session
+
+# Concurrent single-record lookups used by the default get_customers_bulk
+BULK_FALLBACK_CONCURRENCY = 10
 
 
 class IntegrationConfig(BaseModel):
@@ -26,11 +32,40 @@ class IntegrationConfig(BaseModel):
 class CustomerDataProvider(ABC):
     """Abstract base class for customer data providers."""
     
+    # Most IDs one get_customers_bulk call accepts (the provider's batch endpoint limit)
+    max_bulk_size = 100
+    
+    # Whether calls go through ``http_session``, whose requests report to the circuit breaker
+    uses_http_session = False
+    
+    # Documented API rate limit; None uses the application default
+    rate_limit_per_second: Optional[float] = None
+    rate_limit_burst: Optional[int] = None
+    
     def __init__(self, config: IntegrationConfig):
         self.config = config
         self.provider_type = config.provider_type
         self.provider_name = config.provider_name
     
+    @property
+    def provider_key(self) -> str:
+        """Identity of this provider across data manager instances."""
+        return f"{self.provider_type}:{self.provider_name}"
+    
+    def http_session(self) -> aiohttp.ClientSession:
+        """Shared keep-alive, rate-limited HTTP session for this provider."""
+        overrides = {}
+        if self.rate_limit_per_second is not None:
+            overrides["rate_limit_requests_per_second"] = self.rate_limit_per_second
+        if self.rate_limit_burst is not None:
+            overrides["rate_limit_burst"] = self.rate_limit_burst
+        overrides.update(self.config.custom_config)
+        return get_http_session(self.provider_key, overrides)
+    
+    async def close(self):
+        """Release network resources held for this provider."""
+        await close_http_session(self.provider_key)
+    
     @abstractmethod
     async def get_customer(self, customer_id: str) -> Optional[Customer]:
         """Get customer by ID."""
@@ -46,6 +81,30 @@ class CustomerDataProvider(ABC):
         """Get customer by phone number."""
         pass
     
+    async def get_customers_bulk(self, customer_ids: List[str]) -> Dict[str, Customer]:
+        """
+        Get several customers by ID.
+        
+        The default issues concurrent single-record lookups; providers with a
+        batch endpoint override it.
+        
+        Args:
+            customer_ids: At most ``max_bulk_size`` customer IDs
+        
+        Returns:
+            Dict of customer ID to Customer for the IDs that were found;
+            overrides raise on request failures so that failed IDs are not
+            mistaken for missing ones
+        """
+        semaphore = asyncio.Semaphore(BULK_FALLBACK_CONCURRENCY)
+        
+        async def fetch(customer_id: str):
+            async with semaphore:
+                return customer_id, await self.get_customer(customer_id)
+        
+        results = await asyncio.gather(*(fetch(customer_id) for customer_id in customer_ids))
+        return {customer_id: customer for customer_id, customer in results if customer}
+    
     @abstractmethod
     async def create_customer(self, customer_data: Dict[str, Any]) -> Customer:
         """Create new customer record."""
@@ -66,6 +125,52 @@ class CustomerDataProvider(ABC):
         """Search customers by query."""
         pass
     
+    async def iter_customers(self, query: str, page_size: int = 100) -> AsyncIterator[Customer]:
+        """
+        Stream search results page by page.
+        
+        The default yields a single ``search_customers`` page; providers with
+        a paging protocol override it to follow their cursors lazily.
+        
+        Args:
+            query: Search query
+            page_size: Records requested per page
+        """
+        for customer in await self.search_customers(query, page_size):
+            yield customer
+    
+    async def iter_history(self, customer_id: str, page_size: int = 100) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream interaction history, most recent first where the provider allows.
+        
+        The default yields ``get_customer_history``; providers with a paging
+        protocol override it to follow their cursors lazily.
+        
+        Args:
+            customer_id: Customer identifier
+            page_size: Records requested per page
+        """
+        for record in await self.get_customer_history(customer_id):
+            yield record
+    
+    async def iter_changed_customers(
+        self,
+        since: Optional[datetime] = None,
+        page_size: int = 100
+    ) -> AsyncIterator[Customer]:
+        """
+        Stream customers created or modified since a point in time.
+        
+        Providers override this with their vendor's incremental export; the
+        default raises NotImplementedError, so the provider is not synced.
+        
+        Args:
+            since: Timezone-aware lower bound; None exports every customer
+            page_size: Records requested per page
+        """
+        raise NotImplementedError(f"{self.provider_type} provider has no incremental customer export")
+        yield
+    
     async def test_connection(self) -> Dict[str, Any]:
         """Test provider connection."""
         try:
@@ -0,0 +1,176 @@
+"""Per-provider circuit breakers.
+
+A breaker watches the outcome of the last ``circuit_breaker_window`` calls to
+a provider. When the share of failed calls, or of calls slower than
+``circuit_breaker_slow_call_seconds``, reaches its threshold the breaker
+opens and calls are refused immediately, so the data manager falls back to
+other providers without waiting. After ``circuit_breaker_open_seconds`` it
+lets a trial call through (half-open); a good trial closes it again, a bad
+one reopens it.
+
+For HTTP providers outcomes are recorded per request by the pooled session
+(see ``http_client``), which also sees errors that provider methods catch
+and turn into "not found". For other providers the data manager records the
+outcome of each call.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, Any, Optional, Tuple
+
+from config import config
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+BREAKER_SETTINGS = (
+    "circuit_breaker_window",
+    "circuit_breaker_min_calls",
+    "circuit_breaker_failure_rate",
+    "circuit_breaker_slow_call_seconds",
+    "circuit_breaker_slow_call_rate",
+    "circuit_breaker_open_seconds",
+)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a provider whose breaker is open."""
+    pass
+
+
+class CircuitBreaker:
+    """Closed / open / half-open breaker over a sliding window of call outcomes."""
+
+    def __init__(self, name: str, settings: Dict[str, Any]):
+        self.name = name
+        self.min_calls = settings["circuit_breaker_min_calls"]
+        self.failure_rate_threshold = settings["circuit_breaker_failure_rate"]
+        self.slow_call_seconds = settings["circuit_breaker_slow_call_seconds"]
+        self.slow_call_rate_threshold = settings["circuit_breaker_slow_call_rate"]
+        self.open_seconds = settings["circuit_breaker_open_seconds"]
+        # (failed, slow) per call, most recent last
+        self._outcomes: Deque[Tuple[bool, bool]] = deque(maxlen=settings["circuit_breaker_window"])
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._trial_started_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self.rejected = 0
+        self.times_opened = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+                self._state = HALF_OPEN
+                self._trial_started_at = None
+            return self._state
+
+    def allow_request(self) -> bool:
+        """Whether a call may go to the provider now."""
+        state = self.state
+        with self._lock:
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN:
+                now = time.monotonic()
+                # One trial at a time; a trial whose outcome never arrived expires
+                if self._trial_started_at is None or now - self._trial_started_at >= self.open_seconds:
+                    self._trial_started_at = now
+                    return True
+            self.rejected += 1
+            return False
+
+    def record(self, duration: float, failed: bool = False):
+        """
+        Record the outcome of a call.
+
+        Args:
+            duration: Call latency in seconds
+            failed: Whether the call errored or timed out
+        """
+        slow = duration >= self.slow_call_seconds
+        with self._lock:
+            if self._state == HALF_OPEN:
+                if failed or slow:
+                    self._open("trial call failed" if failed else "trial call slow")
+                else:
+                    self._state = CLOSED
+                    self._outcomes.clear()
+                    logger.info(f"Circuit breaker {self.name} closed")
+                return
+            if self._state == OPEN:
+                return
+
+            self._outcomes.append((failed, slow))
+            if len(self._outcomes) < self.min_calls:
+                return
+            failure_rate, slow_rate = self._rates()
+            if failure_rate >= self.failure_rate_threshold:
+                self._open(f"failure rate {failure_rate:.0%}")
+            elif slow_rate >= self.slow_call_rate_threshold:
+                self._open(f"slow call rate {slow_rate:.0%}")
+
+    def _rates(self) -> Tuple[float, float]:
+        calls = len(self._outcomes)
+        if not calls:
+            return 0.0, 0.0
+        return (
+            sum(failed for failed, _ in self._outcomes) / calls,
+            sum(slow for _, slow in self._outcomes) / calls
+        )
+
+    def _open(self, reason: str):
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
+        self.times_opened += 1
+        logger.warning(f"Circuit breaker {self.name} opened: {reason}")
+
+    def stats(self) -> Dict[str, Any]:
+        """State and window metrics."""
+        state = self.state
+        with self._lock:
+            failure_rate, slow_rate = self._rates()
+            return {
+                "state": state,
+                "calls": len(self._outcomes),
+                "failure_rate": round(failure_rate, 4),
+                "slow_call_rate": round(slow_rate, 4),
+                "times_opened": self.times_opened,
+                "rejected": self.rejected
+            }
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_registry_lock = threading.Lock()
+
+
+def get_circuit_breaker(provider_key: str, overrides: Optional[Dict[str, Any]] = None) -> CircuitBreaker:
+    """
+    Get the breaker of a provider, creating it on first use.
+
+    Args:
+        provider_key: Provider identity
+        overrides: Per-provider ``circuit_breaker_*`` settings; only used
+            when the breaker is created
+    """
+    breaker = _breakers.get(provider_key)
+    if breaker is None:
+        with _registry_lock:
+            breaker = _breakers.get(provider_key)
+            if breaker is None:
+                settings = {name: getattr(config, name) for name in BREAKER_SETTINGS}
+                if overrides:
+                    settings.update({name: overrides[name] for name in BREAKER_SETTINGS if name in overrides})
+                breaker = _breakers[provider_key] = CircuitBreaker(provider_key, settings)
+    return breaker
+
+
+def circuit_breaker_stats() -> Dict[str, Any]:
+    """State of every provider's breaker, for health reporting."""
+    return {provider_key: breaker.stats() for provider_key, breaker in list(_breakers.items())}
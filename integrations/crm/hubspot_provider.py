@@ -1,19 +1,31 @@
 """HubSpot CRM integration provider."""
 
 import logging
-from typing import Dict, Any, List, Optional
-import aiohttp
+from typing import Dict, Any, AsyncIterator, List, Optional
 from datetime import datetime
 
 from ..base_provider import CustomerDataProvider, IntegrationConfig, ProviderConnectionError
+from ..pagination import paginate
 from entities.customer import Customer
 
 logger = logging.getLogger(__name__)
 
+# Largest page the CRM search endpoints return
+SEARCH_PAGE_LIMIT = 100
+
+# CRM search returns at most this many results per query, whatever the paging
+SEARCH_RESULT_LIMIT = 10000
+
 
 class HubSpotProvider(CustomerDataProvider):
     """HubSpot CRM data provider."""
     
+    uses_http_session = True
+    
+    # 100 requests per 10 seconds for private apps
+    rate_limit_per_second = 10.0
+    rate_limit_burst = 100
+    
     def __init__(self, config: IntegrationConfig):
         super().__init__(config)
         self.api_key = config.api_key
@@ -29,28 +41,29 @@ class HubSpotProvider(CustomerDataProvider):
         url = f"{self.base_url}/{endpoint}"
         
         try:
-            async with aiohttp.ClientSession() as session:
-                if method == "GET":
-                    async with session.get(url, headers=headers) as response:
-                        if response.status == 200:
-                            return await response.json()
-                        else:
-                            error_text = await response.text()
-                            raise ProviderConnectionError(f"HubSpot API error: {error_text}")
-                elif method == "POST":
-                    async with session.post(url, headers=headers, json=data) as response:
-                        if response.status in [200, 201]:
-                            return await response.json()
-                        else:
-                            error_text = await response.text()
-                            raise ProviderConnectionError(f"HubSpot API error: {error_text}")
-                elif method == "PATCH":
-                    async with session.patch(url, headers=headers, json=data) as response:
-                        if response.status == 200:
-                            return await response.json()
-                        else:
-                            error_text = await response.text()
-                            raise ProviderConnectionError(f"HubSpot API error: {error_text}")
+            session = self.http_session()
+            if method == "GET":
+                async with session.get(url, headers=headers) as response:
+                    if response.status == 200:
+                        return await response.json()
+                    else:
+                        error_text = await response.text()
+                        raise ProviderConnectionError(f"HubSpot API error: {error_text}")
+            elif method == "POST":
+                async with session.post(url, headers=headers, json=data) as response:
+                    # 207 is returned by batch endpoints when some inputs were not found
+                    if response.status in [200, 201, 207]:
+                        return await response.json()
+                    else:
+                        error_text = await response.text()
+                        raise ProviderConnectionError(f"HubSpot API error: {error_text}")
+            elif method == "PATCH":
+                async with session.patch(url, headers=headers, json=data) as response:
+                    if response.status == 200:
+                        return await response.json()
+                    else:
+                        error_text = await response.text()
+                        raise ProviderConnectionError(f"HubSpot API error: {error_text}")
         except Exception as e:
             raise ProviderConnectionError(f"HubSpot connection error: {str(e)}")
     
@@ -70,6 +83,28 @@ class HubSpotProvider(CustomerDataProvider):
             logger.error(f"Error getting HubSpot customer {customer_id}: {str(e)}")
             return None
     
+    async def get_customers_bulk(self, customer_ids: List[str]) -> Dict[str, Customer]:
+        """Get several contacts with one batch read request."""
+        try:
+            batch_data = {
+                "properties": ["firstname", "lastname", "email", "phone", "company"],
+                "inputs": [{"id": customer_id} for customer_id in customer_ids]
+            }
+            
+            endpoint = "crm/v3/objects/contacts/batch/read"
+            result = await self._make_api_request(endpoint, "POST", batch_data)
+            
+            customers = {}
+            for contact_data in result.get("results", []):
+                mapped_data = self.map_fields(contact_data.get("properties", {}))
+                mapped_data["customer_id"] = contact_data.get("id")
+                customers[str(contact_data.get("id"))] = Customer.from_provider_data(mapped_data, "hubspot")
+            
+            return customers
+        except Exception as e:
+            logger.error(f"Error getting HubSpot customers in bulk: {str(e)}")
+            raise
+    
     async def get_customer_by_email(self, email: str) -> Optional[Customer]:
         """Get customer by email address."""
         try:
@@ -186,17 +221,7 @@ class HubSpotProvider(CustomerDataProvider):
                 # Check if ticket is associated with this contact
                 associations = ticket.get("associations", {}).get("contacts", {}).get("results", [])
                 if any(assoc.get("id") == customer_id for assoc in associations):
-                    properties = ticket.get("properties", {})
-                    history.append({
-                        "id": ticket.get("id"),
-                        "type": "ticket",
-                        "subject": properties.get("subject", ""),
-                        "content": properties.get("content", ""),
-                        "status": properties.get("hs_ticket_status", ""),
-                        "priority": properties.get("hs_ticket_priority", ""),
-                        "created_date": properties.get("createdate", ""),
-                        "source": "hubspot"
-                    })
+                    history.append(self._ticket_record(ticket))
             
             return history
             
@@ -204,6 +229,49 @@ class HubSpotProvider(CustomerDataProvider):
             logger.error(f"Error getting HubSpot customer history {customer_id}: {str(e)}")
             return []
     
+    async def iter_history(self, customer_id: str, page_size: int = 100) -> AsyncIterator[Dict[str, Any]]:
+        """Stream the contact's tickets newest first, following search paging cursors."""
+        search_data = {
+            "filterGroups": [
+                {
+                    "filters": [
+                        {
+                            "propertyName": "associations.contact",
+                            "operator": "EQ",
+                            "value": customer_id
+                        }
+                    ]
+                }
+            ],
+            "properties": ["subject", "content", "hs_ticket_status", "hs_ticket_priority", "createdate"],
+            "sorts": [{"propertyName": "createdate", "direction": "DESCENDING"}],
+            "limit": min(page_size, SEARCH_PAGE_LIMIT)
+        }
+        
+        async def fetch_page(after: Optional[str]):
+            result = await self._make_api_request(
+                "crm/v3/objects/tickets/search", "POST", dict(search_data, after=after or 0)
+            )
+            next_after = result.get("paging", {}).get("next", {}).get("after")
+            return [self._ticket_record(ticket) for ticket in result.get("results", [])], next_after
+        
+        async for record in paginate(fetch_page):
+            yield record
+    
+    def _ticket_record(self, ticket: Dict[str, Any]) -> Dict[str, Any]:
+        """History record for a HubSpot ticket."""
+        properties = ticket.get("properties", {})
+        return {
+            "id": ticket.get("id"),
+            "type": "ticket",
+            "subject": properties.get("subject", ""),
+            "content": properties.get("content", ""),
+            "status": properties.get("hs_ticket_status", ""),
+            "priority": properties.get("hs_ticket_priority", ""),
+            "created_date": properties.get("createdate", ""),
+            "source": "hubspot"
+        }
+    
     async def search_customers(self, query: str, limit: int = 10) -> List[Customer]:
         """Search customers in HubSpot."""
         try:
@@ -216,19 +284,69 @@ class HubSpotProvider(CustomerDataProvider):
             endpoint = "crm/v3/objects/contacts/search"
             result = await self._make_api_request(endpoint, "POST", search_data)
             
-            customers = []
-            for contact in result.get("results", []):
-                mapped_data = self.map_fields(contact.get("properties", {}))
-                mapped_data["customer_id"] = contact.get("id")
-                customer = Customer.from_provider_data(mapped_data, "hubspot")
-                customers.append(customer)
-            
-            return customers
+            return [self._contact_customer(contact) for contact in result.get("results", [])]
             
         except Exception as e:
             logger.error(f"Error searching HubSpot customers: {str(e)}")
             return []
     
+    async def iter_customers(self, query: str, page_size: int = 100) -> AsyncIterator[Customer]:
+        """Stream search results, following search paging cursors."""
+        async def fetch_page(after: Optional[str]):
+            search_data = {
+                "query": query,
+                "limit": min(page_size, SEARCH_PAGE_LIMIT),
+                "after": after or 0
+            }
+            result = await self._make_api_request("crm/v3/objects/contacts/search", "POST", search_data)
+            next_after = result.get("paging", {}).get("next", {}).get("after")
+            return [self._contact_customer(contact) for contact in result.get("results", [])], next_after
+        
+        async for customer in paginate(fetch_page):
+            yield customer
+    
+    async def iter_changed_customers(
+        self,
+        since: Optional[datetime] = None,
+        page_size: int = 100
+    ) -> AsyncIterator[Customer]:
+        """Stream contacts by ascending lastmodifieddate through CRM search."""
+        async def fetch_page(cursor: Optional[tuple]):
+            modified_since, after = cursor or (int(since.timestamp() * 1000) if since else 0, 0)
+            search_data = {
+                "filterGroups": [{"filters": [{
+                    "propertyName": "lastmodifieddate",
+                    "operator": "GTE",
+                    "value": str(modified_since)
+                }]}],
+                "sorts": [{"propertyName": "lastmodifieddate", "direction": "ASCENDING"}],
+                "properties": ["firstname", "lastname", "email", "phone", "company", "lastmodifieddate"],
+                "limit": min(page_size, SEARCH_PAGE_LIMIT),
+                "after": after
+            }
+            result = await self._make_api_request("crm/v3/objects/contacts/search", "POST", search_data)
+            contacts = result.get("results", [])
+            customers = [self._contact_customer(contact) for contact in contacts]
+            next_after = result.get("paging", {}).get("next", {}).get("after")
+            if not next_after:
+                return customers, None
+            
+            if int(next_after) >= SEARCH_RESULT_LIMIT:
+                # Paging stops at the result limit: start a new query from the last modification seen
+                last_modified = contacts[-1].get("properties", {}).get("lastmodifieddate")
+                last_ms = int(datetime.fromisoformat(last_modified.replace("Z", "+00:00")).timestamp() * 1000)
+                return customers, ((last_ms, 0) if last_ms > modified_since else None)
+            return customers, (modified_since, next_after)
+        
+        async for customer in paginate(fetch_page):
+            yield customer
+    
+    def _contact_customer(self, contact: Dict[str, Any]) -> Customer:
+        """Customer from a HubSpot contact object."""
+        mapped_data = self.map_fields(contact.get("properties", {}))
+        mapped_data["customer_id"] = contact.get("id")
+        return Customer.from_provider_data(mapped_data, "hubspot")
+    
     async def test_connection(self) -> Dict[str, Any]:
         """Test HubSpot connection."""
         try:
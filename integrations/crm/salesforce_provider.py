@@ -1,12 +1,13 @@
 """Salesforce CRM integration provider."""
 
 import logging
-from typing import Dict, Any, List, Optional
-import aiohttp
+from typing import Dict, Any, AsyncIterator, List, Optional
 import base64
-from datetime import datetime
+from datetime import datetime, timezone
 
 from ..base_provider import CustomerDataProvider, IntegrationConfig, ProviderConnectionError
+from ..pagination import paginate
+from ..oauth import oauth_tokens
 from entities.customer import Customer
 
 logger = logging.getLogger(__name__)
@@ -15,6 +16,11 @@ logger = logging.getLogger(__name__)
 class SalesforceProvider(CustomerDataProvider):
     """Salesforce CRM data provider."""
     
+    uses_http_session = True
+    
+    # sObject Collections GET accepts up to 200 IDs per request
+    max_bulk_size = 200
+    
     def __init__(self, config: IntegrationConfig):
         super().__init__(config)
         self.instance_url = config.custom_config.get("instance_url")
@@ -23,14 +29,16 @@ class SalesforceProvider(CustomerDataProvider):
         self.username = config.username
         self.password = config.password
         self.security_token = config.custom_config.get("security_token", "")
-        self.access_token = None
-        self.token_expires_at = None
+        # Session lifetime is an org setting and the password grant does not report it
+        self.token_ttl = float(config.custom_config.get("token_ttl_seconds", 7200))
     
-    async def _get_access_token(self) -> str:
-        """Get OAuth access token for Salesforce API."""
-        if self.access_token and self.token_expires_at and datetime.now() < self.token_expires_at:
-            return self.access_token
-        
+    @property
+    def _token_key(self) -> str:
+        """Credential set the access token belongs to."""
+        return f"salesforce:{self.instance_url}:{self.client_id}:{self.username}"
+    
+    async def _request_access_token(self) -> Dict[str, Any]:
+        """Perform the OAuth password grant."""
         auth_url = f"{self.instance_url}/services/oauth2/token"
         
         data = {
@@ -42,44 +50,51 @@ class SalesforceProvider(CustomerDataProvider):
         }
         
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(auth_url, data=data) as response:
-                    if response.status == 200:
-                        token_data = await response.json()
-                        self.access_token = token_data["access_token"]
-                        # Tokens typically expire in 2 hours
-                        self.token_expires_at = datetime.now().timestamp() + 7200
-                        return self.access_token
-                    else:
-                        error_text = await response.text()
-                        raise ProviderConnectionError(f"Salesforce auth failed: {error_text}")
+            session = self.http_session()
+            async with session.post(auth_url, data=data) as response:
+                if response.status == 200:
+                    return await response.json()
+                else:
+                    error_text = await response.text()
+                    raise ProviderConnectionError(f"Salesforce auth failed: {error_text}")
+        except ProviderConnectionError:
+            raise
         except Exception as e:
             raise ProviderConnectionError(f"Salesforce connection error: {str(e)}")
     
-    async def _make_api_request(self, endpoint: str, method: str = "GET", data: Dict = None) -> Dict[str, Any]:
+    async def _get_access_token(self) -> str:
+        """Get OAuth access token for Salesforce API."""
+        return await oauth_tokens.get_token(self._token_key, self._request_access_token, self.token_ttl)
+    
+    async def _make_api_request(
+        self,
+        endpoint: str,
+        method: str = "GET",
+        data: Dict = None,
+        extra_headers: Dict[str, str] = None
+    ) -> Dict[str, Any]:
         """Make authenticated API request to Salesforce."""
-        access_token = await self._get_access_token()
-        
-        headers = {
-            "Authorization": f"Bearer {access_token}",
-            "Content-Type": "application/json"
-        }
-        
         url = f"{self.instance_url}/services/data/v58.0/{endpoint}"
         
-        try:
-            async with aiohttp.ClientSession() as session:
-                if method == "GET":
-                    async with session.get(url, headers=headers) as response:
-                        return await response.json()
-                elif method == "POST":
-                    async with session.post(url, headers=headers, json=data) as response:
-                        return await response.json()
-                elif method == "PATCH":
-                    async with session.patch(url, headers=headers, json=data) as response:
-                        return await response.json()
-        except Exception as e:
-            raise ProviderConnectionError(f"Salesforce API error: {str(e)}")
+        for attempt in range(2):
+            access_token = await self._get_access_token()
+            
+            headers = {
+                "Authorization": f"Bearer {access_token}",
+                "Content-Type": "application/json"
+            }
+            headers.update(extra_headers or {})
+            
+            try:
+                session = self.http_session()
+                async with session.request(method, url, headers=headers, json=data) as response:
+                    if response.status == 401 and attempt == 0:
+                        # Session expired or was revoked early: get a new token and retry once
+                        oauth_tokens.invalidate(self._token_key, access_token)
+                        continue
+                    return await response.json()
+            except Exception as e:
+                raise ProviderConnectionError(f"Salesforce API error: {str(e)}")
     
     async def get_customer(self, customer_id: str) -> Optional[Customer]:
         """Get customer by Salesforce Contact ID."""
@@ -96,6 +111,29 @@ class SalesforceProvider(CustomerDataProvider):
             logger.error(f"Error getting Salesforce customer {customer_id}: {str(e)}")
             return None
     
+    async def get_customers_bulk(self, customer_ids: List[str]) -> Dict[str, Customer]:
+        """Get several contacts with one sObject Collections request."""
+        try:
+            ids = ",".join(customer_ids)
+            endpoint = f"composite/sobjects/Contact?ids={ids}&fields=Id,FirstName,LastName,Email,Phone"
+            records = await self._make_api_request(endpoint)
+            
+            # Missing IDs come back as null; returned IDs are always the 18-character form
+            found = {}
+            for record in records or []:
+                if record:
+                    customer = Customer.from_provider_data(self.map_fields(record), "salesforce")
+                    found[record["Id"]] = found[record["Id"][:15]] = customer
+            
+            return {
+                customer_id: found[customer_id]
+                for customer_id in customer_ids
+                if customer_id in found
+            }
+        except Exception as e:
+            logger.error(f"Error getting Salesforce customers in bulk: {str(e)}")
+            raise
+    
     async def get_customer_by_email(self, email: str) -> Optional[Customer]:
         """Get customer by email address."""
         try:
@@ -186,34 +224,74 @@ class SalesforceProvider(CustomerDataProvider):
             logger.error(f"Error updating Salesforce customer {customer.customer_id}: {str(e)}")
             return False
     
-    async def get_customer_history(self, customer_id: str) -> List[Dict[str, Any]]:
-        """Get customer interaction history from Salesforce."""
+    async def get_customer_history(self, customer_id: str, limit: int = 100) -> List[Dict[str, Any]]:
+        """Get the most recent customer interactions from Salesforce."""
         try:
             # Get Cases associated with the Contact
-            query = f"SELECT Id, Subject, Description, Status, CreatedDate, Priority FROM Case WHERE ContactId = '{customer_id}' ORDER BY CreatedDate DESC"
+            query = f"SELECT Id, Subject, Description, Status, CreatedDate, Priority FROM Case WHERE ContactId = '{customer_id}' ORDER BY CreatedDate DESC LIMIT {int(limit)}"
             endpoint = f"query/?q={query}"
             
             result = await self._make_api_request(endpoint)
             
-            history = []
-            for case in result.get("records", []):
-                history.append({
-                    "id": case["Id"],
-                    "type": "case",
-                    "subject": case.get("Subject", ""),
-                    "description": case.get("Description", ""),
-                    "status": case.get("Status", ""),
-                    "priority": case.get("Priority", ""),
-                    "created_date": case.get("CreatedDate", ""),
-                    "source": "salesforce"
-                })
-            
-            return history
+            return [self._case_record(case) for case in result.get("records", [])]
             
         except Exception as e:
             logger.error(f"Error getting Salesforce customer history {customer_id}: {str(e)}")
             return []
     
+    async def iter_history(self, customer_id: str, page_size: int = 100) -> AsyncIterator[Dict[str, Any]]:
+        """Stream Cases newest first, following nextRecordsUrl batches."""
+        query = f"SELECT Id, Subject, Description, Status, CreatedDate, Priority FROM Case WHERE ContactId = '{customer_id}' ORDER BY CreatedDate DESC"
+        # Salesforce accepts batch sizes between 200 and 2000
+        batch_headers = {"Sforce-Query-Options": f"batchSize={max(200, min(page_size, 2000))}"}
+        
+        async def fetch_page(cursor: Optional[str]):
+            result = await self._make_api_request(cursor or f"query/?q={query}", extra_headers=batch_headers)
+            next_url = result.get("nextRecordsUrl")
+            next_endpoint = f"query/{next_url.split('/query/', 1)[1]}" if next_url else None
+            return [self._case_record(case) for case in result.get("records", [])], next_endpoint
+        
+        async for record in paginate(fetch_page):
+            yield record
+    
+    async def iter_changed_customers(
+        self,
+        since: Optional[datetime] = None,
+        page_size: int = 100
+    ) -> AsyncIterator[Customer]:
+        """Stream contacts by ascending SystemModstamp, following nextRecordsUrl batches."""
+        query = "SELECT Id, FirstName, LastName, Email, Phone, Account.Name FROM Contact"
+        if since:
+            query += f" WHERE SystemModstamp > {since.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')}"
+        query += " ORDER BY SystemModstamp"
+        batch_headers = {"Sforce-Query-Options": f"batchSize={max(200, min(page_size, 2000))}"}
+        
+        async def fetch_page(cursor: Optional[str]):
+            result = await self._make_api_request(cursor or f"query/?q={query}", extra_headers=batch_headers)
+            next_url = result.get("nextRecordsUrl")
+            next_endpoint = f"query/{next_url.split('/query/', 1)[1]}" if next_url else None
+            customers = [
+                Customer.from_provider_data(self.map_fields(contact), "salesforce")
+                for contact in result.get("records", [])
+            ]
+            return customers, next_endpoint
+        
+        async for customer in paginate(fetch_page):
+            yield customer
+    
+    def _case_record(self, case: Dict[str, Any]) -> Dict[str, Any]:
+        """History record for a Salesforce Case."""
+        return {
+            "id": case["Id"],
+            "type": "case",
+            "subject": case.get("Subject", ""),
+            "description": case.get("Description", ""),
+            "status": case.get("Status", ""),
+            "priority": case.get("Priority", ""),
+            "created_date": case.get("CreatedDate", ""),
+            "source": "salesforce"
+        }
+    
     async def search_customers(self, query: str, limit: int = 10) -> List[Customer]:
         """Search customers in Salesforce."""
         try:
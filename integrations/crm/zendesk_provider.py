@@ -1,20 +1,32 @@
 """Zendesk integration provider."""
 
 import logging
-from typing import Dict, Any, List, Optional
-import aiohttp
+from typing import Dict, Any, AsyncIterator, List, Optional
 import base64
 from datetime import datetime
 
 from ..base_provider import CustomerDataProvider, IntegrationConfig, ProviderConnectionError
+from ..pagination import paginate
 from entities.customer import Customer
 
 logger = logging.getLogger(__name__)
 
+# Largest page the users and tickets endpoints return
+MAX_PAGE_SIZE = 100
+
+# Largest page the incremental export endpoints return
+INCREMENTAL_PAGE_SIZE = 1000
+
 
 class ZendeskProvider(CustomerDataProvider):
     """Zendesk data provider."""
     
+    uses_http_session = True
+    
+    # Lowest plan limit: 200 requests per minute
+    rate_limit_per_second = 200 / 60
+    rate_limit_burst = 50
+    
     def __init__(self, config: IntegrationConfig):
         super().__init__(config)
         self.subdomain = config.custom_config.get("subdomain")
@@ -38,28 +50,28 @@ class ZendeskProvider(CustomerDataProvider):
         url = f"{self.base_url}/{endpoint}"
         
         try:
-            async with aiohttp.ClientSession() as session:
-                if method == "GET":
-                    async with session.get(url, headers=headers) as response:
-                        if response.status == 200:
-                            return await response.json()
-                        else:
-                            error_text = await response.text()
-                            raise ProviderConnectionError(f"Zendesk API error: {error_text}")
-                elif method == "POST":
-                    async with session.post(url, headers=headers, json=data) as response:
-                        if response.status in [200, 201]:
-                            return await response.json()
-                        else:
-                            error_text = await response.text()
-                            raise ProviderConnectionError(f"Zendesk API error: {error_text}")
-                elif method == "PUT":
-                    async with session.put(url, headers=headers, json=data) as response:
-                        if response.status == 200:
-                            return await response.json()
-                        else:
-                            error_text = await response.text()
-                            raise ProviderConnectionError(f"Zendesk API error: {error_text}")
+            session = self.http_session()
+            if method == "GET":
+                async with session.get(url, headers=headers) as response:
+                    if response.status == 200:
+                        return await response.json()
+                    else:
+                        error_text = await response.text()
+                        raise ProviderConnectionError(f"Zendesk API error: {error_text}")
+            elif method == "POST":
+                async with session.post(url, headers=headers, json=data) as response:
+                    if response.status in [200, 201]:
+                        return await response.json()
+                    else:
+                        error_text = await response.text()
+                        raise ProviderConnectionError(f"Zendesk API error: {error_text}")
+            elif method == "PUT":
+                async with session.put(url, headers=headers, json=data) as response:
+                    if response.status == 200:
+                        return await response.json()
+                    else:
+                        error_text = await response.text()
+                        raise ProviderConnectionError(f"Zendesk API error: {error_text}")
         except Exception as e:
             raise ProviderConnectionError(f"Zendesk connection error: {str(e)}")
     
@@ -78,6 +90,23 @@ class ZendeskProvider(CustomerDataProvider):
             logger.error(f"Error getting Zendesk customer {customer_id}: {str(e)}")
             return None
     
+    async def get_customers_bulk(self, customer_ids: List[str]) -> Dict[str, Customer]:
+        """Get several users with one show_many request."""
+        try:
+            ids = ",".join(customer_ids)
+            endpoint = f"users/show_many.json?ids={ids}"
+            result = await self._make_api_request(endpoint)
+            
+            customers = {}
+            for user_data in result.get("users", []):
+                mapped_data = self.map_fields(user_data)
+                customers[str(user_data.get("id"))] = Customer.from_provider_data(mapped_data, "zendesk")
+            
+            return customers
+        except Exception as e:
+            logger.error(f"Error getting Zendesk customers in bulk: {str(e)}")
+            raise
+    
     async def get_customer_by_email(self, email: str) -> Optional[Customer]:
         """Get customer by email address."""
         try:
@@ -176,30 +205,50 @@ class ZendeskProvider(CustomerDataProvider):
             endpoint = f"users/{customer_id}/tickets/requested"
             result = await self._make_api_request(endpoint)
             
-            history = []
-            for ticket in result.get("tickets", []):
-                history.append({
-                    "id": ticket.get("id"),
-                    "type": "ticket",
-                    "subject": ticket.get("subject", ""),
-                    "description": ticket.get("description", ""),
-                    "status": ticket.get("status", ""),
-                    "priority": ticket.get("priority", ""),
-                    "created_date": ticket.get("created_at", ""),
-                    "updated_date": ticket.get("updated_at", ""),
-                    "source": "zendesk"
-                })
-            
-            return history
+            return [self._ticket_record(ticket) for ticket in result.get("tickets", [])]
             
         except Exception as e:
             logger.error(f"Error getting Zendesk customer history {customer_id}: {str(e)}")
             return []
     
+    async def iter_history(self, customer_id: str, page_size: int = 100) -> AsyncIterator[Dict[str, Any]]:
+        """Stream the user's requested tickets with cursor pagination."""
+        async def fetch_page(cursor: Optional[str]):
+            endpoint = cursor or f"users/{customer_id}/tickets/requested.json?page[size]={min(page_size, MAX_PAGE_SIZE)}"
+            result = await self._make_api_request(endpoint)
+            next_endpoint = None
+            if result.get("meta", {}).get("has_more"):
+                next_endpoint = self._endpoint_from_url(result.get("links", {}).get("next"))
+            return [self._ticket_record(ticket) for ticket in result.get("tickets", [])], next_endpoint
+        
+        async for record in paginate(fetch_page):
+            yield record
+    
+    def _ticket_record(self, ticket: Dict[str, Any]) -> Dict[str, Any]:
+        """History record for a Zendesk ticket."""
+        return {
+            "id": ticket.get("id"),
+            "type": "ticket",
+            "subject": ticket.get("subject", ""),
+            "description": ticket.get("description", ""),
+            "status": ticket.get("status", ""),
+            "priority": ticket.get("priority", ""),
+            "created_date": ticket.get("created_at", ""),
+            "updated_date": ticket.get("updated_at", ""),
+            "source": "zendesk"
+        }
+    
+    def _endpoint_from_url(self, url: Optional[str]) -> Optional[str]:
+        """Endpoint part of a next-page URL returned by the API."""
+        if not url:
+            return None
+        prefix = f"{self.base_url}/"
+        return url[len(prefix):] if url.startswith(prefix) else None
+    
     async def search_customers(self, query: str, limit: int = 10) -> List[Customer]:
         """Search customers in Zendesk."""
         try:
-            endpoint = f"users/search.json?query={query}"
+            endpoint = f"users/search.json?query={query}&per_page={max(1, min(limit, MAX_PAGE_SIZE))}"
             result = await self._make_api_request(endpoint)
             
             customers = []
@@ -214,6 +263,45 @@ class ZendeskProvider(CustomerDataProvider):
             logger.error(f"Error searching Zendesk customers: {str(e)}")
             return []
     
+    async def iter_customers(self, query: str, page_size: int = 100) -> AsyncIterator[Customer]:
+        """Stream search results, following next_page links."""
+        async def fetch_page(cursor: Optional[str]):
+            endpoint = cursor or f"users/search.json?query={query}&per_page={min(page_size, MAX_PAGE_SIZE)}"
+            result = await self._make_api_request(endpoint)
+            customers = [
+                Customer.from_provider_data(self.map_fields(user), "zendesk")
+                for user in result.get("users", [])
+            ]
+            return customers, self._endpoint_from_url(result.get("next_page"))
+        
+        async for customer in paginate(fetch_page):
+            yield customer
+    
+    async def iter_changed_customers(
+        self,
+        since: Optional[datetime] = None,
+        page_size: int = 100
+    ) -> AsyncIterator[Customer]:
+        """Stream changed users through the cursor-based incremental export."""
+        start_time = int(since.timestamp()) if since else 0
+        
+        async def fetch_page(cursor: Optional[str]):
+            endpoint = cursor or (
+                f"incremental/users/cursor.json?start_time={start_time}"
+                f"&per_page={min(page_size, INCREMENTAL_PAGE_SIZE)}"
+            )
+            result = await self._make_api_request(endpoint)
+            customers = [
+                Customer.from_provider_data(self.map_fields(user), "zendesk")
+                for user in result.get("users", [])
+            ]
+            if result.get("end_of_stream"):
+                return customers, None
+            return customers, self._endpoint_from_url(result.get("after_url"))
+        
+        async for customer in paginate(fetch_page):
+            yield customer
+    
     async def test_connection(self) -> Dict[str, Any]:
         """Test Zendesk connection."""
         try:
@@ -0,0 +1,236 @@
+"""Read-through cache of provider customer lookups.
+
+Entries are keyed by (provider, identifier type, identifier) and hold either
+the customer or a "not found" marker, so an unknown e-mail address does not
+hit the CRM on every turn. Concurrent misses for the same key share one
+provider call. Writes through ``CustomerDataManager`` invalidate every entry
+for the written customer, including "not found" entries for its e-mail
+address and phone number.
+
+Like the HTTP sessions, the cache lives at module level because data
+managers are created per request.
+"""
+
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, Any, Hashable, List, Optional, Tuple
+
+from config import config
+from entities.customer import Customer
+from .identity_index import normalize_phone
+from shared_libraries.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Marker stored for lookups that found no customer
+_NOT_FOUND = object()
+
+
+def normalize_identifier(identifier_type: str, identifier: str) -> str:
+    """Canonical form of an identifier for cache keys."""
+    identifier = (identifier or "").strip()
+    if identifier_type == "email":
+        return identifier.lower()
+    if identifier_type == "phone":
+        return normalize_phone(identifier) or identifier
+    return identifier
+
+
+class CustomerCache:
+    """Bounded TTL cache of customer lookups with request coalescing."""
+
+    def __init__(
+        self,
+        maxsize: Optional[int] = None,
+        ttl: Optional[float] = None,
+        negative_ttl: Optional[float] = None
+    ):
+        self.ttl = config.customer_cache_ttl_seconds if ttl is None else ttl
+        self.negative_ttl = config.customer_cache_negative_ttl_seconds if negative_ttl is None else negative_ttl
+        self._cache = TTLCache(maxsize=maxsize or config.customer_cache_max_entries, ttl=self.ttl)
+        # key -> [load task, number of callers waiting on it]
+        self._inflight: Dict[Hashable, List[Any]] = {}
+        # Bumped on every invalidation so loads started before it are not stored
+        self._generation = 0
+        self.coalesced = 0
+        self.negative_hits = 0
+        self.invalidations = 0
+
+    def key(self, provider_key: str, identifier_type: str, identifier: str) -> Tuple[str, str, str]:
+        return (provider_key, identifier_type, normalize_identifier(identifier_type, identifier))
+
+    @property
+    def generation(self) -> int:
+        """Invalidation counter; pass it to ``store`` for results fetched after reading it."""
+        return self._generation
+
+    def lookup(self, provider_key: str, identifier_type: str, identifier: str) -> Tuple[bool, Optional[Customer]]:
+        """
+        Read an entry without loading it.
+
+        Returns:
+            Tuple of (cached, customer); a cached "not found" is (True, None)
+        """
+        cached = self._cache.get(self.key(provider_key, identifier_type, identifier))
+        if cached is _NOT_FOUND:
+            self.negative_hits += 1
+            return True, None
+        if cached is not None:
+            return True, cached.model_copy(deep=True)
+        return False, None
+
+    def store(
+        self,
+        provider_key: str,
+        identifier_type: str,
+        identifier: str,
+        customer: Optional[Customer],
+        ttl: Optional[float] = None,
+        negative_ttl: Optional[float] = None,
+        generation: Optional[int] = None
+    ):
+        """
+        Cache a lookup result; None caches "not found".
+
+        Args:
+            generation: Value of ``generation`` read before the lookup; the
+                result is dropped if the cache was invalidated since
+        """
+        if generation is not None and generation != self._generation:
+            return
+        key = self.key(provider_key, identifier_type, identifier)
+        if customer is not None:
+            ttl = self.ttl if ttl is None else ttl
+            if ttl > 0:
+                # Callers may mutate what they were given, so never share the cached object
+                self._cache.set(key, customer.model_copy(deep=True), ttl=ttl)
+        else:
+            negative_ttl = self.negative_ttl if negative_ttl is None else negative_ttl
+            if negative_ttl > 0:
+                self._cache.set(key, _NOT_FOUND, ttl=negative_ttl)
+
+    async def get_or_load(
+        self,
+        provider_key: str,
+        identifier_type: str,
+        identifier: str,
+        loader: Callable[[], Awaitable[Optional[Customer]]],
+        ttl: Optional[float] = None,
+        negative_ttl: Optional[float] = None
+    ) -> Optional[Customer]:
+        """
+        Get a customer from the cache, or load and cache it.
+
+        Args:
+            provider_key: Provider identity
+            identifier_type: "id", "email" or "phone"
+            identifier: Customer identifier
+            loader: Coroutine function performing the provider lookup;
+                exceptions propagate and are not cached
+            ttl: Lifetime of a found customer (provider override)
+            negative_ttl: Lifetime of a "not found" result (provider override)
+
+        Returns:
+            A copy of the customer, or None if the provider has no such customer
+        """
+        cached, customer = self.lookup(provider_key, identifier_type, identifier)
+        if cached:
+            return customer
+
+        key = self.key(provider_key, identifier_type, identifier)
+        entry = self._inflight.get(key)
+        if entry is None:
+            task = asyncio.create_task(self._load(key, loader, ttl, negative_ttl))
+            entry = self._inflight[key] = [task, 0]
+            task.add_done_callback(lambda _, key=key, task=task: self._forget(key, task))
+        else:
+            self.coalesced += 1
+
+        entry[1] += 1
+        try:
+            customer = await asyncio.shield(entry[0])
+        finally:
+            entry[1] -= 1
+            # The last caller gave up (e.g. a hedged lookup lost the race): stop the call
+            if entry[1] == 0 and not entry[0].done():
+                self._forget(key, entry[0])
+                entry[0].cancel()
+        return customer.model_copy(deep=True) if customer is not None else None
+
+    async def _load(
+        self,
+        key: Tuple[str, str, str],
+        loader: Callable[[], Awaitable[Optional[Customer]]],
+        ttl: Optional[float],
+        negative_ttl: Optional[float]
+    ) -> Optional[Customer]:
+        generation = self._generation
+        customer = await loader()
+        self.store(*key, customer, ttl=ttl, negative_ttl=negative_ttl, generation=generation)
+        return customer
+
+    def _forget(self, key: Hashable, task: asyncio.Task):
+        entry = self._inflight.get(key)
+        if entry is not None and entry[0] is task:
+            del self._inflight[key]
+
+    def invalidate_customer(self, customer: Customer) -> int:
+        """
+        Drop every entry for a customer that was created or updated.
+
+        Removes entries holding the customer's ID and "not found" or stale
+        entries for its e-mail address and phone number, for all providers.
+
+        Returns:
+            Number of entries removed
+        """
+        return self.invalidate_customers([customer])
+
+    def invalidate_customers(self, customers: List[Customer]) -> int:
+        """Drop every entry for several created or updated customers in one pass; see ``invalidate_customer``."""
+        self._generation += 1
+        self.invalidations += 1
+        emails = {normalize_identifier("email", customer.email) for customer in customers if customer.email}
+        phones = {normalize_identifier("phone", customer.phone) for customer in customers if customer.phone}
+        customer_ids = {customer.customer_id for customer in customers}
+
+        removed = 0
+        for key, value in self._cache.items():
+            _, identifier_type, identifier = key
+            if (
+                (identifier_type == "email" and identifier in emails)
+                or (identifier_type == "phone" and identifier in phones)
+                or (value is not _NOT_FOUND and value.customer_id in customer_ids)
+            ):
+                removed += self._cache.delete(key)
+        return removed
+
+    def invalidate_provider(self, provider_key: str) -> int:
+        """Drop every entry of one provider."""
+        self._generation += 1
+        self.invalidations += 1
+        removed = 0
+        for key, _ in self._cache.items():
+            if key[0] == provider_key:
+                removed += self._cache.delete(key)
+        return removed
+
+    def clear(self):
+        """Drop all entries."""
+        self._generation += 1
+        self.invalidations += 1
+        self._cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss metrics."""
+        stats = self._cache.stats()
+        stats.update({
+            "negative_hits": self.negative_hits,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._inflight),
+            "invalidations": self.invalidations
+        })
+        return stats
+
+
+customer_cache = CustomerCache()
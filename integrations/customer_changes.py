@@ -0,0 +1,60 @@
+"""Apply customer changes pushed by a provider to the local copies.
+
+Providers that push changes (Postgres notifications, vendor webhooks) call
+these instead of waiting for the next sync, so the customer cache, the
+identity index and the replica stop serving the old record right away.
+"""
+
+import logging
+from typing import Optional
+
+from config import config
+from entities.customer import Customer
+from .customer_cache import customer_cache
+from .customer_replica import customer_replica
+from .identity_index import identity_index
+
+logger = logging.getLogger(__name__)
+
+
+async def apply_customer_change(provider_key: str, customer: Customer, ttl: Optional[float] = None):
+    """
+    Replace every local copy of a created or updated customer.
+
+    Entries for the customer's old e-mail address and phone number are
+    dropped and the new record is cached under its ID.
+
+    Args:
+        provider_key: Provider the record belongs to
+        customer: The record as it is now
+        ttl: Cache lifetime of the record (provider override)
+    """
+    customer_cache.invalidate_customer(customer)
+    if config.customer_cache_enabled:
+        customer_cache.store(provider_key, "id", customer.customer_id, customer, ttl=ttl)
+    try:
+        if config.identity_index_enabled:
+            await identity_index.run(identity_index.record, provider_key, customer)
+        if await customer_replica.run(customer_replica.sync_state, provider_key):
+            await customer_replica.run(customer_replica.upsert_many, provider_key, [customer])
+    except Exception as e:
+        logger.warning(f"Error applying change of customer {customer.customer_id} from {provider_key}: {str(e)}")
+
+
+async def apply_customer_deletion(provider_key: str, customer_id: str, customer: Optional[Customer] = None):
+    """
+    Drop every local copy of a deleted customer.
+
+    Args:
+        provider_key: Provider the record was deleted from
+        customer_id: Record ID
+        customer: The deleted record, if known, so entries for its e-mail
+            address and phone number are dropped too
+    """
+    customer_cache.invalidate_customer(customer or Customer(customer_id=customer_id))
+    try:
+        if config.identity_index_enabled:
+            await identity_index.run(identity_index.forget, provider_key, customer_id)
+        await customer_replica.run(customer_replica.delete, provider_key, customer_id)
+    except Exception as e:
+        logger.warning(f"Error applying deletion of customer {customer_id} from {provider_key}: {str(e)}")
@@ -1,7 +1,10 @@
 """Customer data manager for handling multiple providers and data gathering."""
 
+import asyncio
 import logging
-from typing import Dict, Any, List, Optional, Union
+import time
+from contextlib import aclosing
+from typing import Dict, Any, AsyncIterator, Awaitable, Callable, List, Optional, Union
 from datetime import datetime
 
 from .base_provider import CustomerDataProvider, IntegrationConfig
@@ -10,11 +13,22 @@ from .crm.hubspot_provider import HubSpotProvider
 from .crm.zendesk_provider import ZendeskProvider
 from .ecommerce.shopify_provider import ShopifyProvider
 from .database.postgres_provider import PostgreSQLProvider
+from .latency_tracker import provider_latency
+from .customer_cache import customer_cache
+from .circuit_breaker import CircuitOpenError, get_circuit_breaker
+from .rate_limiter import bulk_requests
+from .identity_index import identity_index, normalize_email
+from .customer_replica import customer_replica
+from .customer_changes import apply_customer_change
+from config import config
 from entities.customer import Customer
 from models.business_config import BusinessConfig
 
 logger = logging.getLogger(__name__)
 
+# Bulk lookup chunks in flight at once per call
+BULK_CHUNK_CONCURRENCY = 4
+
 
 class CustomerDataManager:
     """Manages customer data across multiple providers with fallback strategies."""
@@ -67,6 +81,14 @@ class CustomerDataManager:
         """
         Get customer by identifier with fallback strategy.
         
+        Customers already in the identity index are fetched by record ID from
+        the providers known to hold them. Otherwise providers are tried one
+        after another, all at once ("concurrent") or primary first with the
+        others started once the primary is slower than its usual latency
+        ("hedged"), per ``customer_lookup_mode``. With
+        ``replica_max_staleness_seconds`` set, providers synced within that
+        bound are read from the local replica instead.
+        
         Args:
             identifier: Customer identifier (ID, email, phone)
             identifier_type: Type of identifier ("id", "email", "phone")
@@ -75,6 +97,11 @@ class CustomerDataManager:
         Returns:
             Customer object or None if not found
         """
+        if not provider_name and config.identity_index_enabled:
+            customer = await self._indexed_lookup(identifier, identifier_type)
+            if customer:
+                return customer
+        
         providers_to_try = []
         
         if provider_name and provider_name in self.providers:
@@ -88,28 +115,376 @@ class CustomerDataManager:
                 if provider != self.primary_provider:
                     providers_to_try.append(provider)
         
-        for provider in providers_to_try:
-            try:
-                customer = None
-                
-                if identifier_type == "id":
-                    customer = await provider.get_customer(identifier)
-                elif identifier_type == "email":
-                    customer = await provider.get_customer_by_email(identifier)
-                elif identifier_type == "phone":
-                    customer = await provider.get_customer_by_phone(identifier)
-                
+        mode = self.business_config.customer_lookup_mode
+        if mode in ("concurrent", "hedged") and len(providers_to_try) > 1:
+            hedge_delay = self._hedge_delay(providers_to_try[0]) if mode == "hedged" else None
+            customer = await self._race_lookup(providers_to_try, identifier, identifier_type, hedge_delay)
+            if customer:
+                return customer
+        else:
+            for provider in providers_to_try:
+                customer = await self._timed_lookup(provider, identifier, identifier_type)
                 if customer:
                     logger.info(f"Customer found in {provider.provider_name}")
                     return customer
-                    
-            except Exception as e:
-                logger.warning(f"Error getting customer from {provider.provider_name}: {str(e)}")
-                continue
         
         logger.info(f"Customer not found with {identifier_type}: {identifier}")
         return None
     
+    async def _indexed_lookup(self, identifier: str, identifier_type: str) -> Optional[Customer]:
+        """Fetch a customer from the providers the identity index links it to."""
+        provider_key = None
+        if identifier_type == "id":
+            # A bare record ID is taken to be the primary provider's, as in the fallback order
+            if not self.primary_provider:
+                return None
+            provider_key = self.primary_provider.provider_key
+        try:
+            entry = await identity_index.run(identity_index.resolve, identifier, identifier_type, provider_key)
+        except Exception as e:
+            logger.warning(f"Identity index lookup failed: {str(e)}")
+            return None
+        if not entry:
+            return None
+        
+        providers = {provider.provider_key: provider for provider in self.providers.values()}
+        records = list(entry["records"].items())
+        if self.primary_provider:
+            # Primary first, then most recently seen
+            records.sort(key=lambda record: record[0] != self.primary_provider.provider_key)
+        for provider_key, record_id in records:
+            provider = providers.get(provider_key)
+            if provider is None:
+                continue
+            customer = await self._timed_lookup(provider, record_id, "id")
+            if customer:
+                logger.info(f"Customer found in {provider.provider_name} via identity index")
+                return customer
+        return None
+    
+    async def _replica_lookup(
+        self,
+        provider: CustomerDataProvider,
+        identifier: str,
+        identifier_type: str
+    ) -> Optional[Customer]:
+        """Read a customer from the synced replica if it is within the staleness bound."""
+        max_staleness = self.business_config.replica_max_staleness_seconds
+        if not max_staleness:
+            return None
+        try:
+            staleness = await customer_replica.run(customer_replica.staleness, provider.provider_key)
+            if staleness is None or staleness > max_staleness:
+                return None
+            return await customer_replica.run(customer_replica.get, provider.provider_key, identifier, identifier_type)
+        except Exception as e:
+            logger.warning(f"Error reading customer replica for {provider.provider_name}: {str(e)}")
+            return None
+    
+    async def _replicate(self, provider: CustomerDataProvider, customer: Customer):
+        """Write a customer written through this manager to the replica, so reads see it."""
+        try:
+            if await customer_replica.run(customer_replica.sync_state, provider.provider_key):
+                await customer_replica.run(customer_replica.upsert_many, provider.provider_key, [customer])
+        except Exception as e:
+            logger.warning(f"Error updating customer replica for {provider.provider_name}: {str(e)}")
+    
+    async def _index_customers(self, provider: CustomerDataProvider, customers: List[Customer]) -> List[Optional[str]]:
+        """Add customers fetched from a provider to the identity index; returns their keys."""
+        if not config.identity_index_enabled or not customers:
+            return [None] * len(customers)
+        try:
+            return await identity_index.run(identity_index.record_many, provider.provider_key, customers)
+        except Exception as e:
+            logger.warning(f"Error indexing customers from {provider.provider_name}: {str(e)}")
+            return [None] * len(customers)
+    
+    def _dedup_key(self, provider: CustomerDataProvider, customer: Customer, identity_key: Optional[str]) -> str:
+        """Key identifying a customer across providers, for de-duplicating results."""
+        if identity_key:
+            return identity_key
+        email = normalize_email(customer.email)
+        return email or f"{provider.provider_key}:{customer.customer_id}"
+    
+    def _provider_timeout(self, provider: CustomerDataProvider, adaptive: bool = True) -> float:
+        """
+        Per-call timeout for a provider.
+        
+        An explicit ``timeout_seconds`` in the provider's custom_config wins.
+        Otherwise, with ``adaptive_timeouts`` on, lookups time out at a
+        multiple of the provider's observed latency percentile, bounded by
+        ``adaptive_timeout_min_seconds`` and ``provider_timeout_seconds``.
+        
+        Args:
+            provider: Provider being called
+            adaptive: False for calls whose latency is not comparable to a
+                single lookup (bulk, search, history, writes)
+        """
+        custom_timeout = provider.config.custom_config.get("timeout_seconds")
+        if custom_timeout is not None:
+            return float(custom_timeout)
+        
+        timeout = self.business_config.provider_timeout_seconds
+        if adaptive and self.business_config.adaptive_timeouts:
+            observed = provider_latency.percentile(
+                provider.provider_key, self.business_config.adaptive_timeout_percentile
+            )
+            if observed is not None:
+                timeout = min(timeout, max(
+                    self.business_config.adaptive_timeout_min_seconds,
+                    observed * self.business_config.adaptive_timeout_multiplier
+                ))
+        return timeout
+    
+    async def _call_provider(
+        self,
+        provider: CustomerDataProvider,
+        call: Callable[[], Awaitable[Any]],
+        timeout: Optional[float] = None
+    ) -> Any:
+        """
+        Call a provider through its circuit breaker, within a timeout.
+        
+        Args:
+            provider: Provider being called
+            call: Coroutine function performing the provider call
+            timeout: Seconds before giving up (defaults to the static provider timeout)
+        
+        Returns:
+            Result of the call
+        
+        Raises:
+            CircuitOpenError: The provider's breaker is open; it was not called
+            asyncio.TimeoutError: The call timed out
+        """
+        breaker = None
+        if config.circuit_breaker_enabled:
+            breaker = get_circuit_breaker(provider.provider_key, provider.config.custom_config)
+            if not breaker.allow_request():
+                raise CircuitOpenError(f"Circuit open for {provider.provider_name}")
+        
+        if timeout is None:
+            timeout = self._provider_timeout(provider, adaptive=False)
+        started = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(call(), timeout=timeout)
+        except asyncio.TimeoutError:
+            if breaker:
+                breaker.record(time.perf_counter() - started, failed=True)
+            raise
+        except Exception:
+            # HTTP providers report errors per request from their session; a refused
+            # bulk request or a 4xx response says nothing about the provider's health
+            if breaker and not provider.uses_http_session:
+                breaker.record(time.perf_counter() - started, failed=True)
+            raise
+        
+        if breaker and not provider.uses_http_session:
+            breaker.record(time.perf_counter() - started)
+        return result
+    
+    def _hedge_delay(self, provider: CustomerDataProvider) -> float:
+        """How long to wait on the primary before asking the other providers."""
+        delay = provider_latency.percentile(provider.provider_key, self.business_config.hedge_percentile)
+        if delay is None:
+            delay = self.business_config.hedge_default_delay_seconds
+        return min(delay, self._provider_timeout(provider))
+    
+    async def _timed_lookup(
+        self,
+        provider: CustomerDataProvider,
+        identifier: str,
+        identifier_type: str
+    ) -> Optional[Customer]:
+        """Look a customer up in one provider within its timeout; errors count as a miss."""
+        replica_customer = await self._replica_lookup(provider, identifier, identifier_type)
+        if replica_customer:
+            return replica_customer
+        
+        lookups = {
+            "id": provider.get_customer,
+            "email": provider.get_customer_by_email,
+            "phone": provider.get_customer_by_phone
+        }
+        if identifier_type not in lookups:
+            return None
+        
+        async def load() -> Optional[Customer]:
+            # Only completed and timed-out lookups are sampled: lookups cancelled by a
+            # faster provider, refused by the breaker or failing fast would understate latency
+            started = time.perf_counter()
+            try:
+                customer = await self._call_provider(
+                    provider, lambda: lookups[identifier_type](identifier), timeout=self._provider_timeout(provider)
+                )
+            except asyncio.TimeoutError:
+                provider_latency.record(provider.provider_key, time.perf_counter() - started)
+                raise
+            provider_latency.record(provider.provider_key, time.perf_counter() - started)
+            if customer:
+                await self._index_customers(provider, [customer])
+            return customer
+        
+        try:
+            if not config.customer_cache_enabled:
+                return await load()
+            custom_config = provider.config.custom_config
+            return await customer_cache.get_or_load(
+                provider.provider_key,
+                identifier_type,
+                identifier,
+                load,
+                ttl=custom_config.get("cache_ttl_seconds"),
+                negative_ttl=custom_config.get("negative_cache_ttl_seconds")
+            )
+        except CircuitOpenError:
+            logger.debug(f"Skipping {provider.provider_name}: circuit open")
+            return None
+        except asyncio.TimeoutError:
+            logger.warning(f"Timed out getting customer from {provider.provider_name}")
+            return None
+        except Exception as e:
+            logger.warning(f"Error getting customer from {provider.provider_name}: {str(e)}")
+            return None
+    
+    async def _race_lookup(
+        self,
+        providers: List[CustomerDataProvider],
+        identifier: str,
+        identifier_type: str,
+        hedge_delay: Optional[float] = None
+    ) -> Optional[Customer]:
+        """
+        Query providers in parallel and return the first customer found.
+        
+        Args:
+            providers: Providers to query, primary first
+            identifier: Customer identifier
+            identifier_type: Type of identifier
+            hedge_delay: If set, only the first provider is queried until this
+                many seconds pass (or it misses); then the rest are started
+        
+        Returns:
+            First customer found, or None; outstanding lookups are cancelled
+        """
+        if hedge_delay is None:
+            started, deferred = providers, []
+        else:
+            started, deferred = providers[:1], providers[1:]
+        
+        tasks = {
+            asyncio.create_task(self._timed_lookup(provider, identifier, identifier_type)): provider
+            for provider in started
+        }
+        try:
+            while tasks:
+                done, _ = await asyncio.wait(
+                    tasks,
+                    timeout=hedge_delay if deferred else None,
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    provider = tasks.pop(task)
+                    customer = task.result()
+                    if customer:
+                        logger.info(f"Customer found in {provider.provider_name}")
+                        return customer
+                
+                # Hedge delay elapsed, or the primary missed early: start the others
+                if deferred and (not done or not tasks):
+                    if not done:
+                        logger.debug(f"Hedging lookup after {hedge_delay:.3f}s on {started[0].provider_name}")
+                    for provider in deferred:
+                        task = asyncio.create_task(self._timed_lookup(provider, identifier, identifier_type))
+                        tasks[task] = provider
+                    deferred = []
+            return None
+        finally:
+            for task in tasks:
+                task.cancel()
+    
+    async def get_customers_bulk(
+        self,
+        customer_ids: List[str],
+        provider_name: Optional[str] = None
+    ) -> List[Optional[Customer]]:
+        """
+        Get many customers by ID from one provider in as few requests as possible.
+        
+        Cached customers are served locally; the rest are fetched in chunks of
+        the provider's batch size, a few chunks at a time, through the bulk
+        rate limit lane.
+        
+        Args:
+            customer_ids: Customer IDs (duplicates allowed)
+            provider_name: Specific provider to use (defaults to the primary)
+        
+        Returns:
+            Customers in input order, None where a customer was not found
+            or its chunk failed
+        """
+        if provider_name and provider_name in self.providers:
+            provider = self.providers[provider_name]
+        else:
+            provider = self.primary_provider
+        
+        if not provider:
+            logger.error("No provider available for bulk customer lookup")
+            return [None] * len(customer_ids)
+        
+        found: Dict[str, Customer] = {}
+        missing = []
+        for customer_id in dict.fromkeys(customer_ids):
+            cached, customer = (
+                customer_cache.lookup(provider.provider_key, "id", customer_id)
+                if config.customer_cache_enabled else (False, None)
+            )
+            if not cached:
+                missing.append(customer_id)
+            elif customer:
+                found[customer_id] = customer
+        
+        chunk_size = provider.max_bulk_size
+        chunks = [missing[start:start + chunk_size] for start in range(0, len(missing), chunk_size)]
+        semaphore = asyncio.Semaphore(BULK_CHUNK_CONCURRENCY)
+        generation = customer_cache.generation
+        
+        async def fetch(chunk: List[str]) -> Dict[str, Customer]:
+            async with semaphore:
+                try:
+                    with bulk_requests():
+                        customers = await self._call_provider(provider, lambda: provider.get_customers_bulk(chunk))
+                except asyncio.TimeoutError:
+                    logger.warning(f"Timed out getting {len(chunk)} customers from {provider.provider_name}")
+                    return {}
+                except Exception as e:
+                    logger.warning(f"Error getting {len(chunk)} customers from {provider.provider_name}: {str(e)}")
+                    return {}
+            
+            await self._index_customers(provider, list(customers.values()))
+            if config.customer_cache_enabled:
+                custom_config = provider.config.custom_config
+                for customer_id in chunk:
+                    customer_cache.store(
+                        provider.provider_key,
+                        "id",
+                        customer_id,
+                        customers.get(customer_id),
+                        ttl=custom_config.get("cache_ttl_seconds"),
+                        negative_ttl=custom_config.get("negative_cache_ttl_seconds"),
+                        generation=generation
+                    )
+            return customers
+        
+        for customers in await asyncio.gather(*(fetch(chunk) for chunk in chunks)):
+            found.update(customers)
+        
+        logger.info(
+            f"Bulk lookup of {len(customer_ids)} customers in {provider.provider_name}: "
+            f"{len(found)} found, {len(chunks)} requests"
+        )
+        return [found.get(customer_id) for customer_id in customer_ids]
+    
     async def create_customer(
         self, 
         customer_data: Dict[str, Any],
@@ -136,8 +511,12 @@ class CustomerDataManager:
             return None
         
         try:
-            customer = await provider.create_customer(customer_data)
+            customer = await self._call_provider(provider, lambda: provider.create_customer(customer_data))
             logger.info(f"Customer created in {provider.provider_name}")
+            if customer:
+                customer_cache.invalidate_customer(customer)
+                await self._index_customers(provider, [customer])
+                await self._replicate(provider, customer)
             return customer
         except Exception as e:
             logger.error(f"Error creating customer in {provider.provider_name}: {str(e)}")
@@ -172,14 +551,49 @@ class CustomerDataManager:
             return False
         
         try:
-            success = await provider.update_customer(customer)
+            success = await self._call_provider(provider, lambda: provider.update_customer(customer))
             if success:
                 logger.info(f"Customer updated in {provider.provider_name}")
+                await self._index_customers(provider, [customer])
+                await self._replicate(provider, customer)
+            customer_cache.invalidate_customer(customer)
             return success
         except Exception as e:
             logger.error(f"Error updating customer in {provider.provider_name}: {str(e)}")
             return False
     
+    async def refresh_customer(self, provider_name: str, customer_id: str) -> Optional[Customer]:
+        """
+        Re-read a customer a provider reported as changed, replacing the local copies.
+        
+        If the record cannot be read, cached entries for it are dropped so the
+        next lookup goes to the provider.
+        
+        Args:
+            provider_name: Provider holding the record
+            customer_id: Record ID in that provider
+        
+        Returns:
+            The current record, or None if it could not be read
+        """
+        provider = self.providers.get(provider_name)
+        if not provider:
+            return None
+        
+        try:
+            customer = await self._call_provider(provider, lambda: provider.get_customer(customer_id))
+        except Exception as e:
+            logger.warning(f"Error refreshing customer {customer_id} from {provider.provider_name}: {str(e)}")
+            customer = None
+        
+        if customer is None:
+            customer_cache.invalidate_customer(Customer(customer_id=customer_id))
+            return None
+        await apply_customer_change(
+            provider.provider_key, customer, ttl=provider.config.custom_config.get("cache_ttl_seconds")
+        )
+        return customer
+    
     async def get_customer_history(
         self, 
         customer_id: str,
@@ -206,12 +620,92 @@ class CustomerDataManager:
             return []
         
         try:
-            history = await provider.get_customer_history(customer_id)
+            history = await self._call_provider(provider, lambda: provider.get_customer_history(customer_id))
             return history
         except Exception as e:
             logger.error(f"Error getting customer history from {provider.provider_name}: {str(e)}")
             return []
     
+    async def iter_history(
+        self,
+        customer_id: str,
+        provider_name: Optional[str] = None,
+        limit: Optional[int] = None,
+        page_size: int = 100
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream customer interaction history without loading all of it.
+        
+        Args:
+            customer_id: Customer identifier
+            provider_name: Specific provider to use (optional)
+            limit: Stop after this many records
+            page_size: Records requested per provider page
+        
+        Yields:
+            Interaction history records, most recent first where supported
+        """
+        if provider_name and provider_name in self.providers:
+            provider = self.providers[provider_name]
+        else:
+            provider = self.primary_provider
+        
+        if not provider:
+            return
+        
+        count = 0
+        try:
+            async with aclosing(provider.iter_history(customer_id, page_size)) as records:
+                async for record in records:
+                    yield record
+                    count += 1
+                    if limit is not None and count >= limit:
+                        return
+        except Exception as e:
+            logger.error(f"Error streaming customer history from {provider.provider_name}: {str(e)}")
+    
+    async def iter_customers(
+        self,
+        query: str,
+        provider_name: Optional[str] = None,
+        limit: Optional[int] = None,
+        page_size: int = 100
+    ) -> AsyncIterator[Customer]:
+        """
+        Stream search results provider by provider, following each provider's pages.
+        
+        Args:
+            query: Search query
+            provider_name: Specific provider to use (optional)
+            limit: Stop after this many customers
+            page_size: Records requested per provider page
+        
+        Yields:
+            Matching customers, skipping customers already yielded from another provider
+        """
+        if provider_name and provider_name in self.providers:
+            providers_to_search = [self.providers[provider_name]]
+        else:
+            providers_to_search = list(self.providers.values())
+        
+        seen = set()
+        count = 0
+        for provider in providers_to_search:
+            try:
+                async with aclosing(provider.iter_customers(query, page_size)) as customers:
+                    async for customer in customers:
+                        identity_key = (await self._index_customers(provider, [customer]))[0]
+                        key = self._dedup_key(provider, customer, identity_key)
+                        if key in seen:
+                            continue
+                        seen.add(key)
+                        yield customer
+                        count += 1
+                        if limit is not None and count >= limit:
+                            return
+            except Exception as e:
+                logger.warning(f"Error streaming search results from {provider.provider_name}: {str(e)}")
+    
     async def search_customers(
         self, 
         query: str, 
@@ -234,40 +728,46 @@ class CustomerDataManager:
         else:
             providers_to_search = list(self.providers.values())
         
-        all_customers = []
-        
-        for provider in providers_to_search:
+        async def search(provider: CustomerDataProvider) -> List[Customer]:
             try:
-                customers = await provider.search_customers(query, limit)
-                all_customers.extend(customers)
+                return await self._call_provider(provider, lambda: provider.search_customers(query, limit))
+            except asyncio.TimeoutError:
+                logger.warning(f"Timed out searching in {provider.provider_name}")
             except Exception as e:
                 logger.warning(f"Error searching in {provider.provider_name}: {str(e)}")
-                continue
+            return []
+        
+        # Providers are searched in parallel; results keep provider order
+        results = await asyncio.gather(*(search(provider) for provider in providers_to_search))
         
-        # Remove duplicates based on email
+        # Remove duplicates: the same person in several providers appears once
         unique_customers = {}
-        for customer in all_customers:
-            if customer.email and customer.email not in unique_customers:
-                unique_customers[customer.email] = customer
+        for provider, customers in zip(providers_to_search, results):
+            for customer, identity_key in zip(customers, await self._index_customers(provider, customers)):
+                unique_customers.setdefault(self._dedup_key(provider, customer, identity_key), customer)
         
         return list(unique_customers.values())[:limit]
     
     async def test_all_connections(self) -> Dict[str, Dict[str, Any]]:
         """Test connections to all configured providers."""
-        results = {}
-        
-        for name, provider in self.providers.items():
+        async def test(name: str, provider: CustomerDataProvider) -> Dict[str, Any]:
             try:
-                result = await provider.test_connection()
-                results[name] = result
+                return await asyncio.wait_for(
+                    provider.test_connection(), timeout=self._provider_timeout(provider, adaptive=False)
+                )
+            except asyncio.TimeoutError:
+                error = "Connection test timed out"
             except Exception as e:
-                results[name] = {
-                    "status": "error",
-                    "provider": name,
-                    "error": str(e)
-                }
-        
-        return results
+                error = str(e)
+            return {
+                "status": "error",
+                "provider": name,
+                "error": error
+            }
+        
+        names = list(self.providers)
+        results = await asyncio.gather(*(test(name, self.providers[name]) for name in names))
+        return dict(zip(names, results))
     
     def get_provider_info(self) -> Dict[str, Any]:
         """Get information about configured providers."""
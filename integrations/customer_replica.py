@@ -0,0 +1,258 @@
+"""Local replica of provider customer records.
+
+The sync pipeline (see ``customer_sync``) writes every customer it pulls
+from a provider here, together with the point in time the provider's data
+is known to be complete up to. The data manager serves lookups from the
+replica while that point is within the business's staleness bound, and
+analytics read customer base figures from it without calling providers.
+
+Like the identity index the replica is a local SQLite file, and async
+code calls it through ``run`` to keep its SQLite calls off the event loop.
+"""
+
+import asyncio
+import functools
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from config import config
+from entities.customer import Customer
+from .identity_index import normalize_email, normalize_phone
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS customer_replica (
+    provider_key TEXT NOT NULL,
+    customer_id TEXT NOT NULL,
+    email TEXT,
+    phone TEXT,
+    tier TEXT,
+    account_status TEXT,
+    data TEXT NOT NULL,
+    synced_at REAL NOT NULL,
+    PRIMARY KEY (provider_key, customer_id)
+);
+CREATE INDEX IF NOT EXISTS customer_replica_email ON customer_replica (provider_key, email);
+CREATE INDEX IF NOT EXISTS customer_replica_phone ON customer_replica (provider_key, phone);
+CREATE TABLE IF NOT EXISTS sync_state (
+    provider_key TEXT PRIMARY KEY,
+    watermark TEXT,
+    complete_as_of REAL,
+    last_attempt_at REAL,
+    last_error TEXT,
+    records_synced INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+
+class CustomerReplica:
+    """SQLite store of synced customer records and per-provider sync state."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or config.customer_replica_path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="customer-replica")
+        self.hits = 0
+        self.misses = 0
+
+    async def run(self, method: Callable, *args, **kwargs) -> Any:
+        """Call one of the replica's methods on its thread, e.g. ``await customer_replica.run(customer_replica.get, ...)``."""
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, functools.partial(method, *args, **kwargs)
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            if self.path != ":memory:":
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def upsert_many(self, provider_key: str, customers: List[Customer]):
+        """Write customer records pulled from a provider."""
+        now = time.time()
+        rows = [
+            (
+                provider_key,
+                customer.customer_id,
+                normalize_email(customer.email),
+                normalize_phone(customer.phone),
+                customer.tier,
+                customer.account_status,
+                customer.model_dump_json(),
+                now
+            )
+            for customer in customers
+            if customer.customer_id
+        ]
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN")
+            try:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO customer_replica "
+                    "(provider_key, customer_id, email, phone, tier, account_status, data, synced_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    rows
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def delete(self, provider_key: str, customer_id: str):
+        """Drop a record deleted in the provider."""
+        with self._lock:
+            self._connection().execute(
+                "DELETE FROM customer_replica WHERE provider_key = ? AND customer_id = ?",
+                (provider_key, customer_id)
+            )
+
+    def get(self, provider_key: str, identifier: str, identifier_type: str = "id") -> Optional[Customer]:
+        """
+        Read a customer from the replica.
+
+        Args:
+            provider_key: Provider the record belongs to
+            identifier: Record ID, e-mail address or phone number
+            identifier_type: "id", "email" or "phone"
+
+        Returns:
+            Customer, or None if the replica has no such record
+        """
+        columns = {"id": "customer_id", "email": "email", "phone": "phone"}
+        if identifier_type not in columns:
+            return None
+        if identifier_type == "email":
+            identifier = normalize_email(identifier)
+        elif identifier_type == "phone":
+            identifier = normalize_phone(identifier)
+        if not identifier:
+            return None
+
+        with self._lock:
+            row = self._connection().execute(
+                f"SELECT data FROM customer_replica WHERE provider_key = ? AND {columns[identifier_type]} = ? LIMIT 1",
+                (provider_key, identifier)
+            ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return Customer.model_validate_json(row[0])
+
+    def sync_state(self, provider_key: str) -> Optional[Dict[str, Any]]:
+        """
+        Sync progress of a provider.
+
+        Returns:
+            Dict with ``watermark`` (datetime to resume from), ``complete_as_of``
+            (epoch seconds the replica is complete up to), ``last_attempt_at``,
+            ``last_error`` and ``records_synced``, or None if never synced
+        """
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT watermark, complete_as_of, last_attempt_at, last_error, records_synced "
+                "FROM sync_state WHERE provider_key = ?",
+                (provider_key,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "watermark": datetime.fromisoformat(row[0]) if row[0] else None,
+            "complete_as_of": row[1],
+            "last_attempt_at": row[2],
+            "last_error": row[3],
+            "records_synced": row[4]
+        }
+
+    def mark_synced(self, provider_key: str, watermark: datetime, complete_as_of: float, records: int):
+        """Record a successful sync run."""
+        with self._lock:
+            self._connection().execute(
+                "INSERT INTO sync_state (provider_key, watermark, complete_as_of, last_attempt_at, last_error, records_synced) "
+                "VALUES (?, ?, ?, ?, NULL, ?) "
+                "ON CONFLICT (provider_key) DO UPDATE SET watermark = excluded.watermark, "
+                "complete_as_of = excluded.complete_as_of, last_attempt_at = excluded.last_attempt_at, "
+                "last_error = NULL, records_synced = sync_state.records_synced + excluded.records_synced",
+                (provider_key, watermark.isoformat(), complete_as_of, time.time(), records)
+            )
+
+    def mark_failed(self, provider_key: str, error: str):
+        """Record a failed sync run; the watermark is kept so the next run retries."""
+        with self._lock:
+            self._connection().execute(
+                "INSERT INTO sync_state (provider_key, last_attempt_at, last_error) VALUES (?, ?, ?) "
+                "ON CONFLICT (provider_key) DO UPDATE SET last_attempt_at = excluded.last_attempt_at, "
+                "last_error = excluded.last_error",
+                (provider_key, time.time(), error)
+            )
+
+    def staleness(self, provider_key: str) -> Optional[float]:
+        """Seconds since the point the provider's replica is complete up to; None if never synced."""
+        state = self.sync_state(provider_key)
+        if not state or state["complete_as_of"] is None:
+            return None
+        return time.time() - state["complete_as_of"]
+
+    def summary(self) -> Dict[str, Any]:
+        """Customer base figures per provider, for analytics."""
+        with self._lock:
+            conn = self._connection()
+            providers = {}
+            for provider_key, total, with_email, with_phone in conn.execute(
+                "SELECT provider_key, COUNT(*), COUNT(email), COUNT(phone) FROM customer_replica GROUP BY provider_key"
+            ):
+                providers[provider_key] = {
+                    "customers": total,
+                    "with_email": with_email,
+                    "with_phone": with_phone,
+                    "tiers": {},
+                    "account_status": {}
+                }
+            for provider_key, tier, count in conn.execute(
+                "SELECT provider_key, tier, COUNT(*) FROM customer_replica GROUP BY provider_key, tier"
+            ):
+                providers[provider_key]["tiers"][tier or "unknown"] = count
+            for provider_key, status, count in conn.execute(
+                "SELECT provider_key, account_status, COUNT(*) FROM customer_replica GROUP BY provider_key, account_status"
+            ):
+                providers[provider_key]["account_status"][status or "unknown"] = count
+            for provider_key, complete_as_of, last_error in conn.execute(
+                "SELECT provider_key, complete_as_of, last_error FROM sync_state"
+            ):
+                entry = providers.setdefault(provider_key, {"customers": 0})
+                entry["staleness_seconds"] = round(time.time() - complete_as_of, 1) if complete_as_of else None
+                entry["last_error"] = last_error
+        return providers
+
+    def stats(self) -> Dict[str, Any]:
+        """Replica size and read counters."""
+        with self._lock:
+            records = self._connection().execute("SELECT COUNT(*) FROM customer_replica").fetchone()[0]
+        return {
+            "records": records,
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+customer_replica = CustomerReplica()
@@ -0,0 +1,150 @@
+"""Incremental sync of provider customers into the local replica.
+
+Each run asks every provider for the customers changed since its
+watermark, using the vendor's incremental mechanism (Zendesk incremental
+export, HubSpot ``lastmodifieddate`` search, Salesforce ``SystemModstamp``
+queries, Shopify ``updated_at_min``, Postgres ``updated_at``). The changes
+are written to ``customer_replica`` and the identity index, and cached
+lookups of the changed customers are dropped. The first run of a provider
+exports every customer.
+
+A successful run moves the watermark to its own start time, less
+``customer_sync_overlap_seconds`` to absorb clock skew between us and the
+vendor, and marks the replica complete as of the run's start. A failed run
+keeps the old watermark, so its changes are fetched again next time.
+Requests go through the bulk rate limit lane so syncs do not starve
+interactive lookups.
+"""
+
+import asyncio
+import logging
+from contextlib import aclosing
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Any, Optional
+
+from config import config
+from models.business_config import BusinessConfig
+from .base_provider import CustomerDataProvider
+from .customer_cache import customer_cache
+from .customer_data_manager import CustomerDataManager
+from .customer_replica import customer_replica
+from .identity_index import identity_index
+from .rate_limiter import bulk_requests
+
+logger = logging.getLogger(__name__)
+
+# Records written to the replica per transaction
+SYNC_BATCH_SIZE = 500
+
+
+async def sync_provider(provider: CustomerDataProvider, page_size: int = 100) -> Dict[str, Any]:
+    """
+    Pull a provider's changed customers into the replica.
+
+    Args:
+        provider: Provider to sync
+        page_size: Records requested per provider page
+
+    Returns:
+        Dict with ``status`` ("success", "unsupported" or "error") and ``records``
+    """
+    state = await customer_replica.run(customer_replica.sync_state, provider.provider_key)
+    since = state["watermark"] if state else None
+    started = datetime.now(timezone.utc)
+    records = 0
+    batch = []
+
+    async def flush():
+        await customer_replica.run(customer_replica.upsert_many, provider.provider_key, list(batch))
+        if config.identity_index_enabled:
+            await identity_index.run(identity_index.record_many, provider.provider_key, list(batch))
+        # Only cached lookups of the changed customers may predate the changes
+        customer_cache.invalidate_customers(batch)
+        batch.clear()
+
+    try:
+        with bulk_requests():
+            async with aclosing(provider.iter_changed_customers(since, page_size)) as customers:
+                async for customer in customers:
+                    batch.append(customer)
+                    records += 1
+                    if len(batch) >= SYNC_BATCH_SIZE:
+                        await flush()
+        if batch:
+            await flush()
+    except NotImplementedError:
+        return {"status": "unsupported", "records": 0}
+    except Exception as e:
+        if batch:
+            try:
+                # Keep what was pulled; the next run fetches it again from the old watermark anyway
+                await flush()
+            except Exception as flush_error:
+                logger.warning(f"Error saving customers synced from {provider.provider_name}: {str(flush_error)}")
+        logger.error(f"Error syncing customers from {provider.provider_name}: {str(e)}")
+        await customer_replica.run(customer_replica.mark_failed, provider.provider_key, str(e))
+        return {"status": "error", "records": records, "error": str(e)}
+
+    await customer_replica.run(
+        customer_replica.mark_synced,
+        provider.provider_key,
+        watermark=started - timedelta(seconds=config.customer_sync_overlap_seconds),
+        complete_as_of=started.timestamp(),
+        records=records
+    )
+    logger.info(f"Synced {records} changed customers from {provider.provider_name}")
+    return {"status": "success", "records": records}
+
+
+async def sync_all(business_config: BusinessConfig) -> Dict[str, Dict[str, Any]]:
+    """Sync every enabled provider of a business, concurrently."""
+    data_manager = CustomerDataManager(business_config)
+    names = list(data_manager.providers)
+    results = await asyncio.gather(*(
+        sync_provider(data_manager.providers[name], config.customer_sync_page_size) for name in names
+    ))
+    return dict(zip(names, results))
+
+
+class CustomerSyncService:
+    """Background task running ``sync_all`` every ``customer_sync_interval_seconds``."""
+
+    def __init__(
+        self,
+        get_business_config: Callable[[], Optional[BusinessConfig]],
+        interval: Optional[float] = None
+    ):
+        self.get_business_config = get_business_config
+        self.interval = config.customer_sync_interval_seconds if interval is None else interval
+        self._task: Optional[asyncio.Task] = None
+        self.last_results: Dict[str, Dict[str, Any]] = {}
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"Customer sync started, every {self.interval}s")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def sync_once(self) -> Dict[str, Dict[str, Any]]:
+        """Run one sync of the current business configuration."""
+        business_config = self.get_business_config()
+        if not business_config:
+            return {}
+        self.last_results = await sync_all(business_config)
+        return self.last_results
+
+    async def _run(self):
+        while True:
+            try:
+                await self.sync_once()
+            except Exception as e:
+                logger.error(f"Customer sync run failed: {str(e)}")
+            await asyncio.sleep(self.interval)
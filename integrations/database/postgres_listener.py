@@ -0,0 +1,220 @@
+"""Customer cache invalidation from PostgreSQL notifications.
+
+When a PostgreSQL provider has a ``notify_channel`` in its custom_config, a
+listener holds one connection with ``LISTEN`` on that channel. A trigger on
+the customers table (see ``change_trigger_sql``; installed by the listener
+when ``notify_install_trigger`` is set) sends a JSON payload for every
+insert, update and delete:
+
+    {"op": "UPDATE", "id": 42, "row": {...}}
+
+``row`` is omitted when the row would not fit into a notification (8000
+bytes); the listener then reads the row itself. Changes are applied to the
+customer cache, the identity index and the replica, so writes made by other
+systems are visible at once and the provider can run long cache TTLs.
+
+Notifications sent while the listener is disconnected are lost, so on
+reconnect the provider's cached entries are dropped.
+"""
+
+import asyncio
+import json
+import logging
+import time
+from typing import Dict, Any, Optional, Tuple
+
+import asyncpg
+
+from config import config
+from ..customer_cache import customer_cache
+from ..customer_changes import apply_customer_change, apply_customer_deletion
+
+logger = logging.getLogger(__name__)
+
+# Largest payload pg_notify accepts is 8000 bytes; keep some room
+_MAX_PAYLOAD_BYTES = 7900
+
+
+def change_trigger_sql(table_name: str, channel: str) -> str:
+    """
+    SQL creating the trigger that notifies ``channel`` of changes to ``table_name``.
+
+    Both names must already be validated SQL identifiers.
+    """
+    function_name = f"{table_name.replace('.', '_')}_notify_change"
+    trigger_name = f"{table_name.rpartition('.')[2]}_notify_change"
+    return f"""
+CREATE OR REPLACE FUNCTION {function_name}() RETURNS trigger AS $$
+DECLARE
+    changed RECORD;
+    payload TEXT;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        changed := OLD;
+    ELSE
+        changed := NEW;
+    END IF;
+    payload := json_build_object('op', TG_OP, 'id', changed.id, 'row', row_to_json(changed))::text;
+    IF octet_length(payload) > {_MAX_PAYLOAD_BYTES} THEN
+        payload := json_build_object('op', TG_OP, 'id', changed.id)::text;
+    END IF;
+    PERFORM pg_notify('{channel}', payload);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+DROP TRIGGER IF EXISTS {trigger_name} ON {table_name};
+CREATE TRIGGER {trigger_name} AFTER INSERT OR UPDATE OR DELETE ON {table_name}
+    FOR EACH ROW EXECUTE FUNCTION {function_name}();
+"""
+
+
+class PostgresChangeListener:
+    """Dedicated ``LISTEN`` connection applying a provider's row changes."""
+
+    def __init__(self, provider, channel: str):
+        self.provider = provider
+        self.channel = channel
+        self.loop = asyncio.get_running_loop()
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=config.postgres_notify_queue_size)
+        self._task: Optional[asyncio.Task] = None
+        self._worker: Optional[asyncio.Task] = None
+        self.connected = False
+        self.reconnects = 0
+        self.notifications = 0
+        self.applied = 0
+        self.dropped = 0
+        self.errors = 0
+        self.last_notification_at: Optional[float] = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+            self._worker = asyncio.create_task(self._apply_changes())
+
+    async def stop(self):
+        for task in (self._task, self._worker):
+            if task is not None:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._task = self._worker = None
+        self.connected = False
+
+    def _on_notification(self, connection, pid: int, channel: str, payload: str):
+        self.notifications += 1
+        self.last_notification_at = time.time()
+        try:
+            self._queue.put_nowait(payload)
+        except asyncio.QueueFull:
+            # Falling behind: forget what we have rather than serve stale rows
+            self.dropped += 1
+            customer_cache.invalidate_provider(self.provider.provider_key)
+
+    async def _run(self):
+        delay = 1.0
+        while True:
+            connection = None
+            try:
+                connection = await asyncpg.connect(self.provider.database_url)
+                closed = asyncio.Event()
+                connection.add_termination_listener(lambda _: closed.set())
+                if self.provider.config.custom_config.get("notify_install_trigger"):
+                    await connection.execute(change_trigger_sql(self.provider.table_name, self.channel))
+                await connection.add_listener(self.channel, self._on_notification)
+                if self.reconnects:
+                    # Changes made while disconnected were never announced
+                    customer_cache.invalidate_provider(self.provider.provider_key)
+                self.connected = True
+                delay = 1.0
+                logger.info(f"Listening for {self.provider.provider_name} changes on channel {self.channel}")
+
+                while not closed.is_set():
+                    try:
+                        await asyncio.wait_for(closed.wait(), config.postgres_notify_keepalive_seconds)
+                    except asyncio.TimeoutError:
+                        # Detects connections dropped without a FIN
+                        await connection.fetchval("SELECT 1", timeout=config.postgres_command_timeout)
+                raise ConnectionError("connection closed")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"{self.provider.provider_name} change listener disconnected: {str(e)}")
+            finally:
+                self.connected = False
+                if connection is not None and not connection.is_closed():
+                    connection.terminate()
+
+            self.reconnects += 1
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, config.postgres_notify_reconnect_max_seconds)
+
+    async def _apply_changes(self):
+        while True:
+            payload = await self._queue.get()
+            try:
+                await self._apply(json.loads(payload))
+                self.applied += 1
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Error applying {self.provider.provider_name} change notification: {str(e)}")
+                customer_cache.invalidate_provider(self.provider.provider_key)
+
+    async def _apply(self, change: Dict[str, Any]):
+        provider = self.provider
+        customer_id = str(change["id"])
+        row = change.get("row")
+        customer = None
+        if row is not None:
+            customer = provider._row_customer({column: row.get(column) for column in provider.columns})
+
+        if change.get("op") == "DELETE":
+            await apply_customer_deletion(provider.provider_key, customer_id, customer)
+            return
+
+        if customer is None:
+            customer = await provider.get_customer(customer_id)
+            if customer is None:
+                await apply_customer_deletion(provider.provider_key, customer_id)
+                return
+        await apply_customer_change(provider.provider_key, customer, ttl=provider.config.custom_config.get("cache_ttl_seconds"))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "channel": self.channel,
+            "connected": self.connected,
+            "reconnects": self.reconnects,
+            "notifications": self.notifications,
+            "applied": self.applied,
+            "queued": self._queue.qsize(),
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "last_notification_at": self.last_notification_at
+        }
+
+
+# (database url, channel) -> listener
+_listeners: Dict[Tuple[str, str], PostgresChangeListener] = {}
+
+
+def ensure_listener(provider) -> PostgresChangeListener:
+    """Start the change listener of a provider's database and channel, if not running on this loop."""
+    key = (provider.database_url, provider.notify_channel)
+    listener = _listeners.get(key)
+    if listener is None or listener.loop is not asyncio.get_running_loop():
+        listener = _listeners[key] = PostgresChangeListener(provider, provider.notify_channel)
+        listener.start()
+    return listener
+
+
+async def close_postgres_listeners(database_url: Optional[str] = None):
+    """Stop the listeners of one database, or all of them."""
+    for key in list(_listeners):
+        if database_url is None or key[0] == database_url:
+            await _listeners.pop(key).stop()
+
+
+def postgres_listener_stats() -> Dict[str, Any]:
+    """State of every listener, for health reporting."""
+    return {listener.provider.provider_key: listener.stats() for listener in list(_listeners.values())}
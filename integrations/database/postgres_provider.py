@@ -1,40 +1,202 @@
 """PostgreSQL database integration provider."""
 
+import asyncio
 import logging
-from typing import Dict, Any, List, Optional
+import re
+import time
+from typing import Dict, Any, AsyncIterator, Iterable, List, Optional, Tuple
 import asyncpg
 from datetime import datetime
 
 from ..base_provider import CustomerDataProvider, IntegrationConfig, ProviderConnectionError
+from ..pagination import paginate
+from .postgres_listener import close_postgres_listeners, ensure_listener
+from config import config as app_config
 from entities.customer import Customer
 
 
 logger = logging.getLogger(__name__)
 
+# Columns read when neither field_mappings nor a "columns" list is configured
+DEFAULT_CUSTOMER_COLUMNS = ("id", "first_name", "last_name", "email", "phone", "company", "created_at", "updated_at")
+DEFAULT_INTERACTION_COLUMNS = ("id", "customer_id", "interaction_type", "subject", "content", "status", "created_at")
+
+POOL_SETTINGS = (
+    "postgres_pool_min_size",
+    "postgres_pool_max_size",
+    "postgres_pool_max_inactive_lifetime",
+    "postgres_command_timeout",
+    "postgres_statement_cache_size",
+    "postgres_health_check_interval",
+)
+
+# Optionally schema-qualified SQL identifier; table and column names are interpolated into SQL
+_IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_$]*(\.[A-Za-z_][A-Za-z0-9_$]*)?$")
+
+# Backslash escapes of COPY text format
+_COPY_ESCAPES = {"b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t", "v": "\v", "\\": "\\"}
+
+# dsn -> (pool, event loop it was created on, provider it was opened for)
+_pools: Dict[str, Tuple[asyncpg.Pool, asyncio.AbstractEventLoop, str]] = {}
+_pool_locks: Dict[str, asyncio.Lock] = {}
+
+
+def _identifier(name: str) -> str:
+    if not _IDENTIFIER.match(name or ""):
+        raise ValueError(f"Invalid SQL identifier: {name!r}")
+    return name
+
+
+def _unescape_copy_field(field: str) -> Optional[str]:
+    """Value of one field of a COPY text format row."""
+    if field == "\\N":
+        return None
+    if "\\" not in field:
+        return field
+    return re.sub(r"\\(.)", lambda match: _COPY_ESCAPES.get(match.group(1), match.group(1)), field)
+
+
+def _health_check(interval: float):
+    """Pool ``setup`` hook: ping connections that sat idle longer than ``interval``."""
+    checked: Dict[int, float] = {}
+
+    async def setup(connection):
+        now = time.monotonic()
+        pid = connection.get_server_pid()
+        if now - checked.get(pid, 0.0) > interval:
+            # Raises on a dead connection, which the pool then discards
+            await connection.fetchval("SELECT 1")
+        checked[pid] = now
+
+    return setup
+
+
+async def close_postgres_pools():
+    """Close every shared pool and change listener; called on application shutdown."""
+    await close_postgres_listeners()
+    for dsn in list(_pools):
+        pool = _pools.pop(dsn)[0]
+        try:
+            await pool.close()
+        except Exception as e:
+            logger.error(f"Error closing PostgreSQL pool: {str(e)}")
+
+
+def postgres_pool_stats() -> Dict[str, Any]:
+    """Size of every shared pool, for health reporting."""
+    return {
+        provider_key: {"size": pool.get_size(), "idle": pool.get_idle_size(), "max_size": pool.get_max_size()}
+        for pool, _, provider_key in list(_pools.values())
+    }
+
 
 class PostgreSQLProvider(CustomerDataProvider):
     """PostgreSQL database data provider."""
     
+    max_bulk_size = 1000
+    
     def __init__(self, config: IntegrationConfig):
         super().__init__(config)
         self.database_url = config.database_url
-        self.table_name = config.custom_config.get("table_name", "customers")
-        self.connection_pool = None
+        self.table_name = _identifier(config.custom_config.get("table_name", "customers"))
+        self.interactions_table = _identifier(
+            config.custom_config.get("interactions_table", "customer_interactions")
+        )
         self.config = config
+        # Channel fed by the customers table's change trigger; see postgres_listener
+        notify_channel = config.custom_config.get("notify_channel")
+        self.notify_channel = _identifier(notify_channel) if notify_channel else None
+        self.pool_settings = {name: getattr(app_config, name) for name in POOL_SETTINGS}
+        self.pool_settings.update({
+            name: config.custom_config[name] for name in POOL_SETTINGS if name in config.custom_config
+        })
+        
+        # Query text is built once per provider so it is identical on every call,
+        # which lets asyncpg reuse each connection's prepared statements
+        self.columns = [_identifier(column) for column in self._customer_columns()]
+        select = f"SELECT {', '.join(self.columns)} FROM {self.table_name}"
+        search = "(first_name ILIKE $1 OR last_name ILIKE $1 OR email ILIKE $1)"
+        modified = "COALESCE(updated_at, created_at)"
+        interaction_columns = ", ".join(
+            _identifier(column)
+            for column in config.custom_config.get("interaction_columns", DEFAULT_INTERACTION_COLUMNS)
+        )
+        history = f"SELECT {interaction_columns} FROM {self.interactions_table} WHERE customer_id = $1"
+        self.queries = {
+            "by_id": f"{select} WHERE id = $1",
+            "by_ids": f"{select} WHERE id = ANY($1)",
+            "by_email": f"{select} WHERE email = $1",
+            "by_phone": f"{select} WHERE phone = $1",
+            "search": f"{select} WHERE {search} ORDER BY id LIMIT $2",
+            "search_after": f"{select} WHERE {search} AND id > $2 ORDER BY id LIMIT $3",
+            "history": f"{history} ORDER BY created_at DESC, id DESC LIMIT $2",
+            "history_before": (
+                f"{history} AND (created_at, id) < ($2, $3) ORDER BY created_at DESC, id DESC LIMIT $4"
+            ),
+            "changed": (
+                f"SELECT {', '.join(self.columns)}, {modified} AS sync_modified_at FROM {self.table_name} "
+                f"WHERE {modified} > $1 ORDER BY {modified}, id LIMIT $2"
+            ),
+            "changed_after": (
+                f"SELECT {', '.join(self.columns)}, {modified} AS sync_modified_at FROM {self.table_name} "
+                f"WHERE ({modified}, id) > ($1, $2) ORDER BY {modified}, id LIMIT $3"
+            ),
+            "export": f"SELECT {', '.join(self.columns)} FROM {self.table_name}",
+            "update": (
+                f"UPDATE {self.table_name} SET first_name = $1, last_name = $2, email = $3, phone = $4, "
+                f"updated_at = $5 WHERE id = $6"
+            ),
+        }
+    
+    def _customer_columns(self) -> List[str]:
+        """Columns to read: explicit list, else id plus mapped fields, else the defaults."""
+        columns = self.config.custom_config.get("columns")
+        if columns:
+            return list(dict.fromkeys(["id", *columns]))
+        if self.config.field_mappings:
+            return list(dict.fromkeys(["id", *self.config.field_mappings.values()]))
+        return list(DEFAULT_CUSTOMER_COLUMNS)
     
-    async def _get_connection_pool(self):
-        """Get or create connection pool."""
-        if not self.connection_pool:
+    async def _get_connection_pool(self) -> asyncpg.Pool:
+        """Get the pool shared by every provider instance for this database, creating it on first use."""
+        if self.notify_channel:
+            ensure_listener(self)
+        
+        loop = asyncio.get_running_loop()
+        entry = _pools.get(self.database_url)
+        if entry is not None and entry[1] is loop:
+            return entry[0]
+        
+        lock = _pool_locks.setdefault(self.database_url, asyncio.Lock())
+        async with lock:
+            entry = _pools.get(self.database_url)
+            if entry is not None and entry[1] is loop:
+                return entry[0]
+            
+            settings = self.pool_settings
             try:
-                self.connection_pool = await asyncpg.create_pool(
+                pool = await asyncpg.create_pool(
                     self.database_url,
-                    min_size=1,
-                    max_size=10
+                    min_size=settings["postgres_pool_min_size"],
+                    max_size=settings["postgres_pool_max_size"],
+                    max_inactive_connection_lifetime=settings["postgres_pool_max_inactive_lifetime"],
+                    command_timeout=settings["postgres_command_timeout"],
+                    statement_cache_size=settings["postgres_statement_cache_size"],
+                    setup=_health_check(settings["postgres_health_check_interval"])
                 )
             except Exception as e:
                 raise ProviderConnectionError(f"PostgreSQL connection error: {str(e)}")
-        
-        return self.connection_pool
+            
+            _pools[self.database_url] = (pool, loop, self.provider_key)
+            logger.info(
+                f"Opened PostgreSQL pool for {self.provider_name} "
+                f"(min={settings['postgres_pool_min_size']}, max={settings['postgres_pool_max_size']})"
+            )
+            return pool
+    
+    def _row_customer(self, row: Any) -> Customer:
+        """Customer from a customers table row."""
+        return Customer.from_provider_data(self.map_fields(dict(row)), "postgresql")
     
     async def get_customer(self, customer_id: str) -> Optional[Customer]:
         """Get customer by ID."""
@@ -42,32 +204,39 @@ class PostgreSQLProvider(CustomerDataProvider):
             pool = await self._get_connection_pool()
             
             async with pool.acquire() as connection:
-                query = f"SELECT * FROM {self.table_name} WHERE id = $1"
-                row = await connection.fetchrow(query, customer_id)
+                row = await connection.fetchrow(self.queries["by_id"], customer_id)
                 
                 if row:
-                    customer_data = dict(row)
-                    mapped_data = self.map_fields(customer_data)
-                    return Customer.from_provider_data(mapped_data, "postgresql")
+                    return self._row_customer(row)
                 
                 return None
         except Exception as e:
             logger.error(f"Error getting PostgreSQL customer {customer_id}: {str(e)}")
             return None
     
+    async def get_customers_bulk(self, customer_ids: List[str]) -> Dict[str, Customer]:
+        """Get several customers with one query."""
+        try:
+            pool = await self._get_connection_pool()
+            
+            async with pool.acquire() as connection:
+                rows = await connection.fetch(self.queries["by_ids"], customer_ids)
+                
+                return {str(row["id"]): self._row_customer(row) for row in rows}
+        except Exception as e:
+            logger.error(f"Error getting PostgreSQL customers in bulk: {str(e)}")
+            raise
+    
     async def get_customer_by_email(self, email: str) -> Optional[Customer]:
         """Get customer by email address."""
         try:
             pool = await self._get_connection_pool()
             
             async with pool.acquire() as connection:
-                query = f"SELECT * FROM {self.table_name} WHERE email = $1"
-                row = await connection.fetchrow(query, email)
+                row = await connection.fetchrow(self.queries["by_email"], email)
                 
                 if row:
-                    customer_data = dict(row)
-                    mapped_data = self.map_fields(customer_data)
-                    return Customer.from_provider_data(mapped_data, "postgresql")
+                    return self._row_customer(row)
                 
                 return None
         except Exception as e:
@@ -80,13 +249,10 @@ class PostgreSQLProvider(CustomerDataProvider):
             pool = await self._get_connection_pool()
             
             async with pool.acquire() as connection:
-                query = f"SELECT * FROM {self.table_name} WHERE phone = $1"
-                row = await connection.fetchrow(query, phone)
+                row = await connection.fetchrow(self.queries["by_phone"], phone)
                 
                 if row:
-                    customer_data = dict(row)
-                    mapped_data = self.map_fields(customer_data)
-                    return Customer.from_provider_data(mapped_data, "postgresql")
+                    return self._row_customer(row)
                 
                 return None
         except Exception as e:
@@ -110,7 +276,7 @@ class PostgreSQLProvider(CustomerDataProvider):
             
             # Add custom fields if they exist as columns
             for key, value in customer_data.get("custom_fields", {}).items():
-                fields.append(key)
+                fields.append(_identifier(key))
                 values.append(value)
             
             placeholders = ", ".join([f"${i+1}" for i in range(len(values))])
@@ -121,7 +287,7 @@ class PostgreSQLProvider(CustomerDataProvider):
                 customer_id = await connection.fetchval(query, *values)
                 
                 return await self.get_customer(str(customer_id))
-                
+        
         except Exception as e:
             logger.error(f"Error creating PostgreSQL customer: {str(e)}")
             raise
@@ -132,14 +298,8 @@ class PostgreSQLProvider(CustomerDataProvider):
             pool = await self._get_connection_pool()
             
             async with pool.acquire() as connection:
-                query = f"""
-                UPDATE {self.table_name} 
-                SET first_name = $1, last_name = $2, email = $3, phone = $4, updated_at = $5
-                WHERE id = $6
-                """
-                
                 result = await connection.execute(
-                    query,
+                    self.queries["update"],
                     customer.first_name,
                     customer.last_name,
                     customer.email,
@@ -149,72 +309,187 @@ class PostgreSQLProvider(CustomerDataProvider):
                 )
                 
                 return "UPDATE 1" in result
-                
+        
         except Exception as e:
             logger.error(f"Error updating PostgreSQL customer {customer.customer_id}: {str(e)}")
             return False
     
-    async def get_customer_history(self, customer_id: str) -> List[Dict[str, Any]]:
-        """Get customer interaction history from PostgreSQL."""
+    async def get_customer_history(self, customer_id: str, limit: int = 100) -> List[Dict[str, Any]]:
+        """Get the most recent customer interactions from PostgreSQL."""
         try:
             pool = await self._get_connection_pool()
             
-            # Assuming there's an interactions table
-            interactions_table = self.config.custom_config.get("interactions_table", "customer_interactions")
-            
             async with pool.acquire() as connection:
-                query = f"""
-                SELECT * FROM {interactions_table} 
-                WHERE customer_id = $1 
-                ORDER BY created_at DESC
-                """
-                rows = await connection.fetch(query, customer_id)
-                
-                history = []
-                for row in rows:
-                    history.append({
-                        "id": row["id"],
-                        "type": row.get("interaction_type", "interaction"),
-                        "subject": row.get("subject", ""),
-                        "content": row.get("content", ""),
-                        "status": row.get("status", ""),
-                        "created_date": row.get("created_at", ""),
-                        "source": "postgresql"
-                    })
-                
-                return history
+                rows = await connection.fetch(self.queries["history"], customer_id, limit)
                 
+                return [self._interaction_record(row) for row in rows]
+        
         except Exception as e:
             logger.error(f"Error getting PostgreSQL customer history {customer_id}: {str(e)}")
             return []
     
+    async def _fetch(self, query: str, *args) -> List[Any]:
+        """Run one page query on a pooled connection."""
+        pool = await self._get_connection_pool()
+        async with pool.acquire() as connection:
+            return await connection.fetch(query, *args)
+    
+    async def iter_history(self, customer_id: str, page_size: int = 100) -> AsyncIterator[Dict[str, Any]]:
+        """Stream interactions newest first, a keyset page at a time."""
+        async def fetch_page(cursor: Optional[tuple]):
+            if cursor is None:
+                rows = await self._fetch(self.queries["history"], customer_id, page_size)
+            else:
+                rows = await self._fetch(self.queries["history_before"], customer_id, *cursor, page_size)
+            next_cursor = (rows[-1]["created_at"], rows[-1]["id"]) if len(rows) == page_size else None
+            return [self._interaction_record(row) for row in rows], next_cursor
+        
+        async for record in paginate(fetch_page):
+            yield record
+    
+    def _interaction_record(self, row: Any) -> Dict[str, Any]:
+        """History record for an interactions table row."""
+        return {
+            "id": row["id"],
+            "type": row.get("interaction_type", "interaction"),
+            "subject": row.get("subject", ""),
+            "content": row.get("content", ""),
+            "status": row.get("status", ""),
+            "created_date": row.get("created_at", ""),
+            "source": "postgresql"
+        }
+    
     async def search_customers(self, query: str, limit: int = 10) -> List[Customer]:
         """Search customers in PostgreSQL."""
         try:
-            pool = await self._get_connection_pool()
-            
-            async with pool.acquire() as connection:
-                search_query = f"""
-                SELECT * FROM {self.table_name} 
-                WHERE first_name ILIKE $1 OR last_name ILIKE $1 OR email ILIKE $1
-                LIMIT $2
-                """
-                
-                rows = await connection.fetch(search_query, f"%{query}%", limit)
-                
-                customers = []
-                for row in rows:
-                    customer_data = dict(row)
-                    mapped_data = self.map_fields(customer_data)
-                    customer = Customer.from_provider_data(mapped_data, "postgresql")
-                    customers.append(customer)
-                
-                return customers
-                
+            rows = await self._fetch(self.queries["search"], f"%{query}%", limit)
+            return [self._row_customer(row) for row in rows]
+        
         except Exception as e:
             logger.error(f"Error searching PostgreSQL customers: {str(e)}")
             return []
     
+    async def iter_customers(self, query: str, page_size: int = 100) -> AsyncIterator[Customer]:
+        """Stream all matching customers by ascending id, a keyset page at a time."""
+        pattern = f"%{query}%"
+        
+        async def fetch_page(last_id: Optional[Any]):
+            if last_id is None:
+                rows = await self._fetch(self.queries["search"], pattern, page_size)
+            else:
+                rows = await self._fetch(self.queries["search_after"], pattern, last_id, page_size)
+            next_id = rows[-1]["id"] if len(rows) == page_size else None
+            return [self._row_customer(row) for row in rows], next_id
+        
+        async for customer in paginate(fetch_page):
+            yield customer
+    
+    async def iter_changed_customers(
+        self,
+        since: Optional[datetime] = None,
+        page_size: int = 100
+    ) -> AsyncIterator[Customer]:
+        """
+        Stream rows by ascending last modification (updated_at, else created_at).
+        
+        A full export (no ``since``) streams the table with COPY; incremental
+        runs read keyset pages.
+        """
+        if since is None:
+            async for customer in self.export_customers():
+                yield customer
+            return
+        
+        # updated_at holds naive local times (see update_customer)
+        since = since.astimezone().replace(tzinfo=None)
+        
+        async def fetch_page(cursor: Optional[tuple]):
+            if cursor is None:
+                rows = await self._fetch(self.queries["changed"], since, page_size)
+            else:
+                rows = await self._fetch(self.queries["changed_after"], *cursor, page_size)
+            next_cursor = (rows[-1]["sync_modified_at"], rows[-1]["id"]) if len(rows) == page_size else None
+            customers = []
+            for row in rows:
+                data = dict(row)
+                data.pop("sync_modified_at")
+                customers.append(Customer.from_provider_data(self.map_fields(data), "postgresql"))
+            return customers, next_cursor
+        
+        async for customer in paginate(fetch_page):
+            yield customer
+    
+    async def export_customers(self, buffer_rows: int = 1000) -> AsyncIterator[Customer]:
+        """
+        Stream the whole customers table with ``COPY ... TO STDOUT``.
+        
+        Values arrive as text, so non-text columns come back as strings.
+        
+        Args:
+            buffer_rows: Rows decoded ahead of the consumer
+        """
+        rows: asyncio.Queue = asyncio.Queue(maxsize=buffer_rows)
+        done = object()
+        pending = b""
+        
+        async def receive(chunk: bytes):
+            # COPY text format: one row per line, tab-separated, newlines inside values escaped
+            nonlocal pending
+            lines = (pending + chunk).split(b"\n")
+            pending = lines.pop()
+            for line in lines:
+                fields = line.decode("utf-8").split("\t")
+                await rows.put(dict(zip(self.columns, map(_unescape_copy_field, fields))))
+        
+        async def copy():
+            try:
+                pool = await self._get_connection_pool()
+                async with pool.acquire() as connection:
+                    await connection.copy_from_query(self.queries["export"], output=receive, format="text")
+                await rows.put(done)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                await rows.put(e)
+        
+        producer = asyncio.create_task(copy())
+        try:
+            while True:
+                row = await rows.get()
+                if row is done:
+                    return
+                if isinstance(row, Exception):
+                    raise row
+                yield Customer.from_provider_data(self.map_fields(row), "postgresql")
+        finally:
+            producer.cancel()
+    
+    async def import_customers(self, records: Iterable[Dict[str, Any]], columns: Optional[List[str]] = None) -> int:
+        """
+        Load many customer rows with ``COPY ... FROM STDIN``.
+        
+        Args:
+            records: Rows as column -> value dicts
+            columns: Columns to load (defaults to the provider's columns minus id)
+        
+        Returns:
+            Number of rows loaded
+        """
+        columns = [_identifier(column) for column in (columns or [c for c in self.columns if c != "id"])]
+        schema_name, _, table_name = self.table_name.rpartition(".")
+        rows = [tuple(record.get(column) for column in columns) for record in records]
+        
+        pool = await self._get_connection_pool()
+        async with pool.acquire() as connection:
+            await connection.copy_records_to_table(
+                table_name,
+                schema_name=schema_name or None,
+                records=rows,
+                columns=columns
+            )
+        logger.info(f"Imported {len(rows)} customers into {self.table_name}")
+        return len(rows)
+    
     async def test_connection(self) -> Dict[str, Any]:
         """Test PostgreSQL connection."""
         try:
@@ -236,6 +511,8 @@ class PostgreSQLProvider(CustomerDataProvider):
             }
     
     async def close(self):
-        """Close connection pool."""
-        if self.connection_pool:
-            await self.connection_pool.close()
\ No newline at end of file
+        """Close the shared connection pool and change listener of this database."""
+        await close_postgres_listeners(self.database_url)
+        entry = _pools.pop(self.database_url, None)
+        if entry is not None:
+            await entry[0].close()
@@ -1,11 +1,11 @@
 """Shopify e-commerce integration provider."""
 
 import logging
-from typing import Dict, Any, List, Optional
-import aiohttp
-from datetime import datetime
+from typing import Dict, Any, AsyncIterator, List, Optional, Tuple
+from datetime import datetime, timezone
 
 from ..base_provider import CustomerDataProvider, IntegrationConfig, ProviderConnectionError
+from ..pagination import paginate
 from entities.customer import Customer
 
 logger = logging.getLogger(__name__)
@@ -14,11 +14,21 @@ logger = logging.getLogger(__name__)
 class ShopifyProvider(CustomerDataProvider):
     """Shopify e-commerce data provider."""
     
+    uses_http_session = True
+    
+    # REST Admin API leaky bucket: 40 requests, leaking 2 per second
+    rate_limit_per_second = 2.0
+    rate_limit_burst = 40
+    
+    # Largest page the customers endpoint returns
+    max_bulk_size = 250
+    
     def __init__(self, config: IntegrationConfig):
         super().__init__(config)
         self.shop_domain = config.custom_config.get("shop_domain")
         self.access_token = config.api_key
-        self.base_url = ""
+        api_version = config.custom_config.get("api_version", "2024-01")
+        self.base_url = f"https://{self.shop_domain}/admin/api/{api_version}" if self.shop_domain else ""
     
     async def _make_api_request(self, endpoint: str, method: str = "GET", data: Dict = None) -> Dict[str, Any]:
         """Make authenticated API request to Shopify."""
@@ -30,31 +40,58 @@ class ShopifyProvider(CustomerDataProvider):
         url = f"{self.base_url}/{endpoint}"
         
         try:
-            async with aiohttp.ClientSession() as session:
-                if method == "GET":
-                    async with session.get(url, headers=headers) as response:
-                        if response.status == 200:
-                            return await response.json()
-                        else:
-                            error_text = await response.text()
-                            raise ProviderConnectionError(f"Shopify API error: {error_text}")
-                elif method == "POST":
-                    async with session.post(url, headers=headers, json=data) as response:
-                        if response.status in [200, 201]:
-                            return await response.json()
-                        else:
-                            error_text = await response.text()
-                            raise ProviderConnectionError(f"Shopify API error: {error_text}")
-                elif method == "PUT":
-                    async with session.put(url, headers=headers, json=data) as response:
-                        if response.status == 200:
-                            return await response.json()
-                        else:
-                            error_text = await response.text()
-                            raise ProviderConnectionError(f"Shopify API error: {error_text}")
+            session = self.http_session()
+            if method == "GET":
+                async with session.get(url, headers=headers) as response:
+                    if response.status == 200:
+                        return await response.json()
+                    else:
+                        error_text = await response.text()
+                        raise ProviderConnectionError(f"Shopify API error: {error_text}")
+            elif method == "POST":
+                async with session.post(url, headers=headers, json=data) as response:
+                    if response.status in [200, 201]:
+                        return await response.json()
+                    else:
+                        error_text = await response.text()
+                        raise ProviderConnectionError(f"Shopify API error: {error_text}")
+            elif method == "PUT":
+                async with session.put(url, headers=headers, json=data) as response:
+                    if response.status == 200:
+                        return await response.json()
+                    else:
+                        error_text = await response.text()
+                        raise ProviderConnectionError(f"Shopify API error: {error_text}")
         except Exception as e:
             raise ProviderConnectionError(f"Shopify connection error: {str(e)}")
     
+    async def _get_page(self, endpoint: str) -> Tuple[Dict[str, Any], Optional[str]]:
+        """GET a paginated endpoint; returns the body and the endpoint of the next page."""
+        headers = {
+            "X-Shopify-Access-Token": self.access_token,
+            "Content-Type": "application/json"
+        }
+        
+        try:
+            async with self.http_session().get(f"{self.base_url}/{endpoint}", headers=headers) as response:
+                if response.status != 200:
+                    error_text = await response.text()
+                    raise ProviderConnectionError(f"Shopify API error: {error_text}")
+                body = await response.json()
+                # Cursor pagination: the next page is announced in the Link header
+                next_link = response.links.get("next")
+        except ProviderConnectionError:
+            raise
+        except Exception as e:
+            raise ProviderConnectionError(f"Shopify connection error: {str(e)}")
+        
+        next_endpoint = None
+        if next_link:
+            next_url = str(next_link.get("url"))
+            prefix = f"{self.base_url}/"
+            next_endpoint = next_url[len(prefix):] if next_url.startswith(prefix) else None
+        return body, next_endpoint
+    
     async def get_customer(self, customer_id: str) -> Optional[Customer]:
         """Get customer by Shopify Customer ID."""
         try:
@@ -70,6 +107,23 @@ class ShopifyProvider(CustomerDataProvider):
             logger.error(f"Error getting Shopify customer {customer_id}: {str(e)}")
             return None
     
+    async def get_customers_bulk(self, customer_ids: List[str]) -> Dict[str, Customer]:
+        """Get several customers with one ids-filtered list request."""
+        try:
+            ids = ",".join(customer_ids)
+            endpoint = f"customers.json?ids={ids}&limit={self.max_bulk_size}"
+            result = await self._make_api_request(endpoint)
+            
+            customers = {}
+            for customer_data in result.get("customers", []):
+                mapped_data = self.map_fields(customer_data)
+                customers[str(customer_data.get("id"))] = Customer.from_provider_data(mapped_data, "shopify")
+            
+            return customers
+        except Exception as e:
+            logger.error(f"Error getting Shopify customers in bulk: {str(e)}")
+            raise
+    
     async def get_customer_by_email(self, email: str) -> Optional[Customer]:
         """Get customer by email address."""
         try:
@@ -173,16 +227,7 @@ class ShopifyProvider(CustomerDataProvider):
             orders_result = await self._make_api_request(endpoint)
             
             for order in orders_result.get("orders", []):
-                history.append({
-                    "id": order.get("id"),
-                    "type": "order",
-                    "order_number": order.get("order_number"),
-                    "total_price": order.get("total_price"),
-                    "financial_status": order.get("financial_status"),
-                    "fulfillment_status": order.get("fulfillment_status"),
-                    "created_date": order.get("created_at"),
-                    "source": "shopify"
-                })
+                history.append(self._order_record(order))
             
             return history
             
@@ -190,6 +235,30 @@ class ShopifyProvider(CustomerDataProvider):
             logger.error(f"Error getting Shopify customer history {customer_id}: {str(e)}")
             return []
     
+    async def iter_history(self, customer_id: str, page_size: int = 100) -> AsyncIterator[Dict[str, Any]]:
+        """Stream the customer's orders, following Link header cursors."""
+        async def fetch_page(cursor: Optional[str]):
+            body, next_endpoint = await self._get_page(
+                cursor or f"customers/{customer_id}/orders.json?limit={min(page_size, self.max_bulk_size)}"
+            )
+            return [self._order_record(order) for order in body.get("orders", [])], next_endpoint
+        
+        async for record in paginate(fetch_page):
+            yield record
+    
+    def _order_record(self, order: Dict[str, Any]) -> Dict[str, Any]:
+        """History record for a Shopify order."""
+        return {
+            "id": order.get("id"),
+            "type": "order",
+            "order_number": order.get("order_number"),
+            "total_price": order.get("total_price"),
+            "financial_status": order.get("financial_status"),
+            "fulfillment_status": order.get("fulfillment_status"),
+            "created_date": order.get("created_at"),
+            "source": "shopify"
+        }
+    
     async def search_customers(self, query: str, limit: int = 10) -> List[Customer]:
         """Search customers in Shopify."""
         try:
@@ -208,6 +277,42 @@ class ShopifyProvider(CustomerDataProvider):
             logger.error(f"Error searching Shopify customers: {str(e)}")
             return []
     
+    async def iter_customers(self, query: str, page_size: int = 100) -> AsyncIterator[Customer]:
+        """Stream search results, following Link header cursors."""
+        async def fetch_page(cursor: Optional[str]):
+            body, next_endpoint = await self._get_page(
+                cursor or f"customers/search.json?query={query}&limit={min(page_size, self.max_bulk_size)}"
+            )
+            customers = [
+                Customer.from_provider_data(self.map_fields(customer_data), "shopify")
+                for customer_data in body.get("customers", [])
+            ]
+            return customers, next_endpoint
+        
+        async for customer in paginate(fetch_page):
+            yield customer
+    
+    async def iter_changed_customers(
+        self,
+        since: Optional[datetime] = None,
+        page_size: int = 100
+    ) -> AsyncIterator[Customer]:
+        """Stream customers updated since ``since`` via updated_at_min, following Link header cursors."""
+        endpoint = f"customers.json?limit={min(page_size, self.max_bulk_size)}"
+        if since:
+            endpoint += f"&updated_at_min={since.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')}"
+        
+        async def fetch_page(cursor: Optional[str]):
+            body, next_endpoint = await self._get_page(cursor or endpoint)
+            customers = [
+                Customer.from_provider_data(self.map_fields(customer_data), "shopify")
+                for customer_data in body.get("customers", [])
+            ]
+            return customers, next_endpoint
+        
+        async for customer in paginate(fetch_page):
+            yield customer
+    
     async def test_connection(self) -> Dict[str, Any]:
         """Test Shopify connection."""
         try:
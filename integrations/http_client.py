@@ -0,0 +1,158 @@
+"""Pooled HTTP sessions shared by the API-based data providers.
+
+Opening an ``aiohttp.ClientSession`` per request costs a TCP and TLS
+handshake on every CRM call. Instead each provider gets one long-lived
+session from this registry, keyed by provider type and name, so connections
+are kept alive and reused even though data managers (and their provider
+instances) are created per request. Sessions are closed on application
+shutdown with ``close_http_sessions``.
+
+Pool settings default to the ``http_*`` keys in ``config.py`` and can be
+overridden per provider through the same keys in the provider's
+``custom_config``.
+
+Requests are paced by the provider's rate limiter (see ``rate_limiter``),
+which also retries 429 responses. Each attempt then reports its outcome and
+latency to the provider's circuit breaker: connection errors, timeouts and
+5xx responses count as failures. Time spent waiting for the rate limiter
+and requests cancelled by the caller are not counted.
+"""
+
+import asyncio
+import logging
+from typing import Dict, Any, Optional, Tuple
+
+import aiohttp
+
+from config import config
+from .circuit_breaker import get_circuit_breaker
+from .rate_limiter import get_rate_limiter, rate_limit_middleware
+
+logger = logging.getLogger(__name__)
+
+POOL_SETTINGS = (
+    "http_pool_limit",
+    "http_pool_limit_per_host",
+    "http_keepalive_timeout",
+    "http_dns_cache_ttl",
+    "http_connect_timeout",
+    "http_request_timeout",
+)
+
+# key -> (session, event loop it was created on)
+_sessions: Dict[str, Tuple[aiohttp.ClientSession, asyncio.AbstractEventLoop]] = {}
+
+
+def pool_settings(overrides: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Pool settings from the application config with per-provider overrides applied."""
+    settings = {name: getattr(config, name) for name in POOL_SETTINGS}
+    if overrides:
+        settings.update({name: overrides[name] for name in POOL_SETTINGS if name in overrides})
+    return settings
+
+
+def _breaker_middleware(key: str):
+    """Client middleware feeding request outcomes to the provider's circuit breaker."""
+    async def middleware(request, handler):
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        try:
+            response = await handler(request)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            get_circuit_breaker(key).record(loop.time() - started, failed=True)
+            raise
+        get_circuit_breaker(key).record(loop.time() - started, failed=response.status >= 500)
+        return response
+
+    return middleware
+
+
+def _create_session(
+    key: str,
+    settings: Dict[str, Any],
+    overrides: Optional[Dict[str, Any]] = None
+) -> aiohttp.ClientSession:
+    connector = aiohttp.TCPConnector(
+        limit=settings["http_pool_limit"],
+        limit_per_host=settings["http_pool_limit_per_host"],
+        keepalive_timeout=settings["http_keepalive_timeout"],
+        use_dns_cache=settings["http_dns_cache_ttl"] > 0,
+        ttl_dns_cache=settings["http_dns_cache_ttl"] or None,
+        enable_cleanup_closed=True
+    )
+    timeout = aiohttp.ClientTimeout(
+        total=settings["http_request_timeout"],
+        sock_connect=settings["http_connect_timeout"]
+    )
+    # The rate limiter wraps the breaker so retries are recorded per attempt
+    middlewares = [_breaker_middleware(key)]
+    if config.rate_limit_enabled:
+        middlewares.insert(0, rate_limit_middleware(get_rate_limiter(key, overrides)))
+    return aiohttp.ClientSession(connector=connector, timeout=timeout, middlewares=middlewares)
+
+
+def get_http_session(key: str, overrides: Optional[Dict[str, Any]] = None) -> aiohttp.ClientSession:
+    """
+    Get the shared session for a provider, creating it on first use.
+
+    Args:
+        key: Registry key, e.g. ``"salesforce:main_crm"``
+        overrides: Per-provider pool and rate limit settings (``http_*`` and
+            ``rate_limit_*`` keys); only used when the session is created
+
+    Returns:
+        Open ``aiohttp.ClientSession`` bound to the running event loop
+    """
+    loop = asyncio.get_running_loop()
+    entry = _sessions.get(key)
+    if entry is not None:
+        session, session_loop = entry
+        if not session.closed and session_loop is loop:
+            return session
+        if not session.closed:
+            # Created on a loop that is gone; its connections cannot be reused here
+            logger.warning(f"Discarding HTTP session {key} created on another event loop")
+
+    settings = pool_settings(overrides)
+    session = _create_session(key, settings, overrides)
+    _sessions[key] = (session, loop)
+    logger.info(
+        f"Opened HTTP session {key} (limit={settings['http_pool_limit']}, "
+        f"per_host={settings['http_pool_limit_per_host']}, keepalive={settings['http_keepalive_timeout']}s)"
+    )
+    return session
+
+
+async def close_http_session(key: str):
+    """Close and forget one provider's session."""
+    entry = _sessions.pop(key, None)
+    if entry is not None and not entry[0].closed:
+        await entry[0].close()
+        logger.info(f"Closed HTTP session {key}")
+
+
+async def close_http_sessions():
+    """Close every pooled session; called on application shutdown."""
+    for key in list(_sessions):
+        try:
+            await close_http_session(key)
+        except Exception as e:
+            logger.error(f"Error closing HTTP session {key}: {str(e)}")
+
+
+def http_pool_stats() -> Dict[str, Any]:
+    """Open sessions and their connection counts, for health reporting."""
+    stats = {}
+    for key, (session, _) in _sessions.items():
+        if session.closed:
+            continue
+        connector = session.connector
+        stats[key] = {
+            "limit": connector.limit,
+            "limit_per_host": connector.limit_per_host,
+            "idle_connections": sum(len(conns) for conns in getattr(connector, "_conns", {}).values()),
+            "active_connections": sum(len(conns) for conns in getattr(connector, "_acquired_per_host", {}).values())
+        }
+    return stats
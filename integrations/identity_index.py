@@ -0,0 +1,284 @@
+"""Local cross-provider customer identity index.
+
+Maps normalized e-mail addresses, E.164 phone numbers and provider record
+IDs to a unified customer key, and the customer key to the record ID in
+each provider that has the customer. With it the data manager can send a
+lookup straight to the providers holding the customer instead of probing
+every provider in turn.
+
+The index is filled as a side effect of customer data flowing through the
+data manager: lookups, bulk fetches, searches and writes. Other feeds
+(webhooks, syncs) call ``record`` and ``forget`` directly. It is persisted
+in a local SQLite file, so it survives restarts and is shared by the
+worker processes of one host.
+
+SQLite calls block, for up to the busy timeout when another process
+writes, so async code calls the index through ``run``, which runs them on
+the index's own thread.
+"""
+
+import asyncio
+import functools
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from config import config
+from entities.customer import Customer
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS customer_identities (
+    identity_type TEXT NOT NULL,
+    identity_value TEXT NOT NULL,
+    customer_key TEXT NOT NULL,
+    PRIMARY KEY (identity_type, identity_value)
+);
+CREATE INDEX IF NOT EXISTS customer_identities_key ON customer_identities (customer_key);
+CREATE TABLE IF NOT EXISTS provider_records (
+    provider_key TEXT NOT NULL,
+    external_id TEXT NOT NULL,
+    customer_key TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (provider_key, external_id)
+);
+CREATE INDEX IF NOT EXISTS provider_records_key ON provider_records (customer_key);
+"""
+
+
+def normalize_email(email: Optional[str]) -> Optional[str]:
+    """Lower-cased, trimmed e-mail address, or None if it is not one."""
+    email = (email or "").strip().lower()
+    return email if "@" in email else None
+
+
+def normalize_phone(phone: Optional[str], country_code: Optional[str] = None) -> Optional[str]:
+    """
+    Phone number in E.164 form.
+
+    Numbers without an international prefix are taken to be national
+    numbers of ``country_code`` (default ``config.default_phone_country_code``);
+    a leading trunk "0" is dropped.
+
+    Args:
+        phone: Phone number in any common notation
+        country_code: Calling code without "+", e.g. "1" or "44"
+
+    Returns:
+        "+" followed by 8 to 15 digits, or None if the input is not a phone number
+    """
+    phone = (phone or "").strip()
+    if not phone:
+        return None
+    international = phone.startswith("+") or phone.startswith("00")
+    digits = re.sub(r"\D", "", phone)
+    if phone.startswith("00"):
+        digits = digits[2:]
+
+    if not international:
+        country_code = country_code or config.default_phone_country_code
+        if digits.startswith("0"):
+            digits = digits[1:]
+        # A national number already carrying the country code, e.g. "1 555 ..." in the US
+        if not (country_code == "1" and len(digits) == 11 and digits.startswith("1")):
+            digits = f"{country_code}{digits}"
+
+    return f"+{digits}" if 8 <= len(digits) <= 15 else None
+
+
+class IdentityIndex:
+    """SQLite-backed map from customer identities to per-provider record IDs."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or config.identity_index_path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        # Calls serialize on the lock anyway; one thread keeps them off the event loop
+        # without tying up the default executor
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="identity-index")
+        self.hits = 0
+        self.misses = 0
+        self.merges = 0
+
+    async def run(self, method: Callable, *args) -> Any:
+        """Call one of the index's methods on its thread, e.g. ``await identity_index.run(identity_index.record, ...)``."""
+        return await asyncio.get_running_loop().run_in_executor(self._executor, functools.partial(method, *args))
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            if self.path != ":memory:":
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def _identities(self, customer: Customer) -> Dict[str, str]:
+        identities = {}
+        email = normalize_email(customer.email)
+        if email:
+            identities["email"] = email
+        phone = normalize_phone(customer.phone)
+        if phone:
+            identities["phone"] = phone
+        return identities
+
+    def record(self, provider_key: str, customer: Customer) -> Optional[str]:
+        """
+        Index a customer record seen in a provider.
+
+        Records sharing an e-mail address, phone number or record ID get the
+        same customer key; a record linking two known keys merges them.
+
+        Args:
+            provider_key: Provider the record came from
+            customer: Customer record
+
+        Returns:
+            The customer's unified key
+        """
+        if not customer.customer_id:
+            return None
+        identities = self._identities(customer)
+
+        with self._lock:
+            conn = self._connection()
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                keys = []
+                row = conn.execute(
+                    "SELECT customer_key FROM provider_records WHERE provider_key = ? AND external_id = ?",
+                    (provider_key, customer.customer_id)
+                ).fetchone()
+                if row:
+                    keys.append(row[0])
+                for identity_type, value in identities.items():
+                    row = conn.execute(
+                        "SELECT customer_key FROM customer_identities WHERE identity_type = ? AND identity_value = ?",
+                        (identity_type, value)
+                    ).fetchone()
+                    if row and row[0] not in keys:
+                        keys.append(row[0])
+
+                customer_key = keys[0] if keys else uuid.uuid4().hex
+                for other_key in keys[1:]:
+                    conn.execute(
+                        "UPDATE customer_identities SET customer_key = ? WHERE customer_key = ?",
+                        (customer_key, other_key)
+                    )
+                    conn.execute(
+                        "UPDATE provider_records SET customer_key = ? WHERE customer_key = ?",
+                        (customer_key, other_key)
+                    )
+                    self.merges += 1
+
+                conn.executemany(
+                    "INSERT OR REPLACE INTO customer_identities (identity_type, identity_value, customer_key) "
+                    "VALUES (?, ?, ?)",
+                    [(identity_type, value, customer_key) for identity_type, value in identities.items()]
+                )
+                conn.execute(
+                    "INSERT OR REPLACE INTO provider_records (provider_key, external_id, customer_key, updated_at) "
+                    "VALUES (?, ?, ?, ?)",
+                    (provider_key, customer.customer_id, customer_key, time.time())
+                )
+                conn.execute("COMMIT")
+                return customer_key
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def record_many(self, provider_key: str, customers: List[Customer]) -> List[Optional[str]]:
+        """Index several records of one provider; returns their customer keys."""
+        return [self.record(provider_key, customer) for customer in customers]
+
+    def resolve(
+        self,
+        identifier: str,
+        identifier_type: str = "id",
+        provider_key: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Find the providers holding a customer.
+
+        Args:
+            identifier: E-mail address, phone number or provider record ID
+            identifier_type: "email", "phone" or "id"
+            provider_key: For "id", the provider the ID belongs to; required, as
+                different providers may use the same record IDs for different people
+
+        Returns:
+            Dict with ``customer_key`` and ``records`` (provider key -> record
+            ID, most recently seen first), or None if the customer is not indexed
+        """
+        with self._lock:
+            conn = self._connection()
+            row = None
+            if identifier_type in ("email", "phone"):
+                value = normalize_email(identifier) if identifier_type == "email" else normalize_phone(identifier)
+                if value:
+                    row = conn.execute(
+                        "SELECT customer_key FROM customer_identities WHERE identity_type = ? AND identity_value = ?",
+                        (identifier_type, value)
+                    ).fetchone()
+            elif identifier_type == "id" and provider_key:
+                row = conn.execute(
+                    "SELECT customer_key FROM provider_records WHERE provider_key = ? AND external_id = ?",
+                    (provider_key, identifier)
+                ).fetchone()
+
+            if not row:
+                self.misses += 1
+                return None
+            self.hits += 1
+            records = conn.execute(
+                "SELECT provider_key, external_id FROM provider_records WHERE customer_key = ? "
+                "ORDER BY updated_at DESC",
+                (row[0],)
+            ).fetchall()
+            return {"customer_key": row[0], "records": dict(records)}
+
+    def forget(self, provider_key: str, external_id: str):
+        """Drop a provider record that was deleted or no longer exists."""
+        with self._lock:
+            self._connection().execute(
+                "DELETE FROM provider_records WHERE provider_key = ? AND external_id = ?",
+                (provider_key, external_id)
+            )
+
+    def clear(self):
+        """Drop all entries."""
+        with self._lock:
+            conn = self._connection()
+            conn.execute("DELETE FROM customer_identities")
+            conn.execute("DELETE FROM provider_records")
+
+    def stats(self) -> Dict[str, Any]:
+        """Index size and resolution counters."""
+        with self._lock:
+            conn = self._connection()
+            return {
+                "customers": conn.execute("SELECT COUNT(DISTINCT customer_key) FROM provider_records").fetchone()[0],
+                "provider_records": conn.execute("SELECT COUNT(*) FROM provider_records").fetchone()[0],
+                "hits": self.hits,
+                "misses": self.misses,
+                "merges": self.merges
+            }
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+identity_index = IdentityIndex()
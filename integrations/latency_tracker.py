@@ -0,0 +1,75 @@
+"""Rolling latency samples per data provider.
+
+Data managers are created per request, so samples are kept in a module-level
+tracker keyed by provider identity. The hedged customer lookup reads the
+primary provider's latency percentile from here to decide when to start
+asking the other providers.
+"""
+
+import threading
+from collections import deque
+from typing import Deque, Dict, Any, Optional
+
+# Samples kept per provider
+LATENCY_WINDOW = 256
+
+# Samples needed before a percentile is trusted
+MIN_SAMPLES = 20
+
+
+def _percentile(samples: list, q: float) -> float:
+    """Nearest-rank percentile of sorted samples."""
+    return samples[min(len(samples) - 1, max(0, int(round(q * len(samples))) - 1))]
+
+
+class LatencyTracker:
+    """Sliding window of call latencies (seconds) per provider."""
+
+    def __init__(self, window: int = LATENCY_WINDOW, min_samples: int = MIN_SAMPLES):
+        self.window = window
+        self.min_samples = min_samples
+        self._samples: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, provider_key: str, seconds: float):
+        """Add a latency sample."""
+        with self._lock:
+            samples = self._samples.get(provider_key)
+            if samples is None:
+                samples = self._samples[provider_key] = deque(maxlen=self.window)
+            samples.append(seconds)
+
+    def percentile(self, provider_key: str, q: float) -> Optional[float]:
+        """
+        Latency percentile for a provider.
+
+        Args:
+            provider_key: Provider identity
+            q: Percentile as a fraction, e.g. 0.95
+
+        Returns:
+            Latency in seconds, or None with fewer than ``min_samples`` samples
+        """
+        with self._lock:
+            samples = sorted(self._samples.get(provider_key, ()))
+        if len(samples) < self.min_samples:
+            return None
+        return _percentile(samples, q)
+
+    def stats(self) -> Dict[str, Any]:
+        """Sample count and p50/p95/p99 per provider, in milliseconds."""
+        stats = {}
+        for provider_key in list(self._samples):
+            with self._lock:
+                samples = sorted(self._samples[provider_key])
+            if samples:
+                stats[provider_key] = {
+                    "samples": len(samples),
+                    "p50_ms": round(_percentile(samples, 0.5) * 1000, 1),
+                    "p95_ms": round(_percentile(samples, 0.95) * 1000, 1),
+                    "p99_ms": round(_percentile(samples, 0.99) * 1000, 1)
+                }
+        return stats
+
+
+provider_latency = LatencyTracker()
@@ -0,0 +1,117 @@
+"""Shared OAuth access token cache for API providers.
+
+Tokens are kept per credential set, not per provider instance, since data
+managers (and their providers) are created per request. Only one token
+request per credential set is in flight at a time: concurrent callers that
+find the token missing or expired wait for that request instead of starting
+their own. Once a token is within ``oauth_refresh_margin_seconds`` of
+expiry, the next caller gets the current token and a refresh starts in the
+background, so token requests stay out of request latency in steady state.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Dict, Any, Optional
+
+from config import config
+
+logger = logging.getLogger(__name__)
+
+# Coroutine function performing the token request; returns the token response
+TokenFetcher = Callable[[], Awaitable[Dict[str, Any]]]
+
+
+class TokenManager:
+    """Single-flight, proactively refreshed OAuth tokens keyed by credential set."""
+
+    def __init__(self, refresh_margin: Optional[float] = None):
+        self.refresh_margin = config.oauth_refresh_margin_seconds if refresh_margin is None else refresh_margin
+        # credential key -> {"access_token", "expires_at"}
+        self._tokens: Dict[str, Dict[str, Any]] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._background: Dict[str, asyncio.Task] = {}
+        self.fetches = 0
+        self.background_refreshes = 0
+        self.rejections = 0
+
+    def _is_fresh(self, token: Optional[Dict[str, Any]], margin: float = 0.0) -> bool:
+        return token is not None and time.time() < token["expires_at"] - margin
+
+    async def get_token(self, key: str, fetch: TokenFetcher, default_ttl: float = 3600) -> str:
+        """
+        Get a valid access token for a credential set.
+
+        Args:
+            key: Credential set identity, e.g. instance URL, client ID and user
+            fetch: Performs the token request; its response must contain
+                ``access_token`` and may contain ``expires_in`` (seconds)
+            default_ttl: Token lifetime when the response has no ``expires_in``
+
+        Returns:
+            Access token
+        """
+        token = self._tokens.get(key)
+        if self._is_fresh(token):
+            if not self._is_fresh(token, self.refresh_margin):
+                self._refresh_in_background(key, fetch, default_ttl)
+            return token["access_token"]
+        return await self._refresh(key, fetch, default_ttl)
+
+    async def _refresh(self, key: str, fetch: TokenFetcher, default_ttl: float, margin: float = 0.0) -> str:
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            # Another caller may have refreshed while this one waited
+            token = self._tokens.get(key)
+            if self._is_fresh(token, margin):
+                return token["access_token"]
+
+            self.fetches += 1
+            response = await fetch()
+            expires_in = float(response.get("expires_in") or default_ttl)
+            self._tokens[key] = {
+                "access_token": response["access_token"],
+                "expires_at": time.time() + expires_in
+            }
+            logger.debug(f"Fetched OAuth token for {key}, valid for {expires_in:.0f}s")
+            return response["access_token"]
+
+    def _refresh_in_background(self, key: str, fetch: TokenFetcher, default_ttl: float):
+        task = self._background.get(key)
+        if task is not None and not task.done():
+            return
+
+        async def refresh():
+            try:
+                await self._refresh(key, fetch, default_ttl, margin=self.refresh_margin)
+                self.background_refreshes += 1
+            except Exception as e:
+                # The current token is still valid; the next caller will try again
+                logger.warning(f"Background OAuth token refresh failed for {key}: {str(e)}")
+
+        self._background[key] = asyncio.create_task(refresh())
+
+    def invalidate(self, key: str, access_token: Optional[str] = None):
+        """
+        Drop a token the API rejected.
+
+        Args:
+            key: Credential set identity
+            access_token: The rejected token; a newer token fetched meanwhile is kept
+        """
+        token = self._tokens.get(key)
+        if token is not None and (access_token is None or token["access_token"] == access_token):
+            del self._tokens[key]
+            self.rejections += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Token request counters."""
+        return {
+            "credential_sets": len(self._tokens),
+            "fetches": self.fetches,
+            "background_refreshes": self.background_refreshes,
+            "rejections": self.rejections
+        }
+
+
+oauth_tokens = TokenManager()
@@ -0,0 +1,80 @@
+"""Lazy iteration over paginated provider APIs.
+
+Providers describe their paging protocol with a page fetcher: an async
+function taking a cursor (None for the first page) and returning the page's
+items and the next cursor (None on the last page). ``paginate`` turns that
+into an async iterator of items that fetches the next pages in the
+background while the current one is consumed, keeping at most
+``prefetch`` pages buffered, and stops fetching as soon as the caller stops
+iterating.
+
+Callers that may stop early should close the iterator, e.g. with
+``contextlib.aclosing``, so the background fetch is cancelled promptly.
+"""
+
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Awaitable, Callable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Pages fetched ahead of the consumer
+DEFAULT_PREFETCH_PAGES = 1
+
+PageFetcher = Callable[[Optional[Any]], Awaitable[Tuple[List[Any], Optional[Any]]]]
+
+_DONE = object()
+
+
+async def paginate(
+    fetch_page: PageFetcher,
+    prefetch: int = DEFAULT_PREFETCH_PAGES,
+    limit: Optional[int] = None
+) -> AsyncIterator[Any]:
+    """
+    Iterate over the items of a paginated API.
+
+    Args:
+        fetch_page: Async function mapping a cursor to (items, next cursor)
+        prefetch: Pages buffered ahead of the consumer (at least 1)
+        limit: Stop after this many items
+
+    Yields:
+        Items in page order; errors from ``fetch_page`` are raised here
+    """
+    if limit is not None and limit <= 0:
+        return
+
+    # One slot per prefetched page plus the terminating marker
+    pages: asyncio.Queue = asyncio.Queue(maxsize=max(1, prefetch))
+
+    async def produce():
+        cursor = None
+        try:
+            while True:
+                items, cursor = await fetch_page(cursor)
+                await pages.put(items)
+                if cursor is None or not items:
+                    break
+            await pages.put(_DONE)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            await pages.put(e)
+
+    producer = asyncio.create_task(produce())
+    yielded = 0
+    try:
+        while True:
+            page = await pages.get()
+            if page is _DONE:
+                return
+            if isinstance(page, Exception):
+                raise page
+            for item in page:
+                yield item
+                yielded += 1
+                if limit is not None and yielded >= limit:
+                    return
+    finally:
+        producer.cancel()
@@ -0,0 +1,264 @@
+"""Client-side rate limiting of provider API requests.
+
+Every request made through a provider's pooled HTTP session (see
+``http_client``) first takes a token from that provider's bucket. Buckets
+start from the provider's documented limits and are corrected from the
+quota headers each vendor returns:
+
+- Shopify ``X-Shopify-Shop-Api-Call-Limit`` (leaky bucket fill level)
+- HubSpot ``X-HubSpot-RateLimit-Max/Remaining/Interval-Milliseconds``
+- Zendesk ``X-Rate-Limit`` / ``X-Rate-Limit-Remaining`` (per minute)
+- Salesforce ``Sforce-Limit-Info`` (daily API usage)
+
+Requests have a priority lane. Interactive requests (the default) may use
+the whole bucket; bulk requests, marked with ``bulk_requests()``, wait
+while interactive requests are queued and leave ``rate_limit_bulk_reserve``
+of the bucket to them. Once the daily quota is down to
+``rate_limit_daily_reserve``, bulk requests are refused outright.
+
+429 responses are retried after the ``Retry-After`` delay or a jittered
+exponential backoff, during which the provider's other requests wait too.
+"""
+
+import asyncio
+import logging
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Any, Iterator, Mapping, Optional
+
+from config import config
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+
+RATE_LIMIT_SETTINGS = (
+    "rate_limit_requests_per_second",
+    "rate_limit_burst",
+    "rate_limit_bulk_reserve",
+    "rate_limit_daily_reserve",
+    "rate_limit_max_retries",
+    "rate_limit_backoff_base_seconds",
+    "rate_limit_backoff_max_seconds",
+)
+
+# Priority lane of requests made from the current task
+request_priority: ContextVar[str] = ContextVar("request_priority", default=INTERACTIVE)
+
+
+@contextmanager
+def bulk_requests() -> Iterator[None]:
+    """Send provider requests made inside the block through the bulk lane."""
+    token = request_priority.set(BULK)
+    try:
+        yield
+    finally:
+        request_priority.reset(token)
+
+
+class RateLimitError(Exception):
+    """Raised instead of sending a request the provider's quota cannot afford."""
+    pass
+
+
+def _header_int(headers: Mapping[str, str], name: str) -> Optional[int]:
+    value = headers.get(name)
+    try:
+        return int(float(value)) if value is not None else None
+    except ValueError:
+        return None
+
+
+class RateLimiter:
+    """Token bucket with interactive and bulk lanes for one provider."""
+
+    def __init__(self, name: str, settings: Dict[str, Any]):
+        self.name = name
+        self.rate = float(settings["rate_limit_requests_per_second"])
+        self.capacity = float(settings["rate_limit_burst"])
+        self.bulk_reserve = settings["rate_limit_bulk_reserve"]
+        self.daily_reserve = settings["rate_limit_daily_reserve"]
+        self.max_retries = settings["rate_limit_max_retries"]
+        self.backoff_base = settings["rate_limit_backoff_base_seconds"]
+        self.backoff_max = settings["rate_limit_backoff_max_seconds"]
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._interactive_waiting = 0
+        # Daily quota as (used, limit), for vendors that report one
+        self._daily: Optional[tuple] = None
+        self.throttled = 0
+        self.retries = 0
+        self.refused = 0
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _daily_quota_low(self) -> bool:
+        if self._daily is None:
+            return False
+        used, limit = self._daily
+        return limit > 0 and limit - used <= limit * self.daily_reserve
+
+    async def acquire(self, priority: str = INTERACTIVE):
+        """
+        Wait until a request may be sent.
+
+        Raises:
+            RateLimitError: Bulk request while the daily quota is nearly used up
+        """
+        interactive = priority != BULK
+        if not interactive and self._daily_quota_low():
+            self.refused += 1
+            raise RateLimitError(f"{self.name} daily API quota nearly exhausted; bulk request refused")
+
+        # Bulk requests leave part of the bucket for interactive ones
+        floor = 1.0 if interactive else 1.0 + self.bulk_reserve * self.capacity
+        if interactive:
+            self._interactive_waiting += 1
+        waited = False
+        try:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self._paused_until:
+                    delay = self._paused_until - now
+                elif not interactive and self._interactive_waiting:
+                    delay = 1.0 / self.rate
+                elif self._tokens >= min(floor, self.capacity):
+                    self._tokens -= 1.0
+                    return
+                else:
+                    delay = (min(floor, self.capacity) - self._tokens) / self.rate
+                if not waited:
+                    waited = True
+                    self.throttled += 1
+                await asyncio.sleep(delay)
+        finally:
+            if interactive:
+                self._interactive_waiting -= 1
+
+    def update_from_headers(self, headers: Mapping[str, str]):
+        """Align the bucket with the quota state reported by the vendor."""
+        now = time.monotonic()
+        self._refill(now)
+
+        shopify = headers.get("X-Shopify-Shop-Api-Call-Limit")
+        if shopify and "/" in shopify:
+            used, _, limit = shopify.partition("/")
+            if used.strip().isdigit() and limit.strip().isdigit():
+                self.capacity = float(limit)
+                self._tokens = min(self._tokens, float(int(limit) - int(used)))
+
+        hubspot_max = _header_int(headers, "X-HubSpot-RateLimit-Max")
+        hubspot_interval = _header_int(headers, "X-HubSpot-RateLimit-Interval-Milliseconds")
+        if hubspot_max and hubspot_interval:
+            self.capacity = float(hubspot_max)
+            self.rate = hubspot_max / (hubspot_interval / 1000)
+        remaining = _header_int(headers, "X-HubSpot-RateLimit-Remaining")
+
+        zendesk_limit = _header_int(headers, "X-Rate-Limit")
+        if zendesk_limit:
+            self.rate = zendesk_limit / 60
+        if remaining is None:
+            remaining = _header_int(headers, "X-Rate-Limit-Remaining")
+
+        if remaining is not None:
+            self._tokens = min(self._tokens, float(remaining))
+
+        # Salesforce: "api-usage=25/15000"
+        usage = headers.get("Sforce-Limit-Info")
+        if usage and "api-usage=" in usage:
+            used, _, limit = usage.split("api-usage=", 1)[1].split(",")[0].partition("/")
+            if used.strip().isdigit() and limit.strip().isdigit():
+                self._daily = (int(used), int(limit))
+
+    def backoff(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """
+        Delay before retrying a 429 response.
+
+        Args:
+            attempt: Zero-based retry number
+            retry_after: The response's ``Retry-After`` header, in seconds
+
+        Returns:
+            The vendor's delay if given, else full-jitter exponential backoff
+        """
+        try:
+            if retry_after is not None:
+                return min(float(retry_after), self.backoff_max) + random.uniform(0, self.backoff_base)
+        except ValueError:
+            pass
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def pause(self, seconds: float):
+        """Hold every request to the provider for a while, e.g. after a 429."""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = 0.0
+        self._updated = time.monotonic()
+
+    def stats(self) -> Dict[str, Any]:
+        """Bucket state and throttling counters."""
+        self._refill(time.monotonic())
+        stats = {
+            "requests_per_second": round(self.rate, 3),
+            "burst": self.capacity,
+            "tokens": round(self._tokens, 2),
+            "throttled": self.throttled,
+            "retries": self.retries,
+            "refused": self.refused
+        }
+        if self._daily is not None:
+            stats["daily_used"], stats["daily_limit"] = self._daily
+        return stats
+
+
+_limiters: Dict[str, RateLimiter] = {}
+
+
+def get_rate_limiter(provider_key: str, overrides: Optional[Dict[str, Any]] = None) -> RateLimiter:
+    """
+    Get the rate limiter of a provider, creating it on first use.
+
+    Args:
+        provider_key: Provider identity
+        overrides: Per-provider ``rate_limit_*`` settings; only used when the
+            limiter is created
+    """
+    limiter = _limiters.get(provider_key)
+    if limiter is None:
+        settings = {name: getattr(config, name) for name in RATE_LIMIT_SETTINGS}
+        if overrides:
+            settings.update({name: overrides[name] for name in RATE_LIMIT_SETTINGS if name in overrides})
+        limiter = _limiters[provider_key] = RateLimiter(provider_key, settings)
+    return limiter
+
+
+def rate_limit_middleware(limiter: RateLimiter):
+    """aiohttp client middleware pacing requests through ``limiter`` and retrying 429s."""
+    async def middleware(request, handler):
+        attempt = 0
+        while True:
+            await limiter.acquire(request_priority.get())
+            response = await handler(request)
+            limiter.update_from_headers(response.headers)
+            if response.status != 429 or attempt >= limiter.max_retries:
+                return response
+
+            delay = limiter.backoff(attempt, response.headers.get("Retry-After"))
+            logger.warning(f"{limiter.name} rate limited; retrying in {delay:.2f}s")
+            response.release()
+            limiter.pause(delay)
+            limiter.retries += 1
+            attempt += 1
+
+    return middleware
+
+
+def rate_limiter_stats() -> Dict[str, Any]:
+    """State of every provider's limiter, for health reporting."""
+    return {provider_key: limiter.stats() for provider_key, limiter in list(_limiters.items())}
@@ -0,0 +1,393 @@
+"""Customer change webhooks from CRM and e-commerce providers.
+
+Receivers verify the vendor's signature and queue the events; a pool of
+workers applies them to the customer cache, identity index and replica.
+Supported senders:
+
+- Shopify ``customers/*`` topics, signed with ``X-Shopify-Hmac-Sha256``;
+  the payload carries the whole customer record
+- HubSpot ``contact.*`` subscriptions, signed with ``X-HubSpot-Signature-v3``
+- Zendesk ``zen:event-type:user.*`` event webhooks, signed with
+  ``X-Zendesk-Webhook-Signature``
+- Salesforce outbound messages (SOAP); these carry no signature, so the
+  sending organization is checked and the endpoint URL must carry the
+  shared secret as ``?token=``
+
+The signing secret is the provider's ``webhook_secret`` custom_config
+entry (Salesforce additionally needs ``organization_id``). Events without
+the record (HubSpot, Zendesk, Salesforce) make the worker re-read it.
+
+Each customer is handled by one worker, so its events apply in order.
+Events already queued for a customer are replaced by newer ones instead
+of queueing behind them, and events older than the last one applied are
+skipped. Redelivered events are recognized by the vendor's event ID. The
+queue is bounded; when it is full, webhooks are refused so the vendor
+retries them later.
+"""
+
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import time
+from datetime import datetime
+from typing import Callable, Dict, Any, List, Mapping, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+from xml.etree import ElementTree
+
+from pydantic import BaseModel
+
+from config import config
+from core.base import IntegrationConfig
+from entities.customer import Customer
+from models.business_config import BusinessConfig
+from shared_libraries.ttl_cache import TTLCache
+from .customer_cache import customer_cache
+from .customer_changes import apply_customer_change, apply_customer_deletion
+from .customer_data_manager import CustomerDataManager
+from .rate_limiter import bulk_requests
+
+logger = logging.getLogger(__name__)
+
+UPSERT = "upsert"    # event carries the record
+REFRESH = "refresh"  # record changed; read it from the provider
+DELETE = "delete"
+
+_SALESFORCE_NS = {
+    "soap": "http://schemas.xmlsoap.org/soap/envelope/",
+    "om": "http://soap.sforce.com/2005/09/outbound",
+    "sf": "urn:sobject.enterprise.soap.sforce.com",
+}
+
+SALESFORCE_ACK = (
+    '<?xml version="1.0" encoding="UTF-8"?>'
+    '<soapenv:Envelope xmlns:soapenv="http://schemas.xmlsoap.org/soap/envelope/">'
+    '<soapenv:Body><notificationsResponse xmlns="http://soap.sforce.com/2005/09/outbound">'
+    '<Ack>true</Ack></notificationsResponse></soapenv:Body></soapenv:Envelope>'
+)
+
+
+class WebhookSignatureError(Exception):
+    """Webhook whose signature, timestamp or sender could not be verified."""
+    pass
+
+
+class WebhookQueueFullError(Exception):
+    """Raised when the webhook queue cannot take more events."""
+    pass
+
+
+class WebhookEvent(BaseModel):
+    """One customer change reported by a provider."""
+    provider_name: str
+    customer_id: str
+    action: str
+    event_id: Optional[str] = None
+    occurred_at: Optional[float] = None  # epoch seconds
+    data: Optional[Dict[str, Any]] = None  # provider record, for UPSERT
+
+
+def _hmac_base64(secret: str, message: bytes) -> str:
+    return base64.b64encode(hmac.new(secret.encode(), message, hashlib.sha256).digest()).decode()
+
+
+def _check_signature(expected: str, received: Optional[str]):
+    if not received or not hmac.compare_digest(expected, received):
+        raise WebhookSignatureError("Invalid webhook signature")
+
+
+def _check_timestamp(timestamp: float):
+    if abs(time.time() - timestamp) > config.webhook_signature_tolerance_seconds:
+        raise WebhookSignatureError("Webhook timestamp outside the allowed window")
+
+
+def _parse_time(value: Optional[str]) -> Optional[float]:
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp() if value else None
+    except ValueError:
+        return None
+
+
+def _shopify_events(
+    integration: IntegrationConfig, secret: str, url: str, method: str, headers: Mapping[str, str], body: bytes
+) -> List[WebhookEvent]:
+    _check_signature(_hmac_base64(secret, body), headers.get("X-Shopify-Hmac-Sha256"))
+    topic = headers.get("X-Shopify-Topic", "")
+    if not topic.startswith("customers/"):
+        return []
+    record = json.loads(body)
+    return [WebhookEvent(
+        provider_name=integration.provider_name,
+        customer_id=str(record["id"]),
+        action=DELETE if topic == "customers/delete" else UPSERT,
+        event_id=headers.get("X-Shopify-Webhook-Id"),
+        occurred_at=_parse_time(headers.get("X-Shopify-Triggered-At")) or _parse_time(record.get("updated_at")),
+        data=None if topic == "customers/delete" else record
+    )]
+
+
+def _hubspot_events(
+    integration: IntegrationConfig, secret: str, url: str, method: str, headers: Mapping[str, str], body: bytes
+) -> List[WebhookEvent]:
+    timestamp = headers.get("X-HubSpot-Request-Timestamp", "")
+    if not timestamp.isdigit():
+        raise WebhookSignatureError("Missing webhook timestamp")
+    _check_timestamp(int(timestamp) / 1000)
+    message = method.encode() + unquote(url).encode() + body + timestamp.encode()
+    _check_signature(_hmac_base64(secret, message), headers.get("X-HubSpot-Signature-v3"))
+
+    events = []
+    for event in json.loads(body):
+        subscription = event.get("subscriptionType", "")
+        if not subscription.startswith("contact."):
+            continue
+        events.append(WebhookEvent(
+            provider_name=integration.provider_name,
+            customer_id=str(event["objectId"]),
+            action=DELETE if subscription in ("contact.deletion", "contact.privacyDeletion") else REFRESH,
+            event_id=str(event.get("eventId")) if event.get("eventId") is not None else None,
+            occurred_at=event["occurredAt"] / 1000 if event.get("occurredAt") else None
+        ))
+    return events
+
+
+def _zendesk_events(
+    integration: IntegrationConfig, secret: str, url: str, method: str, headers: Mapping[str, str], body: bytes
+) -> List[WebhookEvent]:
+    timestamp = headers.get("X-Zendesk-Webhook-Signature-Timestamp", "")
+    _check_timestamp(_parse_time(timestamp) or 0)
+    _check_signature(_hmac_base64(secret, timestamp.encode() + body), headers.get("X-Zendesk-Webhook-Signature"))
+
+    event = json.loads(body)
+    event_type = event.get("type", "")
+    if not event_type.startswith("zen:event-type:user."):
+        return []
+    return [WebhookEvent(
+        provider_name=integration.provider_name,
+        customer_id=str(event["detail"]["id"]),
+        action=DELETE if event_type == "zen:event-type:user.deleted" else REFRESH,
+        event_id=event.get("id"),
+        occurred_at=_parse_time(event.get("time"))
+    )]
+
+
+def _salesforce_events(
+    integration: IntegrationConfig, secret: str, url: str, method: str, headers: Mapping[str, str], body: bytes
+) -> List[WebhookEvent]:
+    token = parse_qs(urlsplit(url).query).get("token", [""])[0]
+    _check_signature(secret, token)
+    if b"<!DOCTYPE" in body.upper():
+        raise ValueError("Document type declarations are not accepted")
+
+    notifications = ElementTree.fromstring(body).find("soap:Body/om:notifications", _SALESFORCE_NS)
+    if notifications is None:
+        raise ValueError("Not a Salesforce outbound message")
+    organization_id = notifications.findtext("om:OrganizationId", "", _SALESFORCE_NS)
+    expected_organization = integration.custom_config.get("organization_id", "")
+    # 15- and 18-character forms of an ID share the first 15 characters
+    if not expected_organization or organization_id[:15] != expected_organization[:15]:
+        raise WebhookSignatureError("Outbound message from an unexpected organization")
+
+    events = []
+    for notification in notifications.findall("om:Notification", _SALESFORCE_NS):
+        record_id = notification.findtext("om:sObject/sf:Id", None, _SALESFORCE_NS)
+        if record_id:
+            events.append(WebhookEvent(
+                provider_name=integration.provider_name,
+                customer_id=record_id,
+                action=REFRESH,
+                event_id=notification.findtext("om:Id", None, _SALESFORCE_NS),
+                occurred_at=time.time()
+            ))
+    return events
+
+
+_PARSERS = {
+    "shopify": _shopify_events,
+    "hubspot": _hubspot_events,
+    "zendesk": _zendesk_events,
+    "salesforce": _salesforce_events,
+}
+
+
+def parse_webhook(
+    integration: IntegrationConfig,
+    method: str,
+    url: str,
+    headers: Mapping[str, str],
+    body: bytes
+) -> List[WebhookEvent]:
+    """
+    Verify a provider webhook and extract its customer change events.
+
+    Args:
+        integration: Configuration of the provider the webhook is addressed to
+        method: HTTP method of the request
+        url: Full URL the request was sent to
+        headers: Request headers
+        body: Raw request body
+
+    Returns:
+        Customer change events; empty for events about other objects
+
+    Raises:
+        WebhookSignatureError: The request is not authentic
+        ValueError: Unsupported provider or malformed payload
+    """
+    parser = _PARSERS.get(integration.provider_type)
+    secret = integration.custom_config.get("webhook_secret")
+    if parser is None or not secret:
+        raise ValueError(f"Webhooks are not configured for {integration.provider_name}")
+    try:
+        return parser(integration, secret, url, method, headers, body)
+    except (KeyError, TypeError, AttributeError, json.JSONDecodeError, ElementTree.ParseError) as e:
+        raise ValueError(f"Malformed {integration.provider_type} webhook: {str(e)}")
+
+
+class WebhookProcessor:
+    """Sharded, bounded queue of webhook events with a worker per shard."""
+
+    def __init__(
+        self,
+        get_business_config: Callable[[], Optional[BusinessConfig]],
+        workers: Optional[int] = None,
+        queue_size: Optional[int] = None
+    ):
+        self.get_business_config = get_business_config
+        self.workers = workers or config.webhook_workers
+        queue_size = queue_size or config.webhook_queue_size
+        # Queues hold customer keys; the newest event of each key waits in _pending
+        self._queues: List[asyncio.Queue] = [
+            asyncio.Queue(maxsize=max(1, queue_size // self.workers)) for _ in range(self.workers)
+        ]
+        self._pending: Dict[Tuple[str, str], WebhookEvent] = {}
+        self._seen = TTLCache(maxsize=config.webhook_dedup_max_entries, ttl=config.webhook_dedup_ttl_seconds)
+        self._applied_at = TTLCache(maxsize=config.webhook_dedup_max_entries, ttl=config.webhook_dedup_ttl_seconds)
+        self._tasks: List[asyncio.Task] = []
+        self._data_manager: Optional[CustomerDataManager] = None
+        self.received = 0
+        self.duplicates = 0
+        self.coalesced = 0
+        self.rejected = 0
+        self.stale = 0
+        self.applied = 0
+        self.errors = 0
+
+    def start(self):
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._work(queue)) for queue in self._queues]
+            logger.info(f"Webhook processing started with {self.workers} workers")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+
+    def submit(self, events: List[WebhookEvent]) -> Dict[str, int]:
+        """
+        Queue verified events without waiting for them to be applied.
+
+        Returns:
+            Counts of ``accepted`` and ``duplicate`` events
+
+        Raises:
+            WebhookQueueFullError: The customer's queue is full; events before
+                the failing one were accepted and are recognized if redelivered
+        """
+        self.start()
+        accepted = duplicates = 0
+        for event in events:
+            self.received += 1
+            if event.event_id and self._seen.get((event.provider_name, event.event_id)):
+                self.duplicates += 1
+                duplicates += 1
+                continue
+
+            key = (event.provider_name, event.customer_id)
+            pending = self._pending.get(key)
+            if pending is not None:
+                # Still queued: keep only the newer event
+                if not (pending.occurred_at and event.occurred_at and event.occurred_at < pending.occurred_at):
+                    self._pending[key] = event
+                self.coalesced += 1
+            else:
+                try:
+                    self._queues[hash(key) % self.workers].put_nowait(key)
+                except asyncio.QueueFull:
+                    self.rejected += 1
+                    raise WebhookQueueFullError("Webhook queue is full")
+                self._pending[key] = event
+
+            if event.event_id:
+                self._seen.set((event.provider_name, event.event_id), True)
+            accepted += 1
+        return {"accepted": accepted, "duplicate": duplicates}
+
+    def _manager(self) -> Optional[CustomerDataManager]:
+        business_config = self.get_business_config()
+        if business_config is None:
+            return None
+        if self._data_manager is None or self._data_manager.business_config is not business_config:
+            self._data_manager = CustomerDataManager(business_config)
+        return self._data_manager
+
+    async def _work(self, queue: asyncio.Queue):
+        while True:
+            key = await queue.get()
+            event = self._pending.pop(key, None)
+            if event is None:
+                continue
+            try:
+                await self._apply(key, event)
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Error applying {event.provider_name} webhook for customer {event.customer_id}: {str(e)}")
+                customer_cache.invalidate_customer(Customer(customer_id=event.customer_id))
+
+    async def _apply(self, key: Tuple[str, str], event: WebhookEvent):
+        last_applied = self._applied_at.get(key)
+        if last_applied and event.occurred_at and event.occurred_at < last_applied:
+            self.stale += 1
+            return
+
+        data_manager = self._manager()
+        provider = data_manager.providers.get(event.provider_name) if data_manager else None
+        if provider is None:
+            return
+
+        if event.action == DELETE:
+            await apply_customer_deletion(provider.provider_key, event.customer_id)
+        elif event.data is not None:
+            customer = Customer.from_provider_data(provider.map_fields(event.data), provider.provider_type)
+            await apply_customer_change(
+                provider.provider_key, customer, ttl=provider.config.custom_config.get("cache_ttl_seconds")
+            )
+        else:
+            # Background work; keep clear of interactive lookups' rate limit
+            with bulk_requests():
+                await data_manager.refresh_customer(event.provider_name, event.customer_id)
+
+        if event.occurred_at:
+            self._applied_at.set(key, event.occurred_at)
+        self.applied += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth and event counters."""
+        return {
+            "workers": len(self._tasks),
+            "queued": sum(queue.qsize() for queue in self._queues),
+            "received": self.received,
+            "duplicates": self.duplicates,
+            "coalesced": self.coalesced,
+            "rejected": self.rejected,
+            "stale": self.stale,
+            "applied": self.applied,
+            "errors": self.errors
+        }
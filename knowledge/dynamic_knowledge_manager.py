@@ -8,9 +8,13 @@ import json
 from models.business_config import BusinessConfig
 from entities.customer import Customer
 from integrations.customer_data_manager import CustomerDataManager
+from .retrieval import get_knowledge_retriever
 
 logger = logging.getLogger(__name__)
 
+# Most recent history records considered for customer-specific knowledge
+RECENT_HISTORY_LIMIT = 50
+
 
 class DynamicKnowledgeManager:
     """Manages knowledge base content that adapts to customer context and business data."""
@@ -20,7 +24,6 @@ class DynamicKnowledgeManager:
         self.data_manager = data_manager
         self.static_knowledge = self._load_static_knowledge()
         self.dynamic_templates = self._load_dynamic_templates()
-        self.customer_specific_cache = {}
     
     def _load_static_knowledge(self) -> Dict[str, Any]:
         """Load static knowledge base content."""
@@ -110,6 +113,12 @@ class DynamicKnowledgeManager:
                     "source": "static"
                 })
         
+        # Search the shared knowledge base articles
+        articles, _ = get_knowledge_retriever().search(query, limit=5)
+        for article in articles:
+            article["source"] = "knowledge_base"
+            results.append(article)
+        
         return results
     
     async def _enhance_with_dynamic_content(
@@ -214,9 +223,13 @@ class DynamicKnowledgeManager:
         
         customer_knowledge = []
         
-        # Get customer history from providers
+        # Get recent customer history from providers
         try:
-            history = await self.data_manager.get_customer_history(customer.customer_id)
+            history = [
+                record async for record in self.data_manager.iter_history(
+                    customer.customer_id, limit=RECENT_HISTORY_LIMIT
+                )
+            ]
             
             # Generate knowledge based on history
             if history:
@@ -0,0 +1,226 @@
+"""Offline builder that compiles knowledge articles into a memory-mappable index.
+
+Usage::
+
+    python -m knowledge.index_builder --source data/knowledge_base --output data/knowledge_index.bin
+
+Pass ``--embeddings`` to also precompute article embeddings for vector and
+hybrid retrieval, and ``--embedder module:function`` to build them with
+another embedding function than ``knowledge_embedder``.
+"""
+
+import argparse
+import json
+import logging
+import os
+import struct
+from collections import defaultdict
+from typing import Dict, Any, List, Optional
+
+from config import config
+from .search_index import load_knowledge_documents, document_terms, bm25_length_norm
+from .mmap_index import (
+    MAGIC,
+    FORMAT_VERSION,
+    HEADER_FORMAT,
+    HEADER_SIZE,
+    TERM_ENTRY_FORMAT,
+    encode_varint,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _align(buffer: bytearray, alignment: int = 8):
+    """Pad the buffer to the next alignment boundary."""
+    remainder = len(buffer) % alignment
+    if remainder:
+        buffer.extend(b"\0" * (alignment - remainder))
+
+
+def write_index(documents: List[Dict[str, Any]], output_path: str) -> Dict[str, Any]:
+    """
+    Compile documents into the binary index format and write it atomically.
+
+    Args:
+        documents: Knowledge articles as returned by ``load_knowledge_documents``
+        output_path: Destination file
+
+    Returns:
+        Build statistics
+    """
+    postings: Dict[str, List[tuple]] = defaultdict(list)
+    doc_lengths: List[int] = []
+    category_names: List[str] = []
+    category_ids: Dict[str, int] = {}
+    category_counts: List[int] = []
+    doc_categories: List[int] = []
+
+    for doc_id, document in enumerate(documents):
+        term_frequencies = document_terms(document)
+        doc_lengths.append(sum(term_frequencies.values()))
+        for term, tf in term_frequencies.items():
+            postings[term].append((doc_id, tf))
+
+        category = document.get("category", "general")
+        if category not in category_ids:
+            category_ids[category] = len(category_names)
+            category_names.append(category)
+            category_counts.append(0)
+        category_counts[category_ids[category]] += 1
+        doc_categories.append(category_ids[category])
+
+    doc_count = len(documents)
+    avg_length = (sum(doc_lengths) / doc_count) if doc_count else 0.0
+    terms = sorted(postings, key=lambda term: term.encode("utf-8"))
+
+    body = bytearray(b"\0" * HEADER_SIZE)
+
+    norms_offset = len(body)
+    for length in doc_lengths:
+        body.extend(struct.pack("<f", bm25_length_norm(length, avg_length)))
+    _align(body)
+
+    categories_offset = len(body)
+    for category_id in doc_categories:
+        body.extend(struct.pack("<H", category_id))
+    _align(body)
+
+    # Document store is written last; collect the blobs and their offsets first
+    document_blobs = [
+        json.dumps(document, separators=(",", ":"), default=str).encode("utf-8")
+        for document in documents
+    ]
+    doc_offsets_offset = len(body)
+    position = 0
+    for blob in document_blobs:
+        body.extend(struct.pack("<Q", position))
+        position += len(blob)
+    body.extend(struct.pack("<Q", position))
+    _align(body)
+
+    strings = bytearray()
+    postings_blob = bytearray()
+    term_entries = bytearray()
+    for term in terms:
+        term_bytes = term.encode("utf-8")
+        encoded = bytearray()
+        previous = 0
+        for doc_id, tf in postings[term]:
+            encode_varint(doc_id - previous, encoded)
+            encode_varint(tf, encoded)
+            previous = doc_id
+        term_entries.extend(struct.pack(
+            TERM_ENTRY_FORMAT,
+            len(strings), len(term_bytes), len(postings[term]), len(postings_blob), len(encoded)
+        ))
+        strings.extend(term_bytes)
+        postings_blob.extend(encoded)
+
+    terms_offset = len(body)
+    body.extend(term_entries)
+    _align(body)
+
+    strings_offset = len(body)
+    body.extend(strings)
+    _align(body)
+
+    postings_offset = len(body)
+    body.extend(postings_blob)
+    _align(body)
+
+    category_table_offset = len(body)
+    body.extend(json.dumps({"names": category_names, "counts": category_counts}).encode("utf-8"))
+    _align(body)
+
+    documents_offset = len(body)
+    for blob in document_blobs:
+        body.extend(blob)
+
+    struct.pack_into(
+        HEADER_FORMAT, body, 0,
+        MAGIC, FORMAT_VERSION, doc_count, len(terms), len(category_names), avg_length,
+        norms_offset, categories_offset, doc_offsets_offset, terms_offset,
+        strings_offset, postings_offset, category_table_offset, documents_offset
+    )
+
+    output_dir = os.path.dirname(output_path)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+
+    # Write to a temporary file and rename so running workers never map a partial file
+    temp_path = f"{output_path}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(body)
+    os.replace(temp_path, output_path)
+
+    return {
+        "output": output_path,
+        "documents": doc_count,
+        "terms": len(terms),
+        "categories": len(category_names),
+        "postings_bytes": len(postings_blob),
+        "file_bytes": len(body)
+    }
+
+
+def build_index(
+    source_dir: Optional[str] = None,
+    output_path: Optional[str] = None,
+    embeddings_path: Optional[str] = None,
+    embedder: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Build the compiled knowledge index from a directory of articles.
+
+    Args:
+        source_dir: Knowledge base directory (defaults to ``config.knowledge_base_path``)
+        output_path: Index file (defaults to ``config.knowledge_index_path``)
+        embeddings_path: Optional embeddings file, written in the same document order
+        embedder: Embedding function as "module:function" (defaults to ``knowledge_embedder``)
+
+    Returns:
+        Build statistics
+    """
+    source_dir = source_dir or config.knowledge_base_path
+    output_path = output_path or config.knowledge_index_path
+
+    documents = load_knowledge_documents(source_dir)
+    stats = write_index(documents, output_path)
+
+    if embeddings_path:
+        from .vector_index import (
+            embed_documents, get_embedder_id, load_embedding_function, save_embeddings, set_embedding_function
+        )
+        if embedder:
+            set_embedding_function(load_embedding_function(embedder), embedder)
+        embeddings = embed_documents(documents)
+        save_embeddings(embeddings, embeddings_path)
+        stats["embeddings"] = embeddings_path
+        stats["embedding_dim"] = int(embeddings.shape[1])
+        stats["embedder"] = get_embedder_id()
+
+    logger.info(f"Knowledge index built: {stats}")
+    return stats
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Compile knowledge articles into a memory-mapped index")
+    parser.add_argument("--source", default=config.knowledge_base_path, help="Directory of knowledge JSON files")
+    parser.add_argument("--output", default=config.knowledge_index_path, help="Compiled index file")
+    parser.add_argument(
+        "--embeddings", nargs="?", const=config.knowledge_embeddings_path, default=None,
+        help="Also write article embeddings (optionally to the given path)"
+    )
+    parser.add_argument(
+        "--embedder", default=None,
+        help="Embedding function as module:function (defaults to the knowledge_embedder setting)"
+    )
+    args = parser.parse_args(argv)
+
+    stats = build_index(args.source, args.output, args.embeddings, args.embedder)
+    print(json.dumps(stats, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""Read-only, memory-mapped knowledge index produced by ``knowledge.index_builder``.
+
+File layout (little endian, every section 8-byte aligned)::
+
+    header          HEADER_FORMAT
+    length norms    float32 x doc_count        (precomputed BM25 length norms)
+    doc categories  uint16 x doc_count         (index into the category table)
+    doc offsets     uint64 x (doc_count + 1)   (into the document store)
+    term entries    TERM_ENTRY_FORMAT x term_count, sorted by term bytes
+    term strings    utf-8 term bytes referenced by the term entries
+    postings        varint (doc id delta, term frequency) pairs per term
+    categories      JSON object with category names and document counts
+    documents       compact JSON per document
+
+Every worker process maps the same file, so the operating system keeps a
+single page-cache copy and nothing is parsed up front; only the postings
+of query terms and the documents that make the top results are touched.
+"""
+
+import heapq
+import json
+import logging
+import mmap
+import struct
+from collections import defaultdict
+from typing import Dict, Any, List, Optional, Tuple
+
+from .search_index import tokenize, bm25_idf, bm25_term_score, format_result
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"KBIX"
+FORMAT_VERSION = 1
+
+# magic, version, doc_count, term_count, category_count, avg_length,
+# norms, doc categories, doc offsets, term entries, term strings,
+# postings, categories, documents section offsets
+HEADER_FORMAT = "<4sIIIId8Q"
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+
+# term string offset, term length, document frequency, postings offset, postings length
+TERM_ENTRY_FORMAT = "<IHIQI"
+TERM_ENTRY_SIZE = struct.calcsize(TERM_ENTRY_FORMAT)
+
+
+def encode_varint(value: int, out: bytearray):
+    """Append an unsigned LEB128 varint."""
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def decode_varint(buffer, position: int) -> Tuple[int, int]:
+    """Decode an unsigned LEB128 varint, returning (value, next position)."""
+    result = 0
+    shift = 0
+    while True:
+        byte = buffer[position]
+        position += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, position
+        shift += 7
+
+
+class MappedKnowledgeIndex:
+    """BM25 search over a compiled knowledge index file opened with mmap."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        (
+            magic, version, self.doc_count, self.term_count, category_count,
+            self.avg_length, norms_offset, categories_offset, doc_offsets_offset,
+            terms_offset, strings_offset, postings_offset, category_table_offset,
+            self._documents_offset
+        ) = struct.unpack_from(HEADER_FORMAT, self._mm, 0)
+
+        if magic != MAGIC or version != FORMAT_VERSION:
+            self.close()
+            raise ValueError(f"Unsupported knowledge index file: {path}")
+
+        self._view = view = memoryview(self._mm)
+        self._norms = view[norms_offset:norms_offset + 4 * self.doc_count].cast("f")
+        self._doc_categories = view[categories_offset:categories_offset + 2 * self.doc_count].cast("H")
+        self._doc_offsets = view[doc_offsets_offset:doc_offsets_offset + 8 * (self.doc_count + 1)].cast("Q")
+        self._terms_offset = terms_offset
+        self._strings_offset = strings_offset
+        self._postings_offset = postings_offset
+
+        category_table = bytes(self._mm[category_table_offset:self._documents_offset]).rstrip(b"\0")
+        category_data = json.loads(category_table.decode("utf-8"))
+        self.categories: List[str] = category_data["names"][:category_count]
+        self._category_counts: List[int] = category_data["counts"][:category_count]
+        self._category_ids = {name: i for i, name in enumerate(self.categories)}
+        self._category_documents: Dict[int, frozenset] = {}
+
+        logger.info(f"Opened knowledge index {path}: {self.doc_count} documents, {self.term_count} terms")
+
+    def _term_entry(self, i: int) -> Tuple[int, int, int, int, int]:
+        return struct.unpack_from(TERM_ENTRY_FORMAT, self._mm, self._terms_offset + i * TERM_ENTRY_SIZE)
+
+    def _term_bytes(self, string_offset: int, length: int) -> bytes:
+        start = self._strings_offset + string_offset
+        return self._mm[start:start + length]
+
+    def lookup(self, term: str) -> Optional[Tuple[int, int, int]]:
+        """Binary search the term dictionary, returning (df, postings offset, postings length)."""
+        key = term.encode("utf-8")
+        low, high = 0, self.term_count - 1
+        while low <= high:
+            mid = (low + high) // 2
+            string_offset, length, df, postings_offset, postings_length = self._term_entry(mid)
+            candidate = self._term_bytes(string_offset, length)
+            if candidate == key:
+                return df, postings_offset, postings_length
+            if candidate < key:
+                low = mid + 1
+            else:
+                high = mid - 1
+        return None
+
+    def postings(self, postings_offset: int, postings_length: int):
+        """Yield (doc id, term frequency) pairs from a delta-encoded postings list."""
+        position = self._postings_offset + postings_offset
+        end = position + postings_length
+        doc_id = 0
+        mm = self._mm
+        while position < end:
+            delta, position = decode_varint(mm, position)
+            tf, position = decode_varint(mm, position)
+            doc_id += delta
+            yield doc_id, tf
+
+    def get_document(self, doc_id: int) -> Dict[str, Any]:
+        """Decode a single document from the document store."""
+        start = self._documents_offset + self._doc_offsets[doc_id]
+        end = self._documents_offset + self._doc_offsets[doc_id + 1]
+        return json.loads(self._mm[start:end].decode("utf-8"))
+
+    def category_documents(self, category: str) -> frozenset:
+        """Document ids in a category."""
+        category_id = self._category_ids.get(category)
+        if category_id is None:
+            return frozenset()
+        doc_ids = self._category_documents.get(category_id)
+        if doc_ids is None:
+            doc_ids = frozenset(
+                doc_id for doc_id, doc_category in enumerate(self._doc_categories)
+                if doc_category == category_id
+            )
+            self._category_documents[category_id] = doc_ids
+        return doc_ids
+
+    def score_documents(self, query: str, category: str = "") -> Dict[int, float]:
+        """Score matching documents; same contract as ``KnowledgeSearchIndex.score_documents``."""
+        category_id = None
+        if category:
+            category_id = self._category_ids.get(category)
+            if category_id is None:
+                return {}
+
+        scores: Dict[int, float] = defaultdict(float)
+        for term in set(tokenize(query)):
+            entry = self.lookup(term)
+            if not entry:
+                continue
+            df, postings_offset, postings_length = entry
+            idf = bm25_idf(self.doc_count, df)
+            for doc_id, tf in self.postings(postings_offset, postings_length):
+                if category_id is not None and self._doc_categories[doc_id] != category_id:
+                    continue
+                scores[doc_id] += bm25_term_score(idf, tf, self._norms[doc_id])
+        return scores
+
+    def search(self, query: str, category: str = "", limit: int = 5) -> Tuple[List[Dict[str, Any]], int]:
+        """Search the index; same contract as ``KnowledgeSearchIndex.search``."""
+        scores = self.score_documents(query, category)
+        top = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+        results = [format_result(self.get_document(doc_id), score) for doc_id, score in top]
+        return results, len(scores)
+
+    def category_counts(self) -> Dict[str, int]:
+        """Number of documents per category."""
+        return dict(zip(self.categories, self._category_counts))
+
+    def close(self):
+        """Release the memory map."""
+        for name in ("_norms", "_doc_categories", "_doc_offsets", "_view"):
+            view = getattr(self, name, None)
+            if view is not None:
+                view.release()
+        self._mm.close()
+        self._file.close()
@@ -0,0 +1,229 @@
+"""Knowledge retrieval in keyword, vector or hybrid mode.
+
+Every worker checks the knowledge files (the compiled index, the embeddings
+and, without a compiled index, the article files) at most every
+``knowledge_reload_check_seconds`` and reopens the index and the retriever
+once they changed, e.g. after ``python -m knowledge.index_builder`` ran.
+The reload runs on a background thread, one at a time, and searches keep
+using the old retriever until the new one, embeddings included, is ready.
+Caches of derived answers see the reload as a new ``get_knowledge_version``.
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Dict, Any, List, Optional, Tuple
+
+from config import config
+from .search_index import get_knowledge_index, open_knowledge_index, reload_knowledge_index, format_result
+
+logger = logging.getLogger(__name__)
+
+RETRIEVAL_MODES = ("keyword", "vector", "hybrid")
+
+# Vector candidates fetched per requested result before hybrid fusion
+HYBRID_CANDIDATE_FACTOR = 4
+
+
+class KnowledgeRetriever:
+    """
+    Searches the shared knowledge index.
+
+    ``keyword`` mode is plain BM25. ``vector`` mode ranks by cosine similarity
+    of embeddings. ``hybrid`` mode fuses both: the BM25 score normalised by
+    the best BM25 score for the query, weighted against the cosine similarity
+    by ``hybrid_alpha`` (1.0 = vector only).
+    """
+
+    def __init__(self, keyword_index, vector_index=None, mode: str = "keyword", hybrid_alpha: float = 0.5):
+        self.keyword_index = keyword_index
+        self.vector_index = vector_index
+        self.mode = mode if vector_index is not None else "keyword"
+        self.hybrid_alpha = hybrid_alpha
+
+    def search(self, query: str, category: str = "", limit: int = 5) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Search the knowledge base.
+
+        Args:
+            query: Free text query
+            category: Optional category filter
+            limit: Maximum number of results
+
+        Returns:
+            Tuple of (ranked results, total number of matching documents).
+            A document matches on any query term in keyword mode, on a
+            positive similarity in vector mode (among the probed clusters
+            with an IVF index) and on either in hybrid mode.
+        """
+        if self.mode == "keyword":
+            return self.keyword_index.search(query, category, limit=limit)
+
+        candidates = None
+        if category:
+            candidates = self.keyword_index.category_documents(category)
+            if not candidates:
+                return [], 0
+
+        from .vector_index import embed_texts
+        query_vector = embed_texts([query])[0]
+
+        if self.mode == "vector":
+            results, matches = self.vector_index.search_counted(query_vector, limit, candidates)
+            scored = [(doc_id, score) for doc_id, score in results if score > 0]
+            return self._format(scored), matches
+
+        scored = self._hybrid_scores(query, category, query_vector, limit, candidates)
+        return self._format(scored[:limit]), len(scored)
+
+    def _hybrid_scores(self, query, category, query_vector, limit, candidates) -> List[Tuple[int, float]]:
+        keyword_scores = self.keyword_index.score_documents(query, category)
+        vector_scores = dict(self.vector_index.search(
+            query_vector, limit * HYBRID_CANDIDATE_FACTOR, candidates
+        ))
+
+        # Keyword matches outside the vector top-k still get their exact similarity
+        missing = [doc_id for doc_id in keyword_scores if doc_id not in vector_scores]
+        for doc_id, score in zip(missing, self.vector_index.score(query_vector, missing)):
+            vector_scores[doc_id] = float(score)
+
+        best_keyword = max(keyword_scores.values(), default=0.0) or 1.0
+        alpha = self.hybrid_alpha
+        fused = {}
+        for doc_id, similarity in vector_scores.items():
+            score = alpha * max(similarity, 0.0) + (1 - alpha) * keyword_scores.get(doc_id, 0.0) / best_keyword
+            if score > 0:
+                fused[doc_id] = score
+
+        return sorted(fused.items(), key=lambda item: item[1], reverse=True)
+
+    def _format(self, scored: List[Tuple[int, float]]) -> List[Dict[str, Any]]:
+        return [format_result(self.keyword_index.get_document(doc_id), score) for doc_id, score in scored]
+
+
+_retriever: Optional[KnowledgeRetriever] = None
+# Held while a retriever is opened; serializes reloads
+_retriever_lock = threading.Lock()
+_reload_thread: Optional[threading.Thread] = None
+# Knowledge files as of the open retriever, and when they were last checked
+_files_signature = None
+_files_checked_at = 0.0
+
+
+def _knowledge_files_signature() -> Tuple:
+    """Modification time and size of every file the retriever is built from."""
+    paths = [
+        config.knowledge_index_path,
+        config.knowledge_embeddings_path,
+        f"{config.knowledge_embeddings_path}.meta.json"
+    ]
+    if not os.path.exists(config.knowledge_index_path) and os.path.isdir(config.knowledge_base_path):
+        # Indexed from the articles in memory
+        paths.extend(
+            os.path.join(config.knowledge_base_path, name)
+            for name in sorted(os.listdir(config.knowledge_base_path))
+            if name.endswith(".json")
+        )
+    signature = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            signature.append((path, stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            signature.append((path, None, None))
+    return tuple(signature)
+
+
+def check_knowledge_files() -> bool:
+    """
+    Start reloading the retriever in the background if the knowledge files changed since it was opened.
+
+    Checks at most every ``knowledge_reload_check_seconds`` (0 disables it).
+
+    Returns:
+        True if a reload was started
+    """
+    global _files_checked_at, _reload_thread
+    if _retriever is None or config.knowledge_reload_check_seconds <= 0:
+        return False
+    now = time.monotonic()
+    if now - _files_checked_at < config.knowledge_reload_check_seconds:
+        return False
+    _files_checked_at = now
+    if _reload_thread is not None and _reload_thread.is_alive():
+        return False
+    if _knowledge_files_signature() == _files_signature:
+        return False
+    logger.info("Knowledge files changed; reloading the knowledge index")
+    _reload_thread = threading.Thread(target=_reload_in_background, name="knowledge-reload", daemon=True)
+    _reload_thread.start()
+    return True
+
+
+def _reload_in_background():
+    try:
+        reload_knowledge_retriever()
+    except Exception as e:
+        logger.error(f"Error reloading the knowledge index: {str(e)}")
+
+
+def wait_for_reload(timeout: Optional[float] = None) -> bool:
+    """Wait for a background reload started by ``check_knowledge_files``; returns False on timeout."""
+    thread = _reload_thread
+    if thread is not None:
+        thread.join(timeout)
+        return not thread.is_alive()
+    return True
+
+
+def _open_knowledge_retriever(keyword_index=None) -> KnowledgeRetriever:
+    """Open a retriever in the configured mode over a keyword index (the shared one by default)."""
+    if keyword_index is None:
+        keyword_index = get_knowledge_index()
+    mode = config.knowledge_retrieval_mode
+    if mode not in RETRIEVAL_MODES:
+        logger.error(f"Unknown knowledge retrieval mode {mode!r}, using keyword search")
+        mode = "keyword"
+    if mode == "keyword":
+        return KnowledgeRetriever(keyword_index)
+
+    try:
+        from .vector_index import open_vector_index
+        vector_index = open_vector_index(keyword_index)
+    except Exception as e:
+        logger.error(f"Error opening vector index, using keyword search: {str(e)}")
+        return KnowledgeRetriever(keyword_index)
+
+    return KnowledgeRetriever(keyword_index, vector_index, mode, config.knowledge_hybrid_alpha)
+
+
+def get_knowledge_retriever() -> KnowledgeRetriever:
+    """Get the shared knowledge retriever, opening it on first use."""
+    global _retriever, _files_signature
+    if _retriever is None:
+        with _retriever_lock:
+            if _retriever is None:
+                _files_signature = _knowledge_files_signature()
+                _retriever = _open_knowledge_retriever()
+    else:
+        check_knowledge_files()
+    return _retriever
+
+
+def reload_knowledge_retriever() -> KnowledgeRetriever:
+    """
+    Reopen the keyword index and the retriever, e.g. after rebuilding the index files.
+
+    The shared index and retriever are replaced together once both are
+    open, so searches meanwhile use the old ones.
+    """
+    global _retriever, _files_signature
+    with _retriever_lock:
+        signature = _knowledge_files_signature()
+        keyword_index = open_knowledge_index()
+        retriever = _open_knowledge_retriever(keyword_index)
+        reload_knowledge_index(keyword_index)
+        _retriever = retriever
+        _files_signature = signature
+    return retriever
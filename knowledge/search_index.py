@@ -0,0 +1,342 @@
+"""Inverted-index knowledge base search with BM25 ranking."""
+
+import heapq
+import json
+import logging
+import math
+import os
+import re
+import threading
+from collections import defaultdict
+from typing import Dict, Any, List, Optional, Tuple
+
+from config import config
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Very common words are left out of the index so their long postings lists
+# never have to be walked at query time
+STOPWORDS = frozenset([
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "for",
+    "from", "how", "i", "if", "in", "is", "it", "me", "my", "of", "on", "or",
+    "so", "that", "the", "this", "to", "was", "what", "when", "why", "with",
+    "you", "your"
+])
+
+# BM25 tuning constants
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Term frequency multipliers per article field (a light BM25F weighting)
+FIELD_WEIGHTS = {
+    "keywords": 3,
+    "question": 2,
+    "title": 2,
+    "answer": 1,
+    "solution": 1,
+    "content": 1,
+}
+
+# Built-in articles used when no knowledge base directory is configured
+SEED_KNOWLEDGE_BASE = {
+    "faqs": [
+        {
+            "id": "faq_001",
+            "question": "How do I reset my password?",
+            "answer": "To reset your password, go to the login page and click 'Forgot Password'. Enter your email address and follow the instructions sent to your email.",
+            "category": "account",
+            "keywords": ["password", "reset", "login", "forgot", "access"]
+        },
+        {
+            "id": "faq_002",
+            "question": "Why is my payment failing?",
+            "answer": "Payment failures can occur due to insufficient funds, expired cards, or incorrect billing information. Please check your payment method and try again.",
+            "category": "billing",
+            "keywords": ["payment", "failing", "declined", "billing", "card"]
+        },
+        {
+            "id": "faq_003",
+            "question": "How do I update my profile information?",
+            "answer": "You can update your profile by logging into your account and navigating to 'Account Settings'. From there, you can modify your personal information, contact details, and preferences.",
+            "category": "account",
+            "keywords": ["profile", "update", "information", "settings", "account"]
+        }
+    ],
+    "solutions": [
+        {
+            "id": "sol_001",
+            "title": "Application Crash on Startup",
+            "solution": "1. Clear application cache and temporary files\n2. Restart the application\n3. Update to the latest version\n4. Check system requirements\n5. Disable conflicting software\n6. Contact support if issue persists",
+            "category": "technical",
+            "keywords": ["crash", "startup", "error", "application", "launch"]
+        },
+        {
+            "id": "sol_002",
+            "title": "Slow Performance Issues",
+            "solution": "1. Check available system memory and CPU usage\n2. Close unnecessary applications\n3. Clear browser cache and cookies\n4. Update your browser to the latest version\n5. Disable browser extensions temporarily\n6. Check internet connection speed",
+            "category": "technical",
+            "keywords": ["slow", "performance", "lag", "speed", "loading"]
+        }
+    ]
+}
+
+# Collection names in knowledge base files and the result type they map to
+COLLECTION_TYPES = {
+    "faqs": "faq",
+    "solutions": "solution",
+    "articles": "article",
+}
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase alphanumeric tokens, dropping stopwords."""
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+def document_terms(document: Dict[str, Any]) -> Dict[str, int]:
+    """Get weighted term frequencies for a knowledge article."""
+    term_frequencies: Dict[str, int] = defaultdict(int)
+
+    for field, weight in FIELD_WEIGHTS.items():
+        value = document.get(field)
+        if not value:
+            continue
+        if isinstance(value, list):
+            value = " ".join(str(item) for item in value)
+        for term in tokenize(str(value)):
+            term_frequencies[term] += weight
+
+    return term_frequencies
+
+
+def _collect_documents(data: Any, documents: List[Dict[str, Any]]):
+    """Append articles from a parsed knowledge base file."""
+    if isinstance(data, list):
+        for article in data:
+            article = dict(article)
+            article.setdefault("type", "article")
+            documents.append(article)
+        return
+
+    for collection, doc_type in COLLECTION_TYPES.items():
+        for article in data.get(collection, []):
+            article = dict(article)
+            article.setdefault("type", doc_type)
+            documents.append(article)
+
+
+def load_knowledge_documents(path: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Load knowledge articles from the knowledge base directory.
+
+    Every ``*.json`` file in the directory may contain either a list of
+    articles or an object with ``faqs``, ``solutions`` and ``articles`` lists.
+    Falls back to the built-in seed articles when nothing is found.
+
+    Args:
+        path: Knowledge base directory (defaults to ``config.knowledge_base_path``)
+
+    Returns:
+        List of article dictionaries, each tagged with a ``type``
+    """
+    path = path or config.knowledge_base_path
+    documents: List[Dict[str, Any]] = []
+
+    if os.path.isdir(path):
+        for file_name in sorted(os.listdir(path)):
+            if not file_name.endswith(".json"):
+                continue
+            file_path = os.path.join(path, file_name)
+            try:
+                with open(file_path, "r") as f:
+                    _collect_documents(json.load(f), documents)
+            except Exception as e:
+                logger.error(f"Error loading knowledge file {file_path}: {str(e)}")
+
+    if not documents:
+        logger.info(f"No knowledge articles found in {path}, using seed knowledge base")
+        _collect_documents(SEED_KNOWLEDGE_BASE, documents)
+
+    return documents
+
+
+class KnowledgeSearchIndex:
+    """In-memory inverted index over knowledge articles with BM25 scoring."""
+
+    def __init__(self, documents: List[Dict[str, Any]]):
+        self.documents = documents
+        self.postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        self.category_postings: Dict[str, frozenset] = {}
+        self.idf: Dict[str, float] = {}
+        self.length_norms: List[float] = []
+        self._build()
+
+    def _build(self):
+        """Tokenize all documents and build postings lists."""
+        doc_lengths = []
+        categories: Dict[str, List[int]] = defaultdict(list)
+
+        for doc_id, document in enumerate(self.documents):
+            term_frequencies = document_terms(document)
+            doc_lengths.append(sum(term_frequencies.values()))
+            for term, tf in term_frequencies.items():
+                self.postings[term].append((doc_id, tf))
+            categories[document.get("category", "general")].append(doc_id)
+
+        self.postings = dict(self.postings)
+        self.category_postings = {
+            category: frozenset(doc_ids) for category, doc_ids in categories.items()
+        }
+
+        doc_count = len(self.documents)
+        avg_length = (sum(doc_lengths) / doc_count) if doc_count else 0.0
+        self.idf = {
+            term: bm25_idf(doc_count, len(postings))
+            for term, postings in self.postings.items()
+        }
+        self.length_norms = [
+            bm25_length_norm(length, avg_length) for length in doc_lengths
+        ]
+
+        logger.info(f"Built knowledge index: {doc_count} documents, {len(self.postings)} terms")
+
+    @property
+    def doc_count(self) -> int:
+        return len(self.documents)
+
+    def get_document(self, doc_id: int) -> Dict[str, Any]:
+        """Get an indexed article by document id."""
+        return self.documents[doc_id]
+
+    def category_documents(self, category: str) -> frozenset:
+        """Document ids in a category."""
+        return self.category_postings.get(category, frozenset())
+
+    def score_documents(self, query: str, category: str = "") -> Dict[int, float]:
+        """
+        Score every document matching at least one query term.
+
+        Args:
+            query: Free text query
+            category: Optional category filter
+
+        Returns:
+            Mapping of document id to BM25 score
+        """
+        allowed = None
+        if category:
+            allowed = self.category_postings.get(category)
+            if not allowed:
+                return {}
+
+        scores: Dict[int, float] = defaultdict(float)
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = self.idf[term]
+            for doc_id, tf in postings:
+                if allowed is not None and doc_id not in allowed:
+                    continue
+                scores[doc_id] += bm25_term_score(idf, tf, self.length_norms[doc_id])
+        return scores
+
+    def search(self, query: str, category: str = "", limit: int = 5) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Search the index.
+
+        Args:
+            query: Free text query
+            category: Optional category filter
+            limit: Maximum number of results
+
+        Returns:
+            Tuple of (ranked results, total number of matching documents)
+        """
+        scores = self.score_documents(query, category)
+        top = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+        results = [format_result(self.documents[doc_id], score) for doc_id, score in top]
+        return results, len(scores)
+
+    def category_counts(self) -> Dict[str, int]:
+        """Number of documents per category."""
+        return {category: len(doc_ids) for category, doc_ids in self.category_postings.items()}
+
+
+def bm25_idf(doc_count: int, doc_frequency: int) -> float:
+    """BM25 inverse document frequency (always positive)."""
+    return math.log(1 + (doc_count - doc_frequency + 0.5) / (doc_frequency + 0.5))
+
+
+def bm25_length_norm(doc_length: float, avg_length: float) -> float:
+    """Precomputed BM25 document length normalisation term."""
+    if not avg_length:
+        return BM25_K1
+    return BM25_K1 * (1 - BM25_B + BM25_B * doc_length / avg_length)
+
+
+def bm25_term_score(idf: float, tf: int, length_norm: float) -> float:
+    """BM25 contribution of a single query term for one document."""
+    return idf * tf * (BM25_K1 + 1) / (tf + length_norm)
+
+
+def format_result(document: Dict[str, Any], score: float) -> Dict[str, Any]:
+    """Shape an indexed article as a knowledge search result."""
+    content = {k: v for k, v in document.items() if k != "type"}
+    return {
+        "type": document.get("type", "article"),
+        "content": content,
+        "relevance_score": round(score, 4)
+    }
+
+
+_index = None
+_index_lock = threading.Lock()
+# Bumped whenever the shared index is replaced, so caches of derived answers can tell
+_index_version = 0
+
+
+def open_knowledge_index():
+    """Open the compiled index if one has been built, else index the articles in memory; not shared."""
+    if os.path.exists(config.knowledge_index_path):
+        from .mmap_index import MappedKnowledgeIndex
+        try:
+            return MappedKnowledgeIndex(config.knowledge_index_path)
+        except Exception as e:
+            logger.error(f"Error opening compiled knowledge index {config.knowledge_index_path}: {str(e)}")
+    return KnowledgeSearchIndex(load_knowledge_documents())
+
+
+def get_knowledge_index():
+    """Get the shared knowledge index, opening or building it on first use."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = open_knowledge_index()
+    return _index
+
+
+def reload_knowledge_index(index=None):
+    """
+    Replace the shared knowledge index, e.g. after the index file was rebuilt.
+
+    Args:
+        index: Index opened with ``open_knowledge_index``; reopened from the files if None
+    """
+    global _index, _index_version
+    if index is None:
+        index = open_knowledge_index()
+    # A replaced mapped index is not closed explicitly because in-flight
+    # searches may still use it; its mapping is released on garbage collection.
+    with _index_lock:
+        _index = index
+        _index_version += 1
+    return index
+
+
+def get_knowledge_version() -> int:
+    """Version of the shared knowledge content; changes on every reload."""
+    return _index_version
@@ -0,0 +1,423 @@
+"""Dense vector retrieval over knowledge articles.
+
+Article embeddings are precomputed (see ``python -m knowledge.index_builder
+--embeddings``) and stored as a row-normalised float32 matrix in ``.npy``
+format, which is memory-mapped at load time. Small corpora are searched
+exactly with a blocked matrix-vector product; corpora of at least
+``config.knowledge_ivf_min_documents`` articles use an inverted-file (IVF)
+index that only scores the clusters nearest to the query.
+
+The embedding function is injectable with ``set_embedding_function`` or
+configured as ``knowledge_embedder`` ("module:function"). The default,
+``hashing_embedding``, is a deterministic local stand-in that needs no model
+or network access. The embeddings file records the embedder and dimension
+it was built with (in a ``.meta.json`` file next to it); a file built with
+another embedder or dimension is not used.
+"""
+
+import importlib
+import json
+import logging
+import os
+import zlib
+from typing import Callable, Dict, Any, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from config import config
+from .search_index import tokenize, FIELD_WEIGHTS
+
+logger = logging.getLogger(__name__)
+
+EmbeddingFunction = Callable[[Sequence[str]], np.ndarray]
+
+# Matrix rows scored per block, bounding temporary memory on large mapped matrices
+SCORE_BLOCK_ROWS = 65536
+
+# Training vectors sampled per IVF list when clustering
+IVF_TRAINING_SAMPLES_PER_LIST = 64
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalise each row so dot products are cosine similarities."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _add_feature(features: Dict[int, float], feature: str, weight: float, dim: int):
+    h = zlib.crc32(feature.encode("utf-8"))
+    sign = -1.0 if h & 0x80000000 else 1.0
+    features[h % dim] = features.get(h % dim, 0.0) + sign * weight
+
+
+def hashing_embedding(texts: Sequence[str], dim: Optional[int] = None) -> np.ndarray:
+    """
+    Deterministic local embedding using signed feature hashing.
+
+    Words and their character trigrams are hashed into a fixed number of
+    dimensions, so texts sharing words or word stems ("refund" / "refunds")
+    land close together. It does not know about true synonyms; inject a
+    model-backed function for that.
+
+    Args:
+        texts: Texts to embed
+        dim: Embedding dimension (defaults to ``config.knowledge_embedding_dim``)
+
+    Returns:
+        Row-normalised float32 matrix of shape (len(texts), dim)
+    """
+    dim = dim or config.knowledge_embedding_dim
+    vectors = np.zeros((len(texts), dim), dtype=np.float32)
+
+    for row, text in enumerate(texts):
+        features: Dict[int, float] = {}
+        for token in tokenize(text):
+            _add_feature(features, token, 1.0, dim)
+            padded = f"#{token}#"
+            for i in range(len(padded) - 2):
+                _add_feature(features, padded[i:i + 3], 0.5, dim)
+        if features:
+            vectors[row, list(features.keys())] = list(features.values())
+
+    return normalize_rows(vectors)
+
+
+HASHING_EMBEDDER = "hashing"
+
+_embedding_function: Optional[EmbeddingFunction] = None
+_embedder_id: Optional[str] = None
+
+
+def load_embedding_function(spec: str) -> EmbeddingFunction:
+    """Import an embedding function given as "module:function"."""
+    module_name, _, function_name = spec.partition(":")
+    if not module_name or not function_name:
+        raise ValueError(f"Embedder must be given as 'module:function', got {spec!r}")
+    return getattr(importlib.import_module(module_name), function_name)
+
+
+def set_embedding_function(embedding_function: EmbeddingFunction, embedder_id: Optional[str] = None):
+    """
+    Replace the embedding function used for articles and queries.
+
+    Embeddings already loaded are not recomputed; rebuild the embeddings file
+    and call ``knowledge.retrieval.reload_knowledge_retriever`` afterwards.
+
+    Args:
+        embedding_function: Function mapping texts to an embedding matrix
+        embedder_id: Name recorded with embeddings built by the function
+            (defaults to its module and qualified name)
+    """
+    global _embedding_function, _embedder_id
+    _embedding_function = embedding_function
+    if embedder_id is None:
+        embedder_id = (
+            HASHING_EMBEDDER if embedding_function is hashing_embedding
+            else f"{embedding_function.__module__}:{embedding_function.__qualname__}"
+        )
+    _embedder_id = embedder_id
+
+
+def get_embedding_function() -> EmbeddingFunction:
+    """Get the active embedding function, loading ``knowledge_embedder`` on first use."""
+    if _embedding_function is None:
+        if config.knowledge_embedder:
+            set_embedding_function(load_embedding_function(config.knowledge_embedder), config.knowledge_embedder)
+        else:
+            set_embedding_function(hashing_embedding)
+    return _embedding_function
+
+
+def get_embedder_id() -> str:
+    """Name of the active embedding function, as recorded with embeddings files."""
+    get_embedding_function()
+    return _embedder_id
+
+
+def embed_texts(texts: Sequence[str]) -> np.ndarray:
+    """Embed texts with the active embedding function and normalise the result."""
+    return normalize_rows(get_embedding_function()(list(texts)))
+
+
+def document_text(document: Dict[str, Any]) -> str:
+    """Text of the indexed fields of an article, used as embedding input."""
+    parts = []
+    for field in FIELD_WEIGHTS:
+        value = document.get(field)
+        if not value:
+            continue
+        if isinstance(value, list):
+            value = " ".join(str(item) for item in value)
+        parts.append(str(value))
+    return "\n".join(parts)
+
+
+def embed_documents(documents: Sequence[Dict[str, Any]], batch_size: int = 256) -> np.ndarray:
+    """Embed articles in batches, returning a float32 matrix in document order."""
+    dim = None
+    batches = []
+    for start in range(0, len(documents), batch_size):
+        batch = embed_texts([document_text(doc) for doc in documents[start:start + batch_size]])
+        dim = batch.shape[1]
+        batches.append(batch)
+    if not batches:
+        return np.zeros((0, dim or config.knowledge_embedding_dim), dtype=np.float32)
+    return np.vstack(batches)
+
+
+def _metadata_path(path: str) -> str:
+    return f"{path}.meta.json"
+
+
+def save_embeddings(embeddings: np.ndarray, path: str, embedder_id: Optional[str] = None):
+    """
+    Write an embedding matrix atomically in ``.npy`` format, with its metadata.
+
+    Args:
+        embeddings: Matrix in document order
+        path: Destination ``.npy`` file
+        embedder_id: Embedder the matrix was built with (defaults to the active one)
+    """
+    output_dir = os.path.dirname(path)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    metadata = {
+        "rows": int(embeddings.shape[0]),
+        "dim": int(embeddings.shape[1]),
+        "embedder": embedder_id or get_embedder_id()
+    }
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "wb") as f:
+        np.save(f, np.ascontiguousarray(embeddings, dtype=np.float32))
+    with open(f"{_metadata_path(path)}.tmp", "w") as f:
+        json.dump(metadata, f)
+    # A worker reading between the two renames sees mismatched metadata and re-embeds
+    os.replace(temp_path, path)
+    os.replace(f"{_metadata_path(path)}.tmp", _metadata_path(path))
+
+
+def load_embeddings(path: str) -> np.ndarray:
+    """Memory-map an embedding matrix written by ``save_embeddings``."""
+    return np.load(path, mmap_mode="r")
+
+
+def load_embeddings_metadata(path: str) -> Dict[str, Any]:
+    """Rows, dimension and embedder of an embeddings file; files without metadata were built by the hashing embedder."""
+    try:
+        with open(_metadata_path(path)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"embedder": HASHING_EMBEDDER}
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Positions of the k highest scores, best first."""
+    if k <= 0 or not len(scores):
+        return np.zeros(0, dtype=np.int64)
+    if k < len(scores):
+        positions = np.argpartition(-scores, k - 1)[:k]
+    else:
+        positions = np.arange(len(scores))
+    return positions[np.argsort(-scores[positions], kind="stable")]
+
+
+class BruteForceVectorIndex:
+    """Exact top-k cosine search over an embedding matrix."""
+
+    def __init__(self, embeddings: np.ndarray):
+        self.embeddings = embeddings
+
+    @property
+    def doc_count(self) -> int:
+        return self.embeddings.shape[0]
+
+    def score(self, query_vector: np.ndarray, doc_ids: Sequence[int]) -> np.ndarray:
+        """Cosine similarity of the query to specific documents."""
+        if not len(doc_ids):
+            return np.zeros(0, dtype=np.float32)
+        return self.embeddings[np.asarray(doc_ids, dtype=np.int64)] @ query_vector
+
+    def search(self, query_vector: np.ndarray, k: int, candidates: Optional[Sequence[int]] = None) -> List[Tuple[int, float]]:
+        """
+        Find the nearest documents to a query vector.
+
+        Args:
+            query_vector: Normalised query embedding
+            k: Number of results
+            candidates: Optional document ids to restrict the search to
+
+        Returns:
+            List of (document id, cosine similarity), best first
+        """
+        return self.search_counted(query_vector, k, candidates)[0]
+
+    def search_counted(
+        self,
+        query_vector: np.ndarray,
+        k: int,
+        candidates: Optional[Sequence[int]] = None
+    ) -> Tuple[List[Tuple[int, float]], int]:
+        """Like ``search``, also returning the number of scored documents with a positive similarity."""
+        if candidates is not None:
+            return self._search_candidates_counted(query_vector, np.fromiter(candidates, dtype=np.int64), k)
+        results, matches = self._search_blocks(query_vector[np.newaxis, :], k)
+        return results[0], int(matches[0])
+
+    def _search_candidates_counted(self, query_vector: np.ndarray, doc_ids: np.ndarray, k: int):
+        doc_ids = np.sort(doc_ids)
+        scores = self.score(query_vector, doc_ids)
+        return [(int(doc_ids[i]), float(scores[i])) for i in _top_k(scores, k)], int(np.count_nonzero(scores > 0))
+
+    def search_batch(self, query_vectors: np.ndarray, k: int) -> List[List[Tuple[int, float]]]:
+        """Exact top-k for several queries at once, scoring the matrix block by block."""
+        return self._search_blocks(query_vectors, k)[0]
+
+    def _search_blocks(self, query_vectors: np.ndarray, k: int) -> Tuple[List[List[Tuple[int, float]]], np.ndarray]:
+        query_count = query_vectors.shape[0]
+        best_ids = np.zeros((query_count, 0), dtype=np.int64)
+        best_scores = np.zeros((query_count, 0), dtype=np.float32)
+        matches = np.zeros(query_count, dtype=np.int64)
+
+        for start in range(0, self.doc_count, SCORE_BLOCK_ROWS):
+            block = np.asarray(self.embeddings[start:start + SCORE_BLOCK_ROWS])
+            block_scores = query_vectors @ block.T
+            matches += np.count_nonzero(block_scores > 0, axis=1)
+            block_ids = np.broadcast_to(np.arange(start, start + block.shape[0]), block_scores.shape)
+
+            candidate_scores = np.concatenate([best_scores, block_scores], axis=1)
+            candidate_ids = np.concatenate([best_ids, block_ids], axis=1)
+            if candidate_scores.shape[1] > k:
+                keep = np.argpartition(-candidate_scores, k - 1, axis=1)[:, :k]
+                candidate_scores = np.take_along_axis(candidate_scores, keep, axis=1)
+                candidate_ids = np.take_along_axis(candidate_ids, keep, axis=1)
+            best_scores, best_ids = candidate_scores, candidate_ids
+
+        results = []
+        for row in range(query_count):
+            order = np.argsort(-best_scores[row], kind="stable")
+            results.append([(int(best_ids[row, i]), float(best_scores[row, i])) for i in order])
+        return results, matches
+
+
+def _assign_to_centroids(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Nearest centroid for each vector."""
+    assignments = np.empty(vectors.shape[0], dtype=np.int64)
+    for start in range(0, vectors.shape[0], SCORE_BLOCK_ROWS):
+        block = np.asarray(vectors[start:start + SCORE_BLOCK_ROWS])
+        assignments[start:start + block.shape[0]] = np.argmax(block @ centroids.T, axis=1)
+    return assignments
+
+
+def train_centroids(embeddings: np.ndarray, n_lists: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """Spherical k-means on a sample of the embeddings."""
+    rng = np.random.default_rng(seed)
+    sample_size = min(embeddings.shape[0], n_lists * IVF_TRAINING_SAMPLES_PER_LIST)
+    sample_ids = np.sort(rng.choice(embeddings.shape[0], sample_size, replace=False))
+    sample = np.asarray(embeddings[sample_ids], dtype=np.float32)
+
+    centroids = sample[rng.choice(sample_size, n_lists, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = _assign_to_centroids(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, sample)
+        counts = np.bincount(assignments, minlength=n_lists)
+        empty = counts == 0
+        if empty.any():
+            sums[empty] = sample[rng.choice(sample_size, int(empty.sum()))]
+        centroids = normalize_rows(sums)
+    return centroids
+
+
+class IVFVectorIndex(BruteForceVectorIndex):
+    """
+    Approximate cosine search with an inverted-file index.
+
+    Documents are clustered around ``n_lists`` centroids; a query only scores
+    the documents in its ``nprobe`` nearest clusters.
+    """
+
+    def __init__(self, embeddings: np.ndarray, n_lists: int = 0, nprobe: int = 8, seed: int = 0):
+        super().__init__(embeddings)
+        n_lists = n_lists or int(np.sqrt(self.doc_count))
+        self.n_lists = max(1, min(n_lists, self.doc_count))
+        self.nprobe = max(1, min(nprobe, self.n_lists))
+
+        self.centroids = train_centroids(embeddings, self.n_lists, seed=seed)
+        assignments = _assign_to_centroids(embeddings, self.centroids)
+        self.list_doc_ids = np.argsort(assignments, kind="stable")
+        self.list_offsets = np.concatenate([
+            [0], np.cumsum(np.bincount(assignments, minlength=self.n_lists))
+        ])
+
+        logger.info(f"Built IVF index: {self.doc_count} documents, {self.n_lists} lists, nprobe={self.nprobe}")
+
+    def _probe(self, query_vector: np.ndarray) -> np.ndarray:
+        lists = _top_k(self.centroids @ query_vector, self.nprobe)
+        return np.concatenate([
+            self.list_doc_ids[self.list_offsets[i]:self.list_offsets[i + 1]] for i in lists
+        ])
+
+    def search(self, query_vector: np.ndarray, k: int, candidates: Optional[Sequence[int]] = None) -> List[Tuple[int, float]]:
+        """Approximate top-k; same contract as ``BruteForceVectorIndex.search``."""
+        return self.search_counted(query_vector, k, candidates)[0]
+
+    def search_counted(
+        self,
+        query_vector: np.ndarray,
+        k: int,
+        candidates: Optional[Sequence[int]] = None
+    ) -> Tuple[List[Tuple[int, float]], int]:
+        """Approximate top-k; matches are counted in the probed clusters only."""
+        doc_ids = self._probe(query_vector)
+        if candidates is not None:
+            doc_ids = doc_ids[np.isin(doc_ids, np.fromiter(candidates, dtype=np.int64))]
+        return self._search_candidates_counted(query_vector, doc_ids, k)
+
+    def search_batch(self, query_vectors: np.ndarray, k: int) -> List[List[Tuple[int, float]]]:
+        """Approximate top-k for several queries."""
+        return [self.search(query_vector, k) for query_vector in query_vectors]
+
+
+def open_vector_index(keyword_index) -> BruteForceVectorIndex:
+    """
+    Open the vector index aligned with a keyword index.
+
+    Uses the precomputed embeddings file when its row count matches the
+    keyword index and it was built with the active embedder and dimension,
+    otherwise embeds the articles in memory.
+
+    Args:
+        keyword_index: The shared keyword index (document ids must line up)
+
+    Returns:
+        A brute-force or IVF vector index
+    """
+    embeddings = None
+    path = config.knowledge_embeddings_path
+    if os.path.exists(path):
+        embeddings = load_embeddings(path)
+        metadata = load_embeddings_metadata(path)
+        embedder = get_embedder_id()
+        dim = embed_texts(["dimension probe"]).shape[1]
+        if embeddings.shape[0] != keyword_index.doc_count:
+            logger.warning(
+                f"Embeddings file {path} has {embeddings.shape[0]} rows for "
+                f"{keyword_index.doc_count} documents; re-embedding in memory"
+            )
+            embeddings = None
+        elif metadata.get("embedder") != embedder or embeddings.shape[1] != dim:
+            logger.warning(
+                f"Embeddings file {path} was built by {metadata.get('embedder')} with dimension "
+                f"{embeddings.shape[1]}, active embedder {embedder} has dimension {dim}; re-embedding in memory"
+            )
+            embeddings = None
+
+    if embeddings is None:
+        documents = [keyword_index.get_document(doc_id) for doc_id in range(keyword_index.doc_count)]
+        embeddings = embed_documents(documents)
+
+    if embeddings.shape[0] >= config.knowledge_ivf_min_documents:
+        return IVFVectorIndex(embeddings, config.knowledge_ivf_lists, config.knowledge_ivf_nprobe)
+    return BruteForceVectorIndex(embeddings)
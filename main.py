@@ -1,4 +1,5 @@
 """Main entry point for the Customer Service Ecosystem."""
+from contextlib import asynccontextmanager
 from pathlib import Path
 
 import uvicorn
@@ -8,18 +9,41 @@ from fastapi.staticfiles import StaticFiles
 from fastapi.responses import RedirectResponse
 from fastapi.templating import Jinja2Templates
 
-from web.admin_interface import admin_app
+from web.admin_interface import admin_app, config_manager
 from web.customer_interface import customer_app
 from web.agent_interface import agent_app
-from web.api_interface import api_app as enhanced_api_app
+from web.api_interface import api_app as enhanced_api_app, webhook_processor
 from web.middleware import ErrorHandlingMiddleware, RequestLoggingMiddleware
+from integrations.http_client import close_http_sessions
+from integrations.database.postgres_provider import close_postgres_pools
+from integrations.customer_sync import CustomerSyncService
+from agents.customer_service_agents import session_service, session_sweeper
 from config import config
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Run the customer sync, webhook and session expiry workers in the background; on shutdown store buffered session events and release pooled connections."""
+    customer_sync = CustomerSyncService(config_manager.get_business_config)
+    if config.customer_sync_enabled:
+        customer_sync.start()
+    webhook_processor.start()
+    session_sweeper.start()
+    yield
+    await session_sweeper.stop()
+    await webhook_processor.stop()
+    await customer_sync.stop()
+    await close_http_sessions()
+    await close_postgres_pools()
+    await session_service.close()
+
+
 # Create main application
 app = FastAPI(
     title="Customer Service Ecosystem",
     description="Complete customer service system with admin, customer, and agent interfaces",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Add CORS middleware
@@ -58,6 +58,17 @@ class BusinessConfig(BaseModel):
     escalation_threshold: int = 3
     auto_escalate_keywords: List[str] = Field(default_factory=list)
     
+    # Customer lookup across data providers
+    customer_lookup_mode: str = "sequential"  # sequential, concurrent or hedged
+    provider_timeout_seconds: float = 5.0
+    adaptive_timeouts: bool = True  # shrink timeouts to a multiple of observed latency
+    adaptive_timeout_percentile: float = 0.99
+    adaptive_timeout_multiplier: float = 2.0
+    adaptive_timeout_min_seconds: float = 0.5
+    hedge_percentile: float = 0.95
+    hedge_default_delay_seconds: float = 0.5
+    replica_max_staleness_seconds: Optional[float] = None  # serve lookups from the synced replica when fresher
+    
     # Integration settings
     webhook_urls: Dict[str, str] = Field(default_factory=dict)
     notification_settings: Dict[str, Any] = Field(default_factory=dict)
@@ -1,168 +1,198 @@
-"""Callback functions for the ADK customer service ecosystem."""
+"""Callback functions for the ADK customer service ecosystem.
+
+Registered on every agent in ``agents.customer_service_agents``. ADK calls
+them with keyword arguments, so parameter names follow its callback
+signatures. They record analytics in session state and leave agent output
+and tool results unchanged, except that a failing tool returns an error
+result.
+"""
 
 import logging
-import asyncio
 import time
 from typing import Any, Dict
-from google.adk.agents.invocation_context import InvocationContext
-from google.adk.events import Event
+
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.tools.base_tool import BaseTool
+from google.adk.tools.tool_context import ToolContext
+
+from .session_history import append_history, compact_history, compact_value
 
 logger = logging.getLogger(__name__)
 
-async def rate_limit_callback(context: InvocationContext) -> None:
+# Tool whose result marks an escalation, and the next action that marks a resolution
+ESCALATION_TOOL = "create_escalation_summary"
+NEXT_ACTION_TOOL = "determine_next_action"
+RESOLVED_ACTION = "close_case"
+
+# Result the model gets from a tool that raised
+TOOL_ERROR_MESSAGE = "The tool is temporarily unavailable. Please continue without it or try again later."
+
+
+async def before_agent(callback_context: CallbackContext) -> None:
     """
-    Rate limiting callback to prevent excessive API calls.
-    
+    Callback executed before agent processing.
+
     Args:
-        context: The invocation context
+        callback_context: Context of the agent about to run
     """
-    # Simple rate limiting - add delay between requests
-    await asyncio.sleep(0.1)
-    logger.debug("Rate limit callback executed")
+    agent_name = callback_context.agent_name
+    state = callback_context.state
+    logger.info(f"Starting agent: {agent_name}")
+
+    # Save agent start time for performance tracking; replaced, not changed in place, so it is stored
+    timings = dict(state.get('agent_timings') or {})
+    timings[agent_name] = {'start_time': time.time()}
+    state['agent_timings'] = timings
+
+    # Track agent execution order; also caps histories stored before they were bounded
+    compact_history(state, callback_context.session.id)
+    append_history(state, 'agent_history', agent_name, callback_context.session.id)
 
-async def before_agent(context: InvocationContext) -> None:
+async def after_agent(callback_context: CallbackContext) -> None:
     """
-    Callback executed before agent processing.
-    
+    Callback executed after agent processing.
+
     Args:
-        context: The invocation context
+        callback_context: Context of the agent that ran
     """
-    agent_name = getattr(context, 'agent_name', 'unknown')
-    logger.info(f"Starting agent: {agent_name}")
-    
-    # Save agent start time for performance tracking
-    if not hasattr(context.session.state, 'agent_timings'):
-        context.session.state['agent_timings'] = {}
-    
-    context.session.state['agent_timings'][agent_name] = {
-        'start_time': time.time()
-    }
-    
-    # Track agent execution order
-    if 'agent_history' not in context.session.state:
-        context.session.state['agent_history'] = []
-    
-    context.session.state['agent_history'].append(agent_name)
-
-async def before_tool(context: InvocationContext, tool_name: str, tool_args: Dict[str, Any]) -> None:
+    agent_name = callback_context.agent_name
+    state = callback_context.state
+    logger.info(f"Completed agent: {agent_name}")
+
+    # Calculate agent execution time
+    timings = state.get('agent_timings') or {}
+    if agent_name in timings:
+        execution_time = time.time() - timings[agent_name]['start_time']
+        timings = dict(timings)
+        timings[agent_name] = dict(timings[agent_name], execution_time=execution_time)
+        state['agent_timings'] = timings
+        logger.info(f"Agent {agent_name} execution time: {execution_time:.2f} seconds")
+
+async def before_tool(tool: BaseTool, args: Dict[str, Any], tool_context: ToolContext) -> None:
     """
     Callback executed before tool execution.
-    
+
     Args:
-        context: The invocation context
-        tool_name: Name of the tool being executed
-        tool_args: Arguments passed to the tool
+        tool: Tool being executed
+        args: Arguments passed to the tool
+        tool_context: Context of the tool call
     """
-    logger.info(f"Executing tool: {tool_name} with args: {tool_args}")
-    
+    logger.info(f"Executing tool: {tool.name} with args: {args}")
+
     # Track tool usage for analytics
-    if 'tool_usage' not in context.session.state:
-        context.session.state['tool_usage'] = []
-    
-    context.session.state['tool_usage'].append({
-        'tool_name': tool_name,
+    append_history(tool_context.state, 'tool_usage', {
+        'tool_name': tool.name,
         'timestamp': time.time(),
-        'args': tool_args
-    })
+        'args': compact_value(args)
+    }, tool_context.session.id)
+
+def _finish_tool_record(tool_context: ToolContext, tool_name: str, **fields):
+    """Complete the most recent unfinished usage record of a tool."""
+    tool_usage = list(tool_context.state.get('tool_usage') or [])
+    for index in range(len(tool_usage) - 1, -1, -1):
+        tool_record = tool_usage[index]
+        if tool_record.get('tool_name') == tool_name and 'success' not in tool_record:
+            tool_usage[index] = dict(tool_record, **fields)
+            # Replaced, not changed in place, so the update is stored
+            tool_context.state['tool_usage'] = tool_usage
+            return
 
-async def after_tool(context: InvocationContext, tool_name: str, tool_result: Any) -> None:
+async def after_tool(
+    tool: BaseTool,
+    args: Dict[str, Any],
+    tool_context: ToolContext,
+    tool_response: Any
+) -> None:
     """
     Callback executed after tool execution.
-    
+
     Args:
-        context: The invocation context
-        tool_name: Name of the tool that was executed
-        tool_result: Result returned by the tool
+        tool: Tool that was executed
+        args: Arguments passed to the tool
+        tool_context: Context of the tool call
+        tool_response: Result returned by the tool
     """
-    logger.info(f"Tool {tool_name} completed with result type: {type(tool_result)}")
-    
+    logger.info(f"Tool {tool.name} completed with result type: {type(tool_response)}")
+
     # Update tool usage tracking with results
-    if 'tool_usage' in context.session.state:
-        # Find the most recent tool execution and update it
-        for tool_record in reversed(context.session.state['tool_usage']):
-            if tool_record['tool_name'] == tool_name and 'result' not in tool_record:
-                tool_record['result'] = str(tool_result)[:200]  # Truncate for storage
-                tool_record['success'] = True
-                break
-
-async def after_agent(context: InvocationContext) -> None:
-    """
-    Callback executed after agent processing.
-    
-    Args:
-        context: The invocation context
-    """
-    agent_name = getattr(context, 'agent_name', 'unknown')
-    logger.info(f"Completed agent: {agent_name}")
-    
-    # Calculate agent execution time
-    if hasattr(context.session.state, 'agent_timings') and agent_name in context.session.state['agent_timings']:
-        start_time = context.session.state['agent_timings'][agent_name]['start_time']
-        execution_time = time.time() - start_time
-        context.session.state['agent_timings'][agent_name]['execution_time'] = execution_time
-        logger.info(f"Agent {agent_name} execution time: {execution_time:.2f} seconds")
+    _finish_tool_record(tool_context, tool.name, result=compact_value(str(tool_response)), success=True)
+
+    if not isinstance(tool_response, dict):
+        return
+    if tool.name == ESCALATION_TOOL:
+        on_escalation(tool_context, tool_response.get('escalation_reason', ''))
+    elif tool.name == NEXT_ACTION_TOOL and tool_response.get('action') == RESOLVED_ACTION:
+        on_resolution(tool_context, tool_response)
+
+async def on_tool_error(
+    tool: BaseTool,
+    args: Dict[str, Any],
+    tool_context: ToolContext,
+    error: Exception
+) -> Dict[str, Any]:
+    """
+    Callback executed when a tool raises.
 
-async def on_error(context: InvocationContext, error: Exception) -> None:
-    """
-    Callback executed when an error occurs.
-    
     Args:
-        context: The invocation context
+        tool: Tool that failed
+        args: Arguments passed to the tool
+        tool_context: Context of the tool call
         error: The exception that occurred
+
+    Returns:
+        Generic error result in the tools' format, given to the model instead
+        of ending the run; state changes are only stored with a result. The
+        error text may hold provider URLs, queries or credentials, so it
+        only goes to the log and the errors history.
     """
     logger.error(f"Error in customer service system: {str(error)}")
-    
+
+    _finish_tool_record(tool_context, tool.name, success=False)
+
     # Track errors for analysis
-    if 'errors' not in context.session.state:
-        context.session.state['errors'] = []
-    
-    context.session.state['errors'].append({
+    append_history(tool_context.state, 'errors', {
         'error_type': type(error).__name__,
-        'error_message': str(error),
+        'error_message': compact_value(str(error)),
         'timestamp': time.time(),
-        'agent_context': getattr(context, 'agent_name', 'unknown')
-    })
+        'agent_context': tool_context.agent_name,
+        'tool_name': tool.name
+    }, tool_context.session.id)
+    return {"status": "error", "message": TOOL_ERROR_MESSAGE}
 
-async def on_escalation(context: InvocationContext, escalation_reason: str) -> None:
+def on_escalation(tool_context: ToolContext, escalation_reason: str) -> None:
     """
-    Callback executed when an issue is escalated.
-    
+    Record an escalated issue.
+
     Args:
-        context: The invocation context
+        tool_context: Context of the escalating tool call
         escalation_reason: Reason for escalation
     """
     logger.info(f"Issue escalated: {escalation_reason}")
-    
+
     # Track escalations for metrics
-    if 'escalations' not in context.session.state:
-        context.session.state['escalations'] = []
-    
-    context.session.state['escalations'].append({
-        'reason': escalation_reason,
+    append_history(tool_context.state, 'escalations', {
+        'reason': compact_value(escalation_reason),
         'timestamp': time.time(),
-        'agent_path': context.session.state.get('agent_history', [])
-    })
+        'agent_path': list(tool_context.state.get('agent_history', []))
+    }, tool_context.session.id)
 
-async def on_resolution(context: InvocationContext, resolution_details: Dict[str, Any]) -> None:
+def on_resolution(tool_context: ToolContext, resolution_details: Dict[str, Any]) -> None:
     """
-    Callback executed when an issue is resolved.
-    
+    Record a resolved issue.
+
     Args:
-        context: The invocation context
+        tool_context: Context of the tool call that closed the case
         resolution_details: Details about the resolution
     """
     logger.info(f"Issue resolved: {resolution_details}")
-    
+
     # Track successful resolutions
-    if 'resolutions' not in context.session.state:
-        context.session.state['resolutions'] = []
-    
-    context.session.state['resolutions'].append({
-        'details': resolution_details,
+    append_history(tool_context.state, 'resolutions', {
+        'details': compact_value(resolution_details),
         'timestamp': time.time(),
-        'agent_path': context.session.state.get('agent_history', []),
+        'agent_path': list(tool_context.state.get('agent_history', [])),
         'total_execution_time': sum(
-            timing.get('execution_time', 0) 
-            for timing in context.session.state.get('agent_timings', {}).values()
+            timing.get('execution_time', 0)
+            for timing in (tool_context.state.get('agent_timings') or {}).values()
         )
-    })
\ No newline at end of file
+    }, tool_context.session.id)
@@ -0,0 +1,297 @@
+"""Conversation history compaction for agent model calls.
+
+ADK sends every agent the conversation loaded with the session, so prompt
+size and latency grow with every turn. ``compact_conversation`` runs as the
+agents' ``before_model_callback`` and keeps only the last
+``max_conversation_turns`` turns verbatim. Older turns are replaced by a
+rolling summary kept in ``state["conversation_summary"]``.
+
+The summary is extractive and built locally, without a model call. Each
+turn becomes one line: the customer's opening sentence, the tools used and
+the first sentence of the agent's answer. Every turn is summarized once, as
+soon as the next one starts, whether or not it is still kept verbatim, so
+the summary also covers turns that later fall out of the events loaded
+with the session (``session_recent_events``). It costs a few string
+operations per turn. The summary keeps fingerprints of the turns it covers,
+so no turn is summarized twice, and lines of turns an agent keeps verbatim
+are left out of its prompt. Its length is capped by
+``history_summary_max_chars``, dropping the oldest lines first.
+
+Each agent has a prompt budget, ``history_token_budget`` in its model
+settings. When the verbatim turns and the summary exceed it, further turns
+are summarized, down to the current one. Tokens are estimated at four
+characters each before the call. The prompt token counts reported by the
+model are recorded per agent (see ``prompt_history_stats``).
+"""
+
+import hashlib
+import json
+import logging
+import re
+from typing import Dict, Any, List, Optional, Tuple
+
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.genai import types
+
+from config import config
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_KEY = "conversation_summary"
+
+# Prefix ADK gives other agents' messages relayed as user content
+_RELAYED_PREFIX = "For context:"
+_CHARS_PER_TOKEN = 4
+_MAX_SENTENCE_CHARS = 160
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+# Fingerprints of summarized turns remembered, including turns whose lines were dropped
+_MAX_COVERED_TURNS = 200
+
+_AGENT_SETTINGS = (
+    "coordinator_agent",
+    "reception_agent",
+    "knowledge_agent",
+    "technical_agent",
+    "escalation_agent",
+    "followup_agent",
+    "learning_agent",
+)
+
+# agent name -> prompt counters
+_stats: Dict[str, Dict[str, Any]] = {}
+
+
+def _text(content: types.Content) -> str:
+    return " ".join(part.text for part in content.parts or [] if part.text and not part.thought).strip()
+
+
+def _is_turn_start(content: types.Content) -> bool:
+    """A message typed by the customer, as opposed to tool results and relayed agent messages."""
+    if content.role != "user" or any(part.function_response for part in content.parts or []):
+        return False
+    text = _text(content)
+    return bool(text) and not text.startswith(_RELAYED_PREFIX)
+
+
+def _split_turns(contents: List[types.Content]) -> Tuple[List[types.Content], List[List[types.Content]]]:
+    """Contents before the first customer message, and the turns starting at each customer message."""
+    head: List[types.Content] = []
+    turns: List[List[types.Content]] = []
+    for content in contents:
+        if _is_turn_start(content):
+            turns.append([content])
+        elif turns:
+            turns[-1].append(content)
+        else:
+            head.append(content)
+    return head, turns
+
+
+def estimate_tokens(contents: List[types.Content]) -> int:
+    """Rough token count of model contents, at four characters per token."""
+    chars = 0
+    for content in contents:
+        for part in content.parts or []:
+            if part.text:
+                chars += len(part.text)
+            elif part.function_call:
+                chars += len(part.function_call.name or "") + len(json.dumps(part.function_call.args or {}, default=str))
+            elif part.function_response:
+                chars += len(json.dumps(part.function_response.response or {}, default=str))
+    return chars // _CHARS_PER_TOKEN
+
+
+def _first_sentence(text: str) -> str:
+    sentence = _SENTENCE_END.split(" ".join(text.split()), 1)[0]
+    return sentence if len(sentence) <= _MAX_SENTENCE_CHARS else sentence[:_MAX_SENTENCE_CHARS] + "..."
+
+
+def _fingerprint(turn: List[types.Content]) -> str:
+    replies = [_text(content) for content in turn if content.role == "model"]
+    key = _text(turn[0]) + "\0" + next((reply for reply in reversed(replies) if reply), "")
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+
+
+def summarize_turn(turn: List[types.Content]) -> str:
+    """One-line extractive summary of a conversation turn."""
+    line = f"Customer: {_first_sentence(_text(turn[0]))}"
+    tools = []
+    for content in turn:
+        for part in content.parts or []:
+            if part.function_call and part.function_call.name not in tools:
+                tools.append(part.function_call.name)
+    if tools:
+        line += f" | Tools: {', '.join(tools)}"
+    replies = [_text(content) for content in turn if content.role == "model"]
+    reply = next((reply for reply in reversed(replies) if reply), "")
+    if reply:
+        line += f" | Agent: {_first_sentence(reply)}"
+    return line
+
+
+def _extend_summary(
+    summary: Dict[str, Any],
+    older: List[List[types.Content]],
+    fingerprints: Optional[List[str]] = None
+) -> Dict[str, Any]:
+    """Add the turns of ``older`` not yet in the summary; returns the same dict if none are new."""
+    fingerprints = fingerprints or [_fingerprint(turn) for turn in older]
+    covered = set(summary.get("covered") or [])
+    if not covered and summary.get("last") in fingerprints:
+        # Summary stored before fingerprints were kept: turns up to the last summarized one are in it
+        covered = set(fingerprints[:len(fingerprints) - fingerprints[::-1].index(summary["last"])])
+    new = [(fingerprint, turn) for fingerprint, turn in zip(fingerprints, older) if fingerprint not in covered]
+    if not new:
+        return summary
+
+    lines = list(summary.get("lines", []))
+    line_fingerprints = list(summary.get("fingerprints") or [None] * len(lines))
+    for fingerprint, turn in new:
+        lines.append(summarize_turn(turn))
+        line_fingerprints.append(fingerprint)
+    dropped = summary.get("dropped", 0)
+    while len(lines) > 1 and sum(len(line) + 1 for line in lines) > config.history_summary_max_chars:
+        lines.pop(0)
+        line_fingerprints.pop(0)
+        dropped += 1
+    covered_list = list(summary.get("covered") or covered) + [fingerprint for fingerprint, _ in new]
+    return {
+        "lines": lines,
+        "fingerprints": line_fingerprints,
+        "covered": covered_list[-_MAX_COVERED_TURNS:],
+        "turns": summary.get("turns", 0) + len(new),
+        "dropped": dropped
+    }
+
+
+def _summary_content(summary: Dict[str, Any], verbatim: set) -> Optional[types.Content]:
+    """Summary message without the lines of the turns kept verbatim; None if no line is left."""
+    lines = summary["lines"]
+    line_fingerprints = summary.get("fingerprints") or [None] * len(lines)
+    shown = [line for line, fingerprint in zip(lines, line_fingerprints) if fingerprint not in verbatim]
+    if not shown:
+        return None
+    header = f"Summary of the {summary['turns'] - (len(lines) - len(shown))} earlier turns of this conversation"
+    if summary.get("dropped"):
+        header += f" (oldest {summary['dropped']} omitted)"
+    text = header + ":\n" + "\n".join(f"- {line}" for line in shown)
+    return types.Content(role="user", parts=[types.Part(text=text)])
+
+
+def token_budget(agent_name: str) -> int:
+    """Prompt token budget of an agent."""
+    for setting in _AGENT_SETTINGS:
+        agent = getattr(config, setting)
+        if agent.name == agent_name and agent.history_token_budget:
+            return agent.history_token_budget
+    return config.history_token_budget
+
+
+def _agent_stats(agent_name: str) -> Dict[str, Any]:
+    stats = _stats.get(agent_name)
+    if stats is None:
+        stats = _stats[agent_name] = {
+            "requests": 0,
+            "compacted": 0,
+            "over_budget": 0,
+            "estimated_tokens_before": 0,
+            "estimated_tokens_after": 0,
+            "responses": 0,
+            "prompt_tokens": 0,
+            "max_prompt_tokens": 0
+        }
+    return stats
+
+
+def compact_conversation(callback_context: CallbackContext, llm_request: LlmRequest) -> Optional[LlmResponse]:
+    """
+    Replace conversation turns beyond the verbatim window with the rolling summary.
+
+    Args:
+        callback_context: Context of the agent making the model call
+        llm_request: Request about to be sent; its contents are replaced
+
+    Returns:
+        None, so the model call goes ahead
+    """
+    stats = _agent_stats(callback_context.agent_name)
+    stats["requests"] += 1
+    contents = llm_request.contents or []
+    before = estimate_tokens(contents)
+    stats["estimated_tokens_before"] += before
+
+    head, turns = _split_turns(contents)
+    fingerprints = [_fingerprint(turn) for turn in turns]
+    summary = callback_context.state.get(SUMMARY_KEY) or {}
+    if len(turns) > 1:
+        # Every finished turn, before the bounded session read can drop it
+        updated = _extend_summary(summary, turns[:-1], fingerprints[:-1])
+        if updated is not summary:
+            callback_context.state[SUMMARY_KEY] = summary = updated
+
+    budget = token_budget(callback_context.agent_name)
+    keep = min(len(turns), max(1, config.max_conversation_turns))
+    verbatim = set(fingerprints[len(turns) - keep:])
+    line_tokens = {
+        fingerprint: (len(line) + 3) // _CHARS_PER_TOKEN
+        for line, fingerprint in zip(summary.get("lines", []), summary.get("fingerprints") or [])
+    }
+    kept_tokens = estimate_tokens(head) + sum(estimate_tokens(turn) for turn in turns[len(turns) - keep:])
+    summary_tokens = (
+        sum(len(line) + 3 for line in summary.get("lines", [])) // _CHARS_PER_TOKEN
+        - sum(line_tokens.get(fingerprint, 0) for fingerprint in verbatim)
+    )
+    while keep > 1 and kept_tokens + summary_tokens > budget:
+        # The oldest kept turn moves to the summary
+        kept_tokens -= estimate_tokens(turns[len(turns) - keep])
+        summary_tokens += line_tokens.get(fingerprints[len(turns) - keep], 0)
+        verbatim.discard(fingerprints[len(turns) - keep])
+        keep -= 1
+
+    kept = turns[len(turns) - keep:]
+    summary_content = _summary_content(summary, verbatim) if summary.get("lines") else None
+    if summary_content is not None:
+        compacted = head + [summary_content]
+        for turn in kept:
+            compacted.extend(turn)
+        llm_request.contents = compacted
+        stats["compacted"] += 1
+
+    after = estimate_tokens(llm_request.contents or [])
+    stats["estimated_tokens_after"] += after
+    if after > budget:
+        stats["over_budget"] += 1
+        logger.debug(f"{callback_context.agent_name} prompt of ~{after} tokens exceeds its budget of {budget}")
+    return None
+
+
+def record_prompt_usage(callback_context: CallbackContext, llm_response: LlmResponse) -> Optional[LlmResponse]:
+    """Record the prompt token count reported by the model; leaves the response unchanged."""
+    usage = llm_response.usage_metadata
+    if usage is not None and usage.prompt_token_count:
+        stats = _agent_stats(callback_context.agent_name)
+        stats["responses"] += 1
+        stats["prompt_tokens"] += usage.prompt_token_count
+        stats["max_prompt_tokens"] = max(stats["max_prompt_tokens"], usage.prompt_token_count)
+    return None
+
+
+def prompt_history_stats() -> Dict[str, Any]:
+    """Per-agent prompt sizes and compaction counters, for health reporting."""
+    report = {}
+    for agent_name, stats in list(_stats.items()):
+        requests = stats["requests"]
+        responses = stats["responses"]
+        report[agent_name] = {
+            "budget": token_budget(agent_name),
+            "requests": requests,
+            "compacted": stats["compacted"],
+            "over_budget": stats["over_budget"],
+            "avg_estimated_tokens_before": stats["estimated_tokens_before"] // requests if requests else 0,
+            "avg_estimated_tokens_after": stats["estimated_tokens_after"] // requests if requests else 0,
+            "avg_prompt_tokens": stats["prompt_tokens"] // responses if responses else 0,
+            "max_prompt_tokens": stats["max_prompt_tokens"]
+        }
+    return report
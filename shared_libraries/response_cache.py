@@ -0,0 +1,201 @@
+"""Cache of agent answers to repeated customer questions.
+
+Answers are keyed on tenant (the business), routed category and the normalised message, so
+"How do I reset my password?" and "how do i reset my password" share an
+entry. With a similarity threshold set, a miss falls back to the most
+similar cached question in the same tenant and category (cosine similarity
+of message embeddings), which catches light rephrasings.
+
+Only answers that cannot depend on who is asking are stored: the message
+must have been routed to the knowledge agent, must not contain personal
+identifiers, and the run may only have used knowledge base search. Entries
+are dropped when the shared knowledge index is reloaded, which happens when
+the knowledge files change (see ``knowledge.retrieval.check_knowledge_files``).
+"""
+
+import logging
+import re
+import threading
+import time
+from typing import Dict, Any, Iterable, Optional, Tuple
+
+from config import config
+from knowledge.search_index import TOKEN_PATTERN, get_knowledge_version
+from knowledge.retrieval import check_knowledge_files
+from .ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Agents whose answers are documented, customer-independent content
+CACHEABLE_AGENTS = frozenset([config.knowledge_agent.name])
+
+# Tools that may be called in a run whose answer is cached
+CACHEABLE_TOOLS = frozenset(["search_knowledge_base"])
+
+# E-mail addresses, phone/order/account numbers and similar identifiers
+PERSONAL_DATA_PATTERN = re.compile(
+    r"[\w.+-]+@[\w-]+\.[\w.]+"
+    r"|\d{4,}"
+    r"|\b[a-z]{2,5}[-_#]\d+\b"
+    r"|#\d+",
+    re.IGNORECASE
+)
+
+
+def normalize_message(message: str) -> str:
+    """Lowercase and strip punctuation and extra whitespace."""
+    return " ".join(TOKEN_PATTERN.findall(message.lower()))
+
+
+class ResponseCache:
+    """TTL + LRU cache of agent answers with optional near-duplicate lookup."""
+
+    def __init__(
+        self,
+        maxsize: Optional[int] = None,
+        ttl: Optional[float] = None,
+        similarity_threshold: Optional[float] = None
+    ):
+        self.similarity_threshold = (
+            config.response_cache_similarity_threshold if similarity_threshold is None else similarity_threshold
+        )
+        self._cache = TTLCache(
+            maxsize=maxsize or config.response_cache_max_entries,
+            ttl=ttl or config.response_cache_ttl_seconds
+        )
+        self._knowledge_version = get_knowledge_version()
+        self._lock = threading.Lock()
+        self.similar_hits = 0
+        self.stores = 0
+        self.skipped = 0
+        self.invalidations = 0
+
+    def _check_knowledge_version(self):
+        """Drop every entry once the knowledge content has changed."""
+        check_knowledge_files()
+        version = get_knowledge_version()
+        if version != self._knowledge_version:
+            with self._lock:
+                if version != self._knowledge_version:
+                    self._cache.clear()
+                    self._knowledge_version = version
+                    self.invalidations += 1
+                    logger.info("Response cache invalidated after knowledge reload")
+
+    def is_cacheable_request(self, message: str, route: Optional[Dict[str, Any]]) -> bool:
+        """Whether a message may be answered from, or stored in, the cache."""
+        if not route or route.get("agent") not in CACHEABLE_AGENTS:
+            return False
+        return not PERSONAL_DATA_PATTERN.search(message)
+
+    def _key(self, message: str, route: Dict[str, Any], tenant: str) -> Tuple[str, str, str]:
+        return (tenant, route.get("category") or "", normalize_message(message))
+
+    def _embed(self, text: str):
+        from knowledge.vector_index import embed_texts
+        return embed_texts([text])[0]
+
+    def lookup(self, message: str, route: Optional[Dict[str, Any]], tenant: str) -> Optional[Dict[str, Any]]:
+        """
+        Find a cached answer for a message.
+
+        Args:
+            message: The customer message
+            route: Fast-path route decision for the message
+            tenant: Tenant the conversation belongs to
+
+        Returns:
+            Dict with ``text``, ``agent`` and ``match`` ("exact" or "similar"), or None
+        """
+        if not self.is_cacheable_request(message, route):
+            return None
+        self._check_knowledge_version()
+
+        key = self._key(message, route, tenant)
+        entry = self._cache.get(key)
+        if entry is not None:
+            return {"text": entry["text"], "agent": entry["agent"], "match": "exact"}
+
+        if self.similarity_threshold <= 0:
+            return None
+
+        best_key, best_score = None, self.similarity_threshold
+        query_vector = self._embed(key[2])
+        for candidate_key, candidate in self._cache.items():
+            if candidate_key[:2] != key[:2] or "vector" not in candidate:
+                continue
+            score = float(candidate["vector"] @ query_vector)
+            if score >= best_score:
+                best_key, best_score = candidate_key, score
+
+        if best_key is None:
+            return None
+        entry = self._cache.get(best_key)
+        if entry is None:
+            return None
+        self.similar_hits += 1
+        return {"text": entry["text"], "agent": entry["agent"], "match": "similar", "similarity": round(best_score, 4)}
+
+    def store(
+        self,
+        message: str,
+        route: Optional[Dict[str, Any]],
+        tenant: str,
+        text: str,
+        agent: str,
+        tools_used: Iterable[str] = ()
+    ) -> bool:
+        """
+        Cache an answer if it is customer-independent.
+
+        Args:
+            message: The customer message
+            route: Fast-path route decision for the message
+            tenant: Tenant the conversation belongs to
+            text: Final answer text
+            agent: Agent that produced the answer
+            tools_used: Names of the tools called while answering
+
+        Returns:
+            True if the answer was stored
+        """
+        if (
+            not text
+            or not self.is_cacheable_request(message, route)
+            or agent not in CACHEABLE_AGENTS
+            or any(tool not in CACHEABLE_TOOLS for tool in tools_used)
+        ):
+            self.skipped += 1
+            return False
+        self._check_knowledge_version()
+
+        key = self._key(message, route, tenant)
+        entry = {"text": text, "agent": agent, "stored_at": time.time()}
+        if self.similarity_threshold > 0:
+            entry["vector"] = self._embed(key[2])
+        self._cache.set(key, entry)
+        self.stores += 1
+        return True
+
+    def invalidate(self):
+        """Drop all cached answers."""
+        self._cache.clear()
+        self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss metrics."""
+        stats = self._cache.stats()
+        # A similar hit follows an exact-key miss; count the lookup once, as a hit
+        stats["misses"] -= self.similar_hits
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        stats.update({
+            "similar_hits": self.similar_hits,
+            "stores": self.stores,
+            "skipped": self.skipped,
+            "invalidations": self.invalidations
+        })
+        return stats
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,272 @@
+"""Bounded interaction histories in session state.
+
+The callbacks record tool calls, agent hops, errors, escalations and
+resolutions in ``session.state``, which is read and rewritten whole with
+every event. To keep that cost constant over a long conversation each
+history is a ring buffer of the last ``session_history_max_entries``
+entries. Entries pushed out of it are:
+
+- rolled up into counters under ``state["history_rollups"][key]`` (count,
+  time span and counts per tool, agent or error type), so totals stay
+  available to the agents, and
+- with ``session_history_archive_enabled``, appended to the session history
+  archive, a local SQLite table that is only ever inserted into and is read
+  for analytics and audits, never by a chat turn. Writes are queued to the
+  archive's own thread, so callbacks never wait on SQLite.
+
+Recorded values are compacted too: long strings are cut to
+``session_history_max_value_chars`` and large lists and dicts to their
+first items.
+"""
+
+import asyncio
+import functools
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from config import config
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_KEY = "history_rollups"
+
+# History key -> entry field counted per value in its rollup ("" counts the entry itself)
+HISTORY_KEYS = {
+    "tool_usage": "tool_name",
+    "agent_history": "",
+    "errors": "error_type",
+    "escalations": None,
+    "resolutions": None,
+}
+
+# Distinct names counted per rollup; further ones are counted as "other"
+_MAX_ROLLUP_NAMES = 50
+_MAX_COLLECTION_ITEMS = 20
+_MAX_DEPTH = 3
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS session_history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT NOT NULL,
+    history_key TEXT NOT NULL,
+    entry TEXT NOT NULL,
+    recorded_at REAL,
+    archived_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS session_history_session ON session_history (session_id, history_key, id);
+"""
+
+
+def compact_value(value: Any, depth: int = 0) -> Any:
+    """
+    Copy of a value small enough to keep in session state.
+
+    Args:
+        value: Tool arguments, results or other details to record
+        depth: Nesting level of ``value``
+
+    Returns:
+        JSON-compatible value with strings, lists, dicts and nesting cut short
+    """
+    max_chars = config.session_history_max_value_chars
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    if isinstance(value, str):
+        return value if len(value) <= max_chars else value[:max_chars] + "..."
+    if depth >= _MAX_DEPTH:
+        return compact_value(str(value), depth)
+    if isinstance(value, dict):
+        items = list(value.items())[:_MAX_COLLECTION_ITEMS]
+        return {str(key): compact_value(item, depth + 1) for key, item in items}
+    if isinstance(value, (list, tuple, set)):
+        return [compact_value(item, depth + 1) for item in list(value)[:_MAX_COLLECTION_ITEMS]]
+    return compact_value(str(value), depth)
+
+
+def _roll_up(key: str, rollup: Optional[Dict[str, Any]], entries: List[Any]) -> Dict[str, Any]:
+    """Fold evicted history entries into the counters of their history."""
+    rollup = dict(rollup or {"count": 0, "first_at": None, "last_at": None})
+    field = HISTORY_KEYS.get(key)
+    by_name = dict(rollup.get("by_name", {}))
+    for entry in entries:
+        rollup["count"] += 1
+        timestamp = entry.get("timestamp") if isinstance(entry, dict) else None
+        if timestamp is not None:
+            rollup["first_at"] = rollup["first_at"] or timestamp
+            rollup["last_at"] = timestamp
+        if key == "tool_usage" and isinstance(entry, dict) and not entry.get("success"):
+            rollup["failures"] = rollup.get("failures", 0) + 1
+        if field is None:
+            continue
+        name = entry if field == "" else entry.get(field) if isinstance(entry, dict) else None
+        name = str(name) if name is not None else "unknown"
+        if name not in by_name and len(by_name) >= _MAX_ROLLUP_NAMES:
+            name = "other"
+        by_name[name] = by_name.get(name, 0) + 1
+    if field is not None:
+        rollup["by_name"] = by_name
+    return rollup
+
+
+def append_history(state, key: str, entry: Any, session_id: Optional[str] = None) -> None:
+    """
+    Append an entry to a bounded history in session state.
+
+    The history list is replaced rather than changed in place, so the write
+    is recorded as a state change.
+
+    Args:
+        state: Session state (dict or ADK ``State``)
+        key: History key, one of ``HISTORY_KEYS``
+        entry: Entry to record, already compacted
+        session_id: Session the state belongs to; needed to archive evicted entries
+    """
+    entries = list(state.get(key) or [])
+    entries.append(entry)
+    _store(state, key, entries, session_id)
+
+
+def compact_history(state, session_id: Optional[str] = None) -> None:
+    """Bring every history in session state down to its cap, e.g. for sessions stored before caps existed."""
+    for key in HISTORY_KEYS:
+        entries = state.get(key)
+        if entries and len(entries) > config.session_history_max_entries:
+            _store(state, key, list(entries), session_id)
+
+
+def _store(state, key: str, entries: List[Any], session_id: Optional[str]):
+    overflow = len(entries) - config.session_history_max_entries
+    if overflow > 0:
+        evicted, entries = entries[:overflow], entries[overflow:]
+        rollups = dict(state.get(ROLLUP_KEY) or {})
+        rollups[key] = _roll_up(key, rollups.get(key), evicted)
+        state[ROLLUP_KEY] = rollups
+        if config.session_history_archive_enabled and session_id:
+            history_archive.append_later(session_id, key, evicted)
+    state[key] = entries
+
+
+def history_total(state, key: str) -> int:
+    """Number of entries ever recorded in a history, including rolled-up ones."""
+    rollup = (state.get(ROLLUP_KEY) or {}).get(key) or {}
+    return rollup.get("count", 0) + len(state.get(key) or [])
+
+
+class HistoryArchive:
+    """Append-only SQLite table of history entries evicted from session state."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or config.session_history_archive_path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        # Writes are serialized anyway; one thread keeps them off the event loop in order
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="history-archive")
+        self.archived = 0
+        self.errors = 0
+
+    async def run(self, method: Callable, *args) -> Any:
+        """Call one of the archive's methods on its thread, e.g. ``await history_archive.run(history_archive.append, ...)``."""
+        return await asyncio.get_running_loop().run_in_executor(self._executor, functools.partial(method, *args))
+
+    def append_later(self, session_id: str, key: str, entries: List[Any]) -> Future:
+        """Queue entries for ``append`` on the archive's thread; failures are logged, not raised."""
+        future = self._executor.submit(self.append, session_id, key, entries)
+        future.add_done_callback(functools.partial(self._log_failure, session_id, key))
+        return future
+
+    def _log_failure(self, session_id: str, key: str, future: Future):
+        if not future.cancelled() and future.exception() is not None:
+            self.errors += 1
+            logger.warning(f"Could not archive {key} of session {session_id}: {str(future.exception())}")
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            if self.path != ":memory:":
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def append(self, session_id: str, key: str, entries: List[Any]):
+        """Archive entries of one session history, oldest first."""
+        now = time.time()
+        rows = [
+            (
+                session_id,
+                key,
+                json.dumps(entry, default=str),
+                entry.get("timestamp") if isinstance(entry, dict) else None,
+                now
+            )
+            for entry in entries
+        ]
+        with self._lock:
+            self._connection().executemany(
+                "INSERT INTO session_history (session_id, history_key, entry, recorded_at, archived_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+            self.archived += len(rows)
+
+    def read(
+        self,
+        session_id: str,
+        key: Optional[str] = None,
+        limit: int = 100,
+        before_id: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Archived entries of a session, newest first.
+
+        Args:
+            session_id: Session to read
+            key: Only this history; all histories if None
+            limit: Maximum number of entries
+            before_id: Only entries older than this archive ID, for paging
+
+        Returns:
+            List of dicts with ``id``, ``history_key``, ``entry`` and ``archived_at``
+        """
+        query = "SELECT id, history_key, entry, archived_at FROM session_history WHERE session_id = ?"
+        params: List[Any] = [session_id]
+        if key is not None:
+            query += " AND history_key = ?"
+            params.append(key)
+        if before_id is not None:
+            query += " AND id < ?"
+            params.append(before_id)
+        query += " ORDER BY id DESC LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            rows = self._connection().execute(query, params).fetchall()
+        return [
+            {"id": row[0], "history_key": row[1], "entry": json.loads(row[2]), "archived_at": row[3]}
+            for row in rows
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        """Archive size and entries archived by this process."""
+        with self._lock:
+            return {
+                "entries": self._connection().execute("SELECT COUNT(*) FROM session_history").fetchone()[0],
+                "archived": self.archived,
+                "errors": self.errors
+            }
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+history_archive = HistoryArchive()
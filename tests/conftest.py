@@ -0,0 +1,15 @@
+"""Shared test setup: modules import ``config`` and packages from the repository root."""
+
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+# web.dependencies requires a JWT secret at import time
+os.environ.setdefault("SUPABASE_JWT_SECRET", "test-secret")
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "postgres: needs the PostgreSQL database in POSTGRES_TEST_DSN")
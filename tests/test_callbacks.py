@@ -0,0 +1,103 @@
+"""Tests for shared_libraries.callbacks, run by ADK around a scripted model."""
+
+import asyncio
+
+from google.adk.agents import LlmAgent
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_response import LlmResponse
+from google.adk.runners import InMemoryRunner
+from google.genai import types
+
+from shared_libraries.callbacks import (
+    TOOL_ERROR_MESSAGE, after_agent, after_tool, before_agent, before_tool, on_tool_error
+)
+
+
+def determine_next_action(resolution: str) -> dict:
+    """Next action after a resolution."""
+    return {"action": "close_case", "reasoning": resolution}
+
+
+def create_escalation_summary(customer_id: str) -> dict:
+    """Escalation summary."""
+    return {"customer_id": customer_id, "escalation_reason": "Needs a human"}
+
+
+def lookup_order(order_id: str) -> dict:
+    """Failing lookup."""
+    raise RuntimeError(f"order {order_id} unavailable at https://internal.example.com/?token=secret")
+
+
+class ScriptedLlm(BaseLlm):
+    """Calls one tool, then answers."""
+
+    model: str = "scripted"
+    tool_name: str = ""
+    tool_args: dict = {}
+
+    async def generate_content_async(self, llm_request, stream=False):
+        if any(part.function_response for content in llm_request.contents for part in content.parts or []):
+            yield LlmResponse(content=types.Content(role="model", parts=[types.Part(text="Done.")]))
+        else:
+            call = types.FunctionCall(name=self.tool_name, args=self.tool_args)
+            yield LlmResponse(content=types.Content(role="model", parts=[types.Part(function_call=call)]))
+
+
+def _run(tool, **tool_args):
+    agent = LlmAgent(
+        name="followup_agent",
+        model=ScriptedLlm(tool_name=tool.__name__, tool_args=tool_args),
+        tools=[tool],
+        before_agent_callback=before_agent,
+        after_agent_callback=after_agent,
+        before_tool_callback=before_tool,
+        after_tool_callback=after_tool,
+        on_tool_error_callback=on_tool_error
+    )
+
+    async def run():
+        runner = InMemoryRunner(agent=agent, app_name="test")
+        session = await runner.session_service.create_session(app_name="test", user_id="user")
+        message = types.Content(role="user", parts=[types.Part(text="Hello")])
+        tool_results = []
+        async for event in runner.run_async(user_id="user", session_id=session.id, new_message=message):
+            tool_results.extend(response.response for response in event.get_function_responses())
+        session = await runner.session_service.get_session(app_name="test", user_id="user", session_id=session.id)
+        return session.state, tool_results
+
+    return asyncio.run(run())
+
+
+def test_agent_and_tool_calls_are_recorded():
+    state, _ = _run(determine_next_action, resolution="fixed")
+
+    assert state["agent_history"] == ["followup_agent"]
+    assert "execution_time" in state["agent_timings"]["followup_agent"]
+    [usage] = state["tool_usage"]
+    assert usage["tool_name"] == "determine_next_action"
+    assert usage["args"] == {"resolution": "fixed"}
+    assert usage["success"] is True
+    [resolution] = state["resolutions"]
+    assert resolution["details"]["action"] == "close_case"
+    assert resolution["agent_path"] == ["followup_agent"]
+
+
+def test_escalation_is_recorded():
+    state, _ = _run(create_escalation_summary, customer_id="42")
+
+    [escalation] = state["escalations"]
+    assert escalation["reason"] == "Needs a human"
+    assert "resolutions" not in state
+
+
+def test_tool_errors_are_recorded():
+    state, tool_results = _run(lookup_order, order_id="7")
+
+    [error] = state["errors"]
+    assert error["error_type"] == "RuntimeError"
+    assert error["tool_name"] == "lookup_order"
+    assert error["agent_context"] == "followup_agent"
+    assert "internal.example.com" in error["error_message"]
+    assert state["tool_usage"][0]["success"] is False
+    # The model, and so the customer, only sees a generic message
+    assert tool_results == [{"status": "error", "message": TOOL_ERROR_MESSAGE}]
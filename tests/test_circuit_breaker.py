@@ -0,0 +1,115 @@
+"""Tests for integrations.circuit_breaker."""
+
+from types import SimpleNamespace
+
+import pytest
+
+from integrations import circuit_breaker
+from integrations.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, get_circuit_breaker
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(circuit_breaker, "time", SimpleNamespace(monotonic=clock.monotonic))
+    return clock
+
+
+def _breaker(**settings):
+    return CircuitBreaker("crm", {
+        "circuit_breaker_window": 10,
+        "circuit_breaker_min_calls": 4,
+        "circuit_breaker_failure_rate": 0.5,
+        "circuit_breaker_slow_call_seconds": 2.0,
+        "circuit_breaker_slow_call_rate": 0.8,
+        "circuit_breaker_open_seconds": 30,
+        **settings
+    })
+
+
+def _open(breaker):
+    for failed in (False, True, False, True):
+        breaker.record(0.1, failed=failed)
+    assert breaker.state == OPEN
+
+
+def test_opens_at_the_failure_rate_once_enough_calls(clock):
+    breaker = _breaker()
+    for _ in range(3):
+        breaker.record(0.1, failed=True)
+    # Fewer than min_calls outcomes
+    assert breaker.state == CLOSED
+
+    breaker.record(0.1, failed=True)
+    assert breaker.state == OPEN
+    assert not breaker.allow_request()
+    assert breaker.stats()["rejected"] == 1
+
+
+def test_opens_at_the_slow_call_rate(clock):
+    breaker = _breaker()
+    for _ in range(4):
+        breaker.record(2.5)
+    assert breaker.state == OPEN
+
+
+def test_half_open_lets_one_trial_through(clock):
+    breaker = _breaker()
+    _open(breaker)
+
+    clock.now += 30
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow_request()
+    # The trial is outstanding: others are refused
+    assert not breaker.allow_request()
+    assert not breaker.allow_request()
+
+    breaker.record(0.1)
+    assert breaker.state == CLOSED
+    assert breaker.allow_request()
+    assert breaker.stats()["calls"] == 0
+
+
+@pytest.mark.parametrize("duration, failed", [(0.1, True), (2.5, False)])
+def test_bad_trial_reopens(clock, duration, failed):
+    breaker = _breaker()
+    _open(breaker)
+
+    clock.now += 30
+    assert breaker.allow_request()
+    breaker.record(duration, failed=failed)
+    assert breaker.state == OPEN
+    assert not breaker.allow_request()
+    assert breaker.stats()["times_opened"] == 2
+
+    clock.now += 30
+    assert breaker.allow_request()
+
+
+def test_trial_without_outcome_expires(clock):
+    breaker = _breaker()
+    _open(breaker)
+
+    clock.now += 30
+    assert breaker.allow_request()
+    clock.now += 29
+    assert not breaker.allow_request()
+    # The trial call never reported back: another one may go
+    clock.now += 1
+    assert breaker.allow_request()
+
+
+def test_registry_applies_provider_overrides(monkeypatch):
+    monkeypatch.setattr(circuit_breaker, "_breakers", {})
+    breaker = get_circuit_breaker("slow_crm", {"circuit_breaker_open_seconds": 5, "unrelated": 1})
+    assert breaker.open_seconds == 5
+    assert get_circuit_breaker("slow_crm", {"circuit_breaker_open_seconds": 60}) is breaker
+    assert breaker.open_seconds == 5
@@ -0,0 +1,111 @@
+"""Tests for shared_libraries.conversation_history."""
+
+from types import SimpleNamespace
+
+import pytest
+from google.adk.models.llm_request import LlmRequest
+from google.genai import types
+
+from config import config
+from shared_libraries import conversation_history
+from shared_libraries.conversation_history import SUMMARY_KEY, compact_conversation
+
+
+def _turns(count):
+    contents = []
+    for i in range(1, count + 1):
+        contents.append(types.Content(role="user", parts=[types.Part(text=f"Question number {i} about my order.")]))
+        contents.append(types.Content(role="model", parts=[types.Part(text=f"Answer number {i}. " + "Details. " * 20)]))
+    return contents
+
+
+def _compact(state, agent_name, contents):
+    request = LlmRequest(contents=list(contents))
+    compact_conversation(SimpleNamespace(agent_name=agent_name, state=state), request)
+    return request.contents
+
+
+def _summary_text(contents):
+    return next(content.parts[0].text for content in contents if (content.parts[0].text or "").startswith("Summary of"))
+
+
+@pytest.fixture
+def budgets(monkeypatch):
+    budgets = {"small_agent": 50, "large_agent": 100000}
+    monkeypatch.setattr(conversation_history, "token_budget", budgets.__getitem__)
+    monkeypatch.setattr(config, "max_conversation_turns", 10)
+    monkeypatch.setattr(config, "history_summary_max_chars", 100000)
+    return budgets
+
+
+def test_larger_budget_does_not_resummarize_turns(budgets):
+    state = {}
+    contents = _turns(12)
+
+    compacted = _compact(state, "small_agent", contents)
+    assert state[SUMMARY_KEY]["turns"] == 11
+    assert len(compacted) == 3
+
+    # Keeps turns 3-12 verbatim: nothing is added, and their lines are left out of the summary
+    compacted = _compact(state, "large_agent", contents)
+    assert state[SUMMARY_KEY]["turns"] == 11
+    assert len(state[SUMMARY_KEY]["lines"]) == 11
+    text = _summary_text(compacted)
+    assert text.startswith("Summary of the 2 earlier turns")
+    assert "Question number 1 " in text and "Question number 2 " in text
+    assert "Question number 3 " not in text
+    assert len(compacted) == 1 + 20
+
+    # The next turn adds exactly one line
+    contents += _turns(13)[24:]
+    _compact(state, "small_agent", contents)
+    summary = state[SUMMARY_KEY]
+    assert summary["turns"] == 12
+    assert len(summary["lines"]) == len(set(summary["lines"])) == 12
+
+
+def test_summary_omitted_when_all_its_turns_are_verbatim(budgets):
+    state = {}
+    contents = _turns(4)
+    _compact(state, "small_agent", contents)
+
+    compacted = _compact(state, "large_agent", contents)
+    assert compacted == contents
+
+
+def _tool_turn(i):
+    """A turn of six events: the question, a transfer, a tool call and the answer."""
+    call = lambda name: types.Content(role="model", parts=[types.Part(function_call=types.FunctionCall(name=name, args={}))])
+    result = lambda name: types.Content(role="user", parts=[types.Part(
+        function_response=types.FunctionResponse(name=name, response={"result": "ok"})
+    )])
+    return [
+        types.Content(role="user", parts=[types.Part(text=f"Question number {i} about my order.")]),
+        call("transfer_to_agent"), result("transfer_to_agent"),
+        call("lookup_order"), result("lookup_order"),
+        types.Content(role="model", parts=[types.Part(text=f"Answer number {i}. Your order has shipped.")]),
+    ]
+
+
+def test_turns_are_summarized_before_the_session_window_drops_them(budgets):
+    # session_recent_events=50 with six-event turns loads about eight turns, fewer than max_conversation_turns
+    window = 50
+    state = {}
+    events = []
+    for i in range(1, 31):
+        turn = _tool_turn(i)
+        # Every model call of the turn sees the last events loaded with the session
+        for end in (1, 3, 5):
+            compacted = _compact(state, "large_agent", (events + turn[:end])[-window:])
+        events += turn
+
+    summary = state[SUMMARY_KEY]
+    assert summary["turns"] == 29
+    assert len(summary["lines"]) == len(set(summary["lines"])) == 29
+
+    text = _summary_text(compacted)
+    verbatim = [content.parts[0].text for content in compacted]
+    for i in range(1, 31):
+        question = f"Question number {i} about my order."
+        shown = int(f"Customer: Question number {i} about" in text) + verbatim.count(question)
+        assert shown == 1, i
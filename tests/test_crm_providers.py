@@ -0,0 +1,42 @@
+"""Tests for the requests the CRM providers send for bounded reads."""
+
+import asyncio
+
+from integrations.base_provider import IntegrationConfig
+from integrations.crm.salesforce_provider import SalesforceProvider
+from integrations.crm.zendesk_provider import ZendeskProvider
+
+
+def _record_requests(provider, result):
+    endpoints = []
+
+    async def make_api_request(endpoint, *args, **kwargs):
+        endpoints.append(endpoint)
+        return result
+
+    provider._make_api_request = make_api_request
+    return endpoints
+
+
+def test_zendesk_search_requests_only_the_limit():
+    provider = ZendeskProvider(IntegrationConfig(
+        provider_type="zendesk", provider_name="zendesk", custom_config={"subdomain": "acme"}
+    ))
+    endpoints = _record_requests(provider, {"users": [{"id": i, "email": f"u{i}@example.com"} for i in range(5)]})
+
+    customers = asyncio.run(provider.search_customers("smith", limit=3))
+
+    assert endpoints == ["users/search.json?query=smith&per_page=3"]
+    assert len(customers) == 3
+
+
+def test_salesforce_history_query_is_limited():
+    provider = SalesforceProvider(IntegrationConfig(
+        provider_type="salesforce", provider_name="salesforce", custom_config={"instance_url": "https://acme"}
+    ))
+    endpoints = _record_requests(provider, {"records": [{"Id": "500A"}]})
+
+    history = asyncio.run(provider.get_customer_history("003A", limit=25))
+
+    assert endpoints[0].endswith("WHERE ContactId = '003A' ORDER BY CreatedDate DESC LIMIT 25")
+    assert [record["id"] for record in history] == ["500A"]
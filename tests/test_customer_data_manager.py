@@ -0,0 +1,100 @@
+"""Tests for hedged customer lookups in integrations.customer_data_manager."""
+
+import asyncio
+import time
+from types import SimpleNamespace
+
+from entities.customer import Customer
+from integrations import customer_data_manager
+from integrations.customer_data_manager import CustomerDataManager
+from integrations.latency_tracker import LatencyTracker
+from models.business_config import BusinessConfig
+
+
+def _provider(name):
+    return SimpleNamespace(provider_name=name, provider_key=name, config=SimpleNamespace(custom_config={}))
+
+
+def _manager(lookups, **settings):
+    """Manager whose per-provider lookups are ``lookups[name]`` = (seconds, customer or None)."""
+    manager = CustomerDataManager(BusinessConfig(
+        business_name="Test", industry="retail", primary_data_provider="primary", **settings
+    ))
+    manager.started = []
+    manager.cancelled = []
+
+    async def timed_lookup(provider, identifier, identifier_type):
+        manager.started.append(provider.provider_name)
+        seconds, customer = lookups[provider.provider_name]
+        try:
+            await asyncio.sleep(seconds)
+        except asyncio.CancelledError:
+            manager.cancelled.append(provider.provider_name)
+            raise
+        return customer
+
+    manager._timed_lookup = timed_lookup
+    return manager
+
+
+def _race(manager, hedge_delay):
+    async def run():
+        started = time.perf_counter()
+        customer = await manager._race_lookup(
+            [_provider("primary"), _provider("secondary")], "a@example.com", "email", hedge_delay
+        )
+        elapsed = time.perf_counter() - started
+        # Let cancelled lookups finish unwinding
+        await asyncio.sleep(0)
+        return customer, elapsed
+
+    return asyncio.run(run())
+
+
+def test_fast_primary_is_not_hedged():
+    manager = _manager({"primary": (0.01, Customer(customer_id="p")), "secondary": (0.01, Customer(customer_id="s"))})
+    customer, _ = _race(manager, hedge_delay=1.0)
+    assert customer.customer_id == "p"
+    assert manager.started == ["primary"]
+
+
+def test_slow_primary_is_hedged_and_cancelled():
+    manager = _manager({"primary": (5.0, Customer(customer_id="p")), "secondary": (0.01, Customer(customer_id="s"))})
+    customer, elapsed = _race(manager, hedge_delay=0.05)
+    assert customer.customer_id == "s"
+    assert manager.started == ["primary", "secondary"]
+    assert manager.cancelled == ["primary"]
+    assert elapsed < 1.0
+
+
+def test_primary_miss_starts_the_others_without_waiting():
+    manager = _manager({"primary": (0.01, None), "secondary": (0.01, Customer(customer_id="s"))})
+    customer, elapsed = _race(manager, hedge_delay=5.0)
+    assert customer.customer_id == "s"
+    assert elapsed < 1.0
+
+
+def test_concurrent_lookup_cancels_the_losers():
+    manager = _manager({"primary": (5.0, Customer(customer_id="p")), "secondary": (0.01, Customer(customer_id="s"))})
+    customer, _ = _race(manager, hedge_delay=None)
+    assert customer.customer_id == "s"
+    assert manager.started == ["primary", "secondary"]
+    assert manager.cancelled == ["primary"]
+
+
+def test_hedge_delay_follows_the_primary_latency(monkeypatch):
+    tracker = LatencyTracker(min_samples=20)
+    monkeypatch.setattr(customer_data_manager, "provider_latency", tracker)
+    manager = _manager({}, hedge_percentile=0.9, hedge_default_delay_seconds=0.5, provider_timeout_seconds=5.0)
+    primary = _provider("primary")
+
+    # Too few samples: the default delay
+    assert manager._hedge_delay(primary) == 0.5
+
+    for i in range(1, 21):
+        tracker.record("primary", i / 100)
+    assert manager._hedge_delay(primary) == 0.18
+
+    # Never longer than the provider's timeout
+    primary.config.custom_config["timeout_seconds"] = 0.1
+    assert manager._hedge_delay(primary) == 0.1
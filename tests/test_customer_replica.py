@@ -0,0 +1,50 @@
+"""Tests for integrations.customer_replica and replica-served lookups."""
+
+import asyncio
+import time
+from datetime import datetime, timezone
+
+import pytest
+
+from entities.customer import Customer
+from integrations.customer_data_manager import CustomerDataManager
+from integrations.customer_replica import CustomerReplica
+
+
+@pytest.fixture
+def replica(tmp_path):
+    replica = CustomerReplica(str(tmp_path / "replica.db"))
+    yield replica
+    replica.close()
+
+
+class _Provider:
+    provider_key = "crm"
+    provider_name = "crm"
+
+
+class _BusinessConfig:
+    replica_max_staleness_seconds = 60
+
+
+def _manager():
+    manager = CustomerDataManager.__new__(CustomerDataManager)
+    manager.business_config = _BusinessConfig()
+    return manager
+
+
+def test_replica_lookup_within_staleness_bound(replica, monkeypatch):
+    from integrations import customer_data_manager
+
+    monkeypatch.setattr(customer_data_manager, "customer_replica", replica)
+    replica.upsert_many("crm", [Customer(customer_id="1", email="alice@example.com")])
+
+    # Never synced: no complete-as-of point to serve from
+    assert asyncio.run(_manager()._replica_lookup(_Provider(), "alice@example.com", "email")) is None
+
+    replica.mark_synced("crm", datetime.now(timezone.utc), complete_as_of=time.time(), records=1)
+    customer = asyncio.run(_manager()._replica_lookup(_Provider(), "Alice@Example.com", "email"))
+    assert customer.customer_id == "1"
+
+    replica.mark_synced("crm", datetime.now(timezone.utc), complete_as_of=time.time() - 120, records=0)
+    assert asyncio.run(_manager()._replica_lookup(_Provider(), "1", "id")) is None
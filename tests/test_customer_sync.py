@@ -0,0 +1,71 @@
+"""Tests for integrations.customer_sync."""
+
+import asyncio
+
+import pytest
+
+from entities.customer import Customer
+from integrations import customer_sync
+from integrations.customer_cache import CustomerCache
+from integrations.customer_replica import CustomerReplica
+from integrations.identity_index import IdentityIndex
+
+
+@pytest.fixture
+def stores(tmp_path, monkeypatch):
+    replica = CustomerReplica(str(tmp_path / "replica.db"))
+    index = IdentityIndex(str(tmp_path / "identity.db"))
+    cache = CustomerCache()
+    monkeypatch.setattr(customer_sync, "customer_replica", replica)
+    monkeypatch.setattr(customer_sync, "identity_index", index)
+    monkeypatch.setattr(customer_sync, "customer_cache", cache)
+    yield replica, cache
+    replica.close()
+    index.close()
+
+
+class _Provider:
+    provider_key = "crm:test"
+    provider_name = "test"
+
+    def __init__(self, customers, error=None):
+        self.customers = customers
+        self.error = error
+
+    async def iter_changed_customers(self, since=None, page_size=100):
+        for customer in self.customers:
+            yield customer
+        if self.error:
+            raise self.error
+
+
+def test_sync_drops_only_changed_customers_from_the_cache(stores):
+    replica, cache = stores
+    changed = Customer(customer_id="1", email="alice@example.com")
+    unchanged = Customer(customer_id="2", email="bob@example.com")
+    cache.store("crm:test", "id", "1", Customer(customer_id="1", email="old@example.com"))
+    cache.store("crm:test", "email", "alice@example.com", None)
+    cache.store("crm:test", "id", "2", unchanged)
+
+    result = asyncio.run(customer_sync.sync_provider(_Provider([changed])))
+
+    assert result == {"status": "success", "records": 1}
+    assert cache.lookup("crm:test", "id", "1") == (False, None)
+    assert cache.lookup("crm:test", "email", "alice@example.com") == (False, None)
+    assert cache.lookup("crm:test", "id", "2") == (True, unchanged)
+    assert replica.get("crm:test", "1").email == "alice@example.com"
+
+
+def test_failed_save_still_marks_the_sync_failed(stores, monkeypatch):
+    replica, _ = stores
+
+    def broken_upsert(provider_key, customers):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(replica, "upsert_many", broken_upsert)
+    provider = _Provider([Customer(customer_id="1")], error=RuntimeError("connection reset"))
+
+    result = asyncio.run(customer_sync.sync_provider(provider))
+
+    assert result["status"] == "error"
+    assert replica.sync_state("crm:test")["last_error"] == "connection reset"
@@ -0,0 +1,78 @@
+"""Tests for integrations.identity_index and identity-indexed lookups."""
+
+import asyncio
+import threading
+
+import pytest
+
+from entities.customer import Customer
+from integrations.customer_data_manager import CustomerDataManager
+from integrations.identity_index import IdentityIndex, normalize_phone
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = IdentityIndex(str(tmp_path / "identity.db"))
+    yield index
+    index.close()
+
+
+def test_records_sharing_an_email_get_one_key(index):
+    first = index.record("crm", Customer(customer_id="1", email="Alice@Example.com"))
+    second = index.record("shop", Customer(customer_id="a-9", email="alice@example.com "))
+    assert first == second
+    assert index.resolve("alice@example.com", "email")["records"] == {"crm": "1", "shop": "a-9"}
+
+
+def test_id_lookup_is_scoped_to_a_provider(index):
+    index.record("primary", Customer(customer_id="123", email="alice@example.com"))
+    index.record("secondary", Customer(customer_id="123", email="bob@example.com"))
+
+    assert index.resolve("123", "id", "primary")["records"] == {"primary": "123"}
+    assert index.resolve("123", "id", "secondary")["records"] == {"secondary": "123"}
+    # Ambiguous without a provider
+    assert index.resolve("123", "id") is None
+
+
+def test_run_calls_off_the_event_loop_thread(index):
+    async def record():
+        key = await index.run(index.record, "crm", Customer(customer_id="1", email="alice@example.com"))
+        thread = await index.run(threading.get_ident)
+        return key, thread
+
+    key, thread = asyncio.run(record())
+    assert thread != threading.get_ident()
+    assert index.resolve("alice@example.com", "email")["customer_key"] == key
+
+
+def test_normalize_phone():
+    assert normalize_phone("(555) 123-4567") == "+15551234567"
+    assert normalize_phone("0044 20 7946 0958") == "+442079460958"
+    assert normalize_phone("12") is None
+
+
+class _Provider:
+    def __init__(self, provider_key):
+        self.provider_key = provider_key
+        self.provider_name = provider_key
+
+
+def test_bare_id_lookup_resolves_in_primary_provider(index, monkeypatch):
+    from integrations import customer_data_manager
+
+    monkeypatch.setattr(customer_data_manager, "identity_index", index)
+    index.record("primary", Customer(customer_id="123", email="alice@example.com"))
+    index.record("secondary", Customer(customer_id="123", email="bob@example.com"))
+
+    manager = CustomerDataManager.__new__(CustomerDataManager)
+    manager.primary_provider = _Provider("primary")
+    manager.providers = {"primary": manager.primary_provider, "secondary": _Provider("secondary")}
+    looked_up = []
+
+    async def timed_lookup(provider, identifier, identifier_type):
+        looked_up.append((provider.provider_key, identifier))
+        return Customer(customer_id=identifier)
+
+    manager._timed_lookup = timed_lookup
+    asyncio.run(manager._indexed_lookup("123", "id"))
+    assert looked_up == [("primary", "123")]
@@ -0,0 +1,96 @@
+"""Tests for integrations.oauth."""
+
+import asyncio
+
+from integrations.oauth import TokenManager
+
+
+class _Fetcher:
+    """Token endpoint handing out token-1, token-2, ... after a short delay."""
+
+    def __init__(self, expires_in=3600, fail=False):
+        self.expires_in = expires_in
+        self.fail = fail
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        if self.fail:
+            raise RuntimeError("token endpoint down")
+        return {"access_token": f"token-{self.calls}", "expires_in": self.expires_in}
+
+
+def test_concurrent_callers_share_one_token_request():
+    manager = TokenManager(refresh_margin=60)
+    fetch = _Fetcher()
+
+    async def run():
+        return await asyncio.gather(*(manager.get_token("crm", fetch) for _ in range(10)))
+
+    tokens = asyncio.run(run())
+    assert tokens == ["token-1"] * 10
+    assert fetch.calls == 1
+    assert manager.stats()["fetches"] == 1
+
+
+def test_token_near_expiry_is_served_while_refreshed_in_background():
+    manager = TokenManager(refresh_margin=60)
+    # Valid for 30 more seconds: within the refresh margin
+    fetch = _Fetcher(expires_in=30)
+
+    async def run():
+        first = await manager.get_token("crm", fetch)
+        fetch.expires_in = 3600
+        during = await asyncio.gather(*(manager.get_token("crm", fetch) for _ in range(5)))
+        await asyncio.sleep(0.05)
+        after = await manager.get_token("crm", fetch)
+        return first, during, after
+
+    first, during, after = asyncio.run(run())
+    assert first == "token-1"
+    assert during == ["token-1"] * 5
+    assert after == "token-2"
+    assert fetch.calls == 2
+    assert manager.stats()["background_refreshes"] == 1
+
+
+def test_failed_background_refresh_keeps_the_current_token():
+    manager = TokenManager(refresh_margin=60)
+    fetch = _Fetcher(expires_in=30)
+
+    async def run():
+        await manager.get_token("crm", fetch)
+        fetch.fail = True
+        current = await manager.get_token("crm", fetch)
+        await asyncio.sleep(0.05)
+        return current, await manager.get_token("crm", fetch)
+
+    assert asyncio.run(run()) == ("token-1", "token-1")
+
+
+def test_expired_token_is_fetched_again():
+    manager = TokenManager(refresh_margin=0)
+    fetch = _Fetcher(expires_in=-1)
+
+    async def run():
+        return [await manager.get_token("crm", fetch) for _ in range(2)]
+
+    assert asyncio.run(run()) == ["token-1", "token-2"]
+
+
+def test_invalidate_keeps_a_newer_token():
+    manager = TokenManager(refresh_margin=0)
+    fetch = _Fetcher()
+
+    async def run():
+        rejected = await manager.get_token("crm", fetch)
+        manager.invalidate("crm", rejected)
+        renewed = await manager.get_token("crm", fetch)
+        # A late rejection of the old token leaves the new one in place
+        manager.invalidate("crm", rejected)
+        return renewed, await manager.get_token("crm", fetch)
+
+    assert asyncio.run(run()) == ("token-2", "token-2")
+    assert fetch.calls == 2
+    assert manager.stats()["rejections"] == 1
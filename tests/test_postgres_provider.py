@@ -0,0 +1,298 @@
+"""Tests for integrations.database.postgres_provider.
+
+The unit tests run the provider's paging and COPY code against in-memory
+rows. The ``postgres`` tests run against a real database and are skipped
+unless ``POSTGRES_TEST_DSN`` is set, e.g.
+``POSTGRES_TEST_DSN=postgresql://postgres@localhost/postgres``.
+"""
+
+import asyncio
+import os
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from integrations.base_provider import IntegrationConfig
+from integrations.database.postgres_provider import PostgreSQLProvider, _identifier, _unescape_copy_field
+
+POSTGRES_TEST_DSN = os.environ.get("POSTGRES_TEST_DSN")
+
+
+def _provider(table_name="customers", **custom_config) -> PostgreSQLProvider:
+    return PostgreSQLProvider(IntegrationConfig(
+        provider_type="postgresql",
+        provider_name="test",
+        database_url=POSTGRES_TEST_DSN or "postgresql://localhost/test",
+        custom_config={"table_name": table_name, **custom_config}
+    ))
+
+
+async def _collect(iterator):
+    return [item async for item in iterator]
+
+
+class _FakeTable:
+    """Rows of a customers table, queried the way the provider's SQL would."""
+
+    def __init__(self, provider, rows):
+        self.names = {query: name for name, query in provider.queries.items()}
+        self.rows = rows
+        self.calls = []
+
+    @staticmethod
+    def _modified(row):
+        return row["updated_at"] or row["created_at"]
+
+    async def fetch(self, query, *args):
+        name = self.names[query]
+        self.calls.append((name, args))
+        if name in ("search", "search_after"):
+            pattern = args[0].strip("%").lower()
+            rows = sorted(
+                (row for row in self.rows if pattern in (row["email"] or "").lower()),
+                key=lambda row: row["id"]
+            )
+            if name == "search_after":
+                rows = [row for row in rows if row["id"] > args[1]]
+            return rows[:args[-1]]
+        if name == "changed":
+            rows = [row for row in self.rows if self._modified(row) > args[0]]
+        elif name == "changed_after":
+            rows = [row for row in self.rows if (self._modified(row), row["id"]) > (args[0], args[1])]
+        else:
+            raise AssertionError(f"Unexpected query {name}")
+        rows.sort(key=lambda row: (self._modified(row), row["id"]))
+        return [{**row, "sync_modified_at": self._modified(row)} for row in rows[:args[-1]]]
+
+
+def _rows(count, modified):
+    return [
+        {
+            "id": i,
+            "first_name": f"Customer {i}",
+            "last_name": "Test",
+            "email": f"customer{i}@example.com",
+            "phone": None,
+            "company": None,
+            "created_at": modified(i),
+            "updated_at": None
+        }
+        for i in range(1, count + 1)
+    ]
+
+
+def test_identifiers_are_validated():
+    assert _identifier("crm.customers") == "crm.customers"
+    for name in ("customers; DROP TABLE x", "1customers", "a.b.c", ""):
+        with pytest.raises(ValueError):
+            _identifier(name)
+
+
+def test_keyset_query_shapes():
+    queries = _provider().queries
+    assert queries["search_after"].endswith("AND id > $2 ORDER BY id LIMIT $3")
+    assert "WHERE (COALESCE(updated_at, created_at), id) > ($1, $2)" in queries["changed_after"]
+    assert queries["changed_after"].endswith("ORDER BY COALESCE(updated_at, created_at), id LIMIT $3")
+    assert "(created_at, id) < ($2, $3)" in queries["history_before"]
+    assert " OFFSET " not in " ".join(queries.values())
+
+
+def test_iter_customers_pages_by_id():
+    provider = _provider()
+    table = _FakeTable(provider, _rows(7, lambda i: datetime(2024, 1, 1)))
+    provider._fetch = table.fetch
+
+    customers = asyncio.run(_collect(provider.iter_customers("example.com", page_size=3)))
+
+    assert [customer.customer_id for customer in customers] == [str(i) for i in range(1, 8)]
+    assert [(name, args[1:-1]) for name, args in table.calls] == [
+        ("search", ()), ("search_after", (3,)), ("search_after", (6,))
+    ]
+
+
+def test_changed_cursor_keeps_rows_sharing_a_timestamp():
+    provider = _provider()
+    # Rows 2-5 share a modification time and straddle the page boundary
+    base = datetime(2024, 1, 1)
+    table = _FakeTable(provider, _rows(6, lambda i: base + timedelta(minutes=1 if 2 <= i <= 5 else i)))
+    table.rows[0]["updated_at"] = base + timedelta(minutes=10)
+    provider._fetch = table.fetch
+
+    since = datetime(2023, 12, 31, tzinfo=timezone.utc)
+    customers = asyncio.run(_collect(provider.iter_changed_customers(since, page_size=3)))
+
+    assert [customer.customer_id for customer in customers] == ["2", "3", "4", "5", "6", "1"]
+    assert [name for name, _ in table.calls] == ["changed", "changed_after", "changed_after"]
+    # The cursor is the last row's (modification time, id)
+    assert table.calls[1][1][:2] == (base + timedelta(minutes=1), 4)
+    # Since is passed as a naive local time, like updated_at is stored
+    assert table.calls[0][1][0].tzinfo is None
+
+
+def test_unescape_copy_field():
+    assert _unescape_copy_field("\\N") is None
+    assert _unescape_copy_field("") == ""
+    assert _unescape_copy_field("plain") == "plain"
+    assert _unescape_copy_field("a\\tb\\nc\\\\d") == "a\tb\nc\\d"
+    assert _unescape_copy_field("\\\\N") == "\\N"
+    # Unknown escapes stand for the character itself
+    assert _unescape_copy_field("\\x") == "x"
+
+
+class _FakeConnection:
+    def __init__(self, copy_output=b"", chunk_size=7):
+        self.copy_output = copy_output
+        self.chunk_size = chunk_size
+        self.copied_in = None
+
+    async def copy_from_query(self, query, output, format):
+        assert format == "text"
+        for start in range(0, len(self.copy_output), self.chunk_size):
+            await output(self.copy_output[start:start + self.chunk_size])
+
+    async def copy_records_to_table(self, table_name, schema_name, records, columns):
+        self.copied_in = {"table_name": table_name, "schema_name": schema_name, "records": records, "columns": columns}
+
+
+class _FakePool:
+    def __init__(self, connection):
+        self.connection = connection
+
+    @asynccontextmanager
+    async def acquire(self):
+        yield self.connection
+
+
+def _use_connection(provider, connection):
+    async def get_pool():
+        return _FakePool(connection)
+
+    provider._get_connection_pool = get_pool
+
+
+def test_export_parses_copy_text_split_across_chunks():
+    provider = _provider(columns=["first_name", "email", "phone"])
+    lines = [
+        "1\tZoë\tzoe@example.com\t\\N",
+        "2\tAnn\\tMarie\\nSmith\tann\\\\@example.com\t+15551234567",
+    ]
+    # Chunks of 7 bytes split rows, escapes and the two-byte "ë"
+    connection = _FakeConnection(("\n".join(lines) + "\n").encode("utf-8"))
+    _use_connection(provider, connection)
+
+    customers = asyncio.run(_collect(provider.export_customers(buffer_rows=1)))
+
+    assert [customer.customer_id for customer in customers] == ["1", "2"]
+    assert customers[0].first_name == "Zoë"
+    assert customers[0].phone is None
+    assert customers[1].first_name == "Ann\tMarie\nSmith"
+    assert customers[1].email == "ann\\@example.com"
+
+
+def test_import_customers_copies_rows_in_column_order():
+    provider = _provider(table_name="crm.customers", columns=["first_name", "email"])
+    connection = _FakeConnection()
+    _use_connection(provider, connection)
+
+    count = asyncio.run(provider.import_customers([
+        {"email": "a@example.com", "first_name": "A", "ignored": 1},
+        {"first_name": "B"},
+    ]))
+
+    assert count == 2
+    assert connection.copied_in == {
+        "table_name": "customers",
+        "schema_name": "crm",
+        "records": [("A", "a@example.com"), ("B", None)],
+        "columns": ["first_name", "email"]
+    }
+
+
+def test_import_customers_rejects_invalid_columns():
+    provider = _provider()
+    _use_connection(provider, _FakeConnection())
+    with pytest.raises(ValueError):
+        asyncio.run(provider.import_customers([{}], columns=["email; DROP TABLE customers"]))
+
+
+@pytest.fixture
+def postgres_table():
+    """Empty customers table in the POSTGRES_TEST_DSN database, dropped afterwards."""
+    if not POSTGRES_TEST_DSN:
+        pytest.skip("POSTGRES_TEST_DSN is not set")
+    import asyncpg
+
+    table_name = f"test_customers_{uuid.uuid4().hex[:8]}"
+
+    async def execute(sql):
+        connection = await asyncpg.connect(POSTGRES_TEST_DSN)
+        try:
+            await connection.execute(sql)
+        finally:
+            await connection.close()
+
+    asyncio.run(execute(
+        f"CREATE TABLE {table_name} (id SERIAL PRIMARY KEY, first_name TEXT, last_name TEXT, email TEXT, "
+        f"phone TEXT, company TEXT, created_at TIMESTAMP, updated_at TIMESTAMP)"
+    ))
+    yield table_name
+    asyncio.run(execute(f"DROP TABLE IF EXISTS {table_name}"))
+
+
+def _records(count, created_at):
+    return [
+        {
+            "first_name": f"Customer\t{i}",
+            "last_name": "Test\\Case",
+            "email": f"customer{i}@example.com",
+            "phone": None,
+            "company": "Line\nBreak",
+            "created_at": created_at,
+            "updated_at": None
+        }
+        for i in range(count)
+    ]
+
+
+@pytest.mark.postgres
+def test_postgres_import_and_export_round_trip(postgres_table):
+    provider = _provider(postgres_table)
+
+    async def run():
+        try:
+            imported = await provider.import_customers(_records(25, datetime(2024, 1, 1)))
+            exported = await _collect(provider.export_customers(buffer_rows=4))
+            paged = await _collect(provider.iter_customers("example.com", page_size=10))
+            return imported, exported, paged
+        finally:
+            await provider.close()
+
+    imported, exported, paged = asyncio.run(run())
+    assert imported == 25
+    assert len(exported) == 25
+    assert {customer.first_name for customer in exported} == {f"Customer\t{i}" for i in range(25)}
+    assert exported[0].last_name == "Test\\Case"
+    assert exported[0].phone is None
+    assert sorted(int(customer.customer_id) for customer in paged) == list(range(1, 26))
+    assert len({customer.customer_id for customer in paged}) == 25
+
+
+@pytest.mark.postgres
+def test_postgres_changed_customers_since(postgres_table):
+    provider = _provider(postgres_table)
+    # Naive local times, as the provider writes them
+    old = datetime(2024, 1, 1)
+    recent = datetime.now().replace(microsecond=0) - timedelta(minutes=5)
+
+    async def run():
+        try:
+            await provider.import_customers(_records(3, old) + _records(7, recent))
+            since = (recent - timedelta(minutes=1)).astimezone()
+            return await _collect(provider.iter_changed_customers(since, page_size=3))
+        finally:
+            await provider.close()
+
+    changed = asyncio.run(run())
+    assert [int(customer.customer_id) for customer in changed] == list(range(4, 11))
@@ -0,0 +1,93 @@
+"""Tests for integrations.rate_limiter."""
+
+import asyncio
+
+import pytest
+
+from integrations.rate_limiter import BULK, INTERACTIVE, RateLimiter, RateLimitError
+
+
+def _limiter(**settings):
+    return RateLimiter("crm", {
+        "rate_limit_requests_per_second": 0.01,
+        "rate_limit_burst": 10,
+        "rate_limit_bulk_reserve": 0.2,
+        "rate_limit_daily_reserve": 0.01,
+        "rate_limit_max_retries": 3,
+        "rate_limit_backoff_base_seconds": 0.5,
+        "rate_limit_backoff_max_seconds": 30,
+        **settings
+    })
+
+
+async def _acquired(limiter, priority, timeout=0.05) -> bool:
+    try:
+        await asyncio.wait_for(limiter.acquire(priority), timeout)
+        return True
+    except asyncio.TimeoutError:
+        return False
+
+
+def test_bulk_lane_leaves_the_reserve_to_interactive_requests():
+    limiter = _limiter()
+
+    async def run():
+        bulk = 0
+        while await _acquired(limiter, BULK):
+            bulk += 1
+        interactive = 0
+        while await _acquired(limiter, INTERACTIVE):
+            interactive += 1
+        return bulk, interactive
+
+    # Bulk requests stop once only the 20% reserve is left
+    assert asyncio.run(run()) == (8, 2)
+
+
+def test_bulk_request_waits_while_interactive_ones_are_queued():
+    limiter = _limiter(rate_limit_requests_per_second=20, rate_limit_burst=1, rate_limit_bulk_reserve=0)
+    order = []
+
+    async def request(priority):
+        await limiter.acquire(priority)
+        order.append(priority)
+
+    async def run():
+        await limiter.acquire(INTERACTIVE)
+        # Both wait for the next token; the bulk request asked first
+        bulk = asyncio.create_task(request(BULK))
+        await asyncio.sleep(0)
+        interactive = asyncio.create_task(request(INTERACTIVE))
+        await asyncio.gather(bulk, interactive)
+
+    asyncio.run(run())
+    assert order == [INTERACTIVE, BULK]
+
+
+def test_bulk_requests_refused_when_daily_quota_is_low():
+    limiter = _limiter()
+    limiter.update_from_headers({"Sforce-Limit-Info": "api-usage=14900/15000"})
+
+    async def run():
+        with pytest.raises(RateLimitError):
+            await limiter.acquire(BULK)
+        return await _acquired(limiter, INTERACTIVE)
+
+    assert asyncio.run(run())
+    assert limiter.stats()["refused"] == 1
+    assert limiter.stats()["daily_used"] == 14900
+
+
+def test_vendor_headers_correct_the_bucket():
+    limiter = _limiter()
+    limiter.update_from_headers({"X-Shopify-Shop-Api-Call-Limit": "38/40"})
+    assert limiter.capacity == 40
+    assert limiter.stats()["tokens"] == 2
+
+    limiter.update_from_headers({
+        "X-HubSpot-RateLimit-Max": "100",
+        "X-HubSpot-RateLimit-Interval-Milliseconds": "10000",
+        "X-HubSpot-RateLimit-Remaining": "1"
+    })
+    assert limiter.rate == 10
+    assert limiter.stats()["tokens"] <= 1.1
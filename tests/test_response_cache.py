@@ -0,0 +1,100 @@
+"""Tests for shared_libraries.response_cache and knowledge file reloading."""
+
+import threading
+
+import pytest
+
+from config import config
+from knowledge import retrieval, search_index
+from knowledge.index_builder import write_index
+from shared_libraries.response_cache import ResponseCache
+
+ROUTE = {"agent": config.knowledge_agent.name, "category": "account"}
+
+
+@pytest.fixture
+def knowledge_files(tmp_path, monkeypatch):
+    index_path = str(tmp_path / "knowledge_index.bin")
+    monkeypatch.setattr(config, "knowledge_index_path", index_path)
+    monkeypatch.setattr(config, "knowledge_embeddings_path", str(tmp_path / "embeddings.npy"))
+    monkeypatch.setattr(config, "knowledge_retrieval_mode", "keyword")
+    monkeypatch.setattr(config, "knowledge_reload_check_seconds", 0.001)
+    write_index([{"title": "Reset your password", "content": "Use the forgot password link."}], index_path)
+    monkeypatch.setattr(search_index, "_index", None)
+    monkeypatch.setattr(retrieval, "_retriever", None)
+    monkeypatch.setattr(retrieval, "_files_signature", None)
+    monkeypatch.setattr(retrieval, "_files_checked_at", 0.0)
+    monkeypatch.setattr(retrieval, "_reload_thread", None)
+    retrieval.get_knowledge_retriever()
+    return index_path
+
+
+def test_answers_are_not_shared_between_tenants(knowledge_files):
+    cache = ResponseCache(similarity_threshold=0)
+    assert cache.store("How do I reset my password?", ROUTE, "acme", "Use the link.", config.knowledge_agent.name)
+
+    assert cache.lookup("how do i reset my password", ROUTE, "acme")["text"] == "Use the link."
+    assert cache.lookup("how do i reset my password", ROUTE, "globex") is None
+
+
+def test_rebuilt_index_is_reloaded_and_invalidates_answers(knowledge_files):
+    cache = ResponseCache(similarity_threshold=0)
+    cache.store("How do I reset my password?", ROUTE, "acme", "Use the link.", config.knowledge_agent.name)
+    version = search_index.get_knowledge_version()
+
+    write_index([
+        {"title": "Reset your password", "content": "Passwords are now reset from the security page."},
+        {"title": "Request a refund", "content": "Refunds are issued within five days."},
+    ], knowledge_files)
+    retrieval._files_checked_at = 0.0
+
+    # The lookup starts the reload; the answer goes once the new index is in place
+    cache.lookup("How do I reset my password?", ROUTE, "acme")
+    assert retrieval.wait_for_reload(5)
+    assert cache.lookup("How do I reset my password?", ROUTE, "acme") is None
+    assert search_index.get_knowledge_version() == version + 1
+    assert retrieval.get_knowledge_retriever().keyword_index.doc_count == 2
+
+
+def test_old_retriever_serves_until_reload_finishes(knowledge_files, monkeypatch):
+    old = retrieval.get_knowledge_retriever()
+    version = search_index.get_knowledge_version()
+    opening = threading.Event()
+    release = threading.Event()
+    opens = []
+    open_retriever = retrieval._open_knowledge_retriever
+
+    def slow_open(keyword_index=None):
+        opens.append(keyword_index)
+        opening.set()
+        release.wait(5)
+        return open_retriever(keyword_index)
+
+    monkeypatch.setattr(retrieval, "_open_knowledge_retriever", slow_open)
+    write_index([
+        {"title": "Reset your password", "content": "Use the security page."},
+        {"title": "Request a refund", "content": "Refunds take five days."},
+    ], knowledge_files)
+    retrieval._files_checked_at = 0.0
+
+    assert retrieval.check_knowledge_files()
+    assert opening.wait(5)
+    # A second check while the reload runs does not start another one
+    retrieval._files_checked_at = 0.0
+    assert not retrieval.check_knowledge_files()
+    assert retrieval.get_knowledge_retriever() is old
+    assert search_index.get_knowledge_version() == version
+
+    release.set()
+    assert retrieval.wait_for_reload(5)
+    assert len(opens) == 1
+    assert retrieval.get_knowledge_retriever() is not old
+    assert retrieval.get_knowledge_retriever().keyword_index.doc_count == 2
+    assert search_index.get_knowledge_version() == version + 1
+
+
+def test_unchanged_files_are_not_reloaded(knowledge_files):
+    version = search_index.get_knowledge_version()
+    retrieval._files_checked_at = 0.0
+    assert not retrieval.check_knowledge_files()
+    assert search_index.get_knowledge_version() == version
@@ -0,0 +1,224 @@
+"""Tests for agents.session_cache against a SQLite DatabaseSessionService."""
+
+import asyncio
+
+from google.adk.events import Event
+from google.adk.sessions import DatabaseSessionService
+from google.adk.sessions.base_session_service import GetSessionConfig
+from google.genai import types
+
+from agents.session_cache import INTERVAL, ON_CLOSE, CachedSessionService
+from config import config
+
+APP = "test_app"
+USER = "user"
+
+
+def _event(text: str) -> Event:
+    return Event(author="user", content=types.Content(role="user", parts=[types.Part(text=text)]))
+
+
+def _texts(session) -> list:
+    return [event.content.parts[0].text for event in session.events]
+
+
+def _database(tmp_path) -> DatabaseSessionService:
+    return DatabaseSessionService(f"sqlite+aiosqlite:///{tmp_path / 'sessions.db'}")
+
+
+async def _stored(backend, session_id):
+    return _texts(await backend.get_session(app_name=APP, user_id=USER, session_id=session_id))
+
+
+def test_write_behind_flushes_events_in_order(tmp_path):
+    async def run():
+        cache = CachedSessionService(_database(tmp_path), durability=ON_CLOSE)
+        session = await cache.create_session(app_name=APP, user_id=USER)
+        for i in range(5):
+            await cache.append_event(session, _event(f"message {i}"))
+
+        before = await _stored(cache.backend, session.id)
+        pending = cache.stats()["pending_events"]
+        await cache.flush()
+        after = await _stored(cache.backend, session.id)
+        flushed = cache.flushed
+        await cache.close()
+        return before, pending, after, flushed
+
+    before, pending, after, flushed = asyncio.run(run())
+    assert before == []
+    assert pending == 5
+    assert after == [f"message {i}" for i in range(5)]
+    assert flushed == 5
+
+
+def test_interval_flush_writes_in_the_background(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "session_cache_flush_interval_seconds", 0.01)
+
+    async def run():
+        cache = CachedSessionService(_database(tmp_path), durability=INTERVAL)
+        session = await cache.create_session(app_name=APP, user_id=USER)
+        await cache.append_event(session, _event("hello"))
+        for _ in range(100):
+            if cache.flushed:
+                break
+            await asyncio.sleep(0.01)
+        stored = await _stored(cache.backend, session.id)
+        await cache.close()
+        return stored
+
+    assert asyncio.run(run()) == ["hello"]
+
+
+def test_serve_slices_the_cached_window(tmp_path):
+    async def run():
+        cache = CachedSessionService(_database(tmp_path), durability=ON_CLOSE)
+        session = await cache.create_session(app_name=APP, user_id=USER)
+        for i in range(5):
+            await cache.append_event(session, _event(f"message {i}"))
+        middle = session.events[2].timestamp
+
+        def read(**kwargs):
+            return cache.get_session(
+                app_name=APP, user_id=USER, session_id=session.id, config=GetSessionConfig(**kwargs)
+            )
+
+        recent = _texts(await read(num_recent_events=2))
+        none = _texts(await read(num_recent_events=0))
+        after = _texts(await read(after_timestamp=middle))
+        full = await cache.get_session(app_name=APP, user_id=USER, session_id=session.id)
+        hits, misses = cache.hits, cache.misses
+        await cache.close()
+        return recent, none, after, full is session, hits, misses
+
+    recent, none, after, same, hits, misses = asyncio.run(run())
+    assert recent == ["message 3", "message 4"]
+    assert none == []
+    assert after[0] == "message 2" and after[-1] == "message 4"
+    assert same
+    assert (hits, misses) == (4, 0)
+
+
+def test_window_read_reloads_when_the_cache_lacks_history(tmp_path):
+    async def run():
+        backend = _database(tmp_path)
+        session = await backend.create_session(app_name=APP, user_id=USER)
+        for i in range(5):
+            await backend.append_event(session, _event(f"message {i}"))
+
+        cache = CachedSessionService(backend, durability=ON_CLOSE)
+        partial = await cache.get_session(
+            app_name=APP, user_id=USER, session_id=session.id, config=GetSessionConfig(num_recent_events=2)
+        )
+        await cache.append_event(partial, _event("new"))
+        # Wider than the cached window: buffered events are stored, then the history reloaded
+        wider = await cache.get_session(
+            app_name=APP, user_id=USER, session_id=session.id, config=GetSessionConfig(num_recent_events=4)
+        )
+        stored = await _stored(backend, session.id)
+        misses = cache.misses
+        await cache.close()
+        return _texts(wider), stored, misses
+
+    wider, stored, misses = asyncio.run(run())
+    assert wider == ["message 2", "message 3", "message 4", "new"]
+    assert stored == [f"message {i}" for i in range(5)] + ["new"]
+    assert misses == 2
+
+
+def test_reload_carries_over_events_appended_meanwhile(tmp_path):
+    async def run():
+        backend = _database(tmp_path)
+        created = await backend.create_session(app_name=APP, user_id=USER)
+        for text in ("first", "second"):
+            await backend.append_event(created, _event(text))
+
+        cache = CachedSessionService(backend, durability=ON_CLOSE)
+        session = await cache.get_session(
+            app_name=APP, user_id=USER, session_id=created.id, config=GetSessionConfig(num_recent_events=1)
+        )
+
+        # Another task appends while the full history is read from the database
+        read = backend.get_session
+
+        async def get_session(**kwargs):
+            stored = await read(**kwargs)
+            await cache.append_event(session, _event("meanwhile"))
+            return stored
+
+        backend.get_session = get_session
+        reloaded = await cache.get_session(app_name=APP, user_id=USER, session_id=created.id)
+        backend.get_session = read
+
+        pending = cache.stats()["pending_events"]
+        await cache.flush()
+        stored = await _stored(backend, created.id)
+        await cache.close()
+        return _texts(reloaded), pending, stored
+
+    reloaded, pending, stored = asyncio.run(run())
+    assert reloaded == ["first", "second", "meanwhile"]
+    assert pending == 1
+    assert stored == ["first", "second", "meanwhile"]
+
+
+def test_conflicting_worker_replays_onto_the_stored_session(tmp_path):
+    async def run():
+        backend = _database(tmp_path)
+        created = await backend.create_session(app_name=APP, user_id=USER)
+        first = CachedSessionService(backend, durability=ON_CLOSE)
+        second = CachedSessionService(backend, durability=ON_CLOSE)
+        first_session = await first.get_session(app_name=APP, user_id=USER, session_id=created.id)
+        second_session = await second.get_session(app_name=APP, user_id=USER, session_id=created.id)
+
+        await first.append_event(first_session, _event("first worker"))
+        await second.append_event(second_session, _event("second worker 1"))
+        await second.append_event(second_session, _event("second worker 2"))
+        await first.flush()
+        # The second worker's revision is stale now
+        await second.flush()
+
+        stored = await _stored(backend, created.id)
+        result = (stored, second.conflicts, second.holds(APP, USER, created.id), second.stats()["pending_events"])
+        reread = _texts(await second.get_session(app_name=APP, user_id=USER, session_id=created.id))
+        await first.close()
+        await second.close()
+        return result, reread
+
+    (stored, conflicts, held, pending), reread = asyncio.run(run())
+    assert stored == ["first worker", "second worker 1", "second worker 2"]
+    assert conflicts == 1
+    # The stale copy is dropped, so the next read picks up both workers' events
+    assert not held
+    assert pending == 0
+    assert reread == stored
+
+
+def test_eviction_by_idle_time_and_bytes(tmp_path, monkeypatch):
+    async def run():
+        cache = CachedSessionService(_database(tmp_path), durability=ON_CLOSE)
+        idle = await cache.create_session(app_name=APP, user_id=USER)
+        await cache.append_event(idle, _event("idle"))
+        recent = [await cache.create_session(app_name=APP, user_id=USER) for _ in range(3)]
+        for session in recent:
+            await cache.append_event(session, _event("x" * 1000))
+
+        # Idle beyond the limit: stored, then evicted
+        cache._sessions[(APP, USER, idle.id)].last_access -= 60
+        monkeypatch.setattr(config, "session_cache_idle_seconds", 30)
+        # Room for two sessions: the least recently used goes
+        monkeypatch.setattr(
+            config, "session_cache_max_bytes", sum(cache._sessions[(APP, USER, session.id)].size for session in recent[1:])
+        )
+        await cache._evict()
+
+        held = [cache.holds(APP, USER, session.id) for session in [idle] + recent]
+        stored = [await _stored(cache.backend, session.id) for session in (idle, recent[0])]
+        evictions = cache.evictions
+        await cache.close()
+        return held, stored, evictions
+
+    held, stored, evictions = asyncio.run(run())
+    assert held == [False, False, True, True]
+    assert stored == [["idle"], ["x" * 1000]]
+    assert evictions == 2
@@ -0,0 +1,55 @@
+"""Tests for shared_libraries.session_history."""
+
+import threading
+
+import pytest
+
+from config import config
+from shared_libraries import session_history
+from shared_libraries.session_history import ROLLUP_KEY, HistoryArchive, append_history, history_total
+
+
+@pytest.fixture
+def archive(tmp_path, monkeypatch):
+    archive = HistoryArchive(str(tmp_path / "history.db"))
+    monkeypatch.setattr(session_history, "history_archive", archive)
+    monkeypatch.setattr(config, "session_history_max_entries", 3)
+    monkeypatch.setattr(config, "session_history_archive_enabled", True)
+    yield archive
+    archive.close()
+
+
+def test_evicted_entries_are_rolled_up_and_archived_off_thread(archive, monkeypatch):
+    writers = []
+    append = archive.append
+
+    def recording_append(*args):
+        writers.append(threading.get_ident())
+        append(*args)
+
+    monkeypatch.setattr(archive, "append", recording_append)
+    state = {}
+    for i in range(5):
+        append_history(state, "tool_usage", {"tool_name": f"tool_{i % 2}", "timestamp": i, "success": True}, "s1")
+
+    assert [entry["timestamp"] for entry in state["tool_usage"]] == [2, 3, 4]
+    assert state[ROLLUP_KEY]["tool_usage"]["by_name"] == {"tool_0": 1, "tool_1": 1}
+    assert history_total(state, "tool_usage") == 5
+
+    archive.append_later("s1", "noop", []).result()
+    assert writers and threading.get_ident() not in writers
+    assert [row["entry"]["timestamp"] for row in archive.read("s1", "tool_usage")] == [1, 0]
+
+
+def test_archive_failures_are_counted_not_raised(archive, monkeypatch):
+    def fail(*args):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(archive, "append", fail)
+    state = {}
+    for i in range(4):
+        append_history(state, "agent_history", f"agent_{i}", "s1")
+
+    archive._executor.submit(lambda: None).result()
+    assert archive.errors == 1
+    assert len(state["agent_history"]) == 3
@@ -0,0 +1,17 @@
+"""Tests for agents.session_store."""
+
+from agents.session_store import session_read_config
+from config import config
+
+
+def test_read_window_covers_the_verbatim_turns(monkeypatch):
+    monkeypatch.setattr(config, "session_recent_events", 50)
+    monkeypatch.setattr(config, "session_events_per_turn", 8)
+    monkeypatch.setattr(config, "max_conversation_turns", 10)
+    assert session_read_config().num_recent_events == 88
+
+    monkeypatch.setattr(config, "max_conversation_turns", 2)
+    assert session_read_config().num_recent_events == 50
+
+    monkeypatch.setattr(config, "session_recent_events", 0)
+    assert session_read_config() is None
@@ -0,0 +1,104 @@
+"""Tests for agents.session_sweeper against a SQLite session database."""
+
+import asyncio
+import threading
+
+import pytest
+from google.adk.sessions import DatabaseSessionService
+from sqlalchemy import update
+
+from agents import session_sweeper
+from agents.session_sweeper import ABANDONED, SessionSweeper
+from config import config
+from shared_libraries.session_history import HistoryArchive
+
+
+@pytest.fixture
+def archive(tmp_path, monkeypatch):
+    archive = HistoryArchive(str(tmp_path / "history.db"))
+    monkeypatch.setattr(session_sweeper, "history_archive", archive)
+    monkeypatch.setattr(config, "session_sweep_archive", True)
+    monkeypatch.setattr(config, "session_sweep_pause_seconds", 0)
+    yield archive
+    archive.close()
+
+
+async def _expired_sessions(service, count):
+    """Sessions without events, idle for two days (past the abandoned TTL)."""
+    sessions = [await service.create_session(app_name="app", user_id="user") for _ in range(count)]
+    schema = service._get_schema_classes()
+    old = SessionSweeper(service)._cutoff(2 * 86400)
+    async with service.database_session_factory() as sql_session:
+        await sql_session.execute(update(schema.StorageSession).values(update_time=old))
+        await sql_session.commit()
+    return sessions
+
+
+def test_delete_counts_only_deleted_sessions(tmp_path, archive, monkeypatch):
+    service = DatabaseSessionService(f"sqlite+aiosqlite:///{tmp_path / 'sessions.db'}")
+    sweeper = SessionSweeper(service)
+    writers = []
+    append = archive.append
+
+    def recording_append(*args):
+        writers.append(threading.get_ident())
+        append(*args)
+
+    monkeypatch.setattr(archive, "append", recording_append)
+
+    async def run():
+        sessions = await _expired_sessions(service, 3)
+        await service.prepare_tables()
+        batch = await sweeper._read_batch(None)
+        assert len(batch) == 3
+        # Another process deletes one session after the batch was read
+        await service.delete_session(app_name="app", user_id="user", session_id=sessions[0].id)
+        removed = await sweeper._delete([(row, ABANDONED) for row, _ in batch])
+        remaining = await service.list_sessions(app_name="app", user_id="user")
+        return sessions, removed, remaining
+
+    sessions, removed, remaining = asyncio.run(run())
+    assert sorted(row.id for row, _ in removed) == sorted(session.id for session in sessions[1:])
+    assert remaining.sessions == []
+    # Archived before the delete, on the archive's thread
+    assert len(archive.read(sessions[1].id, "session")) == 1
+    assert sweeper.archived == 3
+    assert len(writers) == 3 and threading.get_ident() not in writers
+
+
+def test_failed_archive_keeps_sessions(tmp_path, archive, monkeypatch):
+    service = DatabaseSessionService(f"sqlite+aiosqlite:///{tmp_path / 'sessions.db'}")
+    sweeper = SessionSweeper(service)
+
+    def fail(session_id, key, entries):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(archive, "append", fail)
+
+    async def run():
+        await _expired_sessions(service, 2)
+        deleted = await sweeper.sweep()
+        remaining = await service.list_sessions(app_name="app", user_id="user")
+        return deleted, remaining
+
+    deleted, remaining = asyncio.run(run())
+    assert deleted == 0
+    assert sweeper.deleted[ABANDONED] == 0
+    assert len(remaining.sessions) == 2
+
+
+def test_sweep_deletes_expired_sessions(tmp_path, archive):
+    service = DatabaseSessionService(f"sqlite+aiosqlite:///{tmp_path / 'sessions.db'}")
+    sweeper = SessionSweeper(service)
+
+    async def run():
+        await _expired_sessions(service, 3)
+        fresh = await service.create_session(app_name="app", user_id="user")
+        deleted = await sweeper.sweep()
+        remaining = await service.list_sessions(app_name="app", user_id="user")
+        return fresh, deleted, remaining
+
+    fresh, deleted, remaining = asyncio.run(run())
+    assert deleted == 3
+    assert sweeper.deleted[ABANDONED] == 3
+    assert [session.id for session in remaining.sessions] == [fresh.id]
@@ -0,0 +1,107 @@
+"""Tests for knowledge.vector_index and vector-mode retrieval."""
+
+import numpy as np
+import pytest
+
+from config import config
+from knowledge import vector_index
+from knowledge.retrieval import KnowledgeRetriever
+from knowledge.vector_index import (
+    BruteForceVectorIndex,
+    embed_texts,
+    hashing_embedding,
+    load_embeddings_metadata,
+    open_vector_index,
+    save_embeddings,
+    set_embedding_function,
+)
+
+DOCUMENTS = [
+    {"title": "Reset your password", "content": "Use the forgot password link to reset it."},
+    {"title": "Request a refund", "content": "Refunds are issued within five business days."},
+    {"title": "Change shipping address", "content": "Update the address before the order ships."},
+]
+
+
+class _KeywordIndex:
+    """The parts of the keyword index the vector index and retriever use."""
+
+    def __init__(self, documents):
+        self.documents = documents
+
+    @property
+    def doc_count(self):
+        return len(self.documents)
+
+    def get_document(self, doc_id):
+        return self.documents[doc_id]
+
+
+def _small_embedding(texts):
+    return hashing_embedding(texts, dim=16)
+
+
+@pytest.fixture(autouse=True)
+def embeddings_path(tmp_path, monkeypatch):
+    path = str(tmp_path / "embeddings.npy")
+    monkeypatch.setattr(config, "knowledge_embeddings_path", path)
+    set_embedding_function(hashing_embedding)
+    yield path
+    monkeypatch.setattr(vector_index, "_embedding_function", None)
+    monkeypatch.setattr(vector_index, "_embedder_id", None)
+
+
+def test_saved_embeddings_record_embedder_and_dim(embeddings_path):
+    save_embeddings(vector_index.embed_documents(DOCUMENTS), embeddings_path)
+    metadata = load_embeddings_metadata(embeddings_path)
+    assert metadata == {"rows": 3, "dim": config.knowledge_embedding_dim, "embedder": "hashing"}
+
+
+def test_matching_embeddings_file_is_used(embeddings_path):
+    save_embeddings(np.zeros((3, config.knowledge_embedding_dim), dtype=np.float32), embeddings_path)
+    index = open_vector_index(_KeywordIndex(DOCUMENTS))
+    assert not np.asarray(index.embeddings).any()
+
+
+def test_embeddings_of_other_dimension_are_rebuilt(embeddings_path):
+    set_embedding_function(_small_embedding, "small")
+    save_embeddings(vector_index.embed_documents(DOCUMENTS), embeddings_path)
+
+    set_embedding_function(hashing_embedding)
+    index = open_vector_index(_KeywordIndex(DOCUMENTS))
+    assert index.embeddings.shape == (3, config.knowledge_embedding_dim)
+    # Searching no longer fails in the matrix product
+    assert index.search(embed_texts(["refund"])[0], 1)[0][0] == 1
+
+
+def test_embeddings_of_other_embedder_are_rebuilt(embeddings_path):
+    save_embeddings(np.zeros((3, 16), dtype=np.float32), embeddings_path, embedder_id="other")
+    set_embedding_function(_small_embedding, "small")
+    index = open_vector_index(_KeywordIndex(DOCUMENTS))
+    assert np.asarray(index.embeddings).any()
+
+
+def test_build_cli_selects_embedder(tmp_path, monkeypatch):
+    import json
+    from knowledge import index_builder
+
+    source = tmp_path / "kb"
+    source.mkdir()
+    (source / "articles.json").write_text(json.dumps(DOCUMENTS))
+    output = tmp_path / "embeddings.npy"
+    stats = index_builder.build_index(
+        str(source), str(tmp_path / "index.bin"), str(output), "tests.test_vector_index:_small_embedding"
+    )
+    assert stats["embedder"] == "tests.test_vector_index:_small_embedding"
+    assert load_embeddings_metadata(str(output))["dim"] == 16
+
+
+def test_vector_mode_counts_all_matches():
+    embeddings = vector_index.embed_documents(DOCUMENTS)
+    retriever = KnowledgeRetriever(_KeywordIndex(DOCUMENTS), BruteForceVectorIndex(embeddings), mode="vector")
+    query_vector = embed_texts(["password refund address"])[0]
+    expected = int(np.count_nonzero(embeddings @ query_vector > 0))
+
+    results, total = retriever.search("password refund address", limit=1)
+    assert len(results) == 1
+    assert total == expected > 1
@@ -4,9 +4,15 @@ import logging
 from typing import Dict, Any, List
 from datetime import datetime, timedelta
 
+from .keyword_matcher import register_keyword_table, scan_message
+
 
 logger = logging.getLogger(__name__)
 
+register_keyword_table("escalation_risk", {
+    "critical": ["urgent", "critical", "emergency", "angry"]
+})
+
 def predict_escalation_risk(interaction_data: Dict[str, Any]) -> Dict[str, Any]:
     """
     Predict the likelihood of escalation using ML.
@@ -21,8 +27,7 @@ def predict_escalation_risk(interaction_data: Dict[str, Any]) -> Dict[str, Any]:
     
     # Mock ML prediction - replace with actual ML model
     risk_factors = {
-        "critical_keywords": any(word in interaction_data.get("message", "").lower() 
-                               for word in ["urgent", "critical", "emergency", "angry"]),
+        "critical_keywords": scan_message(interaction_data.get("message", "")).count("escalation_risk", "critical") > 0,
         "previous_escalations": interaction_data.get("customer_history", {}).get("escalations", 0) > 0,
         "complexity_score": len(interaction_data.get("message", "")) > 200,
         "sentiment_negative": interaction_data.get("sentiment", "neutral") == "negative"
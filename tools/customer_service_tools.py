@@ -11,8 +11,49 @@ from typing import Optional
 from google.genai import types
 from google.adk.models import LlmResponse
 
+from knowledge.retrieval import get_knowledge_retriever
+from .keyword_matcher import register_keyword_table, get_keyword_table, scan_message
+
 logger = logging.getLogger(__name__)
 
+# Keyword tables read by the classifiers below; category order is significant
+register_keyword_table("request_category", {
+    "technical": ["error", "bug", "crash", "not working", "broken", "issue", "slow", "performance"],
+    "billing": ["payment", "charge", "invoice", "refund", "subscription", "billing", "cost"],
+    "account": ["login", "password", "access", "profile", "settings", "account", "signin"],
+    "general": ["question", "help", "how to", "information", "guide", "tutorial"]
+})
+
+register_keyword_table("request_priority", {
+    "critical": ["urgent", "critical", "emergency", "down", "outage", "security", "breach", "data loss"],
+    "high": ["important", "asap", "priority", "escalate", "business", "production", "broken"],
+    "medium": ["soon", "when possible", "moderate", "standard", "issue"],
+    "low": ["whenever", "no rush", "low priority", "minor", "question"]
+})
+
+register_keyword_table("request_priority_fallback", {
+    "error": ["error", "crash", "not working"]
+})
+
+register_keyword_table("issue_type", {
+    "application_crash": ["crash", "freeze", "hang", "stop working", "error", "exception"],
+    "login_issues": ["login", "sign in", "password", "authentication", "access", "signin"],
+    "performance_issues": ["slow", "lag", "performance", "speed", "loading", "timeout"],
+    "connectivity_issues": ["connection", "network", "internet", "offline", "timeout", "dns"]
+})
+
+register_keyword_table("satisfaction", {
+    "high": ["excellent", "amazing", "perfect", "love", "fantastic", "outstanding", "great"],
+    "medium": ["good", "okay", "fine", "decent", "satisfied", "helpful", "thanks"],
+    "low": ["disappointed", "frustrated", "angry", "terrible", "awful", "poor", "bad"]
+})
+
+register_keyword_table("resolution", {
+    "resolved": ["yes", "solved", "fixed", "working", "resolved", "thank you", "perfect"],
+    "unresolved": ["no", "still", "not working", "problem", "issue", "help", "broken"],
+    "partial": ["maybe", "partially", "somewhat", "kind of", "better"]
+})
+
 
 # --- Define the Callback Function ---
 def simple_after_model_modifier(
@@ -83,94 +124,13 @@ def search_knowledge_base(query: str, category: str = "") -> Dict[str, Any]:
     """
     logger.info(f"Searching knowledge base for: {query}, category: {category}")
     
-    # Mock knowledge base data
-    knowledge_base = {
-        "faqs": [
-            {
-                "id": "faq_001",
-                "question": "How do I reset my password?",
-                "answer": "To reset your password, go to the login page and click 'Forgot Password'. Enter your email address and follow the instructions sent to your email.",
-                "category": "account",
-                "keywords": ["password", "reset", "login", "forgot", "access"]
-            },
-            {
-                "id": "faq_002",
-                "question": "Why is my payment failing?",
-                "answer": "Payment failures can occur due to insufficient funds, expired cards, or incorrect billing information. Please check your payment method and try again.",
-                "category": "billing",
-                "keywords": ["payment", "failing", "declined", "billing", "card"]
-            },
-            {
-                "id": "faq_003",
-                "question": "How do I update my profile information?",
-                "answer": "You can update your profile by logging into your account and navigating to 'Account Settings'. From there, you can modify your personal information, contact details, and preferences.",
-                "category": "account",
-                "keywords": ["profile", "update", "information", "settings", "account"]
-            }
-        ],
-        "solutions": [
-            {
-                "id": "sol_001",
-                "title": "Application Crash on Startup",
-                "solution": "1. Clear application cache and temporary files\n2. Restart the application\n3. Update to the latest version\n4. Check system requirements\n5. Disable conflicting software\n6. Contact support if issue persists",
-                "category": "technical",
-                "keywords": ["crash", "startup", "error", "application", "launch"]
-            },
-            {
-                "id": "sol_002",
-                "title": "Slow Performance Issues",
-                "solution": "1. Check available system memory and CPU usage\n2. Close unnecessary applications\n3. Clear browser cache and cookies\n4. Update your browser to the latest version\n5. Disable browser extensions temporarily\n6. Check internet connection speed",
-                "category": "technical",
-                "keywords": ["slow", "performance", "lag", "speed", "loading"]
-            }
-        ]
-    }
-    
-    query_lower = query.lower()
-    results = []
-    
-    # Search FAQs
-    for faq in knowledge_base["faqs"]:
-        if category and faq.get("category") != category:
-            continue
-        
-        relevance = 0
-        for keyword in faq.get("keywords", []):
-            if keyword in query_lower:
-                relevance += 1
-        
-        if relevance > 0:
-            results.append({
-                "type": "faq",
-                "content": faq,
-                "relevance_score": relevance / len(faq.get("keywords", [1]))
-            })
-    
-    # Search Solutions
-    for solution in knowledge_base["solutions"]:
-        if category and solution.get("category") != category:
-            continue
-        
-        relevance = 0
-        for keyword in solution.get("keywords", []):
-            if keyword in query_lower:
-                relevance += 1
-        
-        if relevance > 0:
-            results.append({
-                "type": "solution",
-                "content": solution,
-                "relevance_score": relevance / len(solution.get("keywords", [1]))
-            })
-    
-    # Sort by relevance
-    results.sort(key=lambda x: x["relevance_score"], reverse=True)
+    results, total_found = get_knowledge_retriever().search(query, category, limit=5)
     
     return {
         "query": query,
         "category": category,
-        "results": results[:5],  # Top 5 results
-        "total_found": len(results)
+        "results": results,  # Top 5 results
+        "total_found": total_found
     }
 
 def categorize_request(message: str) -> Dict[str, Any]:
@@ -185,24 +145,16 @@ def categorize_request(message: str) -> Dict[str, Any]:
     """
     logger.info(f"Categorizing request: {message[:100]}...")
     
-    category_keywords = {
-        "technical": ["error", "bug", "crash", "not working", "broken", "issue", "slow", "performance"],
-        "billing": ["payment", "charge", "invoice", "refund", "subscription", "billing", "cost"],
-        "account": ["login", "password", "access", "profile", "settings", "account", "signin"],
-        "general": ["question", "help", "how to", "information", "guide", "tutorial"]
-    }
-    
-    message_lower = message.lower()
+    scan = scan_message(message)
+    category_keywords = get_keyword_table("request_category")
     category_scores = {}
     
-    for category, keywords in category_keywords.items():
-        score = sum(1 for keyword in keywords if keyword in message_lower)
-        if score > 0:
-            category_scores[category] = score
+    for category in scan.categories("request_category"):
+        category_scores[category] = scan.count("request_category", category)
     
     if category_scores:
         best_category = max(category_scores, key=category_scores.get)
-        confidence = category_scores[best_category] / len(category_keywords[best_category])
+        confidence = category_scores[best_category] / len(category_keywords[best_category]["keywords"])
     else:
         best_category = "general"
         confidence = 0.5
@@ -225,25 +177,17 @@ def assess_priority(message: str) -> Dict[str, Any]:
     """
     logger.info(f"Assessing priority for: {message[:100]}...")
     
-    priority_keywords = {
-        "critical": ["urgent", "critical", "emergency", "down", "outage", "security", "breach", "data loss"],
-        "high": ["important", "asap", "priority", "escalate", "business", "production", "broken"],
-        "medium": ["soon", "when possible", "moderate", "standard", "issue"],
-        "low": ["whenever", "no rush", "low priority", "minor", "question"]
-    }
-    
-    message_lower = message.lower()
+    scan = scan_message(message)
     
-    for priority, keywords in priority_keywords.items():
-        if any(keyword in message_lower for keyword in keywords):
-            return {
-                "priority": priority,
-                "confidence": 0.8,
-                "reasoning": f"Contains {priority}-priority keywords"
-            }
+    for priority in scan.categories("request_priority"):
+        return {
+            "priority": priority,
+            "confidence": 0.8,
+            "reasoning": f"Contains {priority}-priority keywords"
+        }
     
     # Default priority based on message characteristics
-    if any(word in message_lower for word in ["error", "crash", "not working"]):
+    if scan.count("request_priority_fallback", "error"):
         return {
             "priority": "high",
             "confidence": 0.6,
@@ -358,22 +302,14 @@ def identify_issue_type(message: str) -> Dict[str, Any]:
     """
     logger.info(f"Identifying issue type for: {message[:100]}...")
     
-    issue_keywords = {
-        "application_crash": ["crash", "freeze", "hang", "stop working", "error", "exception"],
-        "login_issues": ["login", "sign in", "password", "authentication", "access", "signin"],
-        "performance_issues": ["slow", "lag", "performance", "speed", "loading", "timeout"],
-        "connectivity_issues": ["connection", "network", "internet", "offline", "timeout", "dns"]
-    }
-    
-    message_lower = message.lower()
+    scan = scan_message(message)
     
-    for issue_type, keywords in issue_keywords.items():
-        if any(keyword in message_lower for keyword in keywords):
-            return {
-                "issue_type": issue_type,
-                "confidence": 0.8,
-                "keywords_found": [kw for kw in keywords if kw in message_lower]
-            }
+    for issue_type in scan.categories("issue_type"):
+        return {
+            "issue_type": issue_type,
+            "confidence": 0.8,
+            "keywords_found": scan.matched("issue_type", issue_type)
+        }
     
     return {
         "issue_type": "general_technical",
@@ -486,33 +422,15 @@ def assess_customer_satisfaction(message: str) -> Dict[str, Any]:
     """
     logger.info(f"Assessing customer satisfaction from: {message[:100]}...")
     
-    satisfaction_keywords = {
-        "high": ["excellent", "amazing", "perfect", "love", "fantastic", "outstanding", "great"],
-        "medium": ["good", "okay", "fine", "decent", "satisfied", "helpful", "thanks"],
-        "low": ["disappointed", "frustrated", "angry", "terrible", "awful", "poor", "bad"]
-    }
-    
-    resolution_keywords = {
-        "resolved": ["yes", "solved", "fixed", "working", "resolved", "thank you", "perfect"],
-        "unresolved": ["no", "still", "not working", "problem", "issue", "help", "broken"],
-        "partial": ["maybe", "partially", "somewhat", "kind of", "better"]
-    }
-    
-    message_lower = message.lower()
+    scan = scan_message(message)
     
     # Assess satisfaction level
-    satisfaction = "unknown"
-    for level, keywords in satisfaction_keywords.items():
-        if any(keyword in message_lower for keyword in keywords):
-            satisfaction = level
-            break
+    satisfaction_levels = scan.categories("satisfaction")
+    satisfaction = satisfaction_levels[0] if satisfaction_levels else "unknown"
     
     # Assess resolution status
-    resolution_status = "unclear"
-    for status, keywords in resolution_keywords.items():
-        if any(keyword in message_lower for keyword in keywords):
-            resolution_status = status
-            break
+    resolution_statuses = scan.categories("resolution")
+    resolution_status = resolution_statuses[0] if resolution_statuses else "unclear"
     
     # Default assessment based on resolution status
     if satisfaction == "unknown":
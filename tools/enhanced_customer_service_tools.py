@@ -9,9 +9,55 @@ from models.business_config import BusinessConfig
 from integrations.customer_data_manager import CustomerDataManager
 from integrations.data_gathering_agent import DataGatheringAgent
 from knowledge.dynamic_knowledge_manager import DynamicKnowledgeManager
+from .keyword_matcher import register_keyword_table, scan_message
 
 logger = logging.getLogger(__name__)
 
+# Most recent history records included in the customer context
+CONTEXT_HISTORY_LIMIT = 20
+
+register_keyword_table("message_category", {
+    "technical": {
+        "keywords": ["error", "bug", "crash", "not working", "broken", "issue", "problem", "api", "integration"],
+        "weight": 1.0
+    },
+    "billing": {
+        "keywords": ["payment", "charge", "invoice", "refund", "subscription", "billing", "cost", "price"],
+        "weight": 1.0
+    },
+    "account": {
+        "keywords": ["login", "password", "access", "profile", "settings", "account", "signin", "signup"],
+        "weight": 1.0
+    },
+    "support": {
+        "keywords": ["help", "support", "assistance", "question", "how to", "guide", "tutorial"],
+        "weight": 0.8
+    },
+    "sales": {
+        "keywords": ["buy", "purchase", "pricing", "demo", "trial", "upgrade", "plan"],
+        "weight": 0.9
+    }
+})
+
+register_keyword_table("message_priority", {
+    "critical": {
+        "keywords": ["urgent", "critical", "emergency", "down", "outage", "security", "breach"],
+        "weight": 4
+    },
+    "high": {
+        "keywords": ["important", "asap", "priority", "escalate", "business", "production"],
+        "weight": 3
+    },
+    "medium": {
+        "keywords": ["soon", "when possible", "moderate", "standard"],
+        "weight": 2
+    },
+    "low": {
+        "keywords": ["whenever", "no rush", "low priority", "minor", "question"],
+        "weight": 1
+    }
+})
+
 
 class EnhancedCustomerServiceTools:
     """Enhanced tools that integrate with dynamic customer data and business configuration."""
@@ -104,39 +150,11 @@ class EnhancedCustomerServiceTools:
     
     def _categorize_message_content(self, message: str) -> Dict[str, Any]:
         """Basic message content categorization."""
-        message_lower = message.lower()
-        
-        category_patterns = {
-            "technical": {
-                "keywords": ["error", "bug", "crash", "not working", "broken", "issue", "problem", "api", "integration"],
-                "weight": 1.0
-            },
-            "billing": {
-                "keywords": ["payment", "charge", "invoice", "refund", "subscription", "billing", "cost", "price"],
-                "weight": 1.0
-            },
-            "account": {
-                "keywords": ["login", "password", "access", "profile", "settings", "account", "signin", "signup"],
-                "weight": 1.0
-            },
-            "support": {
-                "keywords": ["help", "support", "assistance", "question", "how to", "guide", "tutorial"],
-                "weight": 0.8
-            },
-            "sales": {
-                "keywords": ["buy", "purchase", "pricing", "demo", "trial", "upgrade", "plan"],
-                "weight": 0.9
-            }
-        }
+        scan = scan_message(message)
         
         scores = {}
-        for category, config in category_patterns.items():
-            score = sum(
-                config["weight"] for keyword in config["keywords"] 
-                if keyword in message_lower
-            )
-            if score > 0:
-                scores[category] = score
+        for category in scan.categories("message_category"):
+            scores[category] = scan.score("message_category", category)
         
         if scores:
             best_category = max(scores, key=scores.get)
@@ -291,32 +309,13 @@ class EnhancedCustomerServiceTools:
     
     def _assess_message_priority(self, message: str) -> Dict[str, Any]:
         """Assess priority from message content."""
-        message_lower = message.lower()
-        
-        priority_indicators = {
-            "critical": {
-                "keywords": ["urgent", "critical", "emergency", "down", "outage", "security", "breach"],
-                "score": 4
-            },
-            "high": {
-                "keywords": ["important", "asap", "priority", "escalate", "business", "production"],
-                "score": 3
-            },
-            "medium": {
-                "keywords": ["soon", "when possible", "moderate", "standard"],
-                "score": 2
-            },
-            "low": {
-                "keywords": ["whenever", "no rush", "low priority", "minor", "question"],
-                "score": 1
-            }
-        }
+        scan = scan_message(message)
         
         max_score = 0
         detected_level = "medium"
         
-        for level, config in priority_indicators.items():
-            score = sum(config["score"] for keyword in config["keywords"] if keyword in message_lower)
+        for level in scan.categories("message_priority"):
+            score = scan.score("message_priority", level)
             if score > max_score:
                 max_score = score
                 detected_level = level
@@ -484,7 +483,11 @@ class EnhancedCustomerServiceTools:
             
             # Get customer history
             try:
-                history = await self.data_manager.get_customer_history(customer.customer_id)
+                history = [
+                    record async for record in self.data_manager.iter_history(
+                        customer.customer_id, limit=CONTEXT_HISTORY_LIMIT
+                    )
+                ]
             except Exception as e:
                 logger.warning(f"Could not retrieve customer history: {e}")
                 history = []
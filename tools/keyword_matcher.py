@@ -0,0 +1,207 @@
+"""Shared single-pass keyword matcher for the keyword-based classifiers.
+
+Each classifier registers a keyword table (category -> keywords, with an
+optional weight) under its own name. All tables are compiled into one regular
+expression, so a message is scanned once per turn no matter how many
+classifiers read it, and the scan result is cached for repeated lookups of
+the same message.
+
+Matching keeps the substring semantics of ``keyword in message.lower()``:
+the pattern is a trie of all keywords, searched again one character after
+each match, which yields the longest keyword starting at every position;
+keywords that are prefixes of it are added from a precomputed table.
+"""
+
+import logging
+import re
+import threading
+from functools import lru_cache
+from typing import Dict, Any, List, NamedTuple, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+# Distinct messages whose scan results are kept
+SCAN_CACHE_SIZE = 512
+
+KeywordTable = Dict[str, Union[List[str], Dict[str, Any]]]
+
+
+class KeywordHit(NamedTuple):
+    """A keyword found in a message, tagged with the classifier table it belongs to."""
+    classifier: str
+    category: str
+    keyword: str
+    weight: float
+
+
+class ScanResult:
+    """All keyword hits for one message, grouped by classifier and category."""
+
+    def __init__(self, keywords: frozenset, tables: Dict[str, Dict[str, Dict[str, Any]]], owners: Dict[str, List[tuple]]):
+        self.keywords = keywords
+        self._tables = tables
+        # classifier -> category -> matched keywords in table order, only categories with hits
+        self._matches: Dict[str, Dict[str, List[str]]] = {classifier: {} for classifier in tables}
+        for classifier, _, category, _, keyword in sorted(
+            owner for keyword in keywords for owner in owners[keyword]
+        ):
+            self._matches[classifier].setdefault(category, []).append(keyword)
+
+    def matched(self, classifier: str, category: str) -> List[str]:
+        """Keywords of a category found in the message, in table order."""
+        return list(self._matches[classifier].get(category, ()))
+
+    def count(self, classifier: str, category: str) -> int:
+        """Number of distinct keywords of a category found in the message."""
+        return len(self._matches[classifier].get(category, ()))
+
+    def score(self, classifier: str, category: str) -> float:
+        """Sum of the category weight over its matched keywords."""
+        count = self.count(classifier, category)
+        return self._tables[classifier][category]["weight"] * count if count else 0
+
+    def categories(self, classifier: str) -> List[str]:
+        """Categories of a classifier with at least one hit, in table order."""
+        return list(self._matches[classifier])
+
+    def hits(self, classifier: Optional[str] = None) -> List[KeywordHit]:
+        """Every hit, optionally limited to one classifier."""
+        classifiers = [classifier] if classifier else list(self._matches)
+        return [
+            KeywordHit(name, category, keyword, self._tables[name][category]["weight"])
+            for name in classifiers
+            for category, matched in self._matches[name].items()
+            for keyword in matched
+        ]
+
+
+def _trie_pattern(keywords: List[str]) -> str:
+    """
+    Regular expression matching the longest keyword at a position.
+
+    Keywords are factored into a character trie so the engine follows a
+    single branch per character instead of trying every keyword in turn.
+    """
+    trie: Dict[str, Any] = {}
+    for keyword in keywords:
+        node = trie
+        for char in keyword:
+            node = node.setdefault(char, {})
+        node[""] = True
+
+    def build(node: Dict[str, Any]) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        # A keyword ends here: longer keywords are tried first, greedily
+        return f"(?:{body})?" if "" in node else body
+
+    return build(trie)
+
+
+class KeywordMatcher:
+    """Compiled matcher over every registered keyword table."""
+
+    def __init__(self, tables: Dict[str, Dict[str, Dict[str, Any]]]):
+        self.tables = tables
+        keywords = sorted({
+            keyword for table in tables.values() for entry in table.values() for keyword in entry["keywords"]
+        })
+        # Keywords found whenever a longer keyword matches at the same position
+        self._prefixes = {
+            keyword: tuple(other for other in keywords if other != keyword and keyword.startswith(other))
+            for keyword in keywords
+        }
+        # keyword -> (classifier, category position, category, keyword position, keyword) per table entry
+        self._owners: Dict[str, List[tuple]] = {keyword: [] for keyword in keywords}
+        for classifier, table in tables.items():
+            for category_position, (category, entry) in enumerate(table.items()):
+                for keyword_position, keyword in enumerate(entry["keywords"]):
+                    self._owners[keyword].append((classifier, category_position, category, keyword_position, keyword))
+        self._pattern = re.compile(_trie_pattern(keywords)) if keywords else None
+
+    def scan(self, text: str) -> ScanResult:
+        """Scan lowercased text once and collect every keyword it contains."""
+        found = set()
+        if self._pattern is not None:
+            # Restart one character after each match so overlapping keywords are found
+            search = self._pattern.search
+            match = search(text)
+            while match is not None:
+                keyword = match.group()
+                if keyword not in found:
+                    found.add(keyword)
+                    found.update(self._prefixes[keyword])
+                match = search(text, match.start() + 1)
+        return ScanResult(frozenset(found), self.tables, self._owners)
+
+
+_tables: Dict[str, Dict[str, Dict[str, Any]]] = {}
+_matcher: Optional[KeywordMatcher] = None
+_lock = threading.Lock()
+
+
+def _normalize_table(table: KeywordTable) -> Dict[str, Dict[str, Any]]:
+    normalized = {}
+    for category, entry in table.items():
+        if isinstance(entry, dict):
+            keywords, weight = entry["keywords"], entry.get("weight", 1)
+        else:
+            keywords, weight = entry, 1
+        normalized[category] = {
+            "keywords": [keyword.lower() for keyword in keywords],
+            "weight": weight
+        }
+    return normalized
+
+
+def register_keyword_table(classifier: str, table: KeywordTable):
+    """
+    Register or replace the keyword table of a classifier.
+
+    Args:
+        classifier: Classifier name, e.g. ``"request_category"``
+        table: Mapping of category to a keyword list, or to
+            ``{"keywords": [...], "weight": w}``; category order is preserved
+    """
+    global _matcher
+    with _lock:
+        _tables[classifier] = _normalize_table(table)
+        _matcher = None
+    _scan_cached.cache_clear()
+
+
+def get_keyword_table(classifier: str) -> Dict[str, Dict[str, Any]]:
+    """Get the normalised keyword table of a classifier."""
+    return _tables[classifier]
+
+
+def _get_matcher() -> KeywordMatcher:
+    global _matcher
+    matcher = _matcher
+    if matcher is None:
+        with _lock:
+            if _matcher is None:
+                _matcher = KeywordMatcher(dict(_tables))
+                logger.debug(f"Compiled keyword matcher for {len(_tables)} classifiers")
+            matcher = _matcher
+    return matcher
+
+
+@lru_cache(maxsize=SCAN_CACHE_SIZE)
+def _scan_cached(text: str) -> ScanResult:
+    return _get_matcher().scan(text.lower())
+
+
+def scan_message(message: str) -> ScanResult:
+    """
+    Scan a message against all registered keyword tables.
+
+    Args:
+        message: Raw message text (matching is case-insensitive)
+
+    Returns:
+        ScanResult shared by every classifier reading the same message
+    """
+    return _scan_cached(message or "")
@@ -9,8 +9,15 @@ from google.cloud import speech, texttospeech
 from google.cloud.speech import RecognitionConfig, RecognitionAudio
 from google.cloud.texttospeech import SsmlVoiceGender, AudioConfig, AudioEncoding
 
+from .keyword_matcher import register_keyword_table, scan_message
+
 logger = logging.getLogger(__name__)
 
+register_keyword_table("voice_sentiment", {
+    "positive": ["good", "great", "excellent", "happy", "satisfied", "thank", "thanks", "perfect"],
+    "negative": ["bad", "terrible", "awful", "angry", "frustrated", "hate", "problem", "issue"]
+})
+
 # Initialize Google Cloud clients
 speech_client = speech.SpeechClient()
 tts_client = texttospeech.TextToSpeechClient()
@@ -295,12 +302,9 @@ def analyze_voice_sentiment(audio_data: str, language: str = "en-US") -> Dict[st
 def _analyze_text_sentiment(text: str) -> Dict[str, Any]:
     """Analyze sentiment from transcribed text."""
     # Simple keyword-based sentiment analysis
-    positive_words = ["good", "great", "excellent", "happy", "satisfied", "thank", "thanks", "perfect"]
-    negative_words = ["bad", "terrible", "awful", "angry", "frustrated", "hate", "problem", "issue"]
-    
-    text_lower = text.lower()
-    positive_count = sum(1 for word in positive_words if word in text_lower)
-    negative_count = sum(1 for word in negative_words if word in text_lower)
+    scan = scan_message(text)
+    positive_count = scan.count("voice_sentiment", "positive")
+    negative_count = scan.count("voice_sentiment", "negative")
     
     if positive_count > negative_count:
         sentiment = "positive"
@@ -5,7 +5,7 @@ import json
 from datetime import datetime
 
 from fastapi import FastAPI, Request, Form, HTTPException, Depends
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi.responses import HTMLResponse, RedirectResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
 
@@ -14,6 +14,8 @@ from admin.config_manager import ConfigManager
 from models.business_config import BusinessConfig
 from integrations.base_provider import IntegrationConfig
 from integrations.customer_data_manager import CustomerDataManager
+from integrations.rate_limiter import bulk_requests
+from integrations.customer_sync import sync_all
 
 # Create enhanced admin app
 admin_app = FastAPI(
@@ -387,6 +389,32 @@ async def search_customers(query: str = "", limit: int = 10):
     except Exception as e:
         return {"customers": [], "error": str(e)}
 
+@admin_app.get("/customers/export")
+async def export_customers(query: str = "", limit: Optional[int] = None):
+    """Stream matching customers as newline-delimited JSON."""
+    business_config = config_manager.get_business_config()
+    if not business_config:
+        raise HTTPException(status_code=404, detail="Business config not found")
+    
+    data_manager = CustomerDataManager(business_config)
+    
+    async def lines():
+        # Exports must not starve interactive lookups of provider API quota
+        with bulk_requests():
+            async for customer in data_manager.iter_customers(query, limit=limit):
+                yield customer.model_dump_json() + "\n"
+    
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@admin_app.post("/customers/sync")
+async def sync_customers():
+    """Pull changed customers from every provider into the local replica now."""
+    business_config = config_manager.get_business_config()
+    if not business_config:
+        raise HTTPException(status_code=404, detail="Business config not found")
+    
+    return await sync_all(business_config)
+
 @admin_app.get("/customers-old", response_class=HTMLResponse)
 async def customers_page(request: Request):
     """Customer list page."""
@@ -4,14 +4,37 @@ import uuid
 from datetime import datetime
 # from pathlib import Path
 
-from fastapi import FastAPI, HTTPException, BackgroundTasks, Depends, Query
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Depends, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 
 from api import app as base_api_app
 from admin.config_manager import ConfigManager
 from integrations.customer_data_manager import CustomerDataManager
+from integrations.http_client import http_pool_stats
+from integrations.database.postgres_provider import postgres_pool_stats
+from integrations.database.postgres_listener import postgres_listener_stats
+from integrations.latency_tracker import provider_latency
+from integrations.customer_cache import customer_cache
+from integrations.oauth import oauth_tokens
+from integrations.circuit_breaker import circuit_breaker_stats
+from integrations.rate_limiter import rate_limiter_stats
+from integrations.identity_index import identity_index
+from integrations.customer_replica import customer_replica
+from integrations.webhooks import (
+    SALESFORCE_ACK,
+    WebhookProcessor,
+    WebhookQueueFullError,
+    WebhookSignatureError,
+    parse_webhook
+)
 from models.business_config import BusinessConfig
+from knowledge.search_index import get_knowledge_index
+from knowledge.retrieval import get_knowledge_retriever
+from shared_libraries.response_cache import response_cache
+from shared_libraries.conversation_history import prompt_history_stats
+from shared_libraries.session_history import history_archive
+from agents.customer_service_agents import session_service, session_sweeper
 
 # Create enhanced API app
 api_app = FastAPI(
@@ -36,6 +59,7 @@ api_app.mount("/v1", base_api_app)
 
 # Initialize managers
 config_manager = ConfigManager()
+webhook_processor = WebhookProcessor(config_manager.get_business_config)
 
 # Enhanced API Models
 class CustomerProfileModel(BaseModel):
@@ -47,6 +71,10 @@ class CustomerProfileModel(BaseModel):
     tier: str = "standard"
     custom_fields: Dict[str, Any] = {}
 
+class BulkCustomerRequest(BaseModel):
+    customer_ids: List[str]
+    provider_name: Optional[str] = None
+
 class ConversationModel(BaseModel):
     conversation_id: str
     customer_id: str
@@ -93,6 +121,33 @@ async def get_customer_profile(customer_id: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@api_app.post("/customers/bulk", response_model=List[Optional[CustomerProfileModel]])
+async def get_customer_profiles_bulk(request: BulkCustomerRequest):
+    """Get many customer profiles at once; entries are null for unknown IDs."""
+    try:
+        business_config = config_manager.get_business_config()
+        if not business_config:
+            raise HTTPException(status_code=500, detail="Business configuration not found")
+        
+        data_manager = CustomerDataManager(business_config)
+        customers = await data_manager.get_customers_bulk(request.customer_ids, request.provider_name)
+        
+        return [
+            CustomerProfileModel(
+                customer_id=customer.customer_id,
+                name=customer.name,
+                email=customer.email,
+                phone=customer.phone,
+                company=customer.company,
+                tier=customer.tier,
+                custom_fields=customer.custom_fields
+            ) if customer else None
+            for customer in customers
+        ]
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @api_app.post("/customers", response_model=CustomerProfileModel)
 async def create_customer(customer_data: CustomerProfileModel):
     """Create new customer profile."""
@@ -150,6 +205,39 @@ async def search_customers(
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# Provider Webhooks
+@api_app.post("/webhooks/{provider_name}", status_code=202)
+async def receive_webhook(provider_name: str, request: Request):
+    """Verify a provider's customer change webhook and queue it for processing."""
+    business_config = config_manager.get_business_config()
+    integration = next(
+        (
+            provider for provider in (business_config.data_providers if business_config else [])
+            if provider.provider_name == provider_name and provider.enabled
+        ),
+        None
+    )
+    if integration is None:
+        raise HTTPException(status_code=404, detail="Provider not found")
+    
+    body = await request.body()
+    try:
+        events = parse_webhook(integration, request.method, str(request.url), request.headers, body)
+    except WebhookSignatureError as e:
+        raise HTTPException(status_code=401, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    try:
+        result = webhook_processor.submit(events)
+    except WebhookQueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
+    
+    if integration.provider_type == "salesforce":
+        # Outbound messages are redelivered until acknowledged in SOAP
+        return Response(content=SALESFORCE_ACK, media_type="text/xml")
+    return result
+
 # Conversation Management
 @api_app.get("/conversations/{conversation_id}", response_model=ConversationModel)
 async def get_conversation(conversation_id: str):
@@ -231,6 +319,15 @@ async def get_analytics_overview(
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@api_app.get("/analytics/customers")
+async def get_customer_analytics():
+    """Get customer base figures from the synced replica."""
+    try:
+        return {"providers": await customer_replica.run(customer_replica.summary)}
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @api_app.get("/analytics/agents")
 async def get_agent_analytics():
     """Get agent performance analytics."""
@@ -271,31 +368,24 @@ async def search_knowledge_base(
 ):
     """Search knowledge base."""
     try:
-        # Mock knowledge search
-        results = [
-            {
-                "id": "kb_001",
-                "title": "Password Reset Guide",
-                "content": "Step-by-step guide to reset your password",
-                "category": "account",
-                "relevance_score": 0.95
-            },
-            {
-                "id": "kb_002",
-                "title": "API Integration Setup",
-                "content": "How to integrate with our API",
-                "category": "technical",
-                "relevance_score": 0.87
-            }
-        ]
+        index_results, total_found = get_knowledge_retriever().search(query, category or "", limit=10)
         
-        if category:
-            results = [r for r in results if r["category"] == category]
+        results = []
+        for result in index_results:
+            content = result["content"]
+            results.append({
+                "id": content.get("id"),
+                "title": content.get("title") or content.get("question", ""),
+                "content": content.get("content") or content.get("answer") or content.get("solution", ""),
+                "category": content.get("category", "general"),
+                "type": result["type"],
+                "relevance_score": result["relevance_score"]
+            })
         
         return {
             "query": query,
             "results": results,
-            "total_found": len(results)
+            "total_found": total_found
         }
         
     except Exception as e:
@@ -307,10 +397,8 @@ async def get_knowledge_categories():
     try:
         return {
             "categories": [
-                {"name": "account", "count": 15},
-                {"name": "technical", "count": 23},
-                {"name": "billing", "count": 12},
-                {"name": "general", "count": 8}
+                {"name": name, "count": count}
+                for name, count in get_knowledge_index().category_counts().items()
             ]
         }
         
@@ -340,6 +428,24 @@ async def enhanced_health_check():
                 "dynamic_knowledge": True,
                 "multi_agent_workflow": True,
                 "real_time_analytics": True
+            },
+            "response_cache": response_cache.stats(),
+            "http_pools": http_pool_stats(),
+            "postgres_pools": postgres_pool_stats(),
+            "postgres_listeners": postgres_listener_stats(),
+            "provider_latency": provider_latency.stats(),
+            "customer_cache": customer_cache.stats(),
+            "oauth_tokens": oauth_tokens.stats(),
+            "circuit_breakers": circuit_breaker_stats(),
+            "rate_limits": rate_limiter_stats(),
+            "identity_index": await identity_index.run(identity_index.stats),
+            "customer_replica": await customer_replica.run(customer_replica.stats),
+            "webhooks": webhook_processor.stats(),
+            "prompt_history": prompt_history_stats(),
+            "sessions": {
+                "cache": session_service.stats() if hasattr(session_service, "stats") else None,
+                "sweeper": session_sweeper.stats(),
+                "history_archive": await history_archive.run(history_archive.stats)
             }
         }
         
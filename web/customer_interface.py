@@ -1,21 +1,33 @@
 """Customer-facing web interface for self-service support."""
+import json
+import logging
 import uuid
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, Any, List, Optional
 
 from fastapi import FastAPI, Request, Form, Depends, HTTPException
-from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse
+from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
 import google.genai.types as types
+from google.adk.agents.run_config import StreamingMode
+from google.adk.events import Event
+from google.adk.sessions.base_session_service import GetSessionConfig
 
-from agents.customer_service_agents import runner, session_service, create_new_state
+from agents.customer_service_agents import session_service, create_new_state
+from agents.session_store import agent_run_config
+from agents.fast_path_router import select_runner
+from config import config
+from shared_libraries.response_cache import response_cache
 from integrations.customer_data_manager import CustomerDataManager
 from models.business_config import BusinessConfig
 from entities.customer import Customer
 # Import the dependency we just created
 from .dependencies import get_current_user, RedirectToLoginException
+from .admin_interface import config_manager
+
+logger = logging.getLogger(__name__)
 
 # Create customer app
 customer_app = FastAPI(
@@ -45,8 +57,88 @@ if not static_dir.exists():
 # Mount static files
 customer_app.mount("/static", StaticFiles(directory=static_dir), name="static")
 
-# Store active conversation sessions
-CONVERSATION_SESSIONS: Dict[str, Dict[str, Any]] = {}
+APP_NAME = "customer-service"
+
+
+async def get_or_create_chat_session(customer_id: str, conversation_id: str, new: bool = False):
+    """
+    Load the agent session for a conversation, creating it on the first message.
+
+    Only the session and its state are read; runners load the recent events
+    themselves. A ``new`` conversation is created without looking it up.
+    """
+    session = None
+    if not new:
+        session = await session_service.get_session(
+            app_name=APP_NAME,
+            user_id=customer_id,
+            session_id=conversation_id,
+            config=GetSessionConfig(num_recent_events=0)
+        )
+    if session is None:
+        state = create_new_state()
+        logger.info(f"New chat session created: {conversation_id}")
+        session = await session_service.create_session(
+            app_name=APP_NAME, user_id=customer_id, state=state, session_id=conversation_id
+        )
+    return session
+
+
+def _event_text(event) -> str:
+    """Concatenate the text parts of an agent event."""
+    if not event.content or not event.content.parts:
+        return ""
+    return "".join(part.text for part in event.content.parts if part.text)
+
+
+def _summarize_run(events: List[Any]) -> Dict[str, Any]:
+    """Final answer text, its author and the tools called during a run."""
+    text, agent, tools_used = "", None, []
+    for event in events:
+        tools_used.extend(call.name for call in event.get_function_calls())
+        event_text = _event_text(event)
+        if event_text and not event.partial and event.author != "user":
+            text, agent = event_text, event.author
+    return {"text": text, "agent": agent, "tools_used": tools_used}
+
+
+def _tenant() -> str:
+    """Business the chat belongs to; cached answers are never shared between businesses."""
+    business_config = config_manager.get_business_config()
+    return business_config.business_name if business_config else config.app_name
+
+
+def _lookup_cached_response(message: str, route: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    if not config.response_cache_enabled:
+        return None
+    return response_cache.lookup(message, route, _tenant())
+
+
+def _store_response(message: str, route: Optional[Dict[str, Any]], summary: Dict[str, Any]):
+    if config.response_cache_enabled:
+        response_cache.store(
+            message, route, _tenant(), summary["text"], summary["agent"], summary["tools_used"]
+        )
+
+
+async def _record_cached_turn(session, message: str, cached: Dict[str, Any]):
+    """Append a turn answered from the response cache to the conversation history."""
+    invocation_id = f"cache-{uuid.uuid4().hex[:12]}"
+    await session_service.append_event(session, Event(
+        invocation_id=invocation_id,
+        author="user",
+        content=types.Content(role="user", parts=[types.Part(text=message)])
+    ))
+    await session_service.append_event(session, Event(
+        invocation_id=invocation_id,
+        author=cached["agent"],
+        content=types.Content(role="model", parts=[types.Part(text=cached["text"])])
+    ))
+
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    """Format one Server-Sent Events frame."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
 
 @customer_app.get("/", response_class=HTMLResponse)
 async def customer_portal_home(request: Request):
@@ -159,37 +251,38 @@ async def send_chat_message(
     
     try:
         # Generate conversation ID if not provided
-        if not conversation_id:
+        new_conversation = not conversation_id
+        if new_conversation:
             conversation_id = f"chat_{uuid.uuid4().hex[:8]}"
 
         # Get or create session data for this conversation
-        # session_data = CONVERSATION_SESSIONS.setdefault(conversation_id, {})
-        app_name = "customer-service"
-        # Process the message through the root agent
-        session = await session_service.get_session(
-            app_name=app_name, user_id=customer_id, session_id=conversation_id
-        )
-        if session is None and not session:
-            state = create_new_state()
-            print("New session created")
-            session = await session_service.create_session(
-                app_name=app_name, user_id=customer_id, state=state, session_id=conversation_id
-            )
+        session = await get_or_create_chat_session(customer_id, conversation_id, new=new_conversation)
 
         try:
-            message = types.Content(role="user", parts=[types.Part(text=message)])
-            events = [
-                event
-                async for event in runner.run_async(
-                    user_id=customer_id,
-                    session_id=session.id,
-                    new_message=message,
-                )
-            ]
-            # response_text = events[0].content.parts[0].text
-            # Extract response text from events
-            response_text = events[0].content.parts[0].text if events and events[0].content and events[0].content.parts else "I'm sorry, I couldn't process your request."
-            # agent_response.get("output", "I'm sorry, I couldn't process your request.")
+            # Confident messages skip the coordinator and go straight to a specialist
+            message_runner, route = select_runner(message)
+
+            # Repeated documented questions are answered without running the agents
+            cached = _lookup_cached_response(message, route)
+            if cached:
+                await _record_cached_turn(session, message, cached)
+                response_text = cached["text"]
+            else:
+                content = types.Content(role="user", parts=[types.Part(text=message)])
+                events = [
+                    event
+                    async for event in message_runner.run_async(
+                        user_id=customer_id,
+                        session_id=session.id,
+                        new_message=content,
+                        state_delta={"fast_path_route": route} if route else None,
+                        run_config=agent_run_config(),
+                    )
+                ]
+                # The last text event is the answer of the agent that handled the request
+                summary = _summarize_run(events)
+                response_text = summary["text"] or "I'm sorry, I couldn't process your request."
+                _store_response(message, route, summary)
             
         except Exception as e:
             print(f"Agent processing error: {str(e)}")
@@ -212,6 +305,108 @@ async def send_chat_message(
             "error": f"Sorry, there was an internal error: {str(e.__class__.__name__)}. Please try again later"
         }, status_code=500)
 
+async def _stream_agent_events(
+    request: Request,
+    message_runner,
+    route: Optional[Dict[str, Any]],
+    customer_id: str,
+    session,
+    message: str
+):
+    """Relay runner events to the client as they are produced."""
+    conversation_id = session.id
+    cached = _lookup_cached_response(message, route)
+    if cached:
+        yield _sse("start", {"conversation_id": conversation_id, "agent": cached["agent"]})
+        try:
+            await _record_cached_turn(session, message, cached)
+        except Exception as e:
+            logger.error(f"Error recording cached chat turn: {str(e)}")
+        yield _sse("message", {"agent": cached["agent"], "text": cached["text"], "cached": True})
+        yield _sse("done", {"conversation_id": conversation_id, "timestamp": datetime.now().isoformat()})
+        return
+
+    content = types.Content(role="user", parts=[types.Part(text=message)])
+    events = message_runner.run_async(
+        user_id=customer_id,
+        session_id=conversation_id,
+        new_message=content,
+        state_delta={"fast_path_route": route} if route else None,
+        run_config=agent_run_config(streaming_mode=StreamingMode.SSE),
+    )
+
+    yield _sse("start", {
+        "conversation_id": conversation_id,
+        "agent": route["agent"] if route else None
+    })
+    final_events = []
+    try:
+        async for event in events:
+            # Stop the agent chain as soon as the customer goes away
+            if await request.is_disconnected():
+                logger.info(f"Client disconnected, cancelling chat run: {conversation_id}")
+                return
+
+            if event.actions and event.actions.transfer_to_agent:
+                yield _sse("transfer", {
+                    "from": event.author,
+                    "to": event.actions.transfer_to_agent
+                })
+
+            if not event.partial:
+                final_events.append(event)
+
+            text = _event_text(event)
+            if not text or event.author == "user":
+                continue
+            # Partial events carry text chunks; the final event repeats the full text
+            yield _sse("delta" if event.partial else "message", {
+                "agent": event.author,
+                "text": text
+            })
+
+        _store_response(message, route, _summarize_run(final_events))
+        yield _sse("done", {
+            "conversation_id": conversation_id,
+            "timestamp": datetime.now().isoformat()
+        })
+    except Exception as e:
+        logger.error(f"Agent streaming error: {str(e)}")
+        yield _sse("error", {
+            "error": "I apologize, but I encountered an issue while processing your request. Please try again."
+        })
+    finally:
+        # Also runs when the response task is cancelled on disconnect
+        await events.aclose()
+
+@customer_app.post("/chat/stream")
+async def stream_chat_message(
+    request: Request,
+    customer_id: str = Form(...),
+    message: str = Form(...),
+    conversation_id: Optional[str] = Form(None)
+):
+    """Handle a chat message, streaming the agent response as Server-Sent Events."""
+    new_conversation = not conversation_id
+    if new_conversation:
+        conversation_id = f"chat_{uuid.uuid4().hex[:8]}"
+
+    try:
+        session = await get_or_create_chat_session(customer_id, conversation_id, new=new_conversation)
+    except Exception as e:
+        logger.error(f"Error loading chat session {conversation_id}: {str(e)}")
+        return JSONResponse({
+            "status": "error",
+            "error": f"Sorry, there was an internal error: {str(e.__class__.__name__)}. Please try again later"
+        }, status_code=500)
+
+    message_runner, route = select_runner(message)
+    return StreamingResponse(
+        _stream_agent_events(request, message_runner, route, customer_id, session, message),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @customer_app.get("/tickets", response_class=HTMLResponse)
 async def customer_tickets(request: Request, customer: Dict = Depends(get_current_user)):
     """Customer ticket history and status."""
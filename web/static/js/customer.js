@@ -51,6 +51,7 @@ function initializeChatInterface() {
         
         chatMessages.appendChild(messageDiv);
         chatMessages.scrollTop = chatMessages.scrollHeight;
+        return messageDiv.querySelector('.message-bubble p.text-sm');
     }
     
     // Function to show typing indicator
@@ -108,32 +109,71 @@ function initializeChatInterface() {
             
             const typingIndicator = showTypingIndicator();
             
-            // Make API call to send message
-            const apiResponse = await fetch('/customer/chat/message', {
+            // Stream the agent response as Server-Sent Events
+            const apiResponse = await fetch('/customer/chat/stream', {
                 method: 'POST',
                 headers: headers,
                 body: formData,
             });
 
-            removeTypingIndicator();
-
-            if (!apiResponse.ok) {
+            if (!apiResponse.ok || !apiResponse.body) {
+                removeTypingIndicator();
                 // Handle server errors (e.g., 500 Internal Server Error)
                 const errorData = await apiResponse.json();
                 throw new Error(errorData.error || 'The server returned an error.');
             }
 
-            const responseData = await apiResponse.json();
-            
-            if (responseData.status === 'success') {
-                // Save the conversation ID returned by the server
-                conversationIdInput.value = responseData.conversation_id;
-                
-                // Add agent response from the server to the chat
-                addMessage(responseData.response.text, false);
-            } else {
-                // Handle logical errors returned by the server
-                throw new Error(responseData.error || 'An unknown error occurred.');
+            const reader = apiResponse.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            let responseText = null;
+            let responseAgent = null;
+
+            // Show text as soon as the first chunk arrives; each agent gets its own bubble
+            function showResponse(text, append, agent) {
+                if (!responseText || agent !== responseAgent) {
+                    removeTypingIndicator();
+                    responseText = addMessage('', false);
+                    responseAgent = agent;
+                }
+                responseText.textContent = append ? responseText.textContent + text : text;
+                chatMessages.scrollTop = chatMessages.scrollHeight;
+            }
+
+            while (true) {
+                const { value, done } = await reader.read();
+                if (done) break;
+                buffer += decoder.decode(value, { stream: true });
+
+                // Frames are separated by a blank line
+                let boundary;
+                while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                    const frame = buffer.slice(0, boundary);
+                    buffer = buffer.slice(boundary + 2);
+
+                    const eventLine = frame.split('\n').find(line => line.startsWith('event: '));
+                    const dataLine = frame.split('\n').find(line => line.startsWith('data: '));
+                    if (!eventLine || !dataLine) continue;
+
+                    const eventType = eventLine.slice(7);
+                    const data = JSON.parse(dataLine.slice(6));
+
+                    if (eventType === 'start' || eventType === 'done') {
+                        // Save the conversation ID returned by the server
+                        conversationIdInput.value = data.conversation_id;
+                    } else if (eventType === 'delta') {
+                        showResponse(data.text, true, data.agent);
+                    } else if (eventType === 'message') {
+                        showResponse(data.text, false, data.agent);
+                    } else if (eventType === 'error') {
+                        throw new Error(data.error);
+                    }
+                }
+            }
+
+            if (!responseText) {
+                removeTypingIndicator();
+                addMessage("I'm sorry, I couldn't process your request.", false);
             }
             
         } catch (error) {